@@ -0,0 +1,325 @@
+"""Query engines for the history-heavy analytical paths (SQLite or DuckDB).
+
+The DuckDB engine attaches the SQLite file read-only and recreates the reporting
+views over the attached tables, from their SQLite definitions or from the
+DuckDB-tuned equivalents below; it executes them vectorized and returns Arrow /
+pandas directly.
+DuckDB is optional (`pip install duckdb`).
+"""
+import importlib.util
+from contextlib import closing
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from db import connect
+
+# pandas is imported on first query so the GUI can import this module cheaply
+if TYPE_CHECKING:
+    import pandas as pd
+
+ENGINES = ("sqlite", "duckdb")
+
+# Views recreated inside DuckDB, in dependency order
+DUCKDB_VIEWS = (
+    "v_jpy_rates",
+    "v_account_valuation",
+    "v_valuation",
+    "v_portfolio_total",
+    "v_currency_exposure",
+    "v_valuation_enriched",
+    "v_account_attribution",
+    "v_attribution",
+)
+
+# DuckDB-specific definitions used instead of the SQLite ones. DuckDB plans the
+# SQLite form's "LEFT JOIN ... ON a.ccy <> 'JPY' AND ..." as nested-loop joins, so the
+# direct/derived JPY legs are merged once (v_jpy_rates) and joined on equality only.
+DUCKDB_VIEW_OVERRIDES = {
+    "v_jpy_rates": """
+        CREATE VIEW v_jpy_rates AS
+        SELECT
+          COALESCE(f.date, g.date) AS date,
+          COALESCE(f.pair, g.pair) AS pair,
+          COALESCE(f.rate, g.rate) AS rate
+        FROM fx_rates f
+        FULL OUTER JOIN fx_rates_derived g ON g.date = f.date AND g.pair = f.pair
+    """,
+    "v_account_valuation": """
+        CREATE VIEW v_account_valuation AS
+        SELECT
+          s.account,
+          s.date,
+          s.ticker,
+          a.ccy,
+          s.qty,
+          s.price_ccy,
+          CASE WHEN a.ccy = 'JPY' THEN 1.0 ELSE j.rate END AS fx_rate,
+          (s.qty * s.price_ccy) * (CASE WHEN a.ccy = 'JPY' THEN 1.0 ELSE j.rate END) AS value_jpy
+        FROM snapshots s
+        JOIN assets a ON a.ticker = s.ticker
+        LEFT JOIN v_jpy_rates j ON j.date = s.date AND j.pair = (a.ccy || 'JPY')
+    """,
+    "v_account_attribution": """
+        CREATE VIEW v_account_attribution AS
+        WITH s AS (
+          SELECT
+            account,
+            date,
+            ticker,
+            qty AS q1,
+            price_ccy AS p1,
+            LAG(qty) OVER w AS q0,
+            LAG(price_ccy) OVER w AS p0,
+            LAG(date) OVER w AS d0
+          FROM snapshots
+          WINDOW w AS (PARTITION BY account, ticker ORDER BY date)
+        ),
+        base AS (
+          SELECT
+            s.account,
+            s.date,
+            s.ticker,
+            s.q0,
+            s.q1,
+            s.p0,
+            s.p1,
+            CASE WHEN a.ccy = 'JPY' THEN 1.0 ELSE j0.rate END AS r0,
+            CASE WHEN a.ccy = 'JPY' THEN 1.0 ELSE j1.rate END AS r1
+          FROM s
+          JOIN assets a ON a.ticker = s.ticker
+          LEFT JOIN v_jpy_rates j1 ON j1.date = s.date AND j1.pair = (a.ccy || 'JPY')
+          LEFT JOIN v_jpy_rates j0 ON j0.date = s.d0 AND j0.pair = (a.ccy || 'JPY')
+          WHERE s.q0 IS NOT NULL
+            AND (a.ccy = 'JPY' OR (j1.rate IS NOT NULL AND j0.rate IS NOT NULL))
+        )
+        SELECT
+          account,
+          date,
+          ticker,
+          (q1 * p1 * r1 - q0 * p0 * r0) AS delta_total,
+          (q0 * (p1 - p0) * r0)         AS delta_price,
+          (q0 * p0 * (r1 - r0))         AS delta_fx,
+          (q0 * (p1 - p0) * (r1 - r0))  AS delta_cross,
+          ((q1 - q0) * p1 * r1)         AS flow
+        FROM base
+        UNION ALL
+        SELECT
+          account,
+          date,
+          'PORTFOLIO' AS ticker,
+          SUM(q1 * p1 * r1 - q0 * p0 * r0),
+          SUM(q0 * (p1 - p0) * r0),
+          SUM(q0 * p0 * (r1 - r0)),
+          SUM(q0 * (p1 - p0) * (r1 - r0)),
+          SUM((q1 - q0) * p1 * r1)
+        FROM base
+        GROUP BY account, date
+    """,
+}
+
+# Base tables the views (and the history queries below) read
+DUCKDB_TABLES = (
+    "assets",
+    "snapshots",
+    "fx_rates",
+    "fx_rates_derived",
+    "asset_prices",
+    "portfolio_total_rc",
+    "valuation_jpy",
+    "account_total_rc",
+    "exposure_rc",
+    "account_exposure_rc",
+)
+
+
+def duckdb_available() -> bool:
+    return importlib.util.find_spec("duckdb") is not None
+
+
+def available_engines() -> list[str]:
+    return [name for name in ENGINES if name != "duckdb" or duckdb_available()]
+
+
+class SQLiteEngine:
+    name = "sqlite"
+
+    def __init__(self, db_path: Path | str):
+        self.conn = connect(db_path, read_only=True)
+
+    def query(self, sql: str, params: tuple = ()) -> "pd.DataFrame":
+        import pandas as pd
+
+        return pd.read_sql_query(sql, self.conn, params=params)
+
+    def arrow(self, sql: str, params: tuple = ()):
+        import pyarrow as pa
+
+        return pa.Table.from_pandas(self.query(sql, params), preserve_index=False)
+
+    def close(self) -> None:
+        self.conn.close()
+
+
+class DuckDBEngine:
+    name = "duckdb"
+
+    def __init__(self, db_path: Path | str):
+        try:
+            import duckdb
+        except ImportError as exc:
+            raise RuntimeError("duckdb がインストールされていません（pip install duckdb）") from exc
+
+        db_path = Path(db_path)
+        with closing(connect(db_path, read_only=True)) as src:
+            view_sql = dict(src.execute("SELECT name, sql FROM sqlite_master WHERE type = 'view'").fetchall())
+            tables = {
+                row[0] for row in src.execute("SELECT name FROM sqlite_master WHERE type = 'table'")
+            }
+
+        self.conn = duckdb.connect()
+        self.conn.execute("SET enable_progress_bar = false")
+        try:
+            self.conn.execute("LOAD sqlite")
+        except duckdb.Error:
+            self.conn.execute("INSTALL sqlite")
+            self.conn.execute("LOAD sqlite")
+        # ATTACH takes no bound parameters; quote the path as a SQL string literal
+        path = db_path.as_posix().replace("'", "''")
+        self.conn.execute(f"ATTACH '{path}' AS md (TYPE sqlite, READ_ONLY)")
+        # Expose the SQLite tables under their own names so the view SQL runs unchanged
+        for table in DUCKDB_TABLES:
+            if table in tables:
+                self.conn.execute(f"CREATE VIEW {table} AS SELECT * FROM md.{table}")
+        for view in DUCKDB_VIEWS:
+            sql = DUCKDB_VIEW_OVERRIDES.get(view) or view_sql.get(view)
+            if sql:
+                self.conn.execute(sql)
+
+    def query(self, sql: str, params: tuple = ()) -> "pd.DataFrame":
+        return self.conn.execute(sql, list(params)).df()
+
+    def arrow(self, sql: str, params: tuple = ()):
+        result = self.conn.execute(sql, list(params))
+        # to_arrow_table() replaced fetch_arrow_table() in newer DuckDB releases
+        fetch = getattr(result, "to_arrow_table", None) or result.fetch_arrow_table
+        return fetch()
+
+    def close(self) -> None:
+        self.conn.close()
+
+
+def open_engine(name: str, db_path: Path | str):
+    if name == "duckdb":
+        return DuckDBEngine(db_path)
+    if name == "sqlite":
+        return SQLiteEngine(db_path)
+    raise ValueError(f"Unknown engine: {name}")
+
+
+def attribution_history(engine) -> "pd.DataFrame":
+    return engine.query(
+        """
+        SELECT date, ticker, delta_total, delta_price, delta_fx, delta_cross, flow
+          FROM v_attribution
+         ORDER BY date, CASE WHEN ticker = 'PORTFOLIO' THEN 0 ELSE 1 END, ticker
+        """
+    )
+
+
+def portfolio_history(engine, start: str, end: str, rc: str = "JPY", account: str | None = None) -> "pd.DataFrame":
+    if account:
+        return engine.query(
+            """
+            SELECT date, total_value
+              FROM account_total_rc
+             WHERE rc = ? AND account = ? AND date BETWEEN ? AND ?
+             ORDER BY date
+            """,
+            (rc, account, start, end),
+        )
+    return engine.query(
+        """
+        SELECT date, total_value
+          FROM portfolio_total_rc
+         WHERE rc = ? AND date BETWEEN ? AND ?
+         ORDER BY date
+        """,
+        (rc, start, end),
+    )
+
+
+def currency_history(engine, start: str, end: str, rc: str = "JPY", account: str | None = None) -> "pd.DataFrame":
+    if account:
+        return engine.query(
+            """
+            SELECT date, ccy, value
+              FROM account_exposure_rc
+             WHERE rc = ? AND account = ? AND date BETWEEN ? AND ?
+             ORDER BY date, ccy
+            """,
+            (rc, account, start, end),
+        )
+    return engine.query(
+        """
+        SELECT date, ccy, value
+          FROM exposure_rc
+         WHERE rc = ? AND date BETWEEN ? AND ?
+         ORDER BY date, ccy
+        """,
+        (rc, start, end),
+    )
+
+
+def valuation_enriched(engine, start: str | None = None, end: str | None = None) -> "pd.DataFrame":
+    where = []
+    params: list[str] = []
+    if start:
+        where.append("date >= ?")
+        params.append(start)
+    if end:
+        where.append("date <= ?")
+        params.append(end)
+    return engine.query(
+        f"""
+        SELECT date, ticker, ccy, qty, price_ccy, fx_rate, value_jpy, portfolio_value_jpy, weight
+          FROM v_valuation_enriched
+         {"WHERE " + " AND ".join(where) if where else ""}
+         ORDER BY date, ticker
+        """,
+        tuple(params),
+    )
+
+
+# name -> callable(engine) used by the parity check and the benchmark
+HISTORY_QUERIES = {
+    "attribution_history": attribution_history,
+    "portfolio_history": lambda e: portfolio_history(e, "0000-01-01", "9999-12-31"),
+    "currency_history": lambda e: currency_history(e, "0000-01-01", "9999-12-31"),
+    "valuation_enriched": valuation_enriched,
+}
+
+
+def compare_frames(left: "pd.DataFrame", right: "pd.DataFrame", rtol: float = 1e-9) -> str | None:
+    """Return a description of the first difference between two results, or None if equal."""
+    import pandas as pd
+
+    if list(left.columns) != list(right.columns):
+        return f"columns differ: {list(left.columns)} vs {list(right.columns)}"
+    if len(left) != len(right):
+        return f"row count differs: {len(left)} vs {len(right)}"
+    left = left.reset_index(drop=True)
+    right = right.reset_index(drop=True)
+    for col in left.columns:
+        a, b = left[col], right[col]
+        if pd.api.types.is_numeric_dtype(a) and pd.api.types.is_numeric_dtype(b):
+            a = a.astype(float)
+            b = b.astype(float)
+            both_null = a.isna() & b.isna()
+            close = (a - b).abs() <= rtol * b.abs().clip(lower=1.0)
+            bad = ~(both_null | close)
+        else:
+            bad = a.astype(str) != b.astype(str)
+        if bad.any():
+            i = int(bad.idxmax())
+            return f"{col} differs at row {i}: {a.iloc[i]!r} vs {b.iloc[i]!r}"
+    return None
@@ -0,0 +1,239 @@
+"""Local read-only HTTP API over the portfolio views (scripts/serve_api.py).
+
+GET endpoints (JSON by default; Arrow IPC stream with ?format=arrow or
+Accept: application/vnd.apache.arrow.stream):
+
+  /api/meta                                  date range, accounts, currencies, endpoints
+  /api/valuation?date=&rc=&account=          holdings valued in rc (default: latest date)
+  /api/history?start=&end=&rc=&account=      portfolio totals
+  /api/exposure?start=&end=&rc=&account=     per-currency exposure
+  /api/attribution?start=&end=&account=      price / fx / cross / flow per ticker
+
+Range endpoints return at most ?days= valuation dates (default 250) and link the
+next page (JSON "next", Link header). Every response carries an ETag built from
+PRAGMA data_version, so a poll with If-None-Match gets 304 without running a query
+until another connection commits; bodies are also cached per data version.
+Queries reuse queries.py, the helpers behind the GUI.
+"""
+import datetime as dt
+import json
+import secrets
+import sqlite3
+from collections import OrderedDict
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from pathlib import Path
+from typing import TYPE_CHECKING
+from urllib.parse import parse_qs, urlencode, urlsplit
+
+import queries
+import tiering
+from db import connect
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+JSON_TYPE = "application/json"
+ARROW_TYPE = "application/vnd.apache.arrow.stream"
+DEFAULT_PAGE_DAYS = 250
+MAX_PAGE_DAYS = 5000
+CACHE_ENTRIES = 256
+FIRST_DATE = "0000-01-01"
+LAST_DATE = "9999-12-31"
+
+# path -> (helper, takes rc); range endpoints page over valuation dates
+RANGE_ENDPOINTS = {
+    "/api/history": (queries.fetch_portfolio_history, True),
+    "/api/exposure": (queries.fetch_currency_history, True),
+    "/api/attribution": (queries.fetch_attribution_history, False),
+}
+
+
+class APIError(Exception):
+    def __init__(self, status: HTTPStatus, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+def _error(status: HTTPStatus, message: str) -> tuple[int, dict, bytes]:
+    body = json.dumps({"error": message}).encode()
+    return status, {"Content-Type": JSON_TYPE, "Cache-Control": "no-store"}, body
+
+
+def _date_param(params: dict, name: str, default: str | None) -> str | None:
+    value = params.get(name, default)
+    if value in (None, FIRST_DATE, LAST_DATE):
+        return value
+    try:
+        return dt.date.fromisoformat(value).isoformat()
+    except ValueError:
+        raise APIError(HTTPStatus.BAD_REQUEST, f"{name} must be YYYY-MM-DD") from None
+
+
+def _json_rows(df: "pd.DataFrame") -> list[dict]:
+    if df.empty:
+        return []
+    df = df.copy()
+    if "date" in df:
+        df["date"] = df["date"].dt.strftime("%Y-%m-%d")
+    return df.astype(object).where(df.notna(), None).to_dict("records")
+
+
+def _arrow_body(df: "pd.DataFrame") -> bytes:
+    import pyarrow as pa
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+class PortfolioAPI:
+    """Request handling without the socket layer: handle() -> (status, headers, body)."""
+
+    def __init__(self, db_path: Path | str):
+        self.conn = connect(db_path, read_only=True)
+        self.conn.row_factory = sqlite3.Row
+        # data_version is only comparable within one connection, so ETags also name this process
+        self.boot = secrets.token_hex(4)
+        self.data_version = None
+        self.cache: OrderedDict[tuple[str, str], tuple[str, dict, bytes]] = OrderedDict()
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def _refresh_version(self) -> int:
+        version = self.conn.execute("PRAGMA data_version").fetchone()[0]
+        if version != self.data_version:
+            self.data_version = version
+            self.cache.clear()
+            # an archive run may have moved the cutoff; the union views are rebuilt on demand
+            if any(row[1] == tiering.COLD for row in self.conn.execute("PRAGMA database_list")):
+                tiering.detach_cold(self.conn)
+        return version
+
+    def handle(self, target: str, accept: str = "", if_none_match: str | None = None) -> tuple[int, dict, bytes]:
+        url = urlsplit(target)
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        fmt = params.pop("format", None) or ("arrow" if ARROW_TYPE in accept else "json")
+        version = self._refresh_version()
+        etag = f'"{self.boot}-{version}-{fmt}"'
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+        if if_none_match and etag in [tag.strip() for tag in if_none_match.split(",")]:
+            return HTTPStatus.NOT_MODIFIED, headers, b""
+        key = (target, fmt)
+        if key in self.cache:
+            self.cache.move_to_end(key)
+            _, cached_headers, body = self.cache[key]
+            return HTTPStatus.OK, {**cached_headers, **headers}, body
+        try:
+            if fmt not in ("json", "arrow"):
+                raise APIError(HTTPStatus.BAD_REQUEST, "format must be json or arrow")
+            frame, payload, links = self._dispatch(url.path, params)
+        except APIError as exc:
+            return _error(exc.status, str(exc))
+        except sqlite3.Error as exc:
+            # a locked, damaged or half-migrated DB; the client still gets a JSON body
+            return _error(HTTPStatus.INTERNAL_SERVER_ERROR, f"database error: {exc}")
+        if fmt == "arrow" and frame is not None:
+            body_headers = {"Content-Type": ARROW_TYPE}
+            body = _arrow_body(frame)
+        else:
+            body_headers = {"Content-Type": JSON_TYPE}
+            if frame is not None:
+                payload["rows"] = _json_rows(frame)
+            body = json.dumps(payload, ensure_ascii=False).encode()
+        if links.get("next"):
+            body_headers["Link"] = f'<{links["next"]}>; rel="next"'
+        self.cache[key] = (etag, body_headers, body)
+        if len(self.cache) > CACHE_ENTRIES:
+            self.cache.popitem(last=False)
+        return HTTPStatus.OK, {**body_headers, **headers}, body
+
+    def _dispatch(self, path: str, params: dict) -> tuple["pd.DataFrame | None", dict, dict]:
+        conn = self.conn
+        rc = params.get("rc", "JPY").upper()
+        account = params.get("account") or None
+        if path in ("/api", "/api/meta"):
+            start, end = queries.get_portfolio_date_range(conn)
+            payload = {
+                "first_date": start.isoformat() if start else None,
+                "last_date": end.isoformat() if end else None,
+                "accounts": queries.get_accounts(conn),
+                "reporting_currencies": queries.get_reporting_currencies(conn),
+                "archive": tiering.archive_info(conn),
+                "endpoints": ["/api/meta", "/api/valuation", *RANGE_ENDPOINTS],
+            }
+            return None, payload, {}
+        if rc not in queries.get_reporting_currencies(conn):
+            raise APIError(HTTPStatus.BAD_REQUEST, f"rc must be one of reporting_currencies, got {rc}")
+        if path == "/api/valuation":
+            date = _date_param(params, "date", None)
+            if date is None:
+                date = conn.execute(
+                    "SELECT MAX(date) FROM portfolio_total_rc WHERE rc = ?", (rc,)
+                ).fetchone()[0] or FIRST_DATE
+            tiering.ensure_range(conn, date)
+            frame = queries.fetch_valuation_history(conn, date, date, rc, account)
+            return frame, {"date": date, "rc": rc, "account": account}, {}
+        if path not in RANGE_ENDPOINTS:
+            raise APIError(HTTPStatus.NOT_FOUND, f"unknown endpoint {path}")
+
+        helper, takes_rc = RANGE_ENDPOINTS[path]
+        start = _date_param(params, "start", FIRST_DATE)
+        end = _date_param(params, "end", LAST_DATE)
+        try:
+            days = min(int(params.get("days", DEFAULT_PAGE_DAYS)), MAX_PAGE_DAYS)
+        except ValueError:
+            raise APIError(HTTPStatus.BAD_REQUEST, "days must be an integer") from None
+        if days < 1:
+            raise APIError(HTTPStatus.BAD_REQUEST, "days must be at least 1")
+        tiering.ensure_range(conn, start)
+        last, next_start = queries.page_dates(conn, start, end, days)
+        if last is None:
+            frame = helper(conn, start, start, rc, account) if takes_rc else helper(conn, start, start, account)
+            frame = frame.iloc[0:0]
+        elif takes_rc:
+            frame = helper(conn, start, last, rc, account)
+        else:
+            frame = helper(conn, start, last, account)
+        next_url = None
+        if next_start:
+            next_url = f"{path}?{urlencode({**params, 'start': next_start})}"
+        payload = {"start": start, "end": last, "rc": rc if takes_rc else None, "account": account, "next": next_url}
+        return frame, payload, {"next": next_url}
+
+
+def make_handler(api: PortfolioAPI) -> type[BaseHTTPRequestHandler]:
+    class Handler(BaseHTTPRequestHandler):
+        server_version = "MoneyDiaryAPI/1.0"
+
+        def do_GET(self):
+            status, headers, body = api.handle(
+                self.path, self.headers.get("Accept", ""), self.headers.get("If-None-Match")
+            )
+            self.send_response(status)
+            for name, value in headers.items():
+                self.send_header(name, value)
+            if status != HTTPStatus.NOT_MODIFIED:
+                self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            if status != HTTPStatus.NOT_MODIFIED:
+                self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def serve(db_path: Path | str, host: str = "127.0.0.1", port: int = 8767) -> None:
+    """Serve until interrupted; requests run one at a time on one read-only connection."""
+    api = PortfolioAPI(db_path)
+    server = HTTPServer((host, port), make_handler(api))
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        api.close()
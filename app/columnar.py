@@ -0,0 +1,103 @@
+"""Columnar query results: typed NumPy arrays / DataFrames built straight from a cursor.
+
+Rows are pulled with fetchmany() and transposed chunk by chunk, so no per-row
+dicts are created and only one chunk of row tuples is alive at a time.
+"""
+import sqlite3
+from typing import TYPE_CHECKING
+
+# numpy / pandas are imported on first fetch so importing this module stays cheap
+if TYPE_CHECKING:
+    import numpy as np
+    import pandas as pd
+
+# Small chunks keep the transient row tuples cache-friendly and out of older GC generations
+CHUNK_SIZE = 4096
+
+# dtypes for time-series queries whose ISO date column should become datetime64
+DATE_INDEX = {"date": "datetime64[D]"}
+
+# Column name -> dtype used when the caller does not pass one; other columns are
+# inferred from their first chunk (float, int, or object for text), and an int
+# column is widened when a later chunk holds a REAL, NULL or text value
+DEFAULT_DTYPES = {
+    "close": "float64",
+    "rate": "float64",
+    "qty": "float64",
+    "price_ccy": "float64",
+    "fx_rate": "float64",
+    "value": "float64",
+    "value_jpy": "float64",
+    "total_value": "float64",
+    "total_value_jpy": "float64",
+    "portfolio_value_jpy": "float64",
+    "weight": "float64",
+}
+
+
+def _infer_dtype(values: tuple):
+    # SQLite columns are not typed: a numeric column can hold INTEGER and REAL values
+    kinds = {type(v) for v in values} - {type(None)}
+    if kinds == {int}:
+        return "float64" if None in values else "int64"
+    if kinds and kinds <= {int, float}:
+        return "float64"
+    return object
+
+
+def fetch_columns(
+    conn: sqlite3.Connection,
+    sql: str,
+    params: tuple = (),
+    dtypes: dict | None = None,
+    chunk_size: int = CHUNK_SIZE,
+) -> dict[str, "np.ndarray"]:
+    """Run sql and return {column: ndarray}; NULLs become NaN / NaT in numeric / date columns."""
+    import numpy as np
+
+    cur = conn.cursor()
+    cur.row_factory = None  # plain tuples even if the connection uses sqlite3.Row
+    cur.execute(sql, params)
+    names = [d[0] for d in cur.description]
+    types = {**DEFAULT_DTYPES, **(dtypes or {})}
+    resolved: list = [types.get(name) for name in names]
+    inferred = [dtype is None for dtype in resolved]
+    chunks: list[list[np.ndarray]] = [[] for _ in names]
+    while True:
+        rows = cur.fetchmany(chunk_size)
+        if not rows:
+            break
+        for i, values in enumerate(zip(*rows)):
+            if resolved[i] is None:
+                resolved[i] = _infer_dtype(values)
+            elif inferred[i] and resolved[i] == "int64":
+                # an inferred int column met a REAL or NULL (or text) in a later chunk
+                other = {type(v) for v in values} - {int}
+                if other:
+                    resolved[i] = "float64" if other <= {float, type(None)} else object
+                    chunks[i] = [part.astype(resolved[i]) for part in chunks[i]]
+            chunks[i].append(np.array(values, dtype=resolved[i]))
+        del rows
+    return {
+        name: np.concatenate(parts) if parts else np.array([], dtype=resolved[i] or object)
+        for i, (name, parts) in enumerate(zip(names, chunks))
+    }
+
+
+def fetch_frame(
+    conn: sqlite3.Connection,
+    sql: str,
+    params: tuple = (),
+    dtypes: dict | None = None,
+    chunk_size: int = CHUNK_SIZE,
+) -> "pd.DataFrame":
+    """Like fetch_columns but wrapped in a DataFrame."""
+    import pandas as pd
+
+    return pd.DataFrame(fetch_columns(conn, sql, params, dtypes, chunk_size), copy=False)
+
+
+def empty_frame() -> "pd.DataFrame":
+    import pandas as pd
+
+    return pd.DataFrame()
@@ -0,0 +1,195 @@
+"""SQLite schema setup and in-place migrations shared by the GUI and scripts."""
+import sqlite3
+from collections.abc import Iterator
+from contextlib import contextmanager
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+SCHEMA_PATH = ROOT / "schema.sql"
+
+# How long a connection waits for a lock before raising "database is locked"
+BUSY_TIMEOUT_MS = 5000
+
+REQUIRED_VIEWS = {
+    "v_portfolio_total",
+    "v_currency_exposure",
+    "v_valuation_enriched",
+    "v_fx_rates",
+    "v_valuation_rc_calc",
+    "v_account_valuation",
+    "v_account_attribution",
+    "v_gap_attribution",
+}
+
+# Derived tables added after the first release; schema.sql is re-applied when one is missing
+REQUIRED_TABLES = {
+    "risk_windows",
+    "risk_series",
+    "risk_vol",
+    "risk_corr",
+    "risk_dirty",
+    "data_gaps",
+    "gap_dirty",
+    "valuation_jpy",
+    "tscache_dirty",
+    "tscache_meta",
+    "ingest_quarantine",
+    "tier_archive",
+    "fetch_runs",
+    "fetch_requests",
+    "fetch_chunks",
+    "rc_batch",
+    "fx_derive_dirty",
+}
+
+# Derived tables whose shape gained an account column; they are rebuilt by schema.sql
+ACCOUNT_DERIVED_TABLES = (
+    "ledger_positions",
+    "ledger_checkpoints",
+    "ledger_dirty",
+    "valuation_rc",
+    "exposure_rc",
+    "portfolio_total_rc",
+    "rc_refresh",
+)
+
+
+def connect(
+    db_path: Path | str,
+    *,
+    read_only: bool = False,
+    busy_timeout_ms: int = BUSY_TIMEOUT_MS,
+) -> sqlite3.Connection:
+    """Open db_path for concurrent use by the GUI and the fetch scripts.
+
+    Writers switch the file to WAL journaling (persistent), so readers keep
+    reading the last committed state while a writer is active; read_only opens
+    a mode=ro URI connection that can never take the write lock. Both wait up to
+    busy_timeout_ms for a lock instead of failing immediately.
+    """
+    timeout = busy_timeout_ms / 1000
+    if read_only:
+        return sqlite3.connect(f"{Path(db_path).resolve().as_uri()}?mode=ro", uri=True, timeout=timeout)
+    conn = sqlite3.connect(db_path, timeout=timeout)
+    conn.execute("PRAGMA journal_mode = WAL")
+    # In WAL mode NORMAL only syncs at checkpoints; committed data survives a crash of the process
+    conn.execute("PRAGMA synchronous = NORMAL")
+    return conn
+
+
+@contextmanager
+def deferred_refresh(conn: sqlite3.Connection) -> Iterator[None]:
+    """Rebuild the cross rates and reporting-currency tables once for the writes inside.
+
+    The refresh triggers only queue their dates (fx_derive_dirty, rc_refresh) while
+    rc_batch holds its row; leaving the block deletes it, which rebuilds the queues
+    set-based (schema.sql).
+    Use it inside one transaction so other connections never see the flag. A nested
+    block joins the outer one.
+    """
+    owner = conn.execute("INSERT OR IGNORE INTO rc_batch (id) VALUES (1)").rowcount == 1
+    try:
+        yield
+    finally:
+        if owner:
+            conn.execute("DELETE FROM rc_batch")
+
+
+def apply_schema(conn: sqlite3.Connection) -> None:
+    conn.executescript(SCHEMA_PATH.read_text(encoding="utf-8"))
+    conn.commit()
+
+
+def _columns(conn: sqlite3.Connection, table: str) -> set[str]:
+    return {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+
+
+def _table_exists(conn: sqlite3.Connection, table: str) -> bool:
+    row = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+        (table,),
+    ).fetchone()
+    return row is not None
+
+
+def _drop_views_and_triggers(conn: sqlite3.Connection) -> None:
+    rows = conn.execute(
+        "SELECT type, name FROM sqlite_master WHERE type IN ('view', 'trigger')"
+    ).fetchall()
+    for kind, name in rows:
+        conn.execute(f'DROP {kind.upper()} IF EXISTS "{name}"')
+
+
+def _add_cashflow_qty(conn: sqlite3.Connection) -> None:
+    conn.execute("ALTER TABLE cashflows ADD COLUMN qty REAL")
+
+
+def _add_accounts(conn: sqlite3.Connection) -> None:
+    """Rebuild snapshots with (account, date, ticker) as key; existing rows go to 'main'."""
+    _drop_views_and_triggers(conn)
+    for table in ACCOUNT_DERIVED_TABLES:
+        conn.execute(f"DROP TABLE IF EXISTS {table}")
+    conn.execute("ALTER TABLE snapshots RENAME TO snapshots_legacy")
+    conn.execute("DROP INDEX IF EXISTS idx_snapshots_ticker_date")
+    if "account" not in _columns(conn, "cashflows"):
+        conn.execute("ALTER TABLE cashflows ADD COLUMN account TEXT NOT NULL DEFAULT 'main'")
+    conn.commit()
+    # Create the new tables, then copy without per-row triggers; migrate() re-applies
+    # schema.sql afterwards, which recreates the triggers and backfills derived tables.
+    apply_schema(conn)
+    _drop_views_and_triggers(conn)
+    conn.execute(
+        """
+        INSERT INTO snapshots (account, date, ticker, qty, price_ccy)
+        SELECT 'main', date, ticker, qty, price_ccy FROM snapshots_legacy
+        """
+    )
+    conn.execute("DROP TABLE snapshots_legacy")
+    conn.execute(
+        """
+        INSERT INTO ledger_dirty (account, ticker, from_date)
+        SELECT account, ticker, MIN(date) FROM cashflows GROUP BY account, ticker
+        """
+    )
+    conn.commit()
+
+
+# (name, needs-migration check, apply); checks inspect the live schema so they are
+# safe to run against databases created by any version of schema.sql
+MIGRATIONS = (
+    (
+        "cashflows.qty",
+        lambda conn: _table_exists(conn, "cashflows") and "qty" not in _columns(conn, "cashflows"),
+        _add_cashflow_qty,
+    ),
+    (
+        "accounts",
+        lambda conn: _table_exists(conn, "snapshots") and "account" not in _columns(conn, "snapshots"),
+        _add_accounts,
+    ),
+)
+
+
+def migrate(conn: sqlite3.Connection) -> list[str]:
+    """Apply pending migrations in order, then schema.sql; returns the applied names."""
+    applied = []
+    for name, needed, apply in MIGRATIONS:
+        if needed(conn):
+            apply(conn)
+            conn.commit()
+            applied.append(name)
+    if applied:
+        apply_schema(conn)
+    return applied
+
+
+def ensure_schema(conn: sqlite3.Connection) -> list[str]:
+    """Create a fresh schema, or migrate an existing DB and re-apply schema.sql if outdated."""
+    if not _table_exists(conn, "snapshots"):
+        apply_schema(conn)
+        return []
+    applied = migrate(conn)
+    names = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type IN ('view', 'table')")}
+    if not (REQUIRED_VIEWS | REQUIRED_TABLES).issubset(names):
+        apply_schema(conn)
+    return applied
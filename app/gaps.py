@@ -0,0 +1,122 @@
+"""Data-gap scans: missing FX rates, price holes and broken attribution across the whole history.
+
+Each kind is one set-based view in schema.sql (v_gap_fx_missing, v_gap_price_holes,
+v_gap_attribution). Triggers record the earliest affected date per kind in
+gap_dirty; scan_gaps() replaces the stored data_gaps rows from that date on with
+the view's rows, so a new day of data rescans only the new dates.
+"""
+import datetime as dt
+import sqlite3
+
+from db import connect, ensure_schema
+
+KINDS = ("fx_missing", "price_hole", "attribution")
+
+# kind -> INSERT ... SELECT from the kind's view for dates >= ?
+SCAN_SQL = {
+    "fx_missing": """
+        INSERT INTO data_gaps (kind, key, date, detail)
+        SELECT 'fx_missing', pair, date, snapshots || ' snapshots: ' || tickers
+          FROM v_gap_fx_missing
+         WHERE date >= ?
+    """,
+    "price_hole": """
+        INSERT INTO data_gaps (kind, key, date, detail)
+        SELECT 'price_hole', ticker, date, ccy
+          FROM v_gap_price_holes
+         WHERE date >= ?
+    """,
+    "attribution": """
+        INSERT INTO data_gaps (kind, key, date, detail)
+        SELECT 'attribution', account || ':' || ticker, date, group_concat(issue || ': ' || detail, '; ')
+          FROM v_gap_attribution
+         WHERE date >= ?
+         GROUP BY account, ticker, date
+    """,
+}
+
+
+def scan_gaps(conn: sqlite3.Connection, full: bool = False) -> dict[str, int]:
+    """Rescan dirty kinds (all kinds from the beginning if full); returns stored gaps per rescanned kind."""
+    if full:
+        with conn:
+            conn.executemany(
+                """
+                INSERT INTO gap_dirty (kind, from_date) VALUES (?, '')
+                ON CONFLICT(kind) DO UPDATE SET from_date = ''
+                """,
+                [(kind,) for kind in KINDS],
+            )
+    scanned = {}
+    for kind, from_date in conn.execute("SELECT kind, from_date FROM gap_dirty ORDER BY kind").fetchall():
+        # BEGIN IMMEDIATE: a write between reading from_date and clearing it would otherwise be lost
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT from_date FROM gap_dirty WHERE kind = ?", (kind,)).fetchone()
+            if row is None:
+                conn.rollback()
+                continue
+            from_date = row[0]
+            conn.execute("DELETE FROM data_gaps WHERE kind = ? AND date >= ?", (kind, from_date))
+            conn.execute(SCAN_SQL[kind], (from_date,))
+            conn.execute("DELETE FROM gap_dirty WHERE kind = ?", (kind,))
+        except BaseException:
+            conn.rollback()
+            raise
+        conn.commit()
+        scanned[kind] = conn.execute("SELECT COUNT(*) FROM data_gaps WHERE kind = ?", (kind,)).fetchone()[0]
+    return scanned
+
+
+def gap_counts(conn: sqlite3.Connection) -> dict[str, tuple[int, int, str | None, str | None]]:
+    """kind -> (gaps, distinct keys, first date, last date) from the stored scan."""
+    counts = {kind: (0, 0, None, None) for kind in KINDS}
+    for kind, n, keys, first, last in conn.execute(
+        "SELECT kind, COUNT(*), COUNT(DISTINCT key), MIN(date), MAX(date) FROM data_gaps GROUP BY kind"
+    ):
+        counts[kind] = (n, keys, first, last)
+    return counts
+
+
+def gap_spans(
+    conn: sqlite3.Connection, kind: str, keys: list[str], start: str, end: str
+) -> dict[str, tuple[str, str]]:
+    """key -> (first, last) gap date within start..end, for the keys that have gaps there."""
+    if not keys:
+        return {}
+    placeholders = ",".join("?" * len(keys))
+    rows = conn.execute(
+        f"""
+        SELECT key, MIN(date), MAX(date) FROM data_gaps
+         WHERE kind = ? AND key IN ({placeholders}) AND date BETWEEN ? AND ?
+         GROUP BY key
+        """,
+        (kind, *keys, start, end),
+    )
+    return {key: (first, last) for key, first, last in rows}
+
+
+def fetch_window(
+    conn: sqlite3.Connection | None, db_path: str, kind: str, keys: list[str], start: dt.date, end: dt.date
+) -> tuple[list[str], dt.date, dt.date] | None:
+    """Narrow a fetch to the keys with gaps of kind in start..end and the dates spanning them.
+
+    Rescans dirty kinds first; with conn None (dry run) reads the stored scan from a
+    read-only connection instead. Returns None when there is nothing to fetch.
+    """
+    if conn is None:
+        reader = connect(db_path, read_only=True)
+    else:
+        ensure_schema(conn)
+        scan_gaps(conn)
+        reader = conn
+    try:
+        spans = gap_spans(reader, kind, keys, start.isoformat(), end.isoformat())
+    finally:
+        if reader is not conn:
+            reader.close()
+    if not spans:
+        return None
+    first = min(first for first, _ in spans.values())
+    last = max(last for _, last in spans.values())
+    return [key for key in keys if key in spans], dt.date.fromisoformat(first), dt.date.fromisoformat(last)
@@ -0,0 +1,294 @@
+"""Read-side query helpers shared by the GUI (streamlit_app.py) and the HTTP API (api.py).
+
+History helpers return typed DataFrames (columnar.fetch_frame, or slices of a
+tscache.SeriesCache when one is passed); the others return lists of dicts and
+expect a connection with row_factory = sqlite3.Row.
+"""
+import sqlite3
+from datetime import date as date_cls
+from datetime import datetime
+from typing import TYPE_CHECKING
+
+import analytics
+import tiering
+from columnar import DATE_INDEX, empty_frame, fetch_frame
+
+# pandas is imported by columnar on first fetch
+if TYPE_CHECKING:
+    import pandas as pd
+
+
+def get_accounts(conn: sqlite3.Connection) -> list[str]:
+    rows = q_all(
+        conn,
+        """
+        SELECT account FROM accounts
+        UNION
+        SELECT DISTINCT account FROM snapshots
+        ORDER BY 1
+        """,
+    )
+    return [row["account"] for row in rows]
+
+
+def q_all(conn: sqlite3.Connection, sql: str, params: tuple = ()):
+    cur = conn.cursor()
+    cur.execute(sql, params)
+    rows = cur.fetchall()
+    return [dict(r) for r in rows]
+
+
+def table_exists(conn: sqlite3.Connection, table: str) -> bool:
+    cur = conn.cursor()
+    cur.execute(
+        "SELECT name FROM sqlite_master WHERE type IN ('table', 'view') AND name=?",
+        (table,),
+    )
+    return cur.fetchone() is not None
+
+
+def fetch_asset_prices(
+    conn: sqlite3.Connection,
+    tickers: list[str],
+    start: str,
+    end: str,
+    cache=None,
+) -> "pd.DataFrame":
+    if not tickers or not table_exists(conn, "asset_prices"):
+        return empty_frame()
+    if cache is not None and cache.covers(start):
+        return cache.frame("price:", tickers, start, end, "ticker", "close")
+    placeholders = ",".join(["?"] * len(tickers))
+    sql = f"""
+        SELECT date, ticker, close
+        FROM asset_prices
+        WHERE date BETWEEN ? AND ?
+          AND ticker IN ({placeholders})
+        ORDER BY date, ticker
+    """
+    return fetch_frame(conn, sql, (start, end, *tickers), DATE_INDEX)
+
+
+def fetch_fx_history(
+    conn: sqlite3.Connection,
+    pairs: list[str],
+    start: str,
+    end: str,
+    cache=None,
+) -> "pd.DataFrame":
+    if not pairs or not table_exists(conn, "fx_rates"):
+        return empty_frame()
+    if cache is not None and cache.covers(start):
+        return cache.frame("fx:", pairs, start, end, "pair", "rate")
+    placeholders = ",".join(["?"] * len(pairs))
+    sql = f"""
+        SELECT date, pair, rate
+        FROM fx_rates
+        WHERE date BETWEEN ? AND ?
+          AND pair IN ({placeholders})
+        ORDER BY date, pair
+    """
+    return fetch_frame(conn, sql, (start, end, *pairs), DATE_INDEX)
+
+
+def get_portfolio_date_range(conn: sqlite3.Connection) -> tuple[date_cls | None, date_cls | None]:
+    if not table_exists(conn, "v_portfolio_total"):
+        return (None, None)
+    rows = q_all(
+        conn,
+        "SELECT MIN(date) AS min_date, MAX(date) AS max_date FROM v_portfolio_total",
+    )
+    if not rows:
+        return (None, None)
+    row = rows[0]
+    min_date = row.get("min_date")
+    max_date = row.get("max_date")
+    # archived dates count too; reading them attaches the archive (tiering.ensure_range)
+    archive = tiering.archive_info(conn) if table_exists(conn, "tier_archive") else None
+    if archive and archive["first_date"]:
+        min_date = min(filter(None, (min_date, archive["first_date"])))
+        max_date = max_date or archive["first_date"]
+    if not min_date or not max_date:
+        return (None, None)
+    return (
+        datetime.strptime(min_date, "%Y-%m-%d").date(),
+        datetime.strptime(max_date, "%Y-%m-%d").date(),
+    )
+
+
+def get_reporting_currencies(conn: sqlite3.Connection) -> list[str]:
+    if not table_exists(conn, "reporting_currencies"):
+        return ["JPY"]
+    rows = q_all(
+        conn,
+        "SELECT ccy FROM reporting_currencies ORDER BY CASE WHEN ccy = 'JPY' THEN 0 ELSE 1 END, ccy",
+    )
+    return [row["ccy"] for row in rows] or ["JPY"]
+
+
+def fetch_portfolio_history(
+    conn: sqlite3.Connection,
+    start: str,
+    end: str,
+    rc: str = "JPY",
+    account: str | None = None,
+    engine=None,
+    cache=None,
+) -> "pd.DataFrame":
+    if not table_exists(conn, "portfolio_total_rc"):
+        return empty_frame()
+    if engine is not None:
+        df = analytics.portfolio_history(engine, start, end, rc, account)
+        if not df.empty:
+            df["date"] = df["date"].astype("datetime64[s]")
+        return df
+    if cache is not None and cache.covers(start):
+        return cache.totals(rc, start, end, account)
+    if account:
+        sql = """
+            SELECT date, total_value
+              FROM account_total_rc
+             WHERE rc = ? AND account = ? AND date BETWEEN ? AND ?
+             ORDER BY date
+        """
+        params = (rc, account, start, end)
+    else:
+        sql = """
+            SELECT date, total_value
+              FROM portfolio_total_rc
+             WHERE rc = ? AND date BETWEEN ? AND ?
+             ORDER BY date
+        """
+        params = (rc, start, end)
+    return fetch_frame(conn, sql, params, DATE_INDEX)
+
+
+def fetch_currency_history(
+    conn: sqlite3.Connection,
+    start: str,
+    end: str,
+    rc: str = "JPY",
+    account: str | None = None,
+    engine=None,
+) -> "pd.DataFrame":
+    if not table_exists(conn, "exposure_rc"):
+        return empty_frame()
+    if engine is not None:
+        df = analytics.currency_history(engine, start, end, rc, account)
+        if not df.empty:
+            df["date"] = df["date"].astype("datetime64[s]")
+        return df
+    if account:
+        sql = """
+            SELECT date, ccy, value
+              FROM account_exposure_rc
+             WHERE rc = ? AND account = ? AND date BETWEEN ? AND ?
+             ORDER BY date, ccy
+        """
+        params = (rc, account, start, end)
+    else:
+        sql = """
+            SELECT date, ccy, value
+              FROM exposure_rc
+             WHERE rc = ? AND date BETWEEN ? AND ?
+             ORDER BY date, ccy
+        """
+        params = (rc, start, end)
+    return fetch_frame(conn, sql, params, DATE_INDEX)
+
+
+def get_valuation_rc_for_date(conn: sqlite3.Connection, date: str, rc: str, account: str | None = None):
+    return q_all(
+        conn,
+        """
+        SELECT account, ticker, ccy, qty, price_ccy, fx_rate, value
+          FROM valuation_rc
+         WHERE rc = ? AND date = ? AND (? IS NULL OR account = ?)
+         ORDER BY value DESC
+        """,
+        (rc, date, account, account),
+    )
+
+
+def get_attribution_history(conn: sqlite3.Connection, limit: int | None = None, engine=None):
+    if engine is not None:
+        rows = analytics.attribution_history(engine).to_dict("records")
+        return rows[-limit:] if limit else rows
+    sql = """
+        SELECT date, ticker, delta_total, delta_price, delta_fx, delta_cross, flow
+          FROM v_attribution
+         ORDER BY date, CASE WHEN ticker = 'PORTFOLIO' THEN 0 ELSE 1 END, ticker
+    """
+    rows = q_all(conn, sql)
+    if limit:
+        rows = rows[-limit:]
+    return rows
+
+
+def get_portfolio_totals_history(conn: sqlite3.Connection, limit: int | None = None):
+    sql = "SELECT date, total_value_jpy FROM v_portfolio_total ORDER BY date"
+    rows = q_all(conn, sql)
+    if limit:
+        rows = rows[-limit:]
+    return rows
+
+
+def fetch_valuation_history(
+    conn: sqlite3.Connection,
+    start: str,
+    end: str,
+    rc: str = "JPY",
+    account: str | None = None,
+) -> "pd.DataFrame":
+    if not table_exists(conn, "valuation_rc"):
+        return empty_frame()
+    return fetch_frame(
+        conn,
+        """
+        SELECT date, account, ticker, ccy, qty, price_ccy, fx_rate, value
+          FROM valuation_rc
+         WHERE rc = ? AND date BETWEEN ? AND ? AND (? IS NULL OR account = ?)
+         ORDER BY date, account, ticker
+        """,
+        (rc, start, end, account, account),
+        DATE_INDEX,
+    )
+
+
+def fetch_attribution_history(
+    conn: sqlite3.Connection,
+    start: str,
+    end: str,
+    account: str | None = None,
+) -> "pd.DataFrame":
+    """v_attribution (or one account's v_account_attribution) rows in start..end, PORTFOLIO first per date."""
+    columns = "date, ticker, delta_total, delta_price, delta_fx, delta_cross, flow"
+    order = "ORDER BY date, CASE WHEN ticker = 'PORTFOLIO' THEN 0 ELSE 1 END, ticker"
+    if account:
+        sql = f"SELECT {columns} FROM v_account_attribution WHERE account = ? AND date BETWEEN ? AND ? {order}"
+        params = (account, start, end)
+    else:
+        sql = f"SELECT {columns} FROM v_attribution WHERE date BETWEEN ? AND ? {order}"
+        params = (start, end)
+    return fetch_frame(conn, sql, params, DATE_INDEX)
+
+
+def page_dates(conn: sqlite3.Connection, start: str, end: str, days: int) -> tuple[str | None, str | None]:
+    """(last date, next start) of a page holding the first `days` portfolio dates in start..end.
+
+    Pages split the valuation calendar (portfolio_total_rc dates), so a page never
+    cuts a date in half; next start is None on the last page, last date None if empty.
+    """
+    rows = conn.execute(
+        """
+        SELECT date FROM portfolio_total_rc
+         WHERE rc = 'JPY' AND date BETWEEN ? AND ?
+         ORDER BY date LIMIT ?
+        """,
+        (start, end, days + 1),
+    ).fetchall()
+    if not rows:
+        return None, None
+    if len(rows) <= days:
+        return rows[-1][0], None
+    return rows[days - 1][0], rows[days][0]
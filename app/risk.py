@@ -0,0 +1,398 @@
+"""Rolling risk statistics (volatility, drawdown, correlation) kept up to date incrementally.
+
+Triggers record the earliest stale date per series in risk_dirty. update_risk()
+rewinds each dirty series to the stored row before that date and replays only
+the newer observations: drawdown is a running peak, volatility a sliding Welford
+accumulator over the last window_days returns. Pairwise correlations keep their
+co-moment state in risk_corr and slide it by the new dates; when history inside
+the window changed they are recomputed from the window alone. Work is therefore
+proportional to the new days (and the window), not to the length of history.
+"""
+import math
+import sqlite3
+from collections import deque
+from contextlib import contextmanager
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import numpy as np
+
+PORTFOLIO = "PORTFOLIO"
+ANNUALIZATION = math.sqrt(252)
+
+
+@contextmanager
+def _write_transaction(conn: sqlite3.Connection):
+    """BEGIN IMMEDIATE: take the write lock before reading, so the rows read and the
+    risk_dirty entry cleared belong to the same snapshot."""
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield
+    except BaseException:
+        conn.rollback()
+        raise
+    conn.commit()
+
+
+def risk_windows(conn: sqlite3.Connection) -> list[int]:
+    return [row[0] for row in conn.execute("SELECT window_days FROM risk_windows ORDER BY window_days")]
+
+
+def _ticker_levels(conn: sqlite3.Connection, ticker: str, since: str) -> list[tuple[str, float, float]]:
+    rows = conn.execute(
+        "SELECT date, close FROM asset_prices WHERE ticker = ? AND date >= ? AND close > 0 ORDER BY date",
+        (ticker, since),
+    )
+    return [(date, close, 0.0) for date, close in rows]
+
+
+def _portfolio_levels(conn: sqlite3.Connection, since: str) -> list[tuple[str, float, float]]:
+    """(date, JPY total, flow) where flow is the JPY value of position changes vs the previous date.
+
+    Positions are read from valuation_rc; a position that is new (or grown) is valued at the
+    current price, one that disappeared at its last value, as in v_attribution's flow term.
+    """
+    totals = conn.execute(
+        """
+        SELECT date, total_value FROM portfolio_total_rc
+         WHERE rc = 'JPY' AND date >= ? AND total_value > 0
+         ORDER BY date
+        """,
+        (since,),
+    ).fetchall()
+    holdings: dict[str, dict[tuple[str, str], tuple[float, float]]] = {}
+    for date, account, ticker, qty, value in conn.execute(
+        """
+        SELECT date, account, ticker, qty, value FROM valuation_rc
+         WHERE rc = 'JPY' AND date >= ? AND value IS NOT NULL
+        """,
+        (since,),
+    ):
+        holdings.setdefault(date, {})[(account, ticker)] = (qty, value)
+    levels = []
+    previous: dict[tuple[str, str], tuple[float, float]] | None = None
+    for date, total in totals:
+        current = holdings.get(date, {})
+        flow = 0.0
+        if previous is not None:
+            for key, (qty, value) in current.items():
+                qty0 = previous.get(key, (0.0, 0.0))[0]
+                if qty:
+                    flow += (qty - qty0) * value / qty
+            for key, (qty0, value0) in previous.items():
+                if key not in current or not current[key][0]:
+                    flow -= value0
+        levels.append((date, total, flow))
+        previous = current
+    return levels
+
+
+def _update_series(conn: sqlite3.Connection, series: str, from_date: str, windows: list[int]) -> int:
+    """Rewind series to before from_date and replay newer observations; returns rows written."""
+    prev = conn.execute(
+        """
+        SELECT date, level, cum_index, peak, max_drawdown FROM risk_series
+         WHERE series = ? AND date < ? ORDER BY date DESC LIMIT 1
+        """,
+        (series, from_date),
+    ).fetchone()
+    conn.execute("DELETE FROM risk_series WHERE series = ? AND date >= ?", (series, from_date))
+    conn.execute("DELETE FROM risk_vol WHERE series = ? AND date >= ?", (series, from_date))
+
+    since = prev[0] if prev else from_date
+    loader = _portfolio_levels if series == PORTFOLIO else _ticker_levels
+    levels = loader(conn, since) if series == PORTFOLIO else loader(conn, series, since)
+    if prev:
+        # the previous row only seeds the first return (and the portfolio's first flow)
+        levels = [row for row in levels if row[0] > prev[0]]
+        level0, index, peak, max_dd = prev[1:]
+    else:
+        level0, index, peak, max_dd = None, 1.0, 1.0, 0.0
+
+    # Sliding Welford state per window, seeded from the stored state and the returns it covers
+    state = {}
+    for window in windows:
+        row = conn.execute(
+            """
+            SELECT n, mean, m2 FROM risk_vol
+             WHERE series = ? AND window_days = ? AND date < ? ORDER BY date DESC LIMIT 1
+            """,
+            (series, window, from_date),
+        ).fetchone()
+        recent = [
+            r[0]
+            for r in conn.execute(
+                """
+                SELECT ret FROM risk_series
+                 WHERE series = ? AND date < ? AND ret IS NOT NULL ORDER BY date DESC LIMIT ?
+                """,
+                (series, from_date, window),
+            )
+        ]
+        n, mean, m2 = row if row else (0, 0.0, 0.0)
+        state[window] = [deque(reversed(recent), maxlen=window), n, mean, m2]
+
+    series_rows = []
+    vol_rows = []
+    for date, level, flow in levels:
+        ret = None
+        if level0 is not None and level0 > 0 and level - flow > 0:
+            ret = math.log((level - flow) / level0)
+            index *= math.exp(ret)
+        peak = max(peak, index)
+        drawdown = index / peak - 1.0
+        max_dd = min(max_dd, drawdown)
+        series_rows.append((series, date, level, ret, index, peak, drawdown, max_dd))
+        for window, st in state.items():
+            window_rets, n, mean, m2 = st
+            if ret is not None:
+                if len(window_rets) == window:
+                    old = window_rets[0]
+                    if n <= 1:
+                        n, mean, m2 = 0, 0.0, 0.0
+                    else:
+                        mean_new = (n * mean - old) / (n - 1)
+                        m2 = max(m2 - (old - mean) * (old - mean_new), 0.0)
+                        n, mean = n - 1, mean_new
+                window_rets.append(ret)
+                n += 1
+                delta = ret - mean
+                mean += delta / n
+                m2 += delta * (ret - mean)
+                st[1:] = n, mean, m2
+            vol = math.sqrt(m2 / (n - 1)) * ANNUALIZATION if n >= 2 else None
+            vol_rows.append((series, window, date, n, mean, m2, vol))
+        level0 = level
+    conn.executemany("INSERT INTO risk_series VALUES (?, ?, ?, ?, ?, ?, ?, ?)", series_rows)
+    conn.executemany("INSERT INTO risk_vol VALUES (?, ?, ?, ?, ?, ?, ?)", vol_rows)
+    return len(series_rows)
+
+
+def _returns(conn: sqlite3.Connection, dates: list[str], series: list[str]) -> "np.ndarray":
+    """len(dates) x len(series) matrix of returns, NaN where a series has none."""
+    import numpy as np
+
+    out = np.full((len(dates), len(series)), np.nan)
+    if not dates:
+        return out
+    row_of = {d: i for i, d in enumerate(dates)}
+    col_of = {s: j for j, s in enumerate(series)}
+    for start in range(0, len(dates), 500):
+        part = dates[start:start + 500]
+        placeholders = ",".join("?" * len(part))
+        for s, d, ret in conn.execute(
+            f"SELECT series, date, ret FROM risk_series WHERE ret IS NOT NULL AND date IN ({placeholders})",
+            part,
+        ):
+            if s in col_of:
+                out[row_of[d], col_of[s]] = ret
+    return out
+
+
+def _comoments(x: "np.ndarray"):
+    """Pairwise-complete (n, mean_a, mean_b, m2_a, m2_b, c_ab) matrices for a dates x series block."""
+    import numpy as np
+
+    present = ~np.isnan(x)
+    m = present.astype(float)
+    x0 = np.where(present, x, 0.0)
+    n = m.T @ m
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean_a = np.where(n > 0, (x0.T @ m) / n, 0.0)
+        mean_b = mean_a.T
+        m2_a = np.maximum((x0 ** 2).T @ m - n * mean_a ** 2, 0.0)
+        m2_b = m2_a.T
+        c_ab = x0.T @ x0 - n * mean_a * mean_b
+    return [n, mean_a, mean_b, m2_a, m2_b, c_ab]
+
+
+def _slide(st: list, x: "np.ndarray", sign: int) -> None:
+    """Add (sign=1) or remove (sign=-1) one date's returns from the pairwise Welford state."""
+    import numpy as np
+
+    n, mean_a, mean_b, m2_a, m2_b, c_ab = st
+    present = ~np.isnan(x)
+    both = np.outer(present, present)
+    xa = np.where(present, x, 0.0)[:, None]
+    xb = xa.T
+    n1 = n + sign * both
+    with np.errstate(invalid="ignore", divide="ignore"):
+        if sign > 0:
+            da = xa - mean_a
+            db = xb - mean_b
+            new_a = np.where(both, mean_a + da / n1, mean_a)
+            new_b = np.where(both, mean_b + db / n1, mean_b)
+            m2_a = np.where(both, m2_a + da * (xa - new_a), m2_a)
+            m2_b = np.where(both, m2_b + db * (xb - new_b), m2_b)
+            c_ab = np.where(both, c_ab + da * (xb - new_b), c_ab)
+        else:
+            new_a = np.where(both & (n1 > 0), (n * mean_a - xa) / n1, np.where(both, 0.0, mean_a))
+            new_b = np.where(both & (n1 > 0), (n * mean_b - xb) / n1, np.where(both, 0.0, mean_b))
+            m2_a = np.where(both, np.maximum(m2_a - (xa - new_a) * (xa - mean_a), 0.0), m2_a)
+            m2_b = np.where(both, np.maximum(m2_b - (xb - new_b) * (xb - mean_b), 0.0), m2_b)
+            c_ab = np.where(both, c_ab - (xa - new_a) * (xb - mean_b), c_ab)
+            empty = both & (n1 == 0)
+            m2_a, m2_b, c_ab = (np.where(empty, 0.0, arr) for arr in (m2_a, m2_b, c_ab))
+    st[:] = [n1, new_a, new_b, m2_a, m2_b, c_ab]
+
+
+def _series_names(conn: sqlite3.Connection) -> list[str]:
+    """Distinct risk_series.series, walking the primary key one series at a time."""
+    return [
+        row[0]
+        for row in conn.execute(
+            """
+            WITH RECURSIVE names(series) AS (
+              SELECT MIN(series) FROM risk_series
+              UNION ALL
+              SELECT (SELECT MIN(series) FROM risk_series WHERE series > names.series)
+                FROM names WHERE names.series IS NOT NULL
+            )
+            SELECT series FROM names WHERE series IS NOT NULL
+            """
+        )
+    ]
+
+
+def _grid(conn: sqlite3.Connection, window: int, until: str | None = None) -> list[str]:
+    """The last `window` dates (up to `until`) on which any series has a return, oldest first."""
+    rows = conn.execute(
+        """
+        SELECT DISTINCT date FROM risk_series
+         WHERE ret IS NOT NULL AND date <= coalesce(?, date)
+         ORDER BY date DESC LIMIT ?
+        """,
+        (until, window),
+    ).fetchall()
+    return [row[0] for row in reversed(rows)]
+
+
+def _update_correlation(conn: sqlite3.Connection, window: int, stale_from: str | None) -> str:
+    """Slide or rebuild risk_corr for one window; returns 'slide', 'rebuild' or 'unchanged'."""
+    import numpy as np
+
+    series = _series_names(conn)
+    window_dates = _grid(conn, window)
+    stored = conn.execute(
+        "SELECT series_a, series_b, asof, n, mean_a, mean_b, m2_a, m2_b, c_ab FROM risk_corr WHERE window_days = ?",
+        (window,),
+    ).fetchall()
+    asof = stored[0][2] if stored else None
+    stored_series = sorted({r[0] for r in stored} | {r[1] for r in stored})
+    if not window_dates:
+        conn.execute("DELETE FROM risk_corr WHERE window_days = ?", (window,))
+        return "unchanged" if not stored else "rebuild"
+    if asof == window_dates[-1] and (stale_from is None or stale_from > asof) and stored_series == series:
+        return "unchanged"
+
+    index = {s: i for i, s in enumerate(series)}
+    if stored and stored_series == series and stale_from is not None and stale_from > asof:
+        mode = "slide"
+        size = len(series)
+        i = np.array([index[r[0]] for r in stored])
+        j = np.array([index[r[1]] for r in stored])
+        values = np.array([r[3:] for r in stored], dtype="float64")
+        st = [np.zeros((size, size)) for _ in range(6)]
+        # (state, column for [a, b], column for [b, a]) with columns n, mean_a, mean_b, m2_a, m2_b, c_ab
+        for k, (ij, ji) in enumerate(((0, 0), (1, 2), (2, 1), (3, 4), (4, 3), (5, 5))):
+            st[k][i, j] = values[:, ij]
+            st[k][j, i] = values[:, ji]
+        previous = _grid(conn, window, asof)
+        current = set(window_dates)
+        leaving = [d for d in previous if d not in current]
+        entering = [d for d in window_dates if d > asof]
+        for row in _returns(conn, leaving, series):
+            _slide(st, row, -1)
+        for row in _returns(conn, entering, series):
+            _slide(st, row, 1)
+    else:
+        mode = "rebuild"
+        st = _comoments(_returns(conn, window_dates, series))
+
+    n, mean_a, mean_b, m2_a, m2_b, c_ab = st
+    i, j = np.triu_indices(len(series), k=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        corr = np.clip(c_ab / np.sqrt(m2_a * m2_b), -1.0, 1.0)
+    valid = (n >= 2) & (m2_a > 0) & (m2_b > 0)
+    names = np.array(series, dtype=object)
+    rows = zip(
+        [window] * len(i), names[i].tolist(), names[j].tolist(), [window_dates[-1]] * len(i),
+        np.rint(n[i, j]).astype(int).tolist(), mean_a[i, j].tolist(), mean_b[i, j].tolist(),
+        m2_a[i, j].tolist(), m2_b[i, j].tolist(), c_ab[i, j].tolist(),
+        np.where(valid, corr, np.nan)[i, j].tolist(),
+    )
+    rows = [(*row[:-1], None if math.isnan(row[-1]) else row[-1]) for row in rows]
+    conn.execute("DELETE FROM risk_corr WHERE window_days = ?", (window,))
+    conn.executemany("INSERT INTO risk_corr VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+    return mode
+
+
+def update_risk(conn: sqlite3.Connection, full: bool = False) -> dict:
+    """Bring risk_series / risk_vol / risk_corr up to date; returns what was done.
+
+    full=True discards the stored statistics and recomputes every series.
+    """
+    windows = risk_windows(conn)
+    if full:
+        with _write_transaction(conn):
+            conn.execute("DELETE FROM risk_series")
+            conn.execute("DELETE FROM risk_vol")
+            conn.execute("DELETE FROM risk_corr")
+            conn.execute("DELETE FROM risk_dirty")
+            conn.execute(
+                "INSERT INTO risk_dirty (series, from_date) SELECT ticker, MIN(date) FROM asset_prices GROUP BY ticker"
+            )
+            conn.execute(
+                """
+                INSERT INTO risk_dirty (series, from_date)
+                SELECT 'PORTFOLIO', MIN(date) FROM portfolio_total_rc WHERE rc = 'JPY' HAVING COUNT(*) > 0
+                """
+            )
+    dirty = conn.execute("SELECT series, from_date FROM risk_dirty ORDER BY series").fetchall()
+    rows = 0
+    stale_from = None
+    for series, _ in dirty:
+        # One short transaction per series; re-read from_date under the write lock
+        with _write_transaction(conn):
+            found = conn.execute("SELECT from_date FROM risk_dirty WHERE series = ?", (series,)).fetchone()
+            if found is None:
+                continue
+            from_date = found[0]
+            rows += _update_series(conn, series, from_date, windows)
+            conn.execute("DELETE FROM risk_dirty WHERE series = ?", (series,))
+        stale_from = from_date if stale_from is None else min(stale_from, from_date)
+    correlation = {}
+    for window in windows:
+        with _write_transaction(conn):
+            correlation[window] = _update_correlation(conn, window, stale_from)
+    return {"series": len(dirty), "rows": rows, "correlation": correlation}
+
+
+def latest_stats(conn: sqlite3.Connection, window: int) -> list[dict]:
+    """Latest vol / drawdown per series for one window (PORTFOLIO first)."""
+    cur = conn.execute(
+        """
+        SELECT s.series, s.date, s.level, v.vol, s.drawdown, s.max_drawdown
+          FROM (SELECT series, MAX(date) AS date FROM risk_series GROUP BY series) last
+          JOIN risk_series s ON s.series = last.series AND s.date = last.date
+          LEFT JOIN risk_vol v ON v.series = s.series AND v.window_days = ? AND v.date = s.date
+         ORDER BY CASE WHEN s.series = 'PORTFOLIO' THEN 0 ELSE 1 END, s.series
+        """,
+        (window,),
+    )
+    names = [d[0] for d in cur.description]
+    return [dict(zip(names, row)) for row in cur.fetchall()]
+
+
+def correlation_matrix(conn: sqlite3.Connection, window: int) -> tuple[list[str], list[list[float | None]], str | None]:
+    """(series, square correlation matrix, as-of date) for one window."""
+    rows = conn.execute(
+        "SELECT series_a, series_b, corr, asof FROM risk_corr WHERE window_days = ?", (window,)
+    ).fetchall()
+    series = sorted({r[0] for r in rows} | {r[1] for r in rows}, key=lambda s: (s != PORTFOLIO, s))
+    index = {s: i for i, s in enumerate(series)}
+    matrix: list[list[float | None]] = [[1.0 if i == j else None for j in series] for i in series]
+    for a, b, corr, _ in rows:
+        matrix[index[a]][index[b]] = corr
+        matrix[index[b]][index[a]] = corr
+    return series, matrix, rows[0][3] if rows else None
@@ -0,0 +1,264 @@
+"""What-if shocks and Monte Carlo scenarios over the holdings of one date.
+
+Positions come from v_valuation (or v_account_valuation). A scenario is a
+relative price change per holding and a relative FX change per currency
+(XXXJPY); all scenarios are evaluated in one batched array computation and
+decomposed like v_attribution with unchanged quantities:
+
+  delta_price = V0 * r_price,  delta_fx = V0 * r_fx,  delta_cross = V0 * r_price * r_fx
+
+where V0 is the JPY value on the base date. Monte Carlo paths draw joint
+price/FX log returns over a horizon, either from a normal distribution fitted
+to the history in asset_prices / v_fx_rates or by bootstrapping historical days.
+"""
+import re
+import sqlite3
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import numpy as np
+
+FX_PAIR = re.compile(r"^([A-Z]{3})JPY$")
+COMPONENTS = ("price", "fx", "cross", "total")
+
+
+def load_positions(conn: sqlite3.Connection, date: str, account: str | None = None) -> dict:
+    """Holdings valued in JPY on date: tickers, ccys and arrays qty / price / fx_rate / value."""
+    import numpy as np
+
+    if account:
+        sql = """
+            SELECT ticker, ccy, qty, price_ccy, fx_rate, value_jpy
+              FROM v_account_valuation
+             WHERE account = ? AND date = ? AND value_jpy IS NOT NULL AND qty <> 0
+             ORDER BY ticker
+        """
+        params = (account, date)
+    else:
+        sql = """
+            SELECT ticker, ccy, qty, price_ccy, fx_rate, value_jpy
+              FROM v_valuation
+             WHERE date = ? AND value_jpy IS NOT NULL AND qty <> 0
+             ORDER BY ticker
+        """
+        params = (date,)
+    rows = conn.execute(sql, params).fetchall()
+    return {
+        "date": date,
+        "tickers": [r[0] for r in rows],
+        "ccys": [r[1] for r in rows],
+        "qty": np.array([r[2] for r in rows], dtype="float64"),
+        "price": np.array([r[3] for r in rows], dtype="float64"),
+        "fx_rate": np.array([r[4] for r in rows], dtype="float64"),
+        "value": np.array([r[5] for r in rows], dtype="float64"),
+    }
+
+
+def foreign_ccys(positions: dict) -> list[str]:
+    return sorted({ccy for ccy in positions["ccys"] if ccy != "JPY"})
+
+
+def parse_shocks(text: str) -> dict[str, float]:
+    """Parse "USDJPY=-10%, *=-20%, VTI=-0.3" into {key: relative change}.
+
+    Keys: XXXJPY shocks a currency, a ticker shocks that holding, "@USD" every
+    holding priced in USD, "*" every holding. Values are fractions or percents.
+    """
+    shocks = {}
+    for part in filter(None, (p.strip() for p in text.split(","))):
+        key, sep, value = part.partition("=")
+        if not sep:
+            raise ValueError(f"shock must be KEY=VALUE: {part!r}")
+        value = value.strip()
+        try:
+            change = float(value[:-1]) / 100 if value.endswith("%") else float(value)
+        except ValueError:
+            raise ValueError(f"invalid shock value: {part!r}") from None
+        if change <= -1:
+            raise ValueError(f"shock must be greater than -100%: {part!r}")
+        shocks[key.strip().upper()] = change
+    return shocks
+
+
+def shock_returns(positions: dict, scenarios: list[dict[str, float]]) -> tuple["np.ndarray", "np.ndarray"]:
+    """(price returns S x H, FX returns S x C) for shock dicts; C follows foreign_ccys()."""
+    import numpy as np
+
+    ccys = foreign_ccys(positions)
+    ccy_index = {ccy: i for i, ccy in enumerate(ccys)}
+    ticker_index = {ticker.upper(): h for h, ticker in enumerate(positions["tickers"])}
+    holding_ccys = np.array(positions["ccys"], dtype=object)
+    price = np.zeros((len(scenarios), len(ticker_index)))
+    fx = np.zeros((len(scenarios), len(ccys)))
+    for s, shocks in enumerate(scenarios):
+        # most specific price key wins: ticker over @CCY over *
+        if "*" in shocks:
+            price[s] = shocks["*"]
+        for key, change in shocks.items():
+            if key.startswith("@"):
+                price[s, holding_ccys == key[1:]] = change
+        for key, change in shocks.items():
+            pair = FX_PAIR.match(key)
+            if pair:
+                if pair.group(1) in ccy_index:
+                    fx[s, ccy_index[pair.group(1)]] = change
+            elif key in ticker_index:
+                price[s, ticker_index[key]] = change
+    return price, fx
+
+
+def decompose(
+    positions: dict, price_returns: "np.ndarray", fx_returns: "np.ndarray", by_holding: bool = False
+) -> dict[str, "np.ndarray"]:
+    """JPY price / fx / cross / total change per scenario (S), or per scenario and holding (S x H).
+
+    Aggregates are matrix products against the base values (FX against the
+    per-currency exposure); only the cross term needs an S x H intermediate.
+    """
+    import numpy as np
+
+    value = positions["value"]
+    ccys = foreign_ccys(positions)
+    holding_ccy = np.array([ccys.index(c) if c != "JPY" else -1 for c in positions["ccys"]], dtype=int)
+    foreign = holding_ccy >= 0
+    # FX change seen by each holding (0 for JPY holdings)
+    fx_h = fx_returns[:, holding_ccy] * foreign if ccys else np.zeros_like(price_returns)
+    if by_holding:
+        out = {"price": price_returns * value, "fx": fx_h * value, "cross": price_returns * fx_h * value}
+    else:
+        exposure = np.bincount(holding_ccy[foreign], weights=value[foreign], minlength=len(ccys))
+        out = {
+            "price": price_returns @ value,
+            "fx": fx_returns @ exposure,
+            "cross": (price_returns * fx_h) @ value,
+        }
+    out["total"] = out["price"] + out["fx"] + out["cross"]
+    return out
+
+
+def load_history(conn: sqlite3.Connection, positions: dict, lookback: int) -> "np.ndarray":
+    """Daily log returns (days x (H + C)) of held prices and their FX rates up to the base date.
+
+    The grid is the last lookback + 1 dates with a price for any holding;
+    prices and rates are forward-filled over it and days before every factor
+    has a value are dropped.
+    """
+    import numpy as np
+
+    tickers = positions["tickers"]
+    ccys = foreign_ccys(positions)
+    factors = {("price", t): i for i, t in enumerate(tickers)}
+    factors.update({("fx", c): len(tickers) + i for i, c in enumerate(ccys)})
+    date = positions["date"]
+    if not tickers:
+        return np.empty((0, len(factors)))
+    placeholders = ",".join("?" * len(tickers))
+    dates = [
+        row[0]
+        for row in conn.execute(
+            f"""
+            SELECT DISTINCT date FROM asset_prices
+             WHERE ticker IN ({placeholders}) AND date <= ?
+             ORDER BY date DESC LIMIT ?
+            """,
+            (*tickers, date, lookback + 1),
+        )
+    ][::-1]
+    if len(dates) < 2:
+        return np.empty((0, len(factors)))
+    rows = conn.execute(
+        f"""
+        SELECT date, 'price', ticker, close FROM asset_prices
+         WHERE ticker IN ({placeholders}) AND date BETWEEN ? AND ? AND close > 0
+        """,
+        (*tickers, dates[0], date),
+    ).fetchall()
+    if ccys:
+        pairs = [f"{c}JPY" for c in ccys]
+        rows += conn.execute(
+            f"""
+            SELECT date, 'fx', substr(pair, 1, 3), rate FROM v_fx_rates
+             WHERE pair IN ({",".join("?" * len(pairs))}) AND date BETWEEN ? AND ? AND rate > 0
+            """,
+            (*pairs, dates[0], date),
+        ).fetchall()
+    date_index = {d: i for i, d in enumerate(dates)}
+    levels = np.full((len(dates), len(factors)), np.nan)
+    for d, kind, key, value in rows:
+        if d in date_index:
+            levels[date_index[d], factors[(kind, key)]] = value
+    # forward fill along dates
+    filled = np.where(np.isnan(levels), 0, np.arange(len(dates))[:, None])
+    np.maximum.accumulate(filled, axis=0, out=filled)
+    levels = levels[filled, np.arange(len(factors))]
+    returns = np.diff(np.log(levels), axis=0)
+    return returns[~np.isnan(returns).any(axis=1)]
+
+
+def simulate(
+    history: "np.ndarray",
+    paths: int,
+    horizon: int = 20,
+    method: str = "normal",
+    seed: int | None = None,
+) -> "np.ndarray":
+    """paths x factors relative changes over horizon days from daily log-return history.
+
+    normal: multivariate normal with the historical mean and covariance scaled
+    to the horizon; bootstrap: sum of `horizon` historical days drawn with
+    replacement (keeps fat tails and cross-asset co-movement of the sample).
+    """
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    days, factors = history.shape
+    if days < 2:
+        raise ValueError("not enough history to estimate scenarios (need at least 2 days of returns)")
+    if method == "bootstrap":
+        draws = rng.integers(0, days, size=(paths, horizon))
+        total = np.zeros((paths, factors))
+        for step in range(horizon):  # horizon row-gathers instead of one paths x horizon x factors array
+            total += history[draws[:, step]]
+    elif method == "normal":
+        mean = history.mean(axis=0) * horizon
+        cov = np.atleast_2d(np.cov(history, rowvar=False)) * horizon
+        # eigen-decomposition tolerates the singular covariance of short or collinear histories
+        eigval, eigvec = np.linalg.eigh(cov)
+        root = eigvec * np.sqrt(np.clip(eigval, 0.0, None))
+        total = mean + rng.standard_normal((paths, factors)) @ root.T
+    else:
+        raise ValueError(f"unknown method: {method}")
+    return np.expm1(total)
+
+
+def monte_carlo(
+    conn: sqlite3.Connection,
+    positions: dict,
+    paths: int = 10_000,
+    horizon: int = 20,
+    lookback: int = 250,
+    method: str = "normal",
+    seed: int | None = None,
+) -> dict[str, "np.ndarray"]:
+    """Decomposed JPY change per simulated path (see decompose)."""
+    history = load_history(conn, positions, lookback)
+    changes = simulate(history, paths, horizon, method, seed)
+    holdings = len(positions["tickers"])
+    return decompose(positions, changes[:, :holdings], changes[:, holdings:])
+
+
+def summarize(result: dict[str, "np.ndarray"], levels: tuple[float, ...] = (0.95, 0.99)) -> dict:
+    """Mean, VaR (loss at each level, positive number) and expected shortfall per component."""
+    import numpy as np
+
+    out = {}
+    for name in COMPONENTS:
+        values = result[name]
+        row = {"mean": float(values.mean()), "p5": float(np.percentile(values, 5)),
+               "p50": float(np.percentile(values, 50)), "p95": float(np.percentile(values, 95))}
+        for level in levels:
+            cutoff = np.percentile(values, (1 - level) * 100)
+            row[f"var{round(level * 100)}"] = float(-cutoff)
+            row[f"es{round(level * 100)}"] = float(-values[values <= cutoff].mean())
+        out[name] = row
+    return out
@@ -0,0 +1,310 @@
+"""Ingest-time screening of fetched or imported prices and FX rates.
+
+Each batch (one ticker's or pair's history from a fetch chunk, a CSV import or a
+manual entry) is checked against the stored history in one vectorized pass
+before it is upserted. The batch is merged with the stored values in its range
+and up to CONTEXT_ROWS stored values before it. Only new or changed values
+can be flagged:
+
+  invalid  not a positive, finite number
+  zscore   the log distance from the recent level (median of the previous
+           LEVEL_WINDOW values) exceeds Z_MAX robust sigmas (MAD of the daily
+           returns of the batch with its context) and MIN_MOVE, and neither
+           the next nor the previous value is at the new level (a bad tick; an
+           unconfirmed last value counts too)
+  split    such a move whose ratio is within SPLIT_TOLERANCE of a split ratio
+           (prices only); later values are held with it until it is reviewed
+  shift    a confirmed move beyond MAX_SHIFT: too large to be a market move
+           whatever the sigma, so it and later values are held like a split
+  stale    the value repeats the previous one for the STALE_RUN-th time or more,
+           in a series whose values normally move
+
+Flagged rows go to ingest_quarantine instead of the target table, where
+scripts/review_quarantine.py accepts (upserts) or rejects them. A value that was
+rejected before is held again; a clean value supersedes a pending one.
+"""
+import datetime as dt
+import sqlite3
+from typing import TYPE_CHECKING
+
+from db import deferred_refresh
+
+# numpy is imported on first screen so the fetch scripts stay cheap to start
+if TYPE_CHECKING:
+    import numpy as np
+
+# target table -> (key column, value column)
+TARGETS = {
+    "asset_prices": ("ticker", "close"),
+    "fx_rates": ("pair", "rate"),
+}
+
+REASONS = ("invalid", "zscore", "split", "shift", "stale")
+# reasons that hold every later value of the key until the flagged row is reviewed
+HOLDING = ("split", "shift")
+
+CONTEXT_ROWS = 60
+LEVEL_WINDOW = 5  # odd, so the median is one of the values
+MIN_RETURNS = 10  # shorter series use DEFAULT_SIGMA
+Z_MAX = 8.0
+# smallest log move that can be an outlier, and the sigma assumed for short series
+MIN_MOVE = {"asset_prices": 0.08, "fx_rates": 0.03}
+DEFAULT_SIGMA = {"asset_prices": 0.02, "fx_rates": 0.007}
+# largest log move from the recent level accepted without review, even when confirmed
+MAX_SHIFT = {"asset_prices": 0.5, "fx_rates": 0.15}
+MIN_SIGMA = 1e-4
+SPLIT_RATIOS = (1.5, 2.0, 3.0, 4.0, 5.0, 8.0, 10.0, 20.0, 25.0, 50.0, 100.0)
+SPLIT_TOLERANCE = 0.02
+STALE_RUN = 5
+
+def utc_now() -> str:
+    return dt.datetime.now(dt.timezone.utc).isoformat(timespec="milliseconds")
+
+
+def _sigma(returns: "np.ndarray") -> float:
+    import numpy as np
+
+    return 1.4826 * float(np.median(np.abs(returns - np.median(returns))))
+
+
+def flag_series(target: str, values: "np.ndarray", candidate: "np.ndarray") -> tuple[list, "np.ndarray", "np.ndarray"]:
+    """Screen one date-ordered series; only rows where candidate is True can be flagged.
+
+    Returns (reason or None per row, detail per row, reference level per row).
+    """
+    import numpy as np
+
+    n = len(values)
+    reasons: list = [None] * n
+    details = np.full(n, None, dtype=object)
+    refs = np.full(n, np.nan)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        valid = np.isfinite(values) & (values > 0)
+    for i in np.flatnonzero(candidate & ~valid):
+        reasons[i] = "invalid"
+        details[i] = "not a positive number"
+    index = np.flatnonzero(valid)
+    if len(index) < 2:
+        return reasons, details, refs
+
+    logs = np.log(values[index])
+    returns = np.diff(logs)
+    # reference level: median of the previous LEVEL_WINDOW values (the first value repeats before the start)
+    padded = np.concatenate([np.full(LEVEL_WINDOW, logs[0]), logs[:-1]])
+    level = np.lib.stride_tricks.sliding_window_view(padded, LEVEL_WINDOW)
+    ref = np.partition(level, LEVEL_WINDOW // 2, axis=1)[:, LEVEL_WINDOW // 2]
+    # one robust sigma per batch: the MAD of its daily returns and those of its context
+    sigma = max(_sigma(returns) if len(returns) >= MIN_RETURNS else DEFAULT_SIGMA[target], MIN_SIGMA)
+
+    dev = logs - ref
+    move = np.abs(dev)
+    z = move / sigma
+    nxt = np.concatenate([logs[1:], [np.nan]])
+    prev = np.concatenate([[np.nan], logs[:-1]])
+    with np.errstate(invalid="ignore"):
+        # the new level is confirmed when the next value stays at it or the previous one is already there
+        persists = (np.abs(nxt - logs) < np.abs(nxt - ref)) | (np.abs(prev - logs) < np.abs(prev - ref))
+        jump = (z > Z_MAX) & (move > MIN_MOVE[target])
+    cand = candidate[index]
+    refs[index] = np.exp(ref)
+
+    split = np.zeros(len(index), dtype=bool)
+    if target == "asset_prices":
+        ratios = np.exp(move)[:, None] / np.array(SPLIT_RATIOS)
+        nearest = np.argmin(np.abs(ratios - 1.0), axis=1)
+        split = jump & (np.abs(ratios[np.arange(len(index)), nearest] - 1.0) <= SPLIT_TOLERANCE)
+    shift = (move > MAX_SHIFT[target]) & persists & ~split
+    first = np.flatnonzero((split | shift) & cand)
+    if len(first):
+        s = first[0]
+        if split[s]:
+            ratio = SPLIT_RATIOS[nearest[s]]
+            reason, after = "split", "after a split-like move"
+            detail = f"{ratio:g}:1 vs {np.exp(ref[s]):.6g}" if dev[s] < 0 else f"1:{ratio:g} vs {np.exp(ref[s]):.6g}"
+        else:
+            reason, after = "shift", "after a level shift"
+            detail = f"{np.exp(dev[s]) - 1:+.1%} vs {np.exp(ref[s]):.6g}, held past the level-shift cap"
+        for j in np.flatnonzero(cand[s:]) + s:
+            reasons[index[j]] = reason
+            details[index[j]] = detail if j == s else after
+        cand = cand.copy()
+        cand[s:] = False
+
+    for j in np.flatnonzero(jump & ~persists & ~split & cand):
+        reasons[index[j]] = "zscore"
+        details[index[j]] = f"z={z[j]:.1f}, {np.exp(dev[j]) - 1:+.1%} vs {np.exp(ref[j]):.6g}"
+
+    # stale: position within a run of identical values, in a series that usually moves
+    same = np.concatenate([[False], returns == 0])
+    starts = np.maximum.accumulate(np.where(same, 0, np.arange(len(index))))
+    repeats = np.arange(len(index)) - starts
+    if np.mean(returns != 0) > 0.5:
+        for j in np.flatnonzero((repeats >= STALE_RUN) & cand):
+            if reasons[index[j]] is None:
+                reasons[index[j]] = "stale"
+                details[index[j]] = f"repeated {repeats[j]} times"
+    return reasons, details, refs
+
+
+def screen_history(
+    conn: sqlite3.Connection, target: str, key: str, history: dict[str, float], source: str
+) -> tuple[dict[str, float], list[tuple[str, float, str, str]]]:
+    """Split one key's batch into (rows to upsert, [(date, value, reason, detail)] held back).
+
+    Pending zscore rows of the key from the context window on are screened again with
+    the batch, so a jump that later values confirm is released into the rows to upsert.
+    """
+    import numpy as np
+
+    if not history:
+        return {}, []
+    key_col, value_col = TARGETS[target]
+    start, end = min(history), max(history)
+    context = conn.execute(
+        f"SELECT date, {value_col} FROM {target} WHERE {key_col} = ? AND date < ? ORDER BY date DESC LIMIT ?",
+        (key, start, CONTEXT_ROWS),
+    ).fetchall()[::-1]
+    since = context[0][0] if context else start
+    stored = dict(
+        conn.execute(
+            f"SELECT date, {value_col} FROM {target} WHERE {key_col} = ? AND date BETWEEN ? AND ?",
+            (key, start, end),
+        ).fetchall()
+    )
+    quarantined = conn.execute(
+        """
+        SELECT date, value, status, reason FROM ingest_quarantine
+         WHERE target = ? AND key = ? AND date BETWEEN ? AND ? AND status <> 'accepted'
+        """,
+        (target, key, since, end),
+    ).fetchall()
+    rejected = {date: value for date, value, status, _ in quarantined if status == "rejected"}
+    retry = {
+        date: value
+        for date, value, status, reason in quarantined
+        if status == "pending" and reason == "zscore" and date not in history and value is not None
+    }
+
+    batch = {**retry, **history}
+    series = dict(context)
+    series.update(stored)
+    series.update(batch)
+    dates = sorted(series)
+    values = np.array([series[d] for d in dates], dtype="float64")
+    candidate = np.array([d in batch and stored.get(d) != batch[d] for d in dates])
+    reasons, details, refs = flag_series(target, values, candidate)
+    # a pending split / shift outside this batch holds everything after it until it is reviewed
+    hold = min(
+        ((d, r) for d, _, status, r in quarantined if status == "pending" and r in HOLDING and d not in batch),
+        default=None,
+    )
+    if hold is not None:
+        hold_date, hold_reason = hold
+        for i in np.flatnonzero(candidate):
+            if reasons[i] != "invalid" and dates[i] > hold_date:
+                reasons[i], details[i] = hold_reason, f"after a pending {hold_reason} on {hold_date}"
+
+    rows = {date: value for date, value in history.items() if stored.get(date) == value}
+    held = []
+    now = utc_now()
+    for i in np.flatnonzero(candidate):
+        date, value = dates[i], batch[dates[i]]
+        reason, detail = reasons[i], details[i]
+        if reason is None and rejected.get(date) == value:
+            reason, detail = "rejected", "rejected before"
+        if reason is None:
+            rows[date] = value
+            continue
+        if date in retry:
+            # still pending; a confirmed jump past the cap becomes a shift that holds later values
+            if reason != "zscore":
+                conn.execute(
+                    "UPDATE ingest_quarantine SET reason = ?, detail = ? WHERE target = ? AND key = ? AND date = ?",
+                    (reason, detail, target, key, date),
+                )
+            continue
+        held.append((date, value, reason, detail))
+        if reason == "rejected":
+            continue
+        conn.execute(
+            """
+            INSERT INTO ingest_quarantine (target, key, date, value, reason, detail, ref_value, source, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(target, key, date) DO UPDATE SET
+              value = excluded.value,
+              reason = excluded.reason,
+              detail = excluded.detail,
+              ref_value = excluded.ref_value,
+              source = excluded.source,
+              status = 'pending',
+              created_at = excluded.created_at,
+              reviewed_at = NULL
+             WHERE ingest_quarantine.value IS NOT excluded.value
+            """,
+            (
+                target,
+                key,
+                date,
+                value if np.isfinite(value) else None,
+                reason,
+                detail,
+                None if np.isnan(refs[i]) else float(refs[i]),
+                source,
+                now,
+            ),
+        )
+    pending = {date for date, _, status, _ in quarantined if status == "pending"}
+    released = [(target, key, date) for date in rows if date in pending]
+    if released:
+        conn.executemany(
+            "DELETE FROM ingest_quarantine WHERE target = ? AND key = ? AND date = ? AND status = 'pending'",
+            released,
+        )
+    return rows, held
+
+
+def review(
+    conn: sqlite3.Connection,
+    action: str,
+    *,
+    target: str | None = None,
+    key: str | None = None,
+    start: str | None = None,
+    end: str | None = None,
+    reason: str | None = None,
+) -> int:
+    """Accept (upsert into the target table) or reject the matching pending rows; returns the count."""
+    where = ["status = 'pending'"]
+    params: list = []
+    for column, value in (("target", target), ("key", key), ("reason", reason)):
+        if value is not None:
+            where.append(f"{column} = ?")
+            params.append(value)
+    if start is not None:
+        where.append("date >= ?")
+        params.append(start)
+    if end is not None:
+        where.append("date <= ?")
+        params.append(end)
+    rows = conn.execute(
+        f"SELECT target, key, date, value FROM ingest_quarantine WHERE {' AND '.join(where)}", params
+    ).fetchall()
+    now = utc_now()
+    with conn, deferred_refresh(conn):
+        for row_target, row_key, date, value in rows:
+            if action == "accept":
+                if value is None:
+                    raise ValueError(f"{row_target} {row_key} {date} has no value to accept")
+                key_col, value_col = TARGETS[row_target]
+                conn.execute(
+                    f"""
+                    INSERT INTO {row_target} (date, {key_col}, {value_col}) VALUES (?, ?, ?)
+                    ON CONFLICT(date, {key_col}) DO UPDATE SET {value_col} = excluded.{value_col}
+                    """,
+                    (date, row_key, value),
+                )
+            conn.execute(
+                "UPDATE ingest_quarantine SET status = ?, reviewed_at = ? WHERE target = ? AND key = ? AND date = ?",
+                ("accepted" if action == "accept" else "rejected", now, row_target, row_key, date),
+            )
+    return len(rows)
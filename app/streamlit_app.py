@@ -1,53 +1,123 @@
-import json
+import importlib.util
 import os
 import sqlite3
-from datetime import date as date_cls, datetime, timedelta
+from datetime import date as date_cls
+from datetime import timedelta
 from pathlib import Path
 
-import pandas as pd
+import analytics
+import gaps
+import risk
+import scenarios
+import screening
 import streamlit as st
-from dotenv import load_dotenv
+import tiering
+import tscache
+from columnar import DATE_INDEX, fetch_frame
+from db import connect, ensure_schema
+from queries import (
+    fetch_asset_prices,
+    fetch_currency_history,
+    fetch_fx_history,
+    fetch_portfolio_history,
+    get_accounts,
+    get_attribution_history,
+    get_portfolio_date_range,
+    get_portfolio_totals_history,
+    get_reporting_currencies,
+    get_valuation_rc_for_date,
+    q_all,
+    table_exists,
+)
+from summaries import (
+    PrecomputeJob,
+    build_history_prompt,
+    day_prompt,
+    ensure_summary_table,
+    load_summary,
+    save_summary,
+    stream_summary,
+)
+
+# pandas, python-dotenv and openai are imported on first use to keep cold start fast
 
 ROOT = Path(__file__).resolve().parent.parent
 DB_DEFAULT = ROOT / "money_diary.db"
-SCHEMA_PATH = ROOT / "schema.sql"
+ALL_ACCOUNTS = "(全口座)"
 
-env_path = ROOT / ".env"
-load_dotenv(env_path)
+_env_loaded = False
 
 
-try:
+def load_env() -> None:
+    """Load ROOT/.env into os.environ once."""
+    global _env_loaded
+    if not _env_loaded:
+        from dotenv import load_dotenv
+
+        load_dotenv(ROOT / ".env")
+        _env_loaded = True
+
+
+def openai_installed() -> bool:
+    return importlib.util.find_spec("openai") is not None
+
+
+def openai_api_key() -> str | None:
+    load_env()
+    return os.getenv("OPENAI_API_KEY")
+
+
+@st.cache_resource
+def get_openai_client(api_key: str):
+    """One OpenAI client per API key, shared across reruns and sessions."""
     from openai import OpenAI
-except Exception:  # pragma: no cover
-    OpenAI = None
+
+    return OpenAI(api_key=api_key)
 
 
 def get_conn(db_path: Path) -> sqlite3.Connection:
-    need_init = not db_path.exists()
-    conn = sqlite3.connect(db_path)
+    """Writer connection for the input forms (WAL, busy timeout); also migrates the schema."""
+    conn = connect(db_path)
     conn.row_factory = sqlite3.Row
-    with open(SCHEMA_PATH, "r", encoding="utf-8") as f:
-        schema_sql = f.read()
-    if need_init:
-        conn.executescript(schema_sql)
-        conn.commit()
-    else:
-        cur = conn.cursor()
-        cur.execute(
-            "SELECT name FROM sqlite_master WHERE type='view'"
-        )
-        views = {row[0] for row in cur.fetchall()}
-        required = {
-            "v_portfolio_total",
-            "v_currency_exposure",
-            "v_valuation_enriched",
-        }
-        if not required.issubset(views):
-            conn.executescript(schema_sql)
-            conn.commit()
+    ensure_schema(conn)
     return conn
 
 
+def get_read_conn(db_path: Path) -> sqlite3.Connection:
+    """Read-only (mode=ro) connection for dashboard queries; never blocks a running fetch."""
+    conn = connect(db_path, read_only=True)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+@st.cache_resource
+def get_precompute_jobs() -> dict[str, PrecomputeJob]:
+    """Background summary jobs by DB path; they outlive reruns and sessions."""
+    return {}
+
+
+@st.cache_resource
+def get_duckdb_engine(db_path: str):
+    return analytics.open_engine("duckdb", db_path)
+
+
+@st.cache_resource
+def get_series_cache(db_path: str) -> tscache.SeriesCache:
+    """Memory-mapped chart series for one DB, shared by all sessions."""
+    return tscache.SeriesCache(db_path)
+
+
+def chart_cache(db_path: Path) -> tscache.SeriesCache | None:
+    """The series cache brought up to date with the DB (None if it cannot be written)."""
+    cache = get_series_cache(str(db_path))
+    try:
+        cache.refresh()
+    except (sqlite3.Error, OSError) as exc:
+        st.warning(f"グラフ用キャッシュを更新できないため DB から直接読み込みます: {exc}")
+        return None
+    return cache
+
+
 def upsert_asset(conn: sqlite3.Connection, ticker: str, ccy: str, name: str | None):
     cur = conn.cursor()
     cur.execute(
@@ -63,297 +133,75 @@ def upsert_asset(conn: sqlite3.Connection, ticker: str, ccy: str, name: str | No
     conn.commit()
 
 
-def upsert_fx(conn: sqlite3.Connection, d: str, ccy: str, rate: float):
+def upsert_fx(conn: sqlite3.Connection, d: str, ccy: str, rate: float) -> list:
+    """Screen and upsert one rate; returns the quarantined [(date, rate, reason, detail)]."""
     pair = f"{ccy}JPY"
-    cur = conn.cursor()
-    cur.execute(
-        """
-        INSERT INTO fx_rates (date, pair, rate)
-        VALUES (?, ?, ?)
-        ON CONFLICT(date, pair) DO UPDATE SET
-          rate = excluded.rate
-        """,
-        (d, pair, rate),
-    )
-    conn.commit()
+    with conn:
+        rows, held = screening.screen_history(conn, "fx_rates", pair, {d: rate}, "gui")
+        for date, value in rows.items():
+            conn.execute(
+                """
+                INSERT INTO fx_rates (date, pair, rate)
+                VALUES (?, ?, ?)
+                ON CONFLICT(date, pair) DO UPDATE SET
+                  rate = excluded.rate
+                """,
+                (date, pair, value),
+            )
+    return held
 
 
-def upsert_snapshot(conn: sqlite3.Connection, d: str, ticker: str, qty: float, price_ccy: float):
+def upsert_snapshot(
+    conn: sqlite3.Connection,
+    d: str,
+    ticker: str,
+    qty: float,
+    price_ccy: float,
+    account: str = "main",
+):
     cur = conn.cursor()
     cur.execute(
         """
-        INSERT INTO snapshots (date, ticker, qty, price_ccy)
-        VALUES (?, ?, ?, ?)
-        ON CONFLICT(date, ticker) DO UPDATE SET
+        INSERT INTO snapshots (account, date, ticker, qty, price_ccy)
+        VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT(account, date, ticker) DO UPDATE SET
           qty = excluded.qty,
           price_ccy = excluded.price_ccy
         """,
-        (d, ticker, qty, price_ccy),
+        (account, d, ticker, qty, price_ccy),
     )
     conn.commit()
 
 
-def q_all(conn: sqlite3.Connection, sql: str, params: tuple = ()):
-    cur = conn.cursor()
-    cur.execute(sql, params)
-    rows = cur.fetchall()
-    return [dict(r) for r in rows]
-
-
-def table_exists(conn: sqlite3.Connection, table: str) -> bool:
+def upsert_account(conn: sqlite3.Connection, account: str, name: str | None):
     cur = conn.cursor()
     cur.execute(
-        "SELECT name FROM sqlite_master WHERE type IN ('table', 'view') AND name=?",
-        (table,),
-    )
-    return cur.fetchone() is not None
-
-
-def fetch_asset_prices(
-    conn: sqlite3.Connection,
-    tickers: list[str],
-    start: str,
-    end: str,
-) -> pd.DataFrame:
-    if not tickers or not table_exists(conn, "asset_prices"):
-        return pd.DataFrame()
-    placeholders = ",".join(["?"] * len(tickers))
-    sql = f"""
-        SELECT date, ticker, close
-        FROM asset_prices
-        WHERE date BETWEEN ? AND ?
-          AND ticker IN ({placeholders})
-        ORDER BY date, ticker
-    """
-    rows = q_all(conn, sql, (start, end, *tickers))
-    if not rows:
-        return pd.DataFrame()
-    df = pd.DataFrame(rows)
-    df["date"] = pd.to_datetime(df["date"])
-    return df
-
-
-def fetch_fx_history(
-    conn: sqlite3.Connection,
-    pairs: list[str],
-    start: str,
-    end: str,
-) -> pd.DataFrame:
-    if not pairs or not table_exists(conn, "fx_rates"):
-        return pd.DataFrame()
-    placeholders = ",".join(["?"] * len(pairs))
-    sql = f"""
-        SELECT date, pair, rate
-        FROM fx_rates
-        WHERE date BETWEEN ? AND ?
-          AND pair IN ({placeholders})
-        ORDER BY date, pair
-    """
-    rows = q_all(conn, sql, (start, end, *pairs))
-    if not rows:
-        return pd.DataFrame()
-    df = pd.DataFrame(rows)
-    df["date"] = pd.to_datetime(df["date"])
-    return df
-
-
-def get_portfolio_date_range(conn: sqlite3.Connection) -> tuple[date_cls | None, date_cls | None]:
-    if not table_exists(conn, "v_portfolio_total"):
-        return (None, None)
-    rows = q_all(
-        conn,
-        "SELECT MIN(date) AS min_date, MAX(date) AS max_date FROM v_portfolio_total",
-    )
-    if not rows:
-        return (None, None)
-    row = rows[0]
-    min_date = row.get("min_date")
-    max_date = row.get("max_date")
-    if not min_date or not max_date:
-        return (None, None)
-    return (
-        datetime.strptime(min_date, "%Y-%m-%d").date(),
-        datetime.strptime(max_date, "%Y-%m-%d").date(),
-    )
-
-
-def fetch_portfolio_history(
-    conn: sqlite3.Connection,
-    start: str,
-    end: str,
-) -> pd.DataFrame:
-    if not table_exists(conn, "v_portfolio_total"):
-        return pd.DataFrame()
-    rows = q_all(
-        conn,
-        """
-        SELECT date, total_value_jpy
-          FROM v_portfolio_total
-         WHERE date BETWEEN ? AND ?
-         ORDER BY date
-        """,
-        (start, end),
-    )
-    if not rows:
-        return pd.DataFrame()
-    df = pd.DataFrame(rows)
-    df["date"] = pd.to_datetime(df["date"])
-    return df
-
-
-def fetch_currency_history(
-    conn: sqlite3.Connection,
-    start: str,
-    end: str,
-) -> pd.DataFrame:
-    if not table_exists(conn, "v_currency_exposure"):
-        return pd.DataFrame()
-    rows = q_all(
-        conn,
         """
-        SELECT date, ccy, value_jpy
-          FROM v_currency_exposure
-         WHERE date BETWEEN ? AND ?
-         ORDER BY date, ccy
-        """,
-        (start, end),
-    )
-    if not rows:
-        return pd.DataFrame()
-    df = pd.DataFrame(rows)
-    df["date"] = pd.to_datetime(df["date"])
-    return df
-
-
-def get_attribution_for_date(conn: sqlite3.Connection, date: str):
-    return q_all(
-        conn,
-        """
-        SELECT ticker, delta_total, delta_price, delta_fx, delta_cross, flow
-          FROM v_attribution
-         WHERE date = ?
-         ORDER BY CASE WHEN ticker = 'PORTFOLIO' THEN 0 ELSE 1 END, ticker
-        """,
-        (date,),
-    )
-
-
-def get_attribution_history(conn: sqlite3.Connection, limit: int | None = None):
-    sql = """
-        SELECT date, ticker, delta_total, delta_price, delta_fx, delta_cross, flow
-          FROM v_attribution
-         ORDER BY date, CASE WHEN ticker = 'PORTFOLIO' THEN 0 ELSE 1 END, ticker
-    """
-    rows = q_all(conn, sql)
-    if limit:
-        rows = rows[-limit:]
-    return rows
-
-
-def get_currency_exposure_for_date(conn: sqlite3.Connection, date: str):
-    return q_all(
-        conn,
-        """
-        SELECT ccy, value_jpy
-          FROM v_currency_exposure
-         WHERE date = ?
-         ORDER BY value_jpy DESC
+        INSERT INTO accounts (account, name)
+        VALUES (?, ?)
+        ON CONFLICT(account) DO UPDATE SET
+          name = excluded.name
         """,
-        (date,),
-    )
-
-
-def get_portfolio_total_for_date(conn: sqlite3.Connection, date: str):
-    rows = q_all(
-        conn,
-        "SELECT total_value_jpy FROM v_portfolio_total WHERE date = ?",
-        (date,),
+        (account, name),
     )
-    return rows[0]["total_value_jpy"] if rows else None
-
-
-def get_portfolio_totals_history(conn: sqlite3.Connection, limit: int | None = None):
-    sql = "SELECT date, total_value_jpy FROM v_portfolio_total ORDER BY date"
-    rows = q_all(conn, sql)
-    if limit:
-        rows = rows[-limit:]
-    return rows
+    conn.commit()
 
 
 def openai_available() -> bool:
-    return OpenAI is not None and bool(os.getenv("OPENAI_API_KEY"))
-
-
-def build_day_prompt(date: str, attribution, exposure, total_value) -> str:
-    payload = {
-        "date": date,
-        "portfolio_total_jpy": total_value,
-        "attribution": attribution,
-        "currency_exposure": exposure,
-    }
-    return (
-        "You are a financial analyst who explains daily portfolio movements in Japanese. "
-        "Summarize the key drivers (price, FX, cross, flow) for the portfolio on the given date. "
-        "Highlight notable tickers and percent contributions if obvious."
-        "\n\nData(JSON):\n"
-        + json.dumps(payload, ensure_ascii=False)
-        + "\n\nOutput format: short bullet list in Japanese with overall conclusion."
-    )
-
-
-def build_history_prompt(attribution_history, totals_history) -> str:
-    payload = {
-        "attribution_history": attribution_history,
-        "portfolio_totals": totals_history,
-    }
-    return (
-        "You are a financial analyst. Review the entire attribution history and portfolio totals "
-        "to identify major turning points, recurring drivers, and any long-term trends."
-        " Provide insights in Japanese, covering key dates, main contributing tickers, and suggestions "
-        "for what deserves attention.\n\nData(JSON):\n"
-        + json.dumps(payload, ensure_ascii=False)
-        + "\n\nOutput format: short paragraphs with bullet list of highlights in Japanese."
-    )
+    return openai_installed() and bool(openai_api_key())
 
 
-def summarize_with_openai(prompt: str) -> str:
-    if OpenAI is None:
-        raise RuntimeError("openai パッケージがインストールされていません")
-    api_key = os.getenv("OPENAI_API_KEY")
-    if not api_key:
-        raise RuntimeError("OPENAI_API_KEY が設定されていません")
-    client = OpenAI(api_key=api_key)
-    try:
-        response = client.responses.create(
-            model="gpt-4o-mini",
-            input=prompt,
-        )
-    except Exception as exc:  # pragma: no cover
-        raise RuntimeError(f"OpenAI API 呼び出しに失敗しました: {exc}")
-
-    text = getattr(response, "output_text", "")
-    if text:
-        return text.strip()
-    # fallback for older client structures
-    chunks = []
-    for item in getattr(response, "output", []) or []:
-        for block in getattr(item, "content", []) or []:
-            if getattr(block, "type", None) == "output_text":
-                chunks.append(getattr(block, "text", ""))
-    if chunks:
-        return "\n".join(chunks).strip()
-    return str(response)
-def get_prev_snapshot(conn: sqlite3.Connection, ticker: str, d: str):
+def get_prev_snapshot(conn: sqlite3.Connection, ticker: str, d: str, account: str = "main"):
     rows = q_all(
         conn,
         """
         SELECT date, qty, price_ccy
           FROM snapshots
-         WHERE ticker = ? AND date < ?
+         WHERE account = ? AND ticker = ? AND date < ?
          ORDER BY date DESC
          LIMIT 1
         """,
-        (ticker, d),
+        (account, ticker, d),
     )
     return rows[0] if rows else None
 
@@ -371,7 +219,7 @@ def fx_missing_for_date(conn: sqlite3.Connection, d: str):
         SELECT n.ccy || 'JPY' AS pair
           FROM need n
          WHERE NOT EXISTS (
-           SELECT 1 FROM fx_rates f WHERE f.date = ? AND f.pair = n.ccy || 'JPY'
+           SELECT 1 FROM v_fx_rates f WHERE f.date = ? AND f.pair = n.ccy || 'JPY'
          )
         ORDER BY pair
         """,
@@ -402,7 +250,7 @@ def get_fx_rate(conn: sqlite3.Connection, ccy: str, date: str) -> float | None:
         return 1.0
     rows = q_all(
         conn,
-        "SELECT rate FROM fx_rates WHERE pair = ? AND date = ?",
+        "SELECT rate FROM v_fx_rates WHERE pair = ? AND date = ?",
         (f"{ccy}JPY", date),
     )
     if not rows:
@@ -416,10 +264,29 @@ def main():
 
     db_path_str = st.sidebar.text_input("DBパス", str(DB_DEFAULT))
     db_path = Path(db_path_str).expanduser().resolve()
-    conn = get_conn(db_path)
+    write_conn = get_conn(db_path)
+    conn = get_read_conn(db_path)
 
     sel_date = st.sidebar.date_input("対象日付", value=date_cls.today())
     sel_date_str = sel_date.strftime("%Y-%m-%d")
+    report_ccy = st.sidebar.selectbox("表示通貨", options=get_reporting_currencies(conn))
+    accounts = get_accounts(conn)
+    account_choice = st.sidebar.selectbox("口座", options=[ALL_ACCOUNTS, *accounts])
+    view_account = None if account_choice == ALL_ACCOUNTS else account_choice
+    engines = analytics.available_engines()
+    engine_name = st.sidebar.selectbox(
+        "分析エンジン",
+        options=engines,
+        help="履歴系の集計（推移グラフ・全履歴要約）を実行するエンジン。duckdb はインストール時のみ表示",
+    )
+    history_engine = None
+    if engine_name == "duckdb":
+        import duckdb  # listed only when installed
+
+        try:
+            history_engine = get_duckdb_engine(str(db_path))
+        except (RuntimeError, duckdb.Error) as exc:
+            st.sidebar.warning(f"DuckDB を利用できません: {exc}")
 
     tabs = st.tabs(["Assets", "FX", "Snapshots", "Views", "Charts"])
     tab_assets, tab_fx, tab_snapshots, tab_views, tab_charts = tabs
@@ -435,11 +302,24 @@ def main():
                 if not ticker or not ccy or len(ccy) != 3:
                     st.error("Ticker と 通貨3桁 は必須です")
                 else:
-                    upsert_asset(conn, ticker, ccy, name or None)
+                    upsert_asset(write_conn, ticker, ccy, name or None)
                     st.success(f"登録: {ticker} ({ccy})")
         st.caption("一覧")
         st.dataframe(q_all(conn, "SELECT ticker, ccy, COALESCE(name,'') AS name FROM assets ORDER BY ticker"))
 
+        st.subheader("Accounts（口座）")
+        with st.form("account_form"):
+            account_id = st.text_input("口座ID", placeholder="nisa").strip()
+            account_name = st.text_input("名称（任意）", key="account_name").strip()
+            submitted = st.form_submit_button("追加/更新")
+            if submitted:
+                if not account_id:
+                    st.error("口座ID は必須です")
+                else:
+                    upsert_account(write_conn, account_id, account_name or None)
+                    st.success(f"登録: {account_id}")
+        st.dataframe(q_all(conn, "SELECT account, COALESCE(name,'') AS name FROM accounts ORDER BY account"))
+
     with tab_fx:
         st.subheader("FX 対JPYレート")
         with st.form("fx_form"):
@@ -451,8 +331,15 @@ def main():
                 if not ccy2 or len(ccy2) != 3 or rate <= 0:
                     st.error("通貨3桁とレート(>0)が必要です")
                 else:
-                    upsert_fx(conn, d.strftime("%Y-%m-%d"), ccy2, float(rate))
-                    st.success(f"登録: {d} {ccy2}JPY={rate}")
+                    held = upsert_fx(write_conn, d.strftime("%Y-%m-%d"), ccy2, float(rate))
+                    if held:
+                        _, _, reason, detail = held[0]
+                        st.warning(
+                            f"保留: {d} {ccy2}JPY={rate} は疑わしい値のため登録していません"
+                            f"（{reason}: {detail}）。`./scripts/review_quarantine.py --accept` で登録できます"
+                        )
+                    else:
+                        st.success(f"登録: {d} {ccy2}JPY={rate}")
         st.caption(f"{sel_date_str} のFX")
         st.dataframe(q_all(conn, "SELECT date, pair, rate FROM fx_rates WHERE date = ? ORDER BY pair", (sel_date_str,)))
 
@@ -480,6 +367,12 @@ def main():
             state.snap_apply_pending = False
 
         with st.form("snap_form"):
+            snap_account = st.selectbox(
+                "口座",
+                options=accounts or ["main"],
+                index=(accounts.index(view_account) if view_account in accounts else 0),
+                key="snap_account",
+            )
             d = st.date_input("日付", value=sel_date, key="snap_date")
             ticker = (
                 st.selectbox("Ticker", options=tickers, key="snap_ticker")
@@ -555,7 +448,7 @@ def main():
             if load_prev:
                 tkr = ticker if tickers else state.get("snap_ticker_text", "").strip()
                 if tkr:
-                    prev = get_prev_snapshot(conn, tkr, date_iso)
+                    prev = get_prev_snapshot(conn, tkr, date_iso, snap_account)
                     if prev:
                         state.snap_qty_pending = float(prev["qty"])
                         state.snap_price_pending = float(prev["price_ccy"])
@@ -588,13 +481,14 @@ def main():
                         else:
                             qty_to_store = float(qty)
                         if amount_jpy == 0 or fx_for_calc:
-                            upsert_snapshot(conn, date_iso, tkr, float(qty_to_store), price_to_store)
+                            upsert_snapshot(write_conn, date_iso, tkr, float(qty_to_store), price_to_store, snap_account)
                             state.snap_qty_pending = float(qty_to_store)
                             state.snap_price_pending = price_to_store
                             state.snap_amount_pending = float(amount_jpy)
                             state.snap_apply_pending = True
                             st.success(
-                                f"登録: {date_iso} {tkr} qty={qty_to_store:.4f} price={price_to_store:.4f}"
+                                f"登録: {snap_account} {date_iso} {tkr} "
+                                f"qty={qty_to_store:.4f} price={price_to_store:.4f}"
                             )
                             st.rerun()
 
@@ -602,12 +496,13 @@ def main():
         st.dataframe(
             q_all(
                 conn,
-                "SELECT date, ticker, qty, price_ccy FROM snapshots ORDER BY date DESC, ticker",
+                "SELECT account, date, ticker, qty, price_ccy FROM snapshots ORDER BY date DESC, account, ticker",
             )
         )
 
     with tab_views:
         st.subheader("Views（評価/原因分解）")
+        tiering.ensure_range(conn, sel_date_str)
         # ヘルパー：FX不足と合計検証
         with st.expander("データチェック"):
             c1, c2 = st.columns(2)
@@ -638,53 +533,106 @@ def main():
                     else:
                         st.error("不一致: " + ", ".join(f"{tkr} Δ={diff:.6f}" for tkr, diff in fails))
 
+            st.markdown("**全期間のデータ欠損（data_gaps）**")
+            if not table_exists(conn, "data_gaps"):
+                st.info("data_gaps テーブルがありません（make db-migrate を実行してください）")
+            else:
+                stale = conn.execute("SELECT COUNT(*), MIN(from_date) FROM gap_dirty").fetchone()
+                gap_col1, gap_col2 = st.columns([3, 1])
+                with gap_col1:
+                    if stale[0]:
+                        st.caption(f"未スキャンの種別: {stale[0]}（{stale[1] or '全期間'} 以降）")
+                    else:
+                        st.caption("スキャン結果は最新です")
+                with gap_col2:
+                    if st.button("再スキャン", disabled=not stale[0]):
+                        with st.spinner("スキャン中..."):
+                            scanned = gaps.scan_gaps(write_conn)
+                        st.success(", ".join(f"{kind}: {n}" for kind, n in scanned.items()))
+                        st.rerun()
+                st.dataframe(
+                    [
+                        {"kind": kind, "gaps": n, "keys": keys, "first": first, "last": last}
+                        for kind, (n, keys, first, last) in gaps.gap_counts(conn).items()
+                    ]
+                )
+                gap_kind = st.selectbox("種別", gaps.KINDS, key="gap_kind")
+                gap_key = st.text_input("キー（部分一致）", key="gap_key")
+                st.dataframe(
+                    q_all(
+                        conn,
+                        """
+                        SELECT date, key, detail FROM data_gaps
+                         WHERE kind = ? AND key LIKE ?
+                         ORDER BY date DESC, key LIMIT 500
+                        """,
+                        (gap_kind, f"%{gap_key}%"),
+                    )
+                )
+
         col1, col2 = st.columns(2)
         with col1:
-            st.markdown("**v_valuation**")
-            val_rows = q_all(
-                conn,
-                """
-                SELECT date, ticker, ccy, qty, price_ccy, fx_rate, value_jpy
-                FROM v_valuation WHERE date = ? ORDER BY ticker
-                """,
-                (sel_date_str,),
-            )
-            st.dataframe(val_rows)
-            if val_rows:
-                import pandas as pd
-
-                df = pd.DataFrame(val_rows)
+            if view_account:
+                st.markdown(f"**v_account_valuation（{view_account}）**")
+                df_val = fetch_frame(
+                    conn,
+                    """
+                    SELECT date, ticker, ccy, qty, price_ccy, fx_rate, value_jpy
+                    FROM v_account_valuation WHERE account = ? AND date = ? ORDER BY ticker
+                    """,
+                    (view_account, sel_date_str),
+                )
+            else:
+                st.markdown("**v_valuation**")
+                df_val = fetch_frame(
+                    conn,
+                    """
+                    SELECT date, ticker, ccy, qty, price_ccy, fx_rate, value_jpy
+                    FROM v_valuation WHERE date = ? ORDER BY ticker
+                    """,
+                    (sel_date_str,),
+                )
+            st.dataframe(df_val)
+            if not df_val.empty:
                 st.download_button(
                     "Download v_valuation CSV",
-                    df.to_csv(index=False).encode("utf-8"),
+                    df_val.to_csv(index=False).encode("utf-8"),
                     file_name=f"valuation_{sel_date_str}.csv",
                     mime="text/csv",
                 )
         with col2:
-            st.markdown("**v_attribution**")
-            att_rows = q_all(
-                conn,
-                """
-                SELECT date, ticker, delta_total, delta_price, delta_fx, delta_cross, flow
-                FROM v_attribution WHERE date = ? ORDER BY ticker
-                """,
-                (sel_date_str,),
-            )
-            st.dataframe(att_rows)
-            if att_rows:
-                import pandas as pd
-
-                df = pd.DataFrame(att_rows)
+            if view_account:
+                st.markdown(f"**v_account_attribution（{view_account}）**")
+                df_att = fetch_frame(
+                    conn,
+                    """
+                    SELECT date, ticker, delta_total, delta_price, delta_fx, delta_cross, flow
+                    FROM v_account_attribution WHERE account = ? AND date = ? ORDER BY ticker
+                    """,
+                    (view_account, sel_date_str),
+                )
+            else:
+                st.markdown("**v_attribution**")
+                df_att = fetch_frame(
+                    conn,
+                    """
+                    SELECT date, ticker, delta_total, delta_price, delta_fx, delta_cross, flow
+                    FROM v_attribution WHERE date = ? ORDER BY ticker
+                    """,
+                    (sel_date_str,),
+                )
+            st.dataframe(df_att)
+            if not df_att.empty:
                 st.download_button(
                     "Download v_attribution CSV",
-                    df.to_csv(index=False).encode("utf-8"),
+                    df_att.to_csv(index=False).encode("utf-8"),
                     file_name=f"attribution_{sel_date_str}.csv",
                     mime="text/csv",
                 )
 
         st.markdown("---")
         st.markdown("**v_portfolio_total**")
-        total_rows = q_all(
+        df_total = fetch_frame(
             conn,
             """
             SELECT date, total_value_jpy
@@ -693,11 +641,8 @@ def main():
             """,
             (sel_date_str,),
         )
-        st.dataframe(total_rows)
-        if total_rows:
-            import pandas as pd
-
-            df_total = pd.DataFrame(total_rows)
+        st.dataframe(df_total)
+        if not df_total.empty:
             st.download_button(
                 "Download v_portfolio_total CSV",
                 df_total.to_csv(index=False).encode("utf-8"),
@@ -708,7 +653,7 @@ def main():
         col3, col4 = st.columns(2)
         with col3:
             st.markdown("**v_currency_exposure**")
-            exposure_rows = q_all(
+            df_exp = fetch_frame(
                 conn,
                 """
                 SELECT date, ccy, value_jpy
@@ -718,11 +663,8 @@ def main():
                 """,
                 (sel_date_str,),
             )
-            st.dataframe(exposure_rows)
-            if exposure_rows:
-                import pandas as pd
-
-                df_exp = pd.DataFrame(exposure_rows)
+            st.dataframe(df_exp)
+            if not df_exp.empty:
                 st.download_button(
                     "Download v_currency_exposure CSV",
                     df_exp.to_csv(index=False).encode("utf-8"),
@@ -731,7 +673,7 @@ def main():
                 )
         with col4:
             st.markdown("**v_valuation_enriched**")
-            enriched_rows = q_all(
+            df_enriched = fetch_frame(
                 conn,
                 """
                 SELECT date, ticker, value_jpy, portfolio_value_jpy, weight
@@ -741,11 +683,8 @@ def main():
                 """,
                 (sel_date_str,),
             )
-            st.dataframe(enriched_rows)
-            if enriched_rows:
-                import pandas as pd
-
-                df_enriched = pd.DataFrame(enriched_rows)
+            st.dataframe(df_enriched)
+            if not df_enriched.empty:
                 st.download_button(
                     "Download v_valuation_enriched CSV",
                     df_enriched.to_csv(index=False).encode("utf-8"),
@@ -753,6 +692,14 @@ def main():
                     mime="text/csv",
                 )
 
+        st.markdown("---")
+        st.markdown(f"**評価額（{report_ccy}建て）**")
+        rc_rows = get_valuation_rc_for_date(conn, sel_date_str, report_ccy, view_account)
+        st.dataframe(rc_rows)
+        if rc_rows:
+            total_rc = sum(r["value"] or 0 for r in rc_rows)
+            st.metric(f"ポートフォリオ合計（{report_ccy}）", f"{total_rc:,.2f}")
+
         st.markdown("---")
         st.markdown("**推移（折れ線グラフ）**")
         min_hist, max_hist = get_portfolio_date_range(conn)
@@ -775,78 +722,236 @@ def main():
 
                 start_iso_hist = start_date_hist.strftime("%Y-%m-%d")
                 end_iso_hist = end_date_hist.strftime("%Y-%m-%d")
+                tiering.ensure_range(conn, start_iso_hist)
 
-                portfolio_hist = fetch_portfolio_history(conn, start_iso_hist, end_iso_hist)
-                currency_hist = fetch_currency_history(conn, start_iso_hist, end_iso_hist)
+                portfolio_hist = fetch_portfolio_history(
+                    conn, start_iso_hist, end_iso_hist, report_ccy, view_account, history_engine, chart_cache(db_path)
+                )
+                currency_hist = fetch_currency_history(
+                    conn, start_iso_hist, end_iso_hist, report_ccy, view_account, history_engine
+                )
 
                 chart_col1, chart_col2 = st.columns(2)
                 with chart_col1:
-                    st.caption("ポートフォリオ合計（JPY）")
+                    st.caption(f"ポートフォリオ合計（{report_ccy}）")
                     if portfolio_hist.empty:
                         st.info("表示可能な履歴がありません")
                     else:
-                        chart_df = portfolio_hist.set_index("date")["total_value_jpy"]
+                        chart_df = portfolio_hist.set_index("date")["total_value"]
                         st.line_chart(chart_df, height=240)
-        with chart_col2:
-            st.caption("通貨別エクスポージャ（JPY）")
-            if currency_hist.empty:
-                st.info("表示可能な履歴がありません")
+                with chart_col2:
+                    st.caption(f"通貨別エクスポージャ（{report_ccy}）")
+                    if currency_hist.empty:
+                        st.info("表示可能な履歴がありません")
+                    else:
+                        pivot_df = (
+                            currency_hist.pivot(index="date", columns="ccy", values="value")
+                            .sort_index()
+                        )
+                        st.line_chart(pivot_df, height=240)
+
+        st.markdown("---")
+        st.markdown("**リスク指標（ボラティリティ / ドローダウン / 相関）**")
+        if not table_exists(conn, "risk_series"):
+            st.info("リスク指標テーブルがありません（make db-migrate を実行してください）")
+        else:
+            windows = risk.risk_windows(conn)
+            stale = conn.execute("SELECT COUNT(*), MIN(from_date) FROM risk_dirty").fetchone()
+            risk_col1, risk_col2 = st.columns([3, 1])
+            with risk_col1:
+                if stale[0]:
+                    st.caption(f"未反映の系列: {stale[0]}（{stale[1]} 以降）")
+                else:
+                    st.caption("リスク指標は最新です")
+            with risk_col2:
+                if st.button("リスク指標を更新", disabled=not stale[0]):
+                    with st.spinner("更新中..."):
+                        result = risk.update_risk(write_conn)
+                    st.success(f"{result['series']} 系列 / {result['rows']} 行を更新しました")
+                    st.rerun()
+            if not windows:
+                st.info("risk_windows にウィンドウが登録されていません")
             else:
-                pivot_df = (
-                    currency_hist.pivot(index="date", columns="ccy", values="value_jpy")
-                    .sort_index()
-                )
-                st.line_chart(pivot_df, height=240)
+                window = st.selectbox("ウィンドウ（営業日）", windows, key="risk_window")
+                stats = risk.latest_stats(conn, window)
+                if not stats:
+                    st.info("リスク指標がまだ計算されていません")
+                else:
+                    st.dataframe(stats)
+                    series, matrix, asof = risk.correlation_matrix(conn, window)
+                    if series:
+                        import pandas as pd
+
+                        st.caption(f"相関行列（{window}日, {asof} 時点）")
+                        st.dataframe(pd.DataFrame(matrix, index=series, columns=series, dtype="float64").round(2))
+                    risk_hist = fetch_frame(
+                        conn,
+                        """
+                        SELECT s.date, s.drawdown, v.vol
+                          FROM risk_series s
+                          LEFT JOIN risk_vol v ON v.series = s.series AND v.date = s.date AND v.window_days = ?
+                         WHERE s.series = ? AND s.date <= ?
+                         ORDER BY s.date
+                        """,
+                        (window, risk.PORTFOLIO, sel_date_str),
+                        {**DATE_INDEX, "drawdown": "float64", "vol": "float64"},
+                    )
+                    if not risk_hist.empty:
+                        st.caption(f"ポートフォリオ（JPY）のドローダウンと{window}日ボラティリティ（年率）")
+                        st.line_chart(risk_hist.set_index("date"), height=240)
+
+        st.markdown("---")
+        with st.expander("シナリオ分析（ショック / モンテカルロ）"):
+            positions = scenarios.load_positions(conn, sel_date_str, view_account)
+            if not positions["tickers"]:
+                st.info("選択日に評価額のある保有がありません")
+            else:
+                base_value = float(positions["value"].sum())
+                st.caption(f"{sel_date_str} の保有 {len(positions['tickers'])} 銘柄、評価額 {base_value:,.0f} JPY")
+                shock_cols = st.columns(len(scenarios.foreign_ccys(positions)) + 1)
+                shocks = {}
+                with shock_cols[0]:
+                    shocks["*"] = st.number_input("全銘柄の価格変化（%）", value=-20.0, step=5.0) / 100
+                for col, ccy in zip(shock_cols[1:], scenarios.foreign_ccys(positions)):
+                    with col:
+                        shocks[f"{ccy}JPY"] = st.number_input(f"{ccy}JPY 変化（%）", value=-10.0, step=5.0) / 100
+                extra = st.text_input("追加ショック（例: VTI=-30%, @USD=-25%）", "")
+                try:
+                    shocks.update(scenarios.parse_shocks(extra))
+                except ValueError as exc:
+                    st.error(str(exc))
+                else:
+                    rows = scenarios.decompose(
+                        positions, *scenarios.shock_returns(positions, [shocks]), by_holding=True
+                    )
+                    totals = {name: float(rows[name].sum()) for name in scenarios.COMPONENTS}
+                    metric_cols = st.columns(4)
+                    for col, name in zip(metric_cols, scenarios.COMPONENTS):
+                        col.metric(name, f"{totals[name]:,.0f}", f"{totals[name] / base_value:.2%}")
+                    st.dataframe(
+                        [
+                            {"ticker": ticker, "ccy": ccy, "value_jpy": value,
+                             **{name: float(rows[name][0, h]) for name in scenarios.COMPONENTS}}
+                            for h, (ticker, ccy, value) in enumerate(
+                                zip(positions["tickers"], positions["ccys"], positions["value"].tolist())
+                            )
+                        ]
+                    )
+
+                st.markdown("**モンテカルロ**")
+                mc_cols = st.columns(4)
+                with mc_cols[0]:
+                    mc_paths = int(st.number_input("パス数", min_value=100, max_value=200_000, value=10_000, step=1000))
+                with mc_cols[1]:
+                    mc_horizon = int(st.number_input("期間（営業日）", min_value=1, max_value=250, value=20))
+                with mc_cols[2]:
+                    mc_lookback = int(st.number_input("推定期間（営業日）", min_value=20, max_value=2500, value=250))
+                with mc_cols[3]:
+                    mc_method = st.selectbox("方式", ["normal", "bootstrap"])
+                if st.button("シミュレーション実行"):
+                    try:
+                        result = scenarios.monte_carlo(
+                            conn, positions, mc_paths, mc_horizon, mc_lookback, mc_method
+                        )
+                    except ValueError as exc:
+                        st.error(str(exc))
+                    else:
+                        import numpy as np
+                        import pandas as pd
+
+                        stats = scenarios.summarize(result)
+                        var_cols = st.columns(4)
+                        var_cols[0].metric("VaR 95%", f"{stats['total']['var95']:,.0f}")
+                        var_cols[1].metric("ES 95%", f"{stats['total']['es95']:,.0f}")
+                        var_cols[2].metric("VaR 99%", f"{stats['total']['var99']:,.0f}")
+                        var_cols[3].metric("ES 99%", f"{stats['total']['es99']:,.0f}")
+                        st.dataframe(pd.DataFrame(stats).T)
+                        counts, edges = np.histogram(result["total"], bins=50)
+                        st.caption(f"{mc_horizon}営業日後の評価額変化（JPY）の分布")
+                        st.bar_chart(pd.Series(counts, index=np.round((edges[:-1] + edges[1:]) / 2, -3)), height=220)
 
         st.markdown("---")
         with st.expander("AI要約 (OpenAI)"):
-            if OpenAI is None:
+            if not openai_installed():
                 st.info("`openai` パッケージがインストールされていません。`pip install -r requirements.txt` を実行してください。")
-            elif not os.getenv("OPENAI_API_KEY"):
+            elif not openai_api_key():
                 st.warning("環境変数 OPENAI_API_KEY を設定すると要約機能が利用できます。例: `.env` にキーを保存し、起動前に読み込んでください。")
             else:
                 st.caption("OpenAI API を利用して変動要因を要約します。API利用料が発生する点に注意してください。")
+                api_key = openai_api_key()
+                client = get_openai_client(api_key)
+                ensure_summary_table(write_conn)
                 day_col, hist_col = st.columns(2)
-                day_summary_key = f"ai_summary_day_{sel_date_str}"
                 hist_summary_key = "ai_summary_history"
+                prompt = day_prompt(conn, sel_date_str)
+                cached_day = load_summary(conn, "day", sel_date_str, prompt) if prompt else None
 
-                if day_col.button("選択日の要因を要約", key=f"btn_ai_day_{sel_date_str}"):
-                    attribution = get_attribution_for_date(conn, sel_date_str)
-                    if not attribution:
-                        st.info("この日付の原因分解データがありません。")
-                    else:
-                        exposure = get_currency_exposure_for_date(conn, sel_date_str)
-                        total_value = get_portfolio_total_for_date(conn, sel_date_str)
-                        prompt = build_day_prompt(sel_date_str, attribution, exposure, total_value)
-                        with st.spinner("OpenAI に問い合わせ中..."):
-                            try:
-                                summary = summarize_with_openai(prompt)
-                                st.session_state[day_summary_key] = summary
-                            except RuntimeError as exc:
-                                st.error(str(exc))
-
-                if hist_col.button("全履歴を要約", key="btn_ai_history"):
-                    attribution_history = get_attribution_history(conn)
+                day_clicked = day_col.button(
+                    "選択日の要因を再要約" if cached_day else "選択日の要因を要約", key=f"btn_ai_day_{sel_date_str}"
+                )
+                hist_clicked = hist_col.button("全履歴を要約", key="btn_ai_history")
+
+                if day_clicked and not prompt:
+                    st.info("この日付の原因分解データがありません。")
+                elif day_clicked:
+                    st.markdown("#### 選択日の要約")
+                    try:
+                        summary = st.write_stream(stream_summary(client, prompt))
+                        save_summary(write_conn, "day", sel_date_str, prompt, summary)
+                    except RuntimeError as exc:
+                        st.error(str(exc))
+                elif cached_day:
+                    st.markdown("#### 選択日の要約")
+                    st.markdown(cached_day)
+
+                if hist_clicked:
+                    attribution_history = get_attribution_history(conn, engine=history_engine)
                     if not attribution_history:
                         st.info("原因分解の履歴データがありません。")
                     else:
                         totals_history = get_portfolio_totals_history(conn)
-                        prompt = build_history_prompt(attribution_history, totals_history)
-                        with st.spinner("OpenAI に問い合わせ中..."):
-                            try:
-                                summary = summarize_with_openai(prompt)
-                                st.session_state[hist_summary_key] = summary
-                            except RuntimeError as exc:
-                                st.error(str(exc))
-
-                if day_summary_key in st.session_state:
-                    st.markdown("#### 選択日の要約")
-                    st.markdown(st.session_state[day_summary_key])
-
-                if hist_summary_key in st.session_state:
+                        hist_prompt = build_history_prompt(attribution_history, totals_history)
+                        st.markdown("#### 履歴要約")
+                        try:
+                            st.session_state[hist_summary_key] = st.write_stream(
+                                stream_summary(client, hist_prompt)
+                            )
+                        except RuntimeError as exc:
+                            st.error(str(exc))
+                elif hist_summary_key in st.session_state:
                     st.markdown("#### 履歴要約")
                     st.markdown(st.session_state[hist_summary_key])
 
+                st.markdown("##### 日次要約の事前生成")
+                jobs = get_precompute_jobs()
+                job = jobs.get(str(db_path))
+                pre_col1, pre_col2, pre_col3 = st.columns([1, 1, 2])
+                pre_days = pre_col1.number_input("直近の日数", min_value=1, max_value=365, value=30, step=1)
+                pre_concurrency = pre_col2.number_input("同時リクエスト数", min_value=1, max_value=16, value=4, step=1)
+                if job is not None and job.running:
+                    st.progress(
+                        len(job.finished) / max(job.total, 1),
+                        text=f"バックグラウンドで生成中: {len(job.finished)} / {job.total} 日",
+                    )
+                    pre_col3.button("進捗を更新", key="btn_ai_precompute_refresh")
+                else:
+                    if job is not None and job.error:
+                        st.error(f"事前生成に失敗しました: {job.error}")
+                    elif job is not None and job.counts:
+                        st.caption(
+                            "前回の事前生成: 生成 {generated} / 既存 {cached} / データなし {empty} / 失敗 {failed}".format(
+                                **job.counts
+                            )
+                        )
+                        if job.failures:
+                            st.warning(
+                                "生成に失敗した日: "
+                                + ", ".join(f"{d}（{msg}）" for d, msg in sorted(job.failures.items()))
+                            )
+                    if pre_col3.button("バックグラウンドで生成", key="btn_ai_precompute"):
+                        jobs[str(db_path)] = PrecomputeJob(db_path, api_key, int(pre_days), int(pre_concurrency))
+                        st.rerun()
+
     with tab_charts:
         st.subheader("チャートビュー")
         default_end = sel_date
@@ -866,6 +971,8 @@ def main():
         else:
             start_iso = start_date.strftime("%Y-%m-%d")
             end_iso = end_date.strftime("%Y-%m-%d")
+            tiering.ensure_range(conn, start_iso)
+            series_cache = chart_cache(db_path)
 
             price_tickers = [
                 row["ticker"]
@@ -893,7 +1000,7 @@ def main():
                     default=price_tickers[:2],
                     help="asset_prices テーブルの終値を使用します",
                 )
-                df_prices = fetch_asset_prices(conn, selected_prices, start_iso, end_iso)
+                df_prices = fetch_asset_prices(conn, selected_prices, start_iso, end_iso, series_cache)
                 if df_prices.empty:
                     st.info("指定期間に価格データがありません")
                 else:
@@ -911,7 +1018,7 @@ def main():
                     default=[p for p in fx_pairs if p.endswith("JPY")][:2],
                     help="fx_rates テーブルのレートを使用します",
                 )
-                df_fx = fetch_fx_history(conn, selected_pairs, start_iso, end_iso)
+                df_fx = fetch_fx_history(conn, selected_pairs, start_iso, end_iso, series_cache)
                 if df_fx.empty:
                     st.info("指定期間にFXデータがありません")
                 else:
@@ -0,0 +1,301 @@
+"""AI summaries of daily attribution: prompts, streaming, and a cache of precomputed results.
+
+Summaries are stored in ai_summaries keyed by (kind, key, model) together with a
+digest of the prompt they were generated from, so a cached summary is only
+reused while the underlying data (and therefore the prompt) is unchanged.
+precompute_daily() fills the cache for recent dates with bounded concurrency
+(asyncio + AsyncOpenAI); the GUI streams anything that is not cached yet.
+"""
+import datetime as dt
+import hashlib
+import json
+import sqlite3
+import threading
+from pathlib import Path
+
+from db import connect
+
+MODEL = "gpt-4o-mini"
+
+SUMMARY_DDL = """
+CREATE TABLE IF NOT EXISTS ai_summaries (
+  kind        TEXT NOT NULL,  -- 'day' | 'history'
+  key         TEXT NOT NULL,  -- date for 'day', 'all' for 'history'
+  model       TEXT NOT NULL,
+  prompt_sha  TEXT NOT NULL,
+  summary     TEXT NOT NULL,
+  created_at  TEXT NOT NULL,
+  PRIMARY KEY (kind, key, model)
+);
+"""
+
+
+def _rows(conn: sqlite3.Connection, sql: str, params: tuple = ()) -> list[dict]:
+    cur = conn.execute(sql, params)
+    names = [d[0] for d in cur.description]
+    return [dict(zip(names, row)) for row in cur.fetchall()]
+
+
+def get_attribution_for_date(conn: sqlite3.Connection, date: str):
+    return _rows(
+        conn,
+        """
+        SELECT ticker, delta_total, delta_price, delta_fx, delta_cross, flow
+          FROM v_attribution
+         WHERE date = ?
+         ORDER BY CASE WHEN ticker = 'PORTFOLIO' THEN 0 ELSE 1 END, ticker
+        """,
+        (date,),
+    )
+
+
+def get_currency_exposure_for_date(conn: sqlite3.Connection, date: str):
+    return _rows(
+        conn,
+        """
+        SELECT ccy, value_jpy
+          FROM v_currency_exposure
+         WHERE date = ?
+         ORDER BY value_jpy DESC
+        """,
+        (date,),
+    )
+
+
+def get_portfolio_total_for_date(conn: sqlite3.Connection, date: str):
+    rows = _rows(conn, "SELECT total_value_jpy FROM v_portfolio_total WHERE date = ?", (date,))
+    return rows[0]["total_value_jpy"] if rows else None
+
+
+def build_day_prompt(date: str, attribution, exposure, total_value) -> str:
+    payload = {
+        "date": date,
+        "portfolio_total_jpy": total_value,
+        "attribution": attribution,
+        "currency_exposure": exposure,
+    }
+    return (
+        "You are a financial analyst who explains daily portfolio movements in Japanese. "
+        "Summarize the key drivers (price, FX, cross, flow) for the portfolio on the given date. "
+        "Highlight notable tickers and percent contributions if obvious."
+        "\n\nData(JSON):\n"
+        + json.dumps(payload, ensure_ascii=False)
+        + "\n\nOutput format: short bullet list in Japanese with overall conclusion."
+    )
+
+
+def build_history_prompt(attribution_history, totals_history) -> str:
+    payload = {
+        "attribution_history": attribution_history,
+        "portfolio_totals": totals_history,
+    }
+    return (
+        "You are a financial analyst. Review the entire attribution history and portfolio totals "
+        "to identify major turning points, recurring drivers, and any long-term trends."
+        " Provide insights in Japanese, covering key dates, main contributing tickers, and suggestions "
+        "for what deserves attention.\n\nData(JSON):\n"
+        + json.dumps(payload, ensure_ascii=False)
+        + "\n\nOutput format: short paragraphs with bullet list of highlights in Japanese."
+    )
+
+
+def day_prompt(conn: sqlite3.Connection, date: str) -> str | None:
+    """Prompt for one date, or None when the date has no attribution rows."""
+    attribution = get_attribution_for_date(conn, date)
+    if not attribution:
+        return None
+    exposure = get_currency_exposure_for_date(conn, date)
+    total_value = get_portfolio_total_for_date(conn, date)
+    return build_day_prompt(date, attribution, exposure, total_value)
+
+
+def recent_dates(conn: sqlite3.Connection, days: int) -> list[str]:
+    """The latest `days` dates that have a portfolio attribution row, newest first."""
+    return [
+        row[0]
+        for row in conn.execute(
+            "SELECT date FROM v_attribution WHERE ticker = 'PORTFOLIO' ORDER BY date DESC LIMIT ?",
+            (days,),
+        )
+    ]
+
+
+def prompt_digest(prompt: str) -> str:
+    return hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+
+
+def ensure_summary_table(conn: sqlite3.Connection) -> None:
+    conn.executescript(SUMMARY_DDL)
+
+
+def load_summary(conn: sqlite3.Connection, kind: str, key: str, prompt: str, model: str = MODEL) -> str | None:
+    """Cached summary for (kind, key) if it was generated from this exact prompt."""
+    try:
+        row = conn.execute(
+            "SELECT summary FROM ai_summaries WHERE kind = ? AND key = ? AND model = ? AND prompt_sha = ?",
+            (kind, key, model, prompt_digest(prompt)),
+        ).fetchone()
+    except sqlite3.OperationalError:  # table not created yet (read-only connection)
+        return None
+    return row[0] if row else None
+
+
+def save_summary(
+    conn: sqlite3.Connection, kind: str, key: str, prompt: str, summary: str, model: str = MODEL
+) -> None:
+    with conn:
+        conn.execute(
+            """
+            INSERT INTO ai_summaries (kind, key, model, prompt_sha, summary, created_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT(kind, key, model) DO UPDATE SET
+              prompt_sha = excluded.prompt_sha,
+              summary = excluded.summary,
+              created_at = excluded.created_at
+            """,
+            (kind, key, model, prompt_digest(prompt), summary, dt.datetime.now(dt.timezone.utc).isoformat()),
+        )
+
+
+def response_text(response) -> str:
+    """Text of a (non-streamed) Responses API result."""
+    text = getattr(response, "output_text", "")
+    if text:
+        return text.strip()
+    # fallback for older client structures
+    chunks = []
+    for item in getattr(response, "output", []) or []:
+        for block in getattr(item, "content", []) or []:
+            if getattr(block, "type", None) == "output_text":
+                chunks.append(getattr(block, "text", ""))
+    if chunks:
+        return "\n".join(chunks).strip()
+    return str(response)
+
+
+def stream_summary(client, prompt: str, model: str = MODEL):
+    """Yield text deltas of a streamed Responses API call (for st.write_stream)."""
+    from openai import OpenAIError
+
+    try:
+        stream = client.responses.create(model=model, input=prompt, stream=True)
+        for event in stream:
+            if event.type == "response.output_text.delta":
+                yield event.delta
+            elif event.type in ("response.failed", "error"):
+                raise RuntimeError(getattr(event, "message", None) or event.type)
+    except OpenAIError as exc:
+        raise RuntimeError(f"OpenAI API 呼び出しに失敗しました: {exc}") from exc
+
+
+async def precompute_daily(
+    db_path: Path | str,
+    client,
+    dates: list[str],
+    *,
+    concurrency: int = 4,
+    model: str = MODEL,
+    force: bool = False,
+    progress=None,
+    failures: dict[str, str] | None = None,
+) -> dict[str, int]:
+    """Generate and store day summaries for dates with at most `concurrency` requests in flight.
+
+    client is an AsyncOpenAI instance. Dates whose cached summary matches the
+    current prompt are skipped unless force is set. Results are written one
+    short transaction per date as they complete; progress(date, status) is
+    called for each date. Returns counts by status (cached / generated / empty / failed);
+    the API error of each failed date is recorded in failures ({date: message}) if given.
+    """
+    import asyncio  # only the precompute path needs it; keeps the GUI import light
+
+    from openai import APIError
+
+    conn = connect(db_path)
+    ensure_summary_table(conn)
+    counts = {"cached": 0, "generated": 0, "empty": 0, "failed": 0}
+    semaphore = asyncio.Semaphore(max(concurrency, 1))
+
+    def done(date: str, status: str) -> None:
+        counts[status] += 1
+        if progress is not None:
+            progress(date, status)
+
+    async def one(date: str, prompt: str) -> None:
+        async with semaphore:
+            try:
+                response = await client.responses.create(model=model, input=prompt)
+            except APIError as exc:
+                if failures is not None:
+                    failures[date] = str(exc)
+                done(date, "failed")
+                return
+        save_summary(conn, "day", date, prompt, response_text(response), model)
+        done(date, "generated")
+
+    try:
+        jobs = []
+        for date in dates:
+            prompt = day_prompt(conn, date)
+            if prompt is None:
+                done(date, "empty")
+            elif not force and load_summary(conn, "day", date, prompt, model) is not None:
+                done(date, "cached")
+            else:
+                jobs.append(one(date, prompt))
+        await asyncio.gather(*jobs)
+    finally:
+        conn.close()
+    return counts
+
+
+class PrecomputeJob:
+    """precompute_daily() running on its own event loop in a daemon thread."""
+
+    def __init__(self, db_path: Path | str, api_key: str, days: int, concurrency: int, model: str = MODEL):
+        self.finished: dict[str, str] = {}
+        self.error: str | None = None
+        self.counts: dict[str, int] | None = None
+        self.failures: dict[str, str] = {}
+        conn = connect(db_path, read_only=True)
+        try:
+            self.dates = recent_dates(conn, days)
+        finally:
+            conn.close()
+        self.total = len(self.dates)
+        self.thread = threading.Thread(
+            target=self._run, args=(db_path, api_key, concurrency, model), daemon=True
+        )
+        self.thread.start()
+
+    def _record(self, date: str, status: str) -> None:
+        self.finished[date] = status
+
+    def _run(self, db_path, api_key: str, concurrency: int, model: str) -> None:
+        import asyncio
+
+        from openai import AsyncOpenAI, OpenAIError
+
+        async def main():
+            client = AsyncOpenAI(api_key=api_key)
+            try:
+                return await precompute_daily(
+                    db_path,
+                    client,
+                    self.dates,
+                    concurrency=concurrency,
+                    model=model,
+                    progress=self._record,
+                    failures=self.failures,
+                )
+            finally:
+                await client.close()
+
+        try:
+            self.counts = asyncio.run(main())
+        except (OpenAIError, sqlite3.Error) as exc:  # surfaced in the GUI
+            self.error = str(exc)
+
+    @property
+    def running(self) -> bool:
+        return self.thread.is_alive()
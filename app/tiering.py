@@ -0,0 +1,204 @@
+"""Hot/cold tiering: move closed periods into an archive DB attached on demand.
+
+archive_before() copies rows dated before a cutoff from the base tables and their
+derived tables into the archive file, then deletes them from the hot DB (the delete
+triggers skip their refresh work while tier_archive.moving is set). The copy and the
+delete are separate transactions, and readers only take archive rows before the
+recorded cutoff, so a crash in between leaves duplicates that are never read twice.
+
+Readers call ensure_range() with the earliest date they need. Only when that date or
+its previous date is before the cutoff is the archive attached and the tiered tables
+shadowed by TEMP views that union both tiers; the reporting views are recreated as
+TEMP views over them (like analytics.DuckDBEngine), so queries run unchanged. Only attach on
+read-only connections: the shadowing views are not writable.
+"""
+import re
+import sqlite3
+from pathlib import Path
+
+# Tables with a date column that move to the archive, base tables first
+TIERED_TABLES = (
+    "snapshots",
+    "asset_prices",
+    "fx_rates",
+    "fx_rates_derived",
+    "valuation_rc",
+    "account_exposure_rc",
+    "account_total_rc",
+    "exposure_rc",
+    "portfolio_total_rc",
+    "valuation_jpy",
+)
+
+COLD = "cold"
+
+# The gap scans cover the hot DB only (like data_gaps): these views keep reading the main
+# tables, where their INDEXED BY hints resolve, instead of the unions
+HOT_ONLY_VIEW_PREFIX = "v_gap_"
+
+
+def default_archive_path(db_path: Path | str) -> Path:
+    """money_diary.db -> money_diary.archive.db next to it."""
+    db_path = Path(db_path)
+    return db_path.with_name(f"{db_path.stem}.archive{db_path.suffix or '.db'}")
+
+
+def archive_info(conn: sqlite3.Connection) -> dict | None:
+    """{path, cutoff, first_date} of the archive, or None when nothing was archived."""
+    row = conn.execute("SELECT path, cutoff, first_date FROM main.tier_archive WHERE id = 1").fetchone()
+    if row is None:
+        return None
+    return {"path": row[0], "cutoff": row[1], "first_date": row[2]}
+
+
+def _attached(conn: sqlite3.Connection) -> bool:
+    return any(row[1] == COLD for row in conn.execute("PRAGMA database_list"))
+
+
+def _columns(conn: sqlite3.Connection, table: str) -> str:
+    return ", ".join(row[1] for row in conn.execute(f"PRAGMA main.table_info({table})"))
+
+
+def _create_cold_tables(conn: sqlite3.Connection) -> None:
+    """Create the tiered tables and their indexes in the attached archive (no foreign keys)."""
+    placeholders = ",".join("?" * len(TIERED_TABLES))
+    rows = conn.execute(
+        f"""
+        SELECT type, name, sql FROM main.sqlite_master
+         WHERE tbl_name IN ({placeholders}) AND type IN ('table', 'index') AND sql IS NOT NULL
+         ORDER BY type = 'index', rowid
+        """,
+        TIERED_TABLES,
+    ).fetchall()
+    for kind, name, sql in rows:
+        if kind == "table":
+            sql = re.sub(r",\s*FOREIGN KEY[^\n]*", "", sql)
+            sql = re.sub(r"^CREATE TABLE \w+", f"CREATE TABLE IF NOT EXISTS {COLD}.{name}", sql)
+        else:
+            sql = re.sub(r"^CREATE INDEX \w+", f"CREATE INDEX IF NOT EXISTS {COLD}.{name}", sql)
+        conn.execute(sql)
+
+
+def archive_before(conn: sqlite3.Connection, cutoff: str, archive_path: Path | str) -> dict[str, int]:
+    """Move rows dated before cutoff into the archive; returns rows moved per table.
+
+    The cutoff only moves forward, and the archive path is fixed by the first call.
+    """
+    info = archive_info(conn)
+    if info is not None:
+        if Path(archive_path).resolve() != Path(info["path"]).resolve():
+            raise ValueError(f"DB is already archived to {info['path']}")
+        if cutoff <= info["cutoff"]:
+            return {}
+    archive_path = str(Path(archive_path).resolve())
+    if _attached(conn):
+        detach_cold(conn)
+    conn.execute(f"ATTACH DATABASE ? AS {COLD}", (archive_path,))
+    try:
+        moved = {}
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            _create_cold_tables(conn)
+            for table in TIERED_TABLES:
+                columns = _columns(conn, table)
+                moved[table] = conn.execute(
+                    f"""
+                    INSERT OR REPLACE INTO {COLD}.{table} ({columns})
+                    SELECT {columns} FROM main.{table} WHERE date < ?
+                    """,
+                    (cutoff,),
+                ).rowcount
+            first_date = conn.execute(
+                f"SELECT MIN(date) FROM {COLD}.portfolio_total_rc WHERE rc = 'JPY'"
+            ).fetchone()[0]
+        except BaseException:
+            conn.rollback()
+            raise
+        conn.commit()
+
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                """
+                INSERT INTO main.tier_archive (id, path, cutoff, first_date, moving) VALUES (1, ?, ?, ?, 1)
+                ON CONFLICT(id) DO UPDATE SET
+                  cutoff = excluded.cutoff, first_date = excluded.first_date, moving = 1
+                """,
+                (archive_path, cutoff, first_date),
+            )
+            for table in TIERED_TABLES:
+                conn.execute(f"DELETE FROM main.{table} WHERE date < ?", (cutoff,))
+            conn.execute("UPDATE main.tier_archive SET moving = 0")
+        except BaseException:
+            conn.rollback()
+            raise
+        conn.commit()
+    finally:
+        conn.execute(f"DETACH DATABASE {COLD}")
+    return moved
+
+
+def attach_cold(conn: sqlite3.Connection) -> bool:
+    """Attach the archive and shadow the tiered tables and views with unions; False if none."""
+    if _attached(conn):
+        return True
+    info = archive_info(conn)
+    if info is None or not Path(info["path"]).exists():
+        return False
+    conn.execute(f"ATTACH DATABASE ? AS {COLD}", (info["path"],))
+    cold_tables = {row[0] for row in conn.execute(f"SELECT name FROM {COLD}.sqlite_master WHERE type = 'table'")}
+    for table in TIERED_TABLES:
+        columns = _columns(conn, table)
+        if table not in cold_tables:
+            continue
+        # the hot side is bounded too: rows copied by an interrupted archive run are not read twice
+        conn.execute(
+            f"""
+            CREATE TEMP VIEW {table} AS
+            SELECT {columns} FROM {COLD}.{table} WHERE date < '{info["cutoff"]}'
+            UNION ALL
+            SELECT {columns} FROM main.{table} WHERE date >= '{info["cutoff"]}'
+            """
+        )
+    views = conn.execute("SELECT name, sql FROM main.sqlite_master WHERE type = 'view' ORDER BY rowid").fetchall()
+    for name, sql in views:
+        if name.startswith(HOT_ONLY_VIEW_PREFIX):
+            continue
+        conn.execute(re.sub(r"^CREATE VIEW", "CREATE TEMP VIEW", sql))
+    return True
+
+
+def detach_cold(conn: sqlite3.Connection) -> None:
+    """Drop the union views and detach the archive."""
+    views = {row[0] for row in conn.execute("SELECT name FROM main.sqlite_master WHERE type = 'view'")}
+    for (name,) in conn.execute("SELECT name FROM temp.sqlite_master WHERE type = 'view'").fetchall():
+        if name in views or name in TIERED_TABLES:
+            conn.execute(f"DROP VIEW temp.{name}")
+    conn.execute(f"DETACH DATABASE {COLD}")
+
+
+def _first_hot_date(conn: sqlite3.Connection, cutoff: str) -> str | None:
+    """Latest first date on or after cutoff among the base tables.
+
+    Up to that date a row's previous date (attribution, returns) may still be archived.
+    """
+    dates = [
+        conn.execute(f"SELECT MIN(date) FROM main.{table} WHERE date >= ?", (cutoff,)).fetchone()[0]
+        for table in ("snapshots", "asset_prices", "fx_rates")
+    ]
+    return max(filter(None, dates), default=None)
+
+
+def ensure_range(conn: sqlite3.Connection, start: str | None) -> bool:
+    """Attach the archive if a read starting at start (None: the whole history) reaches it.
+
+    Reads starting on the first hot dates attach it too: their previous dates are archived.
+    """
+    info = archive_info(conn)
+    if info is None:
+        return _attached(conn)
+    if start is not None and start >= info["cutoff"]:
+        first_hot = _first_hot_date(conn, info["cutoff"])
+        if first_hot is None or start > first_hot:
+            return _attached(conn)
+    return attach_cold(conn)
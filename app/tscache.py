@@ -0,0 +1,247 @@
+"""Memory-mapped time-series cache for chart reads (asset_prices, fx_rates, totals).
+
+Each series is a pair of raw files in <db>.tscache/: int64 day numbers (days since
+1970-01-01, i.e. datetime64[D]) and float64 values, in date order. Readers map
+them read-only with np.memmap and cut ranges with np.searchsorted, so a range
+read is a zero-copy slice; one SeriesCache per DB is shared by every Streamlit
+session (st.cache_resource), and the OS page cache by every process.
+
+Series are price:<ticker> (asset_prices.close), fx:<pair> (fx_rates.rate),
+total:<rc> (portfolio_total_rc) and total:<rc>:<account> (account_total_rc).
+Triggers record the earliest changed date per series in tscache_dirty; refresh()
+appends in place when that date is past the cached end, and otherwise rewrites
+the series from that date into a new file that replaces the old one (os.replace),
+so maps held by readers stay valid. Files only change under the DB write lock.
+A cache built for another DB (tscache_meta.token) is rebuilt from scratch.
+"""
+import json
+import os
+import sqlite3
+from pathlib import Path
+from typing import TYPE_CHECKING
+from urllib.parse import quote
+
+from db import connect
+
+# numpy / pandas are imported on first use so importing this module stays cheap
+if TYPE_CHECKING:
+    import numpy as np
+    import pandas as pd
+
+MANIFEST = "manifest.json"
+
+ALL_SERIES_SQL = """
+SELECT DISTINCT 'price:' || ticker FROM asset_prices
+UNION ALL
+SELECT DISTINCT 'fx:' || pair FROM fx_rates
+UNION ALL
+SELECT DISTINCT 'total:' || rc FROM portfolio_total_rc
+UNION ALL
+SELECT DISTINCT 'total:' || rc || ':' || account FROM account_total_rc
+"""
+
+
+def default_cache_dir(db_path: Path | str) -> Path:
+    """money_diary.db -> money_diary.tscache/ next to it."""
+    db_path = Path(db_path)
+    return db_path.with_name(f"{db_path.stem}.tscache")
+
+
+def _series_query(series: str) -> tuple[str, tuple]:
+    """SELECT date, value from one series' source rows on or after a date (bound last)."""
+    kind, _, key = series.partition(":")
+    if kind == "price":
+        return "SELECT date, close FROM asset_prices WHERE ticker = ? AND date >= ? ORDER BY date", (key,)
+    if kind == "fx":
+        return "SELECT date, rate FROM fx_rates WHERE pair = ? AND date >= ? ORDER BY date", (key,)
+    if kind == "total":
+        rc, _, account = key.partition(":")
+        if account:
+            return (
+                "SELECT date, total_value FROM account_total_rc WHERE rc = ? AND account = ? AND date >= ? ORDER BY date",
+                (rc, account),
+            )
+        return "SELECT date, total_value FROM portfolio_total_rc WHERE rc = ? AND date >= ? ORDER BY date", (rc,)
+    raise ValueError(f"unknown series {series}")
+
+
+def _day(iso: str) -> int:
+    import numpy as np
+
+    return int(np.datetime64(iso, "D").astype("int64")) if iso else -(2**62)
+
+
+class SeriesCache:
+    """Day / value arrays per series for one DB, refreshed from tscache_dirty."""
+
+    def __init__(self, db_path: Path | str, cache_dir: Path | str | None = None):
+        self.db_path = Path(db_path)
+        self.dir = Path(cache_dir) if cache_dir else default_cache_dir(db_path)
+        self.cutoff: str | None = None
+        self._maps: dict[str, tuple[tuple, np.ndarray, np.ndarray]] = {}
+
+    def _paths(self, series: str) -> tuple[Path, Path]:
+        name = quote(series, safe="")
+        return self.dir / f"{name}.days", self.dir / f"{name}.values"
+
+    def _token(self) -> str | None:
+        try:
+            return json.loads((self.dir / MANIFEST).read_text())["token"]
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def refresh(self) -> dict[str, int]:
+        """Bring the files up to date with the DB; returns rows written per refreshed series."""
+        conn = connect(self.db_path, read_only=True)
+        try:
+            token = conn.execute("SELECT token FROM tscache_meta WHERE id = 1").fetchone()[0]
+            dirty = conn.execute("SELECT 1 FROM tscache_dirty LIMIT 1").fetchone() is not None
+            archive = conn.execute("SELECT cutoff FROM tier_archive WHERE id = 1").fetchone()
+        finally:
+            conn.close()
+        self.cutoff = archive[0] if archive else None
+        if not dirty and token == self._token():
+            return {}
+
+        written = {}
+        conn = connect(self.db_path)
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                if token != self._token():
+                    self._reset(conn, token)
+            except BaseException:
+                conn.rollback()
+                raise
+            conn.commit()
+            for (series,) in conn.execute("SELECT series FROM tscache_dirty ORDER BY series").fetchall():
+                # one short transaction per series; files only change while holding the write lock
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    row = conn.execute("SELECT from_date FROM tscache_dirty WHERE series = ?", (series,)).fetchone()
+                    if row is None:
+                        conn.rollback()
+                        continue
+                    written[series] = self._update(conn, series, row[0])
+                    conn.execute("DELETE FROM tscache_dirty WHERE series = ?", (series,))
+                except BaseException:
+                    conn.rollback()
+                    raise
+                conn.commit()
+        finally:
+            conn.close()
+        return written
+
+    def _reset(self, conn: sqlite3.Connection, token: str) -> None:
+        """Drop every cached series and queue all series of this DB from the beginning."""
+        conn.execute("DELETE FROM tscache_dirty")
+        conn.execute(f"INSERT INTO tscache_dirty (series, from_date) SELECT *, '' FROM ({ALL_SERIES_SQL})")
+        self.dir.mkdir(parents=True, exist_ok=True)
+        for path in self.dir.iterdir():
+            if path.suffix in (".days", ".values"):
+                path.unlink()
+        (self.dir / MANIFEST).write_text(json.dumps({"token": token}))
+
+    def _update(self, conn: sqlite3.Connection, series: str, from_date: str) -> int:
+        import numpy as np
+
+        sql, params = _series_query(series)
+        rows = conn.execute(sql, (*params, from_date)).fetchall()
+        days = np.array([row[0] for row in rows], dtype="datetime64[D]").astype("int64")
+        values = np.array([row[1] for row in rows], dtype="float64")
+        days_path, values_path = self._paths(series)
+        old_days = np.fromfile(days_path, dtype="int64") if days_path.exists() else np.empty(0, "int64")
+        keep = int(np.searchsorted(old_days, _day(from_date)))
+        if keep == len(old_days) and keep == _length(values_path):
+            # only new dates: readers keep their shorter maps, so append in place
+            if len(rows):
+                with open(values_path, "ab") as f:
+                    f.write(values.tobytes())
+                with open(days_path, "ab") as f:
+                    f.write(days.tobytes())
+            return len(rows)
+        if keep == 0 and not rows:
+            days_path.unlink(missing_ok=True)
+            values_path.unlink(missing_ok=True)
+            return 0
+        old_values = np.fromfile(values_path, dtype="float64", count=keep)
+        for path, head, tail in ((values_path, old_values, values), (days_path, old_days[:keep], days)):
+            tmp = path.with_name(path.name + ".tmp")
+            with open(tmp, "wb") as f:
+                f.write(head.tobytes())
+                f.write(tail.tobytes())
+            os.replace(tmp, path)
+        return len(rows)
+
+    def series(self, series: str) -> tuple["np.ndarray", "np.ndarray"]:
+        """(days, values) of a whole series as read-only maps; empty arrays if not cached."""
+        import numpy as np
+
+        days_path, values_path = self._paths(series)
+        for _ in range(3):
+            try:
+                days_stat, values_stat = days_path.stat(), values_path.stat()
+            except FileNotFoundError:
+                break
+            key = (days_stat.st_ino, days_stat.st_size, values_stat.st_ino, values_stat.st_size)
+            cached = self._maps.get(series)
+            if cached is not None and cached[0] == key:
+                return cached[1], cached[2]
+            n = min(days_stat.st_size, values_stat.st_size) // 8
+            if n == 0:
+                break
+            try:
+                days = np.memmap(days_path, dtype="int64", mode="r", shape=(n,))
+                values = np.memmap(values_path, dtype="float64", mode="r", shape=(n,))
+            except (FileNotFoundError, ValueError):
+                continue  # replaced while mapping; stat again
+            self._maps[series] = (key, days, values)
+            return days, values
+        self._maps.pop(series, None)
+        return np.empty(0, "int64"), np.empty(0, "float64")
+
+    def slice(self, series: str, start: str, end: str) -> tuple["np.ndarray", "np.ndarray"]:
+        """Zero-copy (days, values) views of series within start..end (ISO dates, inclusive)."""
+        import numpy as np
+
+        days, values = self.series(series)
+        lo = int(np.searchsorted(days, _day(start), "left"))
+        hi = int(np.searchsorted(days, _day(end), "right"))
+        return days[lo:hi], values[lo:hi]
+
+    def covers(self, start: str) -> bool:
+        """False when start reaches before the archive cutoff (the cache only mirrors the hot DB)."""
+        return self.cutoff is None or start >= self.cutoff
+
+    def frame(
+        self, prefix: str, keys: list[str], start: str, end: str, key_column: str, value_column: str
+    ) -> "pd.DataFrame":
+        """Long frame (date, key_column, value_column) ordered by date and key, like the SQL reads."""
+        import numpy as np
+        import pandas as pd
+
+        keys = sorted(set(keys))
+        parts = [self.slice(f"{prefix}{key}", start, end) for key in keys]
+        days = np.concatenate([d for d, _ in parts]) if parts else np.empty(0, "int64")
+        values = np.concatenate([v for _, v in parts]) if parts else np.empty(0, "float64")
+        codes = np.repeat(np.arange(len(keys)), [len(d) for d, _ in parts])
+        order = np.lexsort((codes, days))
+        return pd.DataFrame(
+            {
+                "date": days[order].view("datetime64[D]"),
+                key_column: np.array(keys, dtype=object)[codes[order]],
+                value_column: values[order],
+            },
+            copy=False,
+        )
+
+    def totals(self, rc: str, start: str, end: str, account: str | None = None) -> "pd.DataFrame":
+        """(date, total_value) of the portfolio or one account in rc."""
+        import pandas as pd
+
+        days, values = self.slice(f"total:{rc}:{account}" if account else f"total:{rc}", start, end)
+        return pd.DataFrame({"date": days.view("datetime64[D]"), "total_value": values}, copy=False)
+
+
+def _length(path: Path) -> int:
+    return path.stat().st_size // 8 if path.exists() else 0
@@ -1,5 +1,13 @@
 PRAGMA foreign_keys = ON;
 
+-- Accounts (brokerage / bank accounts); rows default to 'main'
+CREATE TABLE IF NOT EXISTS accounts (
+  account  TEXT PRIMARY KEY,
+  name     TEXT
+);
+
+INSERT OR IGNORE INTO accounts (account, name) VALUES ('main', 'Main');
+
 -- Core master: assets
 CREATE TABLE IF NOT EXISTS assets (
   ticker     TEXT PRIMARY KEY,
@@ -15,6 +23,151 @@ CREATE TABLE IF NOT EXISTS fx_rates (
   PRIMARY KEY (date, pair)
 );
 
+-- Derived XXXJPY cross rates triangulated from two direct legs (e.g. EURUSD x USDJPY)
+CREATE TABLE IF NOT EXISTS fx_rates_derived (
+  date    TEXT NOT NULL CHECK (date LIKE '____-__-__'),
+  pair    TEXT NOT NULL,
+  rate    REAL NOT NULL,
+  via     TEXT,          -- pivot currency (NULL when inverting a JPYXXX quote)
+  leg1    TEXT NOT NULL, -- fx_rates pair used for XXX -> via (or JPYXXX)
+  leg2    TEXT,          -- fx_rates pair used for via -> JPY
+  formula TEXT NOT NULL, -- provenance, e.g. 'EURUSD*USDJPY', 'USDJPY/USDEUR', '1/JPYKRW'
+  PRIMARY KEY (date, pair)
+);
+
+-- View: best triangulated candidate per (date, XXXJPY) where no direct quote exists.
+-- Prefers a single inversion, then USD as pivot, then legs quoted in the needed direction.
+DROP VIEW IF EXISTS v_fx_triangulated;
+CREATE VIEW v_fx_triangulated AS
+SELECT date, pair, rate, via, leg1, leg2, formula
+FROM (
+  SELECT
+    c.*,
+    ROW_NUMBER() OVER (
+      PARTITION BY c.date, c.pair
+      ORDER BY c.hops, c.via IS NOT 'USD', c.inversions, c.via
+    ) AS rn
+  FROM (
+    SELECT
+      f.date,
+      substr(f.pair, 4, 3) || 'JPY' AS pair,
+      1.0 / f.rate AS rate,
+      NULL AS via,
+      f.pair AS leg1,
+      NULL AS leg2,
+      '1/' || f.pair AS formula,
+      1 AS hops,
+      1 AS inversions
+    FROM fx_rates f
+    WHERE substr(f.pair, 1, 3) = 'JPY' AND length(f.pair) = 6 AND f.rate > 0
+    UNION ALL
+    SELECT
+      e1.date,
+      e1.base || 'JPY' AS pair,
+      e1.rate * e2.rate AS rate,
+      e1.quote AS via,
+      e1.pair AS leg1,
+      e2.pair AS leg2,
+      e1.expr || '*' || e2.expr AS formula,
+      2 AS hops,
+      e1.inverted + e2.inverted AS inversions
+    FROM (
+      SELECT date, pair, substr(pair, 1, 3) AS base, substr(pair, 4, 3) AS quote,
+             rate, pair AS expr, 0 AS inverted
+        FROM fx_rates WHERE length(pair) = 6 AND rate > 0
+      UNION ALL
+      SELECT date, pair, substr(pair, 4, 3), substr(pair, 1, 3),
+             1.0 / rate, '(1/' || pair || ')', 1
+        FROM fx_rates WHERE length(pair) = 6 AND rate > 0
+    ) e1
+    JOIN (
+      SELECT date, pair, substr(pair, 1, 3) AS via, rate, pair AS expr, 0 AS inverted
+        FROM fx_rates WHERE length(pair) = 6 AND substr(pair, 4, 3) = 'JPY' AND rate > 0
+      UNION ALL
+      SELECT date, pair, substr(pair, 4, 3), 1.0 / rate, '(1/' || pair || ')', 1
+        FROM fx_rates WHERE length(pair) = 6 AND substr(pair, 1, 3) = 'JPY' AND rate > 0
+    ) e2
+      ON e2.date = e1.date AND e2.via = e1.quote
+    WHERE e1.base <> 'JPY' AND e1.quote <> 'JPY'
+  ) c
+  WHERE NOT EXISTS (
+    SELECT 1 FROM fx_rates d WHERE d.date = c.date AND d.pair = c.pair
+  )
+)
+WHERE rn = 1;
+
+-- Keep fx_rates_derived in sync: any leg change recomputes only that date
+DROP TRIGGER IF EXISTS trg_fx_rates_derive_insert;
+CREATE TRIGGER trg_fx_rates_derive_insert AFTER INSERT ON fx_rates
+WHEN NOT EXISTS (SELECT 1 FROM rc_batch)
+BEGIN
+  DELETE FROM fx_rates_derived WHERE date = NEW.date;
+  INSERT INTO fx_rates_derived (date, pair, rate, via, leg1, leg2, formula)
+  SELECT date, pair, rate, via, leg1, leg2, formula FROM v_fx_triangulated WHERE date = NEW.date;
+  INSERT INTO rc_refresh (date) VALUES (NEW.date);
+END;
+
+DROP TRIGGER IF EXISTS trg_fx_rates_derive_update;
+CREATE TRIGGER trg_fx_rates_derive_update AFTER UPDATE ON fx_rates
+WHEN NOT EXISTS (SELECT 1 FROM rc_batch)
+BEGIN
+  DELETE FROM fx_rates_derived WHERE date IN (OLD.date, NEW.date);
+  INSERT INTO fx_rates_derived (date, pair, rate, via, leg1, leg2, formula)
+  SELECT date, pair, rate, via, leg1, leg2, formula FROM v_fx_triangulated WHERE date IN (OLD.date, NEW.date);
+  INSERT INTO rc_refresh (date) VALUES (OLD.date);
+  INSERT INTO rc_refresh (date) SELECT NEW.date WHERE NEW.date <> OLD.date;
+END;
+
+DROP TRIGGER IF EXISTS trg_fx_rates_derive_delete;
+CREATE TRIGGER trg_fx_rates_derive_delete AFTER DELETE ON fx_rates
+WHEN NOT EXISTS (SELECT 1 FROM tier_archive WHERE moving = 1) AND NOT EXISTS (SELECT 1 FROM rc_batch)
+BEGIN
+  DELETE FROM fx_rates_derived WHERE date = OLD.date;
+  INSERT INTO fx_rates_derived (date, pair, rate, via, leg1, leg2, formula)
+  SELECT date, pair, rate, via, leg1, leg2, formula FROM v_fx_triangulated WHERE date = OLD.date;
+  INSERT INTO rc_refresh (date) VALUES (OLD.date);
+END;
+
+-- Inside a batch (rc_batch, db.deferred_refresh) the dates only queue up; the batch
+-- triangulates each of them once when it ends
+CREATE TABLE IF NOT EXISTS fx_derive_dirty (
+  date TEXT PRIMARY KEY
+);
+
+DROP TRIGGER IF EXISTS trg_fx_rates_batch_insert;
+CREATE TRIGGER trg_fx_rates_batch_insert AFTER INSERT ON fx_rates
+WHEN EXISTS (SELECT 1 FROM rc_batch)
+BEGIN
+  INSERT INTO fx_derive_dirty (date) VALUES (NEW.date) ON CONFLICT(date) DO NOTHING;
+END;
+
+DROP TRIGGER IF EXISTS trg_fx_rates_batch_update;
+CREATE TRIGGER trg_fx_rates_batch_update AFTER UPDATE ON fx_rates
+WHEN EXISTS (SELECT 1 FROM rc_batch)
+BEGIN
+  INSERT INTO fx_derive_dirty (date) VALUES (OLD.date) ON CONFLICT(date) DO NOTHING;
+  INSERT INTO fx_derive_dirty (date) VALUES (NEW.date) ON CONFLICT(date) DO NOTHING;
+END;
+
+DROP TRIGGER IF EXISTS trg_fx_rates_batch_delete;
+CREATE TRIGGER trg_fx_rates_batch_delete AFTER DELETE ON fx_rates
+WHEN NOT EXISTS (SELECT 1 FROM tier_archive WHERE moving = 1) AND EXISTS (SELECT 1 FROM rc_batch)
+BEGIN
+  INSERT INTO fx_derive_dirty (date) VALUES (OLD.date) ON CONFLICT(date) DO NOTHING;
+END;
+
+-- Backfill in one set-based pass for rates loaded before the triggers existed (idempotent)
+DELETE FROM fx_rates_derived;
+INSERT INTO fx_rates_derived (date, pair, rate, via, leg1, leg2, formula)
+SELECT date, pair, rate, via, leg1, leg2, formula FROM v_fx_triangulated;
+
+-- View: direct and derived rates together
+DROP VIEW IF EXISTS v_fx_rates;
+CREATE VIEW v_fx_rates AS
+SELECT date, pair, rate, 'direct' AS source FROM fx_rates
+UNION ALL
+SELECT date, pair, rate, formula AS source FROM fx_rates_derived;
+
 -- Daily close prices per asset (fetched from external APIs)
 CREATE TABLE IF NOT EXISTS asset_prices (
   date   TEXT NOT NULL CHECK (date LIKE '____-__-__'),
@@ -23,17 +176,54 @@ CREATE TABLE IF NOT EXISTS asset_prices (
   PRIMARY KEY (date, ticker)
 );
 
--- Daily snapshots per asset (qty * price_ccy)
+-- Daily snapshots per account and asset (qty * price_ccy)
 CREATE TABLE IF NOT EXISTS snapshots (
+  account    TEXT NOT NULL DEFAULT 'main',
   date       TEXT NOT NULL CHECK (date LIKE '____-__-__'),
   ticker     TEXT NOT NULL,
   qty        REAL NOT NULL CHECK (qty >= 0),
   price_ccy  REAL NOT NULL CHECK (price_ccy >= 0),
-  PRIMARY KEY (date, ticker),
+  PRIMARY KEY (account, date, ticker),
   FOREIGN KEY (ticker) REFERENCES assets(ticker) ON UPDATE CASCADE ON DELETE RESTRICT
 );
 
-CREATE INDEX IF NOT EXISTS idx_snapshots_ticker_date ON snapshots(ticker, date);
+CREATE INDEX IF NOT EXISTS idx_snapshots_account_ticker_date ON snapshots(account, ticker, date);
+CREATE INDEX IF NOT EXISTS idx_snapshots_date ON snapshots(date);
+
+-- Hot/cold tiering (app/tiering.py): rows dated before cutoff were moved from snapshots,
+-- asset_prices, fx_rates and their derived tables into the archive DB at path. While the hot
+-- copies are deleted (moving = 1) the delete triggers skip their refresh / dirty work, since
+-- the data left this file rather than changed.
+CREATE TABLE IF NOT EXISTS tier_archive (
+  id          INTEGER PRIMARY KEY CHECK (id = 1),
+  path        TEXT NOT NULL,
+  cutoff      TEXT NOT NULL CHECK (cutoff LIKE '____-__-__'),
+  first_date  TEXT, -- earliest archived portfolio date
+  moving      INTEGER NOT NULL DEFAULT 0
+);
+
+-- Archived periods are closed: manual snapshots before the cutoff are rejected, and
+-- re-fetched prices / rates for them are skipped (the archive already holds them)
+DROP TRIGGER IF EXISTS trg_snapshots_archived;
+CREATE TRIGGER trg_snapshots_archived BEFORE INSERT ON snapshots
+WHEN NEW.date < (SELECT cutoff FROM tier_archive)
+BEGIN
+  SELECT RAISE(ABORT, 'snapshots before the archive cutoff are read-only');
+END;
+
+DROP TRIGGER IF EXISTS trg_asset_prices_archived;
+CREATE TRIGGER trg_asset_prices_archived BEFORE INSERT ON asset_prices
+WHEN NEW.date < (SELECT cutoff FROM tier_archive)
+BEGIN
+  SELECT RAISE(IGNORE);
+END;
+
+DROP TRIGGER IF EXISTS trg_fx_rates_archived;
+CREATE TRIGGER trg_fx_rates_archived BEFORE INSERT ON fx_rates
+WHEN NEW.date < (SELECT cutoff FROM tier_archive)
+BEGIN
+  SELECT RAISE(IGNORE);
+END;
 
 -- Cashflows (dividends, deposits, buys/sells etc.)
 CREATE TABLE IF NOT EXISTS cashflows (
@@ -43,51 +233,479 @@ CREATE TABLE IF NOT EXISTS cashflows (
   type        TEXT NOT NULL, -- e.g., DIVIDEND/BUY/SELL/DEPOSIT/WITHDRAWAL
   amount_ccy  REAL NOT NULL,
   ccy         TEXT NOT NULL CHECK (length(ccy) = 3),
+  qty         REAL, -- units bought/sold (BUY/SELL); NULL for cash-only flows
+  account     TEXT NOT NULL DEFAULT 'main',
   FOREIGN KEY (ticker) REFERENCES assets(ticker) ON UPDATE CASCADE ON DELETE RESTRICT
 );
 
 CREATE INDEX IF NOT EXISTS idx_cashflows_date ON cashflows(date);
 CREATE INDEX IF NOT EXISTS idx_cashflows_ticker_date ON cashflows(ticker, date);
+CREATE INDEX IF NOT EXISTS idx_cashflows_account_ticker_date ON cashflows(account, ticker, date);
 
--- View: valuation in JPY per date and ticker
-DROP VIEW IF EXISTS v_valuation;
-CREATE VIEW v_valuation AS
+-- Ledger replay output: holdings per account and ticker as of each date with a quantity change
+CREATE TABLE IF NOT EXISTS ledger_positions (
+  account TEXT NOT NULL,
+  date    TEXT NOT NULL CHECK (date LIKE '____-__-__'),
+  ticker  TEXT NOT NULL,
+  qty     REAL NOT NULL,
+  PRIMARY KEY (account, ticker, date)
+);
+
+-- Periodic replay checkpoints (running qty at end of date, n_txn replayed so far)
+CREATE TABLE IF NOT EXISTS ledger_checkpoints (
+  account TEXT NOT NULL,
+  ticker  TEXT NOT NULL,
+  date    TEXT NOT NULL CHECK (date LIKE '____-__-__'),
+  qty     REAL NOT NULL,
+  n_txn   INTEGER NOT NULL,
+  PRIMARY KEY (account, ticker, date)
+);
+
+-- Earliest date per account and ticker whose replay is stale (filled by cashflows triggers)
+CREATE TABLE IF NOT EXISTS ledger_dirty (
+  account   TEXT NOT NULL,
+  ticker    TEXT NOT NULL,
+  from_date TEXT NOT NULL,
+  PRIMARY KEY (account, ticker)
+);
+
+DROP TRIGGER IF EXISTS trg_cashflows_ledger_insert;
+CREATE TRIGGER trg_cashflows_ledger_insert AFTER INSERT ON cashflows
+BEGIN
+  INSERT INTO ledger_dirty (account, ticker, from_date) VALUES (NEW.account, NEW.ticker, NEW.date)
+  ON CONFLICT(account, ticker) DO UPDATE SET from_date = min(from_date, excluded.from_date);
+END;
+
+DROP TRIGGER IF EXISTS trg_cashflows_ledger_update;
+CREATE TRIGGER trg_cashflows_ledger_update AFTER UPDATE ON cashflows
+BEGIN
+  INSERT INTO ledger_dirty (account, ticker, from_date) VALUES (OLD.account, OLD.ticker, OLD.date)
+  ON CONFLICT(account, ticker) DO UPDATE SET from_date = min(from_date, excluded.from_date);
+  INSERT INTO ledger_dirty (account, ticker, from_date) VALUES (NEW.account, NEW.ticker, NEW.date)
+  ON CONFLICT(account, ticker) DO UPDATE SET from_date = min(from_date, excluded.from_date);
+END;
+
+DROP TRIGGER IF EXISTS trg_cashflows_ledger_delete;
+CREATE TRIGGER trg_cashflows_ledger_delete AFTER DELETE ON cashflows
+BEGIN
+  INSERT INTO ledger_dirty (account, ticker, from_date) VALUES (OLD.account, OLD.ticker, OLD.date)
+  ON CONFLICT(account, ticker) DO UPDATE SET from_date = min(from_date, excluded.from_date);
+END;
+
+-- Reporting currencies: valuations precomputed per currency in valuation_rc / exposure_rc /
+-- portfolio_total_rc so switching the reporting currency is a keyed read
+CREATE TABLE IF NOT EXISTS reporting_currencies (
+  ccy TEXT PRIMARY KEY CHECK (length(ccy) = 3)
+);
+
+INSERT OR IGNORE INTO reporting_currencies (ccy) VALUES ('JPY'), ('USD'), ('EUR');
+
+CREATE TABLE IF NOT EXISTS valuation_rc (
+  rc         TEXT NOT NULL,
+  account    TEXT NOT NULL,
+  date       TEXT NOT NULL,
+  ticker     TEXT NOT NULL,
+  ccy        TEXT NOT NULL,
+  qty        REAL NOT NULL,
+  price_ccy  REAL NOT NULL,
+  fx_rate    REAL, -- asset ccy -> rc via JPY legs; NULL when a leg is missing
+  value      REAL,
+  PRIMARY KEY (rc, account, date, ticker)
+);
+
+CREATE INDEX IF NOT EXISTS idx_valuation_rc_date ON valuation_rc(date, account, ticker);
+
+-- Per-account aggregates; the consolidated tables below are summed from these
+CREATE TABLE IF NOT EXISTS account_exposure_rc (
+  rc       TEXT NOT NULL,
+  account  TEXT NOT NULL,
+  date     TEXT NOT NULL,
+  ccy      TEXT NOT NULL,
+  value    REAL,
+  PRIMARY KEY (rc, account, date, ccy)
+);
+
+CREATE INDEX IF NOT EXISTS idx_account_exposure_rc_date ON account_exposure_rc(date, account);
+
+CREATE TABLE IF NOT EXISTS account_total_rc (
+  rc           TEXT NOT NULL,
+  account      TEXT NOT NULL,
+  date         TEXT NOT NULL,
+  total_value  REAL,
+  PRIMARY KEY (rc, account, date)
+);
+
+CREATE INDEX IF NOT EXISTS idx_account_total_rc_date ON account_total_rc(date, account);
+
+CREATE TABLE IF NOT EXISTS exposure_rc (
+  rc     TEXT NOT NULL,
+  date   TEXT NOT NULL,
+  ccy    TEXT NOT NULL,
+  value  REAL,
+  PRIMARY KEY (rc, date, ccy)
+);
+
+CREATE TABLE IF NOT EXISTS portfolio_total_rc (
+  rc           TEXT NOT NULL,
+  date         TEXT NOT NULL,
+  total_value  REAL,
+  PRIMARY KEY (rc, date)
+);
+
+-- JPY valuation per date and ticker consolidated across accounts; backs v_valuation and
+-- (with portfolio_total_rc for the weight) v_valuation_enriched
+CREATE TABLE IF NOT EXISTS valuation_jpy (
+  date       TEXT NOT NULL,
+  ticker     TEXT NOT NULL,
+  ccy        TEXT NOT NULL,
+  qty        REAL NOT NULL,
+  price_ccy  REAL,
+  fx_rate    REAL,
+  value_jpy  REAL,
+  PRIMARY KEY (date, ticker)
+);
+
+-- View: snapshots x reporting_currencies valued through the JPY legs (direct or derived)
+DROP VIEW IF EXISTS v_valuation_rc_calc;
+CREATE VIEW v_valuation_rc_calc AS
+SELECT
+  rc,
+  account,
+  date,
+  ticker,
+  ccy,
+  qty,
+  price_ccy,
+  fx_rate,
+  qty * price_ccy * fx_rate AS value
+FROM (
+  SELECT
+    c.ccy AS rc,
+    s.account,
+    s.date,
+    s.ticker,
+    a.ccy,
+    s.qty,
+    s.price_ccy,
+    CASE
+      WHEN a.ccy = c.ccy THEN 1.0
+      ELSE (CASE WHEN a.ccy = 'JPY' THEN 1.0 ELSE COALESCE(fa.rate, ga.rate) END)
+         / (CASE WHEN c.ccy = 'JPY' THEN 1.0 ELSE COALESCE(fc.rate, gc.rate) END)
+    END AS fx_rate
+  FROM snapshots s
+  JOIN assets a ON a.ticker = s.ticker
+  CROSS JOIN reporting_currencies c
+  LEFT JOIN fx_rates fa ON fa.date = s.date AND fa.pair = (a.ccy || 'JPY')
+  LEFT JOIN fx_rates_derived ga ON ga.date = s.date AND ga.pair = (a.ccy || 'JPY')
+  LEFT JOIN fx_rates fc ON fc.date = s.date AND fc.pair = (c.ccy || 'JPY')
+  LEFT JOIN fx_rates_derived gc ON gc.date = s.date AND gc.pair = (c.ccy || 'JPY')
+);
+
+-- View: valuation_rc (JPY) consolidated across accounts per date and ticker; the source of
+-- valuation_jpy
+DROP VIEW IF EXISTS v_valuation_jpy_calc;
+CREATE VIEW v_valuation_jpy_calc AS
+SELECT
+  date,
+  ticker,
+  ccy,
+  SUM(qty) AS qty,
+  CASE
+    WHEN MIN(price_ccy) = MAX(price_ccy) THEN MIN(price_ccy)
+    ELSE SUM(qty * price_ccy) / NULLIF(SUM(qty), 0)
+  END AS price_ccy,
+  MAX(fx_rate) AS fx_rate,
+  SUM(value) AS value_jpy
+FROM valuation_rc
+WHERE rc = 'JPY'
+GROUP BY date, ticker, ccy;
+
+-- Refresh requests: each inserted row rebuilds one date (optionally one account / ticker) and
+-- is consumed. Per-account aggregates are rebuilt for the touched accounts only; consolidated
+-- rows are summed from the per-account aggregates rather than rescanning valuation_rc.
+CREATE TABLE IF NOT EXISTS rc_refresh (
+  date    TEXT NOT NULL,
+  account TEXT,
+  ticker  TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_rc_refresh_date ON rc_refresh(date);
+
+DROP TRIGGER IF EXISTS trg_rc_refresh;
+CREATE TRIGGER trg_rc_refresh AFTER INSERT ON rc_refresh
+WHEN NOT EXISTS (SELECT 1 FROM rc_batch)
+BEGIN
+  DELETE FROM valuation_rc
+   WHERE date = NEW.date
+     AND (NEW.account IS NULL OR account = NEW.account)
+     AND (NEW.ticker IS NULL OR ticker = NEW.ticker);
+  INSERT INTO valuation_rc (rc, account, date, ticker, ccy, qty, price_ccy, fx_rate, value)
+  SELECT rc, account, date, ticker, ccy, qty, price_ccy, fx_rate, value
+    FROM v_valuation_rc_calc
+   WHERE date = NEW.date
+     AND (NEW.account IS NULL OR account = NEW.account)
+     AND (NEW.ticker IS NULL OR ticker = NEW.ticker);
+  DELETE FROM account_exposure_rc
+   WHERE date = NEW.date AND (NEW.account IS NULL OR account = NEW.account);
+  INSERT INTO account_exposure_rc (rc, account, date, ccy, value)
+  SELECT rc, account, date, ccy, SUM(value)
+    FROM valuation_rc
+   WHERE date = NEW.date AND (NEW.account IS NULL OR account = NEW.account)
+   GROUP BY rc, account, ccy;
+  DELETE FROM account_total_rc
+   WHERE date = NEW.date AND (NEW.account IS NULL OR account = NEW.account);
+  INSERT INTO account_total_rc (rc, account, date, total_value)
+  SELECT rc, account, date, SUM(value)
+    FROM valuation_rc
+   WHERE date = NEW.date AND (NEW.account IS NULL OR account = NEW.account)
+   GROUP BY rc, account;
+  DELETE FROM exposure_rc WHERE date = NEW.date;
+  INSERT INTO exposure_rc (rc, date, ccy, value)
+  SELECT rc, date, ccy, SUM(value) FROM account_exposure_rc WHERE date = NEW.date GROUP BY rc, ccy;
+  DELETE FROM portfolio_total_rc WHERE date = NEW.date;
+  INSERT INTO portfolio_total_rc (rc, date, total_value)
+  SELECT rc, date, SUM(total_value) FROM account_total_rc WHERE date = NEW.date GROUP BY rc;
+  DELETE FROM valuation_jpy
+   WHERE date = NEW.date AND (NEW.ticker IS NULL OR ticker = NEW.ticker);
+  INSERT INTO valuation_jpy (date, ticker, ccy, qty, price_ccy, fx_rate, value_jpy)
+  SELECT date, ticker, ccy, qty, price_ccy, fx_rate, value_jpy
+    FROM v_valuation_jpy_calc
+   WHERE date = NEW.date AND (NEW.ticker IS NULL OR ticker = NEW.ticker);
+  DELETE FROM rc_refresh WHERE rowid = NEW.rowid;
+END;
+
+-- Batched writes (db.deferred_refresh): while the row exists, rc_refresh rows and the
+-- fx_derive_dirty dates stay queued instead of rebuilding their date one row at a time.
+-- Deleting it triangulates the queued rate dates and rebuilds every queued date / account /
+-- ticker once, set-based, inside the writer's transaction.
+CREATE TABLE IF NOT EXISTS rc_batch (
+  id INTEGER PRIMARY KEY CHECK (id = 1)
+);
+
+DROP TRIGGER IF EXISTS trg_rc_batch_flush;
+CREATE TRIGGER trg_rc_batch_flush BEFORE DELETE ON rc_batch
+BEGIN
+  DELETE FROM fx_rates_derived WHERE date IN (SELECT date FROM fx_derive_dirty);
+  INSERT INTO fx_rates_derived (date, pair, rate, via, leg1, leg2, formula)
+  SELECT date, pair, rate, via, leg1, leg2, formula
+    FROM v_fx_triangulated
+   WHERE date IN (SELECT date FROM fx_derive_dirty);
+  INSERT INTO rc_refresh (date) SELECT date FROM fx_derive_dirty;
+  DELETE FROM fx_derive_dirty;
+  DELETE FROM valuation_rc
+   WHERE date IN (SELECT date FROM rc_refresh)
+     AND EXISTS (
+       SELECT 1 FROM rc_refresh r
+        WHERE r.date = valuation_rc.date
+          AND (r.account IS NULL OR r.account = valuation_rc.account)
+          AND (r.ticker IS NULL OR r.ticker = valuation_rc.ticker)
+     );
+  INSERT INTO valuation_rc (rc, account, date, ticker, ccy, qty, price_ccy, fx_rate, value)
+  SELECT v.rc, v.account, v.date, v.ticker, v.ccy, v.qty, v.price_ccy, v.fx_rate, v.value
+    FROM v_valuation_rc_calc v
+   WHERE v.date IN (SELECT date FROM rc_refresh)
+     AND EXISTS (
+       SELECT 1 FROM rc_refresh r
+        WHERE r.date = v.date
+          AND (r.account IS NULL OR r.account = v.account)
+          AND (r.ticker IS NULL OR r.ticker = v.ticker)
+     );
+  DELETE FROM account_exposure_rc
+   WHERE date IN (SELECT date FROM rc_refresh)
+     AND EXISTS (
+       SELECT 1 FROM rc_refresh r
+        WHERE r.date = account_exposure_rc.date
+          AND (r.account IS NULL OR r.account = account_exposure_rc.account)
+     );
+  INSERT INTO account_exposure_rc (rc, account, date, ccy, value)
+  SELECT v.rc, v.account, v.date, v.ccy, SUM(v.value)
+    FROM valuation_rc v
+   WHERE v.date IN (SELECT date FROM rc_refresh)
+     AND EXISTS (
+       SELECT 1 FROM rc_refresh r WHERE r.date = v.date AND (r.account IS NULL OR r.account = v.account)
+     )
+   GROUP BY v.rc, v.account, v.date, v.ccy;
+  DELETE FROM account_total_rc
+   WHERE date IN (SELECT date FROM rc_refresh)
+     AND EXISTS (
+       SELECT 1 FROM rc_refresh r
+        WHERE r.date = account_total_rc.date
+          AND (r.account IS NULL OR r.account = account_total_rc.account)
+     );
+  INSERT INTO account_total_rc (rc, account, date, total_value)
+  SELECT v.rc, v.account, v.date, SUM(v.value)
+    FROM valuation_rc v
+   WHERE v.date IN (SELECT date FROM rc_refresh)
+     AND EXISTS (
+       SELECT 1 FROM rc_refresh r WHERE r.date = v.date AND (r.account IS NULL OR r.account = v.account)
+     )
+   GROUP BY v.rc, v.account, v.date;
+  DELETE FROM exposure_rc WHERE date IN (SELECT date FROM rc_refresh);
+  INSERT INTO exposure_rc (rc, date, ccy, value)
+  SELECT rc, date, ccy, SUM(value)
+    FROM account_exposure_rc
+   WHERE date IN (SELECT date FROM rc_refresh)
+   GROUP BY rc, date, ccy;
+  DELETE FROM portfolio_total_rc WHERE date IN (SELECT date FROM rc_refresh);
+  INSERT INTO portfolio_total_rc (rc, date, total_value)
+  SELECT rc, date, SUM(total_value)
+    FROM account_total_rc
+   WHERE date IN (SELECT date FROM rc_refresh)
+   GROUP BY rc, date;
+  DELETE FROM valuation_jpy
+   WHERE date IN (SELECT date FROM rc_refresh)
+     AND EXISTS (
+       SELECT 1 FROM rc_refresh r
+        WHERE r.date = valuation_jpy.date AND (r.ticker IS NULL OR r.ticker = valuation_jpy.ticker)
+     );
+  -- v_valuation_jpy_calc inlined: a subquery filter is not pushed into its GROUP BY
+  INSERT INTO valuation_jpy (date, ticker, ccy, qty, price_ccy, fx_rate, value_jpy)
+  SELECT
+    v.date,
+    v.ticker,
+    v.ccy,
+    SUM(v.qty),
+    CASE
+      WHEN MIN(v.price_ccy) = MAX(v.price_ccy) THEN MIN(v.price_ccy)
+      ELSE SUM(v.qty * v.price_ccy) / NULLIF(SUM(v.qty), 0)
+    END,
+    MAX(v.fx_rate),
+    SUM(v.value)
+    FROM valuation_rc v
+   WHERE v.rc = 'JPY'
+     AND v.date IN (SELECT date FROM rc_refresh)
+     AND EXISTS (
+       SELECT 1 FROM rc_refresh r WHERE r.date = v.date AND (r.ticker IS NULL OR r.ticker = v.ticker)
+     )
+   GROUP BY v.date, v.ticker, v.ccy;
+  DELETE FROM rc_refresh;
+END;
+
+DROP TRIGGER IF EXISTS trg_snapshots_rc_insert;
+CREATE TRIGGER trg_snapshots_rc_insert AFTER INSERT ON snapshots
+BEGIN
+  INSERT INTO rc_refresh (date, account, ticker) VALUES (NEW.date, NEW.account, NEW.ticker);
+END;
+
+DROP TRIGGER IF EXISTS trg_snapshots_rc_update;
+CREATE TRIGGER trg_snapshots_rc_update AFTER UPDATE ON snapshots
+BEGIN
+  INSERT INTO rc_refresh (date, account, ticker) VALUES (OLD.date, OLD.account, OLD.ticker);
+  INSERT INTO rc_refresh (date, account, ticker)
+  SELECT NEW.date, NEW.account, NEW.ticker
+   WHERE NEW.date <> OLD.date OR NEW.account <> OLD.account OR NEW.ticker <> OLD.ticker;
+END;
+
+DROP TRIGGER IF EXISTS trg_snapshots_rc_delete;
+CREATE TRIGGER trg_snapshots_rc_delete AFTER DELETE ON snapshots
+WHEN NOT EXISTS (SELECT 1 FROM tier_archive WHERE moving = 1)
+BEGIN
+  INSERT INTO rc_refresh (date, account, ticker) VALUES (OLD.date, OLD.account, OLD.ticker);
+END;
+
+DROP TRIGGER IF EXISTS trg_assets_rc_update;
+CREATE TRIGGER trg_assets_rc_update AFTER UPDATE OF ccy ON assets
+BEGIN
+  -- every account at once: valuation_jpy sums the ticker over accounts under one ccy
+  INSERT INTO rc_refresh (date, ticker)
+  SELECT DISTINCT date, ticker FROM snapshots WHERE ticker = NEW.ticker;
+END;
+
+DROP TRIGGER IF EXISTS trg_reporting_currencies_insert;
+CREATE TRIGGER trg_reporting_currencies_insert AFTER INSERT ON reporting_currencies
+BEGIN
+  INSERT INTO rc_refresh (date) SELECT DISTINCT date FROM snapshots;
+END;
+
+-- JPY rows back v_valuation / v_portfolio_total / v_currency_exposure, so JPY cannot be removed
+DROP TRIGGER IF EXISTS trg_reporting_currencies_keep_jpy;
+CREATE TRIGGER trg_reporting_currencies_keep_jpy BEFORE DELETE ON reporting_currencies
+WHEN OLD.ccy = 'JPY'
+BEGIN
+  SELECT RAISE(ABORT, 'JPY is required as a reporting currency');
+END;
+
+DROP TRIGGER IF EXISTS trg_reporting_currencies_delete;
+CREATE TRIGGER trg_reporting_currencies_delete AFTER DELETE ON reporting_currencies
+BEGIN
+  DELETE FROM valuation_rc WHERE rc = OLD.ccy;
+  DELETE FROM account_exposure_rc WHERE rc = OLD.ccy;
+  DELETE FROM account_total_rc WHERE rc = OLD.ccy;
+  DELETE FROM exposure_rc WHERE rc = OLD.ccy;
+  DELETE FROM portfolio_total_rc WHERE rc = OLD.ccy;
+END;
+
+-- A batch left committed by an interrupted writer is closed; the backfill below covers its queue
+DELETE FROM rc_refresh;
+DELETE FROM fx_derive_dirty;
+DELETE FROM rc_batch;
+
+-- Backfill all reporting currencies in one pass over snapshots x FX (idempotent)
+DELETE FROM valuation_rc;
+INSERT INTO valuation_rc (rc, account, date, ticker, ccy, qty, price_ccy, fx_rate, value)
+SELECT rc, account, date, ticker, ccy, qty, price_ccy, fx_rate, value FROM v_valuation_rc_calc;
+DELETE FROM account_exposure_rc;
+INSERT INTO account_exposure_rc (rc, account, date, ccy, value)
+SELECT rc, account, date, ccy, SUM(value) FROM valuation_rc GROUP BY rc, account, date, ccy;
+DELETE FROM account_total_rc;
+INSERT INTO account_total_rc (rc, account, date, total_value)
+SELECT rc, account, date, SUM(value) FROM valuation_rc GROUP BY rc, account, date;
+DELETE FROM exposure_rc;
+INSERT INTO exposure_rc (rc, date, ccy, value)
+SELECT rc, date, ccy, SUM(value) FROM account_exposure_rc GROUP BY rc, date, ccy;
+DELETE FROM portfolio_total_rc;
+INSERT INTO portfolio_total_rc (rc, date, total_value)
+SELECT rc, date, SUM(total_value) FROM account_total_rc GROUP BY rc, date;
+DELETE FROM valuation_jpy;
+INSERT INTO valuation_jpy (date, ticker, ccy, qty, price_ccy, fx_rate, value_jpy)
+SELECT date, ticker, ccy, qty, price_ccy, fx_rate, value_jpy FROM v_valuation_jpy_calc;
+
+-- View: valuation in JPY per account, date and ticker
+DROP VIEW IF EXISTS v_account_valuation;
+CREATE VIEW v_account_valuation AS
 SELECT
+  s.account,
   s.date,
   s.ticker,
   a.ccy,
   s.qty,
   s.price_ccy,
-  CASE WHEN a.ccy = 'JPY' THEN 1.0 ELSE r.rate END AS fx_rate,
-  (s.qty * s.price_ccy) * (CASE WHEN a.ccy = 'JPY' THEN 1.0 ELSE r.rate END) AS value_jpy
+  CASE WHEN a.ccy = 'JPY' THEN 1.0 ELSE COALESCE(r.rate, rd.rate) END AS fx_rate,
+  (s.qty * s.price_ccy) * (CASE WHEN a.ccy = 'JPY' THEN 1.0 ELSE COALESCE(r.rate, rd.rate) END) AS value_jpy
 FROM snapshots s
 JOIN assets a ON a.ticker = s.ticker
-LEFT JOIN fx_rates r ON r.date = s.date AND r.pair = (a.ccy || 'JPY');
+LEFT JOIN fx_rates r ON r.date = s.date AND r.pair = (a.ccy || 'JPY')
+LEFT JOIN fx_rates_derived rd ON rd.date = s.date AND rd.pair = (a.ccy || 'JPY');
 
-DROP VIEW IF EXISTS v_portfolio_total;
-CREATE VIEW v_portfolio_total AS
+-- View: valuation in JPY per date and ticker, consolidated across accounts (valuation_jpy)
+DROP VIEW IF EXISTS v_valuation;
+CREATE VIEW v_valuation AS
+SELECT date, ticker, ccy, qty, price_ccy, fx_rate, value_jpy
+FROM valuation_jpy;
+
+DROP VIEW IF EXISTS v_account_portfolio_total;
+CREATE VIEW v_account_portfolio_total AS
 SELECT
+  account,
   date,
   SUM(value_jpy) AS total_value_jpy
-FROM v_valuation
-GROUP BY date;
+FROM v_account_valuation
+GROUP BY account, date;
+
+-- Totals and exposure read the JPY rows of the materialized tables, so a date filter is a key lookup
+DROP VIEW IF EXISTS v_portfolio_total;
+CREATE VIEW v_portfolio_total AS
+SELECT date, total_value AS total_value_jpy
+FROM portfolio_total_rc
+WHERE rc = 'JPY';
 
 DROP VIEW IF EXISTS v_currency_exposure;
 CREATE VIEW v_currency_exposure AS
-SELECT
-  date,
-  ccy,
-  SUM(value_jpy) AS value_jpy
-FROM v_valuation
-GROUP BY date, ccy;
+SELECT date, ccy, value AS value_jpy
+FROM exposure_rc
+WHERE rc = 'JPY';
 
 DROP VIEW IF EXISTS v_valuation_enriched;
 CREATE VIEW v_valuation_enriched AS
-WITH totals AS (
-  SELECT date, SUM(value_jpy) AS portfolio_value_jpy
-  FROM v_valuation
-  GROUP BY date
-)
 SELECT
   v.date,
   v.ticker,
@@ -96,30 +714,48 @@ SELECT
   v.price_ccy,
   v.fx_rate,
   v.value_jpy,
-  t.portfolio_value_jpy,
-  CASE
-    WHEN t.portfolio_value_jpy > 0 THEN v.value_jpy / t.portfolio_value_jpy
-    ELSE NULL
-  END AS weight
-FROM v_valuation v
-JOIN totals t ON t.date = v.date;
+  t.total_value AS portfolio_value_jpy,
+  CASE WHEN t.total_value > 0 THEN v.value_jpy / t.total_value ELSE NULL END AS weight
+FROM valuation_jpy v
+JOIN portfolio_total_rc t ON t.rc = 'JPY' AND t.date = v.date;
 
--- View: attribution of daily change into price, fx, cross, and flow
-DROP VIEW IF EXISTS v_attribution;
-CREATE VIEW v_attribution AS
+-- View: ledger-derived holdings priced with asset_prices, shaped like snapshots
+DROP VIEW IF EXISTS v_ledger_snapshots;
+CREATE VIEW v_ledger_snapshots AS
+SELECT
+  k.account,
+  p.date,
+  p.ticker,
+  (
+    SELECT lp.qty
+      FROM ledger_positions lp
+     WHERE lp.account = k.account AND lp.ticker = p.ticker AND lp.date <= p.date
+     ORDER BY lp.date DESC
+     LIMIT 1
+  ) AS qty,
+  p.close AS price_ccy
+FROM (SELECT account, ticker, MIN(date) AS first_date FROM ledger_positions GROUP BY account, ticker) k
+JOIN asset_prices p ON p.ticker = k.ticker AND p.date >= k.first_date;
+
+-- View: attribution of daily change into price, fx, cross, and flow per account
+DROP VIEW IF EXISTS v_account_attribution;
+CREATE VIEW v_account_attribution AS
 WITH s AS (
   SELECT
+    s.account,
     s.date,
     s.ticker,
     s.qty AS q1,
     s.price_ccy AS p1,
-    LAG(s.qty) OVER (PARTITION BY s.ticker ORDER BY s.date) AS q0,
-    LAG(s.price_ccy) OVER (PARTITION BY s.ticker ORDER BY s.date) AS p0,
-    LAG(s.date) OVER (PARTITION BY s.ticker ORDER BY s.date) AS d0
+    LAG(s.qty) OVER w AS q0,
+    LAG(s.price_ccy) OVER w AS p0,
+    LAG(s.date) OVER w AS d0
   FROM snapshots s
+  WINDOW w AS (PARTITION BY s.account, s.ticker ORDER BY s.date)
 ),
 base AS (
   SELECT
+    s.account,
     s.date,
     s.ticker,
     a.ccy,
@@ -127,8 +763,8 @@ base AS (
     s.q1,
     s.p0,
     s.p1,
-    CASE WHEN a.ccy = 'JPY' THEN 1.0 ELSE f0.rate END AS r0,
-    CASE WHEN a.ccy = 'JPY' THEN 1.0 ELSE f1.rate END AS r1
+    CASE WHEN a.ccy = 'JPY' THEN 1.0 ELSE COALESCE(f0.rate, g0.rate) END AS r0,
+    CASE WHEN a.ccy = 'JPY' THEN 1.0 ELSE COALESCE(f1.rate, g1.rate) END AS r1
   FROM s
   JOIN assets a
     ON a.ticker = s.ticker
@@ -136,14 +772,23 @@ base AS (
     ON a.ccy <> 'JPY'
    AND f1.date = s.date
    AND f1.pair = (a.ccy || 'JPY')
+  LEFT JOIN fx_rates_derived g1
+    ON a.ccy <> 'JPY'
+   AND g1.date = s.date
+   AND g1.pair = (a.ccy || 'JPY')
   LEFT JOIN fx_rates f0
     ON a.ccy <> 'JPY'
    AND f0.date = s.d0
    AND f0.pair = (a.ccy || 'JPY')
+  LEFT JOIN fx_rates_derived g0
+    ON a.ccy <> 'JPY'
+   AND g0.date = s.d0
+   AND g0.pair = (a.ccy || 'JPY')
   WHERE s.q0 IS NOT NULL
-    AND (a.ccy = 'JPY' OR (f1.rate IS NOT NULL AND f0.rate IS NOT NULL))
+    AND (a.ccy = 'JPY' OR (COALESCE(f1.rate, g1.rate) IS NOT NULL AND COALESCE(f0.rate, g0.rate) IS NOT NULL))
 )
 SELECT
+  account,
   date,
   ticker,
   (q1 * p1 * r1 - q0 * p0 * r0) AS delta_total,
@@ -154,6 +799,7 @@ SELECT
 FROM base
 UNION ALL
 SELECT
+  account,
   date,
   'PORTFOLIO' AS ticker,
   SUM(q1 * p1 * r1 - q0 * p0 * r0) AS delta_total,
@@ -162,5 +808,537 @@ SELECT
   SUM(q0 * (p1 - p0) * (r1 - r0))  AS delta_cross,
   SUM((q1 - q0) * p1 * r1)         AS flow
 FROM base
-GROUP BY date
+GROUP BY account, date
+;
+
+-- View: attribution consolidated across accounts (sum of the per-account rows)
+DROP VIEW IF EXISTS v_attribution;
+CREATE VIEW v_attribution AS
+SELECT
+  date,
+  ticker,
+  SUM(delta_total) AS delta_total,
+  SUM(delta_price) AS delta_price,
+  SUM(delta_fx)    AS delta_fx,
+  SUM(delta_cross) AS delta_cross,
+  SUM(flow)        AS flow
+FROM v_account_attribution
+GROUP BY date, ticker
+;
+
+-- Rolling risk statistics, maintained incrementally by app/risk.py (scripts/update_risk.py).
+-- Series are tickers (asset_prices.close) and 'PORTFOLIO' (portfolio_total_rc, rc = 'JPY').
+-- Windows (in returns) for volatility and correlation
+CREATE TABLE IF NOT EXISTS risk_windows (
+  window_days INTEGER PRIMARY KEY CHECK (window_days >= 2)
+);
+
+INSERT OR IGNORE INTO risk_windows (window_days) VALUES (20), (60);
+
+-- Per series and date: level, log return vs the previous observation, cumulative return
+-- index, running peak and drawdown. Portfolio returns exclude flows (position changes),
+-- so deposits are not counted as gains.
+CREATE TABLE IF NOT EXISTS risk_series (
+  series        TEXT NOT NULL,
+  date          TEXT NOT NULL,
+  level         REAL NOT NULL,
+  ret           REAL,          -- NULL on the first observation
+  cum_index     REAL NOT NULL, -- exp(sum of ret), 1.0 at the first observation
+  peak          REAL NOT NULL, -- running maximum of cum_index
+  drawdown      REAL NOT NULL, -- index / peak - 1 (<= 0)
+  max_drawdown  REAL NOT NULL, -- running minimum of drawdown
+  PRIMARY KEY (series, date)
+);
+
+CREATE INDEX IF NOT EXISTS idx_risk_series_date ON risk_series(date);
+
+-- Per series, window and date: sliding Welford state over the last window_days returns
+CREATE TABLE IF NOT EXISTS risk_vol (
+  series       TEXT NOT NULL,
+  window_days  INTEGER NOT NULL,
+  date         TEXT NOT NULL,
+  n            INTEGER NOT NULL,
+  mean         REAL NOT NULL,
+  m2           REAL NOT NULL,  -- sum of squared deviations from mean
+  vol          REAL,           -- annualized (sqrt(252)) sample stdev; NULL while n < 2
+  PRIMARY KEY (series, window_days, date)
+);
+
+-- Latest pairwise correlation per window (series_a < series_b) over the last window_days dates
+-- on which any series has a return, using the dates where both series have one; the
+-- co-moment state lets new dates slide the window without rescanning it
+CREATE TABLE IF NOT EXISTS risk_corr (
+  window_days  INTEGER NOT NULL,
+  series_a     TEXT NOT NULL,
+  series_b     TEXT NOT NULL,
+  asof         TEXT NOT NULL,
+  n            INTEGER NOT NULL,
+  mean_a       REAL NOT NULL,
+  mean_b       REAL NOT NULL,
+  m2_a         REAL NOT NULL,
+  m2_b         REAL NOT NULL,
+  c_ab         REAL NOT NULL,
+  corr         REAL,           -- NULL while n < 2 or a series is constant
+  PRIMARY KEY (window_days, series_a, series_b)
+);
+
+-- Earliest date per series whose statistics are stale (filled by the triggers below)
+CREATE TABLE IF NOT EXISTS risk_dirty (
+  series    TEXT PRIMARY KEY,
+  from_date TEXT NOT NULL
+);
+
+DROP TRIGGER IF EXISTS trg_asset_prices_risk_insert;
+CREATE TRIGGER trg_asset_prices_risk_insert AFTER INSERT ON asset_prices
+BEGIN
+  INSERT INTO risk_dirty (series, from_date) VALUES (NEW.ticker, NEW.date)
+  ON CONFLICT(series) DO UPDATE SET from_date = min(from_date, excluded.from_date);
+END;
+
+DROP TRIGGER IF EXISTS trg_asset_prices_risk_update;
+CREATE TRIGGER trg_asset_prices_risk_update AFTER UPDATE ON asset_prices
+BEGIN
+  INSERT INTO risk_dirty (series, from_date) VALUES (OLD.ticker, OLD.date)
+  ON CONFLICT(series) DO UPDATE SET from_date = min(from_date, excluded.from_date);
+  INSERT INTO risk_dirty (series, from_date) VALUES (NEW.ticker, NEW.date)
+  ON CONFLICT(series) DO UPDATE SET from_date = min(from_date, excluded.from_date);
+END;
+
+DROP TRIGGER IF EXISTS trg_asset_prices_risk_delete;
+CREATE TRIGGER trg_asset_prices_risk_delete AFTER DELETE ON asset_prices
+WHEN NOT EXISTS (SELECT 1 FROM tier_archive WHERE moving = 1)
+BEGIN
+  INSERT INTO risk_dirty (series, from_date) VALUES (OLD.ticker, OLD.date)
+  ON CONFLICT(series) DO UPDATE SET from_date = min(from_date, excluded.from_date);
+END;
+
+-- portfolio_total_rc is only ever rewritten with DELETE + INSERT (trg_rc_refresh)
+DROP TRIGGER IF EXISTS trg_portfolio_total_risk_insert;
+CREATE TRIGGER trg_portfolio_total_risk_insert AFTER INSERT ON portfolio_total_rc
+WHEN NEW.rc = 'JPY'
+BEGIN
+  INSERT INTO risk_dirty (series, from_date) VALUES ('PORTFOLIO', NEW.date)
+  ON CONFLICT(series) DO UPDATE SET from_date = min(from_date, excluded.from_date);
+END;
+
+DROP TRIGGER IF EXISTS trg_portfolio_total_risk_delete;
+CREATE TRIGGER trg_portfolio_total_risk_delete AFTER DELETE ON portfolio_total_rc
+WHEN OLD.rc = 'JPY' AND NOT EXISTS (SELECT 1 FROM tier_archive WHERE moving = 1)
+BEGIN
+  INSERT INTO risk_dirty (series, from_date) VALUES ('PORTFOLIO', OLD.date)
+  ON CONFLICT(series) DO UPDATE SET from_date = min(from_date, excluded.from_date);
+END;
+
+-- Series with data but no statistics yet (rows loaded before the triggers existed)
+INSERT INTO risk_dirty (series, from_date)
+SELECT ticker, MIN(date) FROM asset_prices
+ WHERE ticker NOT IN (SELECT series FROM risk_series)
+ GROUP BY ticker
+ON CONFLICT(series) DO UPDATE SET from_date = min(from_date, excluded.from_date);
+INSERT INTO risk_dirty (series, from_date)
+SELECT 'PORTFOLIO', MIN(date) FROM portfolio_total_rc
+ WHERE rc = 'JPY' AND NOT EXISTS (SELECT 1 FROM risk_series WHERE series = 'PORTFOLIO')
+HAVING COUNT(*) > 0
+ON CONFLICT(series) DO UPDATE SET from_date = min(from_date, excluded.from_date);
+
+-- Data gaps found by set-based scans over the whole history (see app/gaps.py).
+-- Each v_gap_* view is the full scan for one kind; scan_gaps() re-runs it only from the
+-- earliest date recorded in gap_dirty and stores the result in data_gaps.
+
+CREATE INDEX IF NOT EXISTS idx_asset_prices_ticker_date ON asset_prices(ticker, date);
+
+-- Non-JPY snapshots whose XXXJPY rate is missing (neither direct nor derived) on that date
+DROP VIEW IF EXISTS v_gap_fx_missing;
+CREATE VIEW v_gap_fx_missing AS
+SELECT
+  s.date,
+  a.ccy || 'JPY' AS pair,
+  COUNT(*) AS snapshots,
+  group_concat(DISTINCT s.ticker) AS tickers
+FROM snapshots s
+JOIN assets a ON a.ticker = s.ticker
+WHERE a.ccy <> 'JPY'
+  AND NOT EXISTS (SELECT 1 FROM fx_rates r WHERE r.date = s.date AND r.pair = a.ccy || 'JPY')
+  AND NOT EXISTS (SELECT 1 FROM fx_rates_derived d WHERE d.date = s.date AND d.pair = a.ccy || 'JPY')
+GROUP BY s.date, a.ccy;
+
+-- Dates inside a ticker's first..last price where another ticker of the same currency
+-- (i.e. roughly the same market calendar) has a close but this one does not
+DROP VIEW IF EXISTS v_gap_price_holes;
+CREATE VIEW v_gap_price_holes AS
+SELECT g.date, r.ticker, r.ccy
+FROM (
+  SELECT
+    a.ticker,
+    a.ccy,
+    (SELECT MIN(date) FROM asset_prices WHERE ticker = a.ticker) AS first_date,
+    (SELECT MAX(date) FROM asset_prices WHERE ticker = a.ticker) AS last_date
+  FROM assets a
+) r
+JOIN (
+  SELECT DISTINCT a.ccy, p.date
+  FROM asset_prices p
+  JOIN assets a ON a.ticker = p.ticker
+) g ON g.ccy = r.ccy AND g.date > r.first_date AND g.date < r.last_date
+WHERE NOT EXISTS (SELECT 1 FROM asset_prices p WHERE p.date = g.date AND p.ticker = r.ticker);
+
+-- Attribution inputs per snapshot: JPY value on its date (v1) and on the account/ticker's
+-- previous snapshot date d0 (v0), from valuation_rc. The value is NULL when an FX rate is
+-- missing. Driven by the date index, so a date filter only touches those dates.
+DROP VIEW IF EXISTS v_gap_attribution_rows;
+CREATE VIEW v_gap_attribution_rows AS
+SELECT
+  v1.account,
+  v1.date,
+  v1.ticker,
+  v1.ccy,
+  v1.value AS v1,
+  (SELECT MAX(p.date) FROM snapshots p
+    WHERE p.account = v1.account AND p.ticker = v1.ticker AND p.date < v1.date) AS d0,
+  v0.value AS v0
+FROM valuation_rc v1 INDEXED BY idx_valuation_rc_date
+LEFT JOIN valuation_rc v0
+  ON v0.rc = 'JPY'
+ AND v0.account = v1.account
+ AND v0.ticker = v1.ticker
+ AND v0.date = (SELECT MAX(p.date) FROM snapshots p
+                 WHERE p.account = v1.account AND p.ticker = v1.ticker AND p.date < v1.date)
+WHERE v1.rc = 'JPY';
+
+-- Attribution rows that are dropped (no JPY value on the date or on the previous snapshot
+-- date, i.e. a missing FX rate), and account dates where the identity
+-- total(d) - total(previous date) = sum of delta_total fails (tickers added, removed or
+-- snapshotted on other dates, or dropped rows)
+DROP VIEW IF EXISTS v_gap_attribution;
+CREATE VIEW v_gap_attribution AS
+SELECT
+  date,
+  account,
+  ticker,
+  'dropped' AS issue,
+  ccy || 'JPY missing on ' || CASE WHEN v1 IS NULL THEN date ELSE d0 END AS detail
+FROM v_gap_attribution_rows
+WHERE d0 IS NOT NULL AND (v1 IS NULL OR v0 IS NULL)
+UNION ALL
+SELECT
+  d.date,
+  d.account,
+  'PORTFOLIO' AS ticker,
+  'identity' AS issue,
+  printf('total change %.2f vs attributed %.2f (since %s)',
+         t1.total_value - t0.total_value, COALESCE(d.explained, 0), d.prev_date) AS detail
+FROM (
+  SELECT
+    account,
+    date,
+    (SELECT MAX(p.date) FROM snapshots p WHERE p.account = r.account AND p.date < r.date) AS prev_date,
+    SUM(CASE WHEN d0 IS NOT NULL THEN v1 - v0 END) AS explained
+  FROM v_gap_attribution_rows r
+  GROUP BY account, date
+) d
+JOIN account_total_rc t1 ON t1.rc = 'JPY' AND t1.account = d.account AND t1.date = d.date
+JOIN account_total_rc t0 ON t0.rc = 'JPY' AND t0.account = d.account AND t0.date = d.prev_date
+WHERE abs(t1.total_value - t0.total_value - COALESCE(d.explained, 0)) > 1e-6 * max(1.0, abs(t1.total_value));
+
+-- Stored scan results: key is the pair (fx_missing), ticker (price_hole) or account:ticker (attribution)
+CREATE TABLE IF NOT EXISTS data_gaps (
+  kind    TEXT NOT NULL CHECK (kind IN ('fx_missing', 'price_hole', 'attribution')),
+  key     TEXT NOT NULL,
+  date    TEXT NOT NULL,
+  detail  TEXT,
+  PRIMARY KEY (kind, key, date)
+);
+
+CREATE INDEX IF NOT EXISTS idx_data_gaps_date ON data_gaps(date, kind);
+
+-- Earliest date per kind whose stored scan is stale (filled by the triggers below)
+CREATE TABLE IF NOT EXISTS gap_dirty (
+  kind      TEXT PRIMARY KEY,
+  from_date TEXT NOT NULL
+);
+
+DROP TRIGGER IF EXISTS trg_snapshots_gap_insert;
+CREATE TRIGGER trg_snapshots_gap_insert AFTER INSERT ON snapshots
+BEGIN
+  INSERT INTO gap_dirty (kind, from_date) VALUES ('fx_missing', NEW.date), ('attribution', NEW.date)
+  ON CONFLICT(kind) DO UPDATE SET from_date = min(from_date, excluded.from_date);
+END;
+
+DROP TRIGGER IF EXISTS trg_snapshots_gap_update;
+CREATE TRIGGER trg_snapshots_gap_update AFTER UPDATE ON snapshots
+BEGIN
+  INSERT INTO gap_dirty (kind, from_date) VALUES ('fx_missing', min(OLD.date, NEW.date)), ('attribution', min(OLD.date, NEW.date))
+  ON CONFLICT(kind) DO UPDATE SET from_date = min(from_date, excluded.from_date);
+END;
+
+DROP TRIGGER IF EXISTS trg_snapshots_gap_delete;
+CREATE TRIGGER trg_snapshots_gap_delete AFTER DELETE ON snapshots
+WHEN NOT EXISTS (SELECT 1 FROM tier_archive WHERE moving = 1)
+BEGIN
+  INSERT INTO gap_dirty (kind, from_date) VALUES ('fx_missing', OLD.date), ('attribution', OLD.date)
+  ON CONFLICT(kind) DO UPDATE SET from_date = min(from_date, excluded.from_date);
+END;
+
+-- fx_rates_derived is rewritten from fx_rates per date, so fx_rates covers both
+DROP TRIGGER IF EXISTS trg_fx_rates_gap_insert;
+CREATE TRIGGER trg_fx_rates_gap_insert AFTER INSERT ON fx_rates
+BEGIN
+  INSERT INTO gap_dirty (kind, from_date) VALUES ('fx_missing', NEW.date), ('attribution', NEW.date)
+  ON CONFLICT(kind) DO UPDATE SET from_date = min(from_date, excluded.from_date);
+END;
+
+DROP TRIGGER IF EXISTS trg_fx_rates_gap_update;
+CREATE TRIGGER trg_fx_rates_gap_update AFTER UPDATE ON fx_rates
+BEGIN
+  INSERT INTO gap_dirty (kind, from_date) VALUES ('fx_missing', min(OLD.date, NEW.date)), ('attribution', min(OLD.date, NEW.date))
+  ON CONFLICT(kind) DO UPDATE SET from_date = min(from_date, excluded.from_date);
+END;
+
+DROP TRIGGER IF EXISTS trg_fx_rates_gap_delete;
+CREATE TRIGGER trg_fx_rates_gap_delete AFTER DELETE ON fx_rates
+WHEN NOT EXISTS (SELECT 1 FROM tier_archive WHERE moving = 1)
+BEGIN
+  INSERT INTO gap_dirty (kind, from_date) VALUES ('fx_missing', OLD.date), ('attribution', OLD.date)
+  ON CONFLICT(kind) DO UPDATE SET from_date = min(from_date, excluded.from_date);
+END;
+
+-- A price can open or close holes back to the ticker's previous close (when it extends
+-- the ticker's range) and for the other tickers of its currency on its own date
+DROP TRIGGER IF EXISTS trg_asset_prices_gap_insert;
+CREATE TRIGGER trg_asset_prices_gap_insert AFTER INSERT ON asset_prices
+BEGIN
+  INSERT INTO gap_dirty (kind, from_date)
+  VALUES ('price_hole', COALESCE(
+    (SELECT MAX(date) FROM asset_prices WHERE ticker = NEW.ticker AND date < NEW.date), NEW.date
+  ))
+  ON CONFLICT(kind) DO UPDATE SET from_date = min(from_date, excluded.from_date);
+END;
+
+DROP TRIGGER IF EXISTS trg_asset_prices_gap_update;
+CREATE TRIGGER trg_asset_prices_gap_update AFTER UPDATE OF date, ticker ON asset_prices
+BEGIN
+  INSERT INTO gap_dirty (kind, from_date)
+  VALUES ('price_hole', min(
+    COALESCE((SELECT MAX(date) FROM asset_prices WHERE ticker = OLD.ticker AND date < OLD.date), OLD.date),
+    COALESCE((SELECT MAX(date) FROM asset_prices WHERE ticker = NEW.ticker AND date < NEW.date), NEW.date)
+  ))
+  ON CONFLICT(kind) DO UPDATE SET from_date = min(from_date, excluded.from_date);
+END;
+
+DROP TRIGGER IF EXISTS trg_asset_prices_gap_delete;
+CREATE TRIGGER trg_asset_prices_gap_delete AFTER DELETE ON asset_prices
+WHEN NOT EXISTS (SELECT 1 FROM tier_archive WHERE moving = 1)
+BEGIN
+  INSERT INTO gap_dirty (kind, from_date)
+  VALUES ('price_hole', COALESCE(
+    (SELECT MAX(date) FROM asset_prices WHERE ticker = OLD.ticker AND date < OLD.date), OLD.date
+  ))
+  ON CONFLICT(kind) DO UPDATE SET from_date = min(from_date, excluded.from_date);
+END;
+
+-- An asset's currency decides which FX rate and which price calendar apply on every date
+DROP TRIGGER IF EXISTS trg_assets_gap_update;
+CREATE TRIGGER trg_assets_gap_update AFTER UPDATE OF ccy ON assets
+BEGIN
+  INSERT INTO gap_dirty (kind, from_date) VALUES ('fx_missing', ''), ('price_hole', ''), ('attribution', '')
+  ON CONFLICT(kind) DO UPDATE SET from_date = '';
+END;
+
+-- Nothing scanned or queued yet (new DB, or rows bulk-loaded without triggers): scan everything
+INSERT INTO gap_dirty (kind, from_date)
+SELECT kind, '' FROM (SELECT 'fx_missing' AS kind UNION ALL SELECT 'price_hole' UNION ALL SELECT 'attribution')
+ WHERE NOT EXISTS (SELECT 1 FROM data_gaps) AND NOT EXISTS (SELECT 1 FROM gap_dirty);
+
+-- Memory-mapped chart cache (see app/tscache.py): one file pair per series next to the DB.
+-- Series are 'price:<ticker>', 'fx:<pair>', 'total:<rc>' and 'total:<rc>:<account>';
+-- the triggers below record the earliest changed date per series.
+CREATE TABLE IF NOT EXISTS tscache_dirty (
+  series    TEXT PRIMARY KEY,
+  from_date TEXT NOT NULL
+);
+
+-- Identifies this DB to its cache files; a cache built for another token is rebuilt
+CREATE TABLE IF NOT EXISTS tscache_meta (
+  id    INTEGER PRIMARY KEY CHECK (id = 1),
+  token TEXT NOT NULL
+);
+
+INSERT OR IGNORE INTO tscache_meta (id, token) VALUES (1, lower(hex(randomblob(8))));
+
+DROP TRIGGER IF EXISTS trg_asset_prices_tscache_insert;
+CREATE TRIGGER trg_asset_prices_tscache_insert AFTER INSERT ON asset_prices
+BEGIN
+  INSERT INTO tscache_dirty (series, from_date) VALUES ('price:' || NEW.ticker, NEW.date)
+  ON CONFLICT(series) DO UPDATE SET from_date = min(from_date, excluded.from_date);
+END;
+
+DROP TRIGGER IF EXISTS trg_asset_prices_tscache_update;
+CREATE TRIGGER trg_asset_prices_tscache_update AFTER UPDATE ON asset_prices
+BEGIN
+  INSERT INTO tscache_dirty (series, from_date) VALUES ('price:' || OLD.ticker, OLD.date)
+  ON CONFLICT(series) DO UPDATE SET from_date = min(from_date, excluded.from_date);
+  INSERT INTO tscache_dirty (series, from_date) VALUES ('price:' || NEW.ticker, NEW.date)
+  ON CONFLICT(series) DO UPDATE SET from_date = min(from_date, excluded.from_date);
+END;
+
+DROP TRIGGER IF EXISTS trg_asset_prices_tscache_delete;
+CREATE TRIGGER trg_asset_prices_tscache_delete AFTER DELETE ON asset_prices
+WHEN NOT EXISTS (SELECT 1 FROM tier_archive WHERE moving = 1)
+BEGIN
+  INSERT INTO tscache_dirty (series, from_date) VALUES ('price:' || OLD.ticker, OLD.date)
+  ON CONFLICT(series) DO UPDATE SET from_date = min(from_date, excluded.from_date);
+END;
+
+DROP TRIGGER IF EXISTS trg_fx_rates_tscache_insert;
+CREATE TRIGGER trg_fx_rates_tscache_insert AFTER INSERT ON fx_rates
+BEGIN
+  INSERT INTO tscache_dirty (series, from_date) VALUES ('fx:' || NEW.pair, NEW.date)
+  ON CONFLICT(series) DO UPDATE SET from_date = min(from_date, excluded.from_date);
+END;
+
+DROP TRIGGER IF EXISTS trg_fx_rates_tscache_update;
+CREATE TRIGGER trg_fx_rates_tscache_update AFTER UPDATE ON fx_rates
+BEGIN
+  INSERT INTO tscache_dirty (series, from_date) VALUES ('fx:' || OLD.pair, OLD.date)
+  ON CONFLICT(series) DO UPDATE SET from_date = min(from_date, excluded.from_date);
+  INSERT INTO tscache_dirty (series, from_date) VALUES ('fx:' || NEW.pair, NEW.date)
+  ON CONFLICT(series) DO UPDATE SET from_date = min(from_date, excluded.from_date);
+END;
+
+DROP TRIGGER IF EXISTS trg_fx_rates_tscache_delete;
+CREATE TRIGGER trg_fx_rates_tscache_delete AFTER DELETE ON fx_rates
+WHEN NOT EXISTS (SELECT 1 FROM tier_archive WHERE moving = 1)
+BEGIN
+  INSERT INTO tscache_dirty (series, from_date) VALUES ('fx:' || OLD.pair, OLD.date)
+  ON CONFLICT(series) DO UPDATE SET from_date = min(from_date, excluded.from_date);
+END;
+
+-- The *_total_rc tables are only ever rewritten with DELETE + INSERT (trg_rc_refresh)
+DROP TRIGGER IF EXISTS trg_portfolio_total_tscache_insert;
+CREATE TRIGGER trg_portfolio_total_tscache_insert AFTER INSERT ON portfolio_total_rc
+BEGIN
+  INSERT INTO tscache_dirty (series, from_date) VALUES ('total:' || NEW.rc, NEW.date)
+  ON CONFLICT(series) DO UPDATE SET from_date = min(from_date, excluded.from_date);
+END;
+
+DROP TRIGGER IF EXISTS trg_portfolio_total_tscache_delete;
+CREATE TRIGGER trg_portfolio_total_tscache_delete AFTER DELETE ON portfolio_total_rc
+WHEN NOT EXISTS (SELECT 1 FROM tier_archive WHERE moving = 1)
+BEGIN
+  INSERT INTO tscache_dirty (series, from_date) VALUES ('total:' || OLD.rc, OLD.date)
+  ON CONFLICT(series) DO UPDATE SET from_date = min(from_date, excluded.from_date);
+END;
+
+DROP TRIGGER IF EXISTS trg_account_total_tscache_insert;
+CREATE TRIGGER trg_account_total_tscache_insert AFTER INSERT ON account_total_rc
+BEGIN
+  INSERT INTO tscache_dirty (series, from_date) VALUES ('total:' || NEW.rc || ':' || NEW.account, NEW.date)
+  ON CONFLICT(series) DO UPDATE SET from_date = min(from_date, excluded.from_date);
+END;
+
+DROP TRIGGER IF EXISTS trg_account_total_tscache_delete;
+CREATE TRIGGER trg_account_total_tscache_delete AFTER DELETE ON account_total_rc
+WHEN NOT EXISTS (SELECT 1 FROM tier_archive WHERE moving = 1)
+BEGIN
+  INSERT INTO tscache_dirty (series, from_date) VALUES ('total:' || OLD.rc || ':' || OLD.account, OLD.date)
+  ON CONFLICT(series) DO UPDATE SET from_date = min(from_date, excluded.from_date);
+END;
+
+-- Ingest screening (app/screening.py): fetched or imported prices / FX rates that look like a
+-- bad tick (zscore), an unadjusted split, an implausible level shift, a stale quote or an
+-- invalid number are held here instead of being upserted; scripts/review_quarantine.py
+-- accepts (upserts) or rejects them.
+CREATE TABLE IF NOT EXISTS ingest_quarantine (
+  target      TEXT NOT NULL CHECK (target IN ('asset_prices', 'fx_rates')),
+  key         TEXT NOT NULL, -- ticker or pair
+  date        TEXT NOT NULL CHECK (date LIKE '____-__-__'),
+  value       REAL,          -- NULL when the source value was not a number
+  reason      TEXT NOT NULL CHECK (reason IN ('invalid', 'zscore', 'split', 'shift', 'stale')),
+  detail      TEXT,
+  ref_value   REAL,          -- recent level the value was compared with
+  source      TEXT NOT NULL, -- fetch_prices / fetch_fx / daily_close / import / manual / gui
+  status      TEXT NOT NULL DEFAULT 'pending' CHECK (status IN ('pending', 'accepted', 'rejected')),
+  created_at  TEXT NOT NULL,
+  reviewed_at TEXT,
+  PRIMARY KEY (target, key, date)
+);
+
+-- Fetcher observability: one row per fetch script run and per HTTP request
+-- (written by FetchRecorder in scripts/yahoo_client.py)
+CREATE TABLE IF NOT EXISTS fetch_runs (
+  id            INTEGER PRIMARY KEY AUTOINCREMENT,
+  script        TEXT NOT NULL,
+  args          TEXT,
+  started_at    TEXT NOT NULL,
+  finished_at   TEXT,
+  status        TEXT NOT NULL DEFAULT 'running', -- running / ok / error
+  n_requests    INTEGER,
+  rows_changed  INTEGER
+);
+
+CREATE TABLE IF NOT EXISTS fetch_requests (
+  id              INTEGER PRIMARY KEY AUTOINCREMENT,
+  run_id          INTEGER NOT NULL REFERENCES fetch_runs(id) ON DELETE CASCADE,
+  symbol          TEXT NOT NULL,
+  started_at      TEXT NOT NULL,
+  latency_ms      REAL, -- last attempt
+  elapsed_ms      REAL, -- all attempts including backoff
+  http_status     INTEGER,
+  retries         INTEGER NOT NULL DEFAULT 0,
+  response_bytes  INTEGER,
+  rows_parsed     INTEGER,
+  rows_changed    INTEGER,
+  error           TEXT
+);
+
+CREATE INDEX IF NOT EXISTS idx_fetch_requests_run ON fetch_requests(run_id);
+CREATE INDEX IF NOT EXISTS idx_fetch_requests_symbol ON fetch_requests(symbol, started_at);
+
+-- Backfill progress: one row per completed (target, key, date chunk); --resume skips these.
+-- Chunks reaching today or later are never recorded, since their data is still moving.
+CREATE TABLE IF NOT EXISTS fetch_chunks (
+  target       TEXT NOT NULL, -- asset_prices / fx_rates
+  key          TEXT NOT NULL, -- ticker or pair as stored
+  symbol       TEXT NOT NULL,
+  chunk_start  TEXT NOT NULL,
+  chunk_end    TEXT NOT NULL,
+  rows         INTEGER NOT NULL,
+  run_id       INTEGER,
+  fetched_at   TEXT NOT NULL,
+  PRIMARY KEY (target, key, chunk_start, chunk_end)
+);
+
+-- View: per-run request totals (latency percentiles are computed by scripts/fetch_report.py)
+DROP VIEW IF EXISTS v_fetch_run_summary;
+CREATE VIEW v_fetch_run_summary AS
+SELECT
+  r.id                                     AS run_id,
+  r.script,
+  r.started_at,
+  r.finished_at,
+  r.status,
+  COUNT(q.id)                              AS n_requests,
+  SUM(q.error IS NOT NULL)                 AS n_errors,
+  COALESCE(SUM(q.retries), 0)              AS retries,
+  COALESCE(SUM(q.response_bytes), 0)       AS response_bytes,
+  COALESCE(SUM(q.rows_parsed), 0)          AS rows_parsed,
+  COALESCE(SUM(q.rows_changed), 0)         AS rows_changed,
+  AVG(q.latency_ms)                        AS avg_latency_ms,
+  MAX(q.latency_ms)                        AS max_latency_ms,
+  SUM(q.elapsed_ms)                        AS total_elapsed_ms
+FROM fetch_runs r
+LEFT JOIN fetch_requests q ON q.run_id = r.id
+GROUP BY r.id
 ;
+
+-- AI summary cache: one row per (kind, key, model); prompt_sha identifies the data the
+-- summary was generated from, so a changed prompt means stale (see app/summaries.py)
+CREATE TABLE IF NOT EXISTS ai_summaries (
+  kind        TEXT NOT NULL,  -- 'day' | 'history'
+  key         TEXT NOT NULL,  -- date for 'day', 'all' for 'history'
+  model       TEXT NOT NULL,
+  prompt_sha  TEXT NOT NULL,
+  summary     TEXT NOT NULL,
+  created_at  TEXT NOT NULL,
+  PRIMARY KEY (kind, key, model)
+);
@@ -0,0 +1,302 @@
+-- Compact read-only storage format, written by scripts/compact_db.py from a schema.sql DB.
+-- Dates are stored as day numbers (days since 1970-01-01, as in app/tscache.py) and tickers,
+-- pairs, currencies and accounts as small interned ids, in WITHOUT ROWID tables clustered by
+-- series. Views under the original names decode ISO dates and text keys, so read queries
+-- written against schema.sql run unchanged; the derived *_rc tables are not carried over and
+-- v_valuation / v_portfolio_total / v_attribution compute from the integer tables instead.
+--   day  = CAST(julianday(date) - 2440587.5 AS INTEGER)
+--   date = date(day + 2440587.5)
+PRAGMA foreign_keys = ON;
+
+CREATE TABLE IF NOT EXISTS c_ccys (
+  id          INTEGER PRIMARY KEY,
+  ccy         TEXT NOT NULL UNIQUE CHECK (length(ccy) = 3),
+  jpy_pair_id INTEGER REFERENCES c_pairs(id) -- ccy || 'JPY'; NULL for JPY itself
+);
+
+CREATE TABLE IF NOT EXISTS c_pairs (
+  id   INTEGER PRIMARY KEY,
+  pair TEXT NOT NULL UNIQUE
+);
+
+CREATE TABLE IF NOT EXISTS c_accounts (
+  id      INTEGER PRIMARY KEY,
+  account TEXT NOT NULL UNIQUE,
+  name    TEXT
+);
+
+CREATE TABLE IF NOT EXISTS c_assets (
+  id     INTEGER PRIMARY KEY,
+  ticker TEXT NOT NULL UNIQUE,
+  ccy_id INTEGER NOT NULL REFERENCES c_ccys(id),
+  name   TEXT
+);
+
+CREATE TABLE IF NOT EXISTS c_reporting_currencies (
+  ccy_id INTEGER PRIMARY KEY REFERENCES c_ccys(id)
+);
+
+CREATE TABLE IF NOT EXISTS c_fx_rates (
+  pair_id INTEGER NOT NULL,
+  day     INTEGER NOT NULL,
+  rate    REAL NOT NULL,
+  PRIMARY KEY (pair_id, day)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS c_fx_rates_derived (
+  pair_id INTEGER NOT NULL,
+  day     INTEGER NOT NULL,
+  rate    REAL NOT NULL,
+  via_id  INTEGER, -- c_ccys.id
+  leg1_id INTEGER NOT NULL,
+  leg2_id INTEGER,
+  formula TEXT NOT NULL,
+  PRIMARY KEY (pair_id, day)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS c_asset_prices (
+  asset_id INTEGER NOT NULL,
+  day      INTEGER NOT NULL,
+  close    REAL NOT NULL,
+  PRIMARY KEY (asset_id, day)
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS c_idx_asset_prices_day ON c_asset_prices(day);
+-- Same expression as the asset_prices view, so WHERE date = ... through the view is a search
+CREATE INDEX IF NOT EXISTS c_idx_asset_prices_date ON c_asset_prices(date(day + 2440587.5));
+
+-- Clustered per (account, ticker) in date order, so the attribution window needs no sort
+CREATE TABLE IF NOT EXISTS c_snapshots (
+  account_id INTEGER NOT NULL,
+  asset_id   INTEGER NOT NULL,
+  day        INTEGER NOT NULL,
+  qty        REAL NOT NULL,
+  price_ccy  REAL NOT NULL,
+  PRIMARY KEY (account_id, asset_id, day)
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS c_idx_snapshots_day ON c_snapshots(day);
+-- Same expression as the snapshots view (holdings on one date through the view)
+CREATE INDEX IF NOT EXISTS c_idx_snapshots_date ON c_snapshots(date(day + 2440587.5));
+
+-- Compatibility views: the schema.sql tables under their own names
+DROP VIEW IF EXISTS accounts;
+CREATE VIEW accounts AS
+SELECT account, name FROM c_accounts;
+
+DROP VIEW IF EXISTS assets;
+CREATE VIEW assets AS
+SELECT a.ticker, c.ccy, a.name
+FROM c_assets a
+JOIN c_ccys c ON c.id = a.ccy_id;
+
+DROP VIEW IF EXISTS reporting_currencies;
+CREATE VIEW reporting_currencies AS
+SELECT c.ccy
+FROM c_reporting_currencies r
+JOIN c_ccys c ON c.id = r.ccy_id;
+
+DROP VIEW IF EXISTS fx_rates;
+CREATE VIEW fx_rates AS
+SELECT date(f.day + 2440587.5) AS date, p.pair, f.rate
+FROM c_fx_rates f
+JOIN c_pairs p ON p.id = f.pair_id;
+
+DROP VIEW IF EXISTS fx_rates_derived;
+CREATE VIEW fx_rates_derived AS
+SELECT
+  date(g.day + 2440587.5) AS date,
+  p.pair,
+  g.rate,
+  v.ccy AS via,
+  l1.pair AS leg1,
+  l2.pair AS leg2,
+  g.formula
+FROM c_fx_rates_derived g
+JOIN c_pairs p ON p.id = g.pair_id
+JOIN c_pairs l1 ON l1.id = g.leg1_id
+LEFT JOIN c_pairs l2 ON l2.id = g.leg2_id
+LEFT JOIN c_ccys v ON v.id = g.via_id;
+
+DROP VIEW IF EXISTS v_fx_rates;
+CREATE VIEW v_fx_rates AS
+SELECT date, pair, rate, 'direct' AS source FROM fx_rates
+UNION ALL
+SELECT date, pair, rate, formula AS source FROM fx_rates_derived;
+
+DROP VIEW IF EXISTS asset_prices;
+CREATE VIEW asset_prices AS
+SELECT date(p.day + 2440587.5) AS date, a.ticker, p.close
+FROM c_asset_prices p
+JOIN c_assets a ON a.id = p.asset_id;
+
+DROP VIEW IF EXISTS snapshots;
+CREATE VIEW snapshots AS
+SELECT ac.account, date(s.day + 2440587.5) AS date, a.ticker, s.qty, s.price_ccy
+FROM c_snapshots s
+JOIN c_accounts ac ON ac.id = s.account_id
+JOIN c_assets a ON a.id = s.asset_id;
+
+-- JPY valuation per account, day and asset on integer keys (fx_rate as in v_account_valuation)
+DROP VIEW IF EXISTS c_v_account_valuation;
+CREATE VIEW c_v_account_valuation AS
+SELECT
+  account_id,
+  day,
+  asset_id,
+  ccy_id,
+  qty,
+  price_ccy,
+  fx_rate,
+  qty * price_ccy * fx_rate AS value_jpy
+FROM (
+  SELECT
+    s.account_id,
+    s.day,
+    s.asset_id,
+    a.ccy_id,
+    s.qty,
+    s.price_ccy,
+    CASE WHEN c.jpy_pair_id IS NULL THEN 1.0 ELSE COALESCE(f.rate, g.rate) END AS fx_rate
+  FROM c_snapshots s
+  JOIN c_assets a ON a.id = s.asset_id
+  JOIN c_ccys c ON c.id = a.ccy_id
+  LEFT JOIN c_fx_rates f ON f.pair_id = c.jpy_pair_id AND f.day = s.day
+  LEFT JOIN c_fx_rates_derived g ON g.pair_id = c.jpy_pair_id AND g.day = s.day
+);
+
+DROP VIEW IF EXISTS v_account_valuation;
+CREATE VIEW v_account_valuation AS
+SELECT ac.account, date(v.day + 2440587.5) AS date, a.ticker, c.ccy, v.qty, v.price_ccy, v.fx_rate, v.value_jpy
+FROM c_v_account_valuation v
+JOIN c_accounts ac ON ac.id = v.account_id
+JOIN c_assets a ON a.id = v.asset_id
+JOIN c_ccys c ON c.id = v.ccy_id;
+
+-- Consolidated across accounts like valuation_jpy (v_valuation_jpy_calc)
+DROP VIEW IF EXISTS v_valuation;
+CREATE VIEW v_valuation AS
+SELECT date(v.day + 2440587.5) AS date, a.ticker, c.ccy, v.qty, v.price_ccy, v.fx_rate, v.value_jpy
+FROM (
+  SELECT
+    day,
+    asset_id,
+    ccy_id,
+    SUM(qty) AS qty,
+    CASE
+      WHEN MIN(price_ccy) = MAX(price_ccy) THEN MIN(price_ccy)
+      ELSE SUM(qty * price_ccy) / NULLIF(SUM(qty), 0)
+    END AS price_ccy,
+    MAX(fx_rate) AS fx_rate,
+    SUM(value_jpy) AS value_jpy
+  FROM c_v_account_valuation
+  GROUP BY day, asset_id, ccy_id
+) v
+JOIN c_assets a ON a.id = v.asset_id
+JOIN c_ccys c ON c.id = v.ccy_id;
+
+DROP VIEW IF EXISTS v_portfolio_total;
+CREATE VIEW v_portfolio_total AS
+SELECT date(day + 2440587.5) AS date, SUM(value_jpy) AS total_value_jpy
+FROM c_v_account_valuation
+GROUP BY day;
+
+-- Attribution as in schema.sql; the window follows the c_snapshots key order
+DROP VIEW IF EXISTS c_v_account_attribution;
+CREATE VIEW c_v_account_attribution AS
+WITH s AS (
+  SELECT
+    s.account_id,
+    s.day,
+    s.asset_id,
+    s.qty AS q1,
+    s.price_ccy AS p1,
+    LAG(s.qty) OVER w AS q0,
+    LAG(s.price_ccy) OVER w AS p0,
+    LAG(s.day) OVER w AS d0
+  FROM c_snapshots s
+  WINDOW w AS (PARTITION BY s.account_id, s.asset_id ORDER BY s.day)
+),
+base AS (
+  SELECT
+    s.account_id,
+    s.day,
+    s.asset_id,
+    s.q0,
+    s.q1,
+    s.p0,
+    s.p1,
+    CASE WHEN c.jpy_pair_id IS NULL THEN 1.0 ELSE COALESCE(f0.rate, g0.rate) END AS r0,
+    CASE WHEN c.jpy_pair_id IS NULL THEN 1.0 ELSE COALESCE(f1.rate, g1.rate) END AS r1
+  FROM s
+  JOIN c_assets a ON a.id = s.asset_id
+  JOIN c_ccys c ON c.id = a.ccy_id
+  LEFT JOIN c_fx_rates f1 ON f1.pair_id = c.jpy_pair_id AND f1.day = s.day
+  LEFT JOIN c_fx_rates_derived g1 ON g1.pair_id = c.jpy_pair_id AND g1.day = s.day
+  LEFT JOIN c_fx_rates f0 ON f0.pair_id = c.jpy_pair_id AND f0.day = s.d0
+  LEFT JOIN c_fx_rates_derived g0 ON g0.pair_id = c.jpy_pair_id AND g0.day = s.d0
+  WHERE s.q0 IS NOT NULL
+    AND (c.jpy_pair_id IS NULL OR (COALESCE(f1.rate, g1.rate) IS NOT NULL AND COALESCE(f0.rate, g0.rate) IS NOT NULL))
+)
+SELECT
+  account_id,
+  day,
+  asset_id,
+  (q1 * p1 * r1 - q0 * p0 * r0) AS delta_total,
+  (q0 * (p1 - p0) * r0)         AS delta_price,
+  (q0 * p0 * (r1 - r0))         AS delta_fx,
+  (q0 * (p1 - p0) * (r1 - r0))  AS delta_cross,
+  ((q1 - q0) * p1 * r1)         AS flow
+FROM base
+UNION ALL
+SELECT
+  account_id,
+  day,
+  NULL AS asset_id, -- 'PORTFOLIO'
+  SUM(q1 * p1 * r1 - q0 * p0 * r0) AS delta_total,
+  SUM(q0 * (p1 - p0) * r0)         AS delta_price,
+  SUM(q0 * p0 * (r1 - r0))         AS delta_fx,
+  SUM(q0 * (p1 - p0) * (r1 - r0))  AS delta_cross,
+  SUM((q1 - q0) * p1 * r1)         AS flow
+FROM base
+GROUP BY account_id, day
+;
+
+DROP VIEW IF EXISTS v_account_attribution;
+CREATE VIEW v_account_attribution AS
+SELECT
+  ac.account,
+  date(t.day + 2440587.5) AS date,
+  COALESCE(a.ticker, 'PORTFOLIO') AS ticker,
+  t.delta_total,
+  t.delta_price,
+  t.delta_fx,
+  t.delta_cross,
+  t.flow
+FROM c_v_account_attribution t
+JOIN c_accounts ac ON ac.id = t.account_id
+LEFT JOIN c_assets a ON a.id = t.asset_id;
+
+DROP VIEW IF EXISTS v_attribution;
+CREATE VIEW v_attribution AS
+SELECT
+  date(t.day + 2440587.5) AS date,
+  COALESCE(a.ticker, 'PORTFOLIO') AS ticker,
+  t.delta_total,
+  t.delta_price,
+  t.delta_fx,
+  t.delta_cross,
+  t.flow
+FROM (
+  SELECT
+    day,
+    asset_id,
+    SUM(delta_total) AS delta_total,
+    SUM(delta_price) AS delta_price,
+    SUM(delta_fx)    AS delta_fx,
+    SUM(delta_cross) AS delta_cross,
+    SUM(flow)        AS flow
+  FROM c_v_account_attribution
+  GROUP BY day, asset_id
+) t
+LEFT JOIN c_assets a ON a.id = t.asset_id;
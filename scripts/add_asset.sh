@@ -31,7 +31,7 @@ CCY=$(echo "$CCY" | tr '[:lower:]' '[:upper:]')
 
 read -rp "名称 (任意): " NAME
 
-sqlite3 "$DB" <<SQL
+sqlite3 -cmd ".timeout 5000" "$DB" <<SQL
 INSERT INTO assets (ticker, ccy, name)
 VALUES ('$TICKER', '$CCY', ${NAME:+quote('$NAME')} )
 ON CONFLICT(ticker) DO UPDATE SET
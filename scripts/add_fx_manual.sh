@@ -13,6 +13,8 @@ usage() {
 
 備考:
   ペアは <通貨>JPY を自動生成します（例: USD -> USDJPY）。
+  直近のレートから大きく外れた値は ingest_quarantine に保留されます
+  （確認・登録: scripts/review_quarantine.py --accept）。
 USAGE
 }
 
@@ -33,12 +35,5 @@ PAIR="${CCY}JPY"
 read -rp "レート (例 145.23) [必須]: " RATE
 if [[ ! ${RATE:-} =~ ^[0-9]+(\.[0-9]+)?$ ]]; then echo "ERROR: 数値レートを入力" >&2; exit 1; fi
 
-sqlite3 "$DB" <<SQL
-INSERT INTO fx_rates (date, pair, rate)
-VALUES ('$DATE', '$PAIR', $RATE)
-ON CONFLICT(date, pair) DO UPDATE SET
-  rate = excluded.rate;
-SQL
-
-echo "Added/Updated FX: $DATE $PAIR=$RATE in $DB"
-
+# 異常値チェック（scripts/import_csv.py）を通して登録します。保留された場合は理由を表示します
+echo "$DATE,$PAIR,$RATE" | python3 "$(dirname "$0")/import_csv.py" fx_rates - --db "$DB" --no-header --source manual
@@ -12,7 +12,7 @@ usage() {
   db_path : SQLite DB パス（省略可、既定: money_diary.db）
 
 備考:
-  既存 (date,ticker) は UPSERT します。
+  既存 (account,date,ticker) は UPSERT します。口座は省略時 main。
 USAGE
 }
 
@@ -25,6 +25,9 @@ DB=${1:-money_diary.db}
 read -rp "日付 YYYY-MM-DD [必須]: " DATE
 if [[ ! ${DATE:-} =~ ^[0-9]{4}-[0-9]{2}-[0-9]{2}$ ]]; then echo "ERROR: 日付形式が不正" >&2; exit 1; fi
 
+read -rp "口座 [main]: " ACCOUNT
+ACCOUNT=${ACCOUNT:-main}
+
 read -rp "Ticker [必須]: " TICKER
 if [[ -z "${TICKER}" ]]; then echo "ERROR: Ticker は必須" >&2; exit 1; fi
 
@@ -34,13 +37,13 @@ if [[ ! ${QTY:-} =~ ^[0-9]+(\.[0-9]+)?$ ]]; then echo "ERROR: 数量は数値" >
 read -rp "現地通貨建て価格 price_ccy (例 210.5) [必須]: " PRICE
 if [[ ! ${PRICE:-} =~ ^[0-9]+(\.[0-9]+)?$ ]]; then echo "ERROR: 価格は数値" >&2; exit 1; fi
 
-sqlite3 "$DB" <<SQL
-INSERT INTO snapshots (date, ticker, qty, price_ccy)
-VALUES ('$DATE', '$TICKER', $QTY, $PRICE)
-ON CONFLICT(date, ticker) DO UPDATE SET
+sqlite3 -cmd ".timeout 5000" "$DB" <<SQL
+INSERT INTO snapshots (account, date, ticker, qty, price_ccy)
+VALUES ('$ACCOUNT', '$DATE', '$TICKER', $QTY, $PRICE)
+ON CONFLICT(account, date, ticker) DO UPDATE SET
   qty = excluded.qty,
   price_ccy = excluded.price_ccy;
 SQL
 
-echo "Added/Updated snapshot: $DATE $TICKER qty=$QTY price_ccy=$PRICE in $DB"
+echo "Added/Updated snapshot: $ACCOUNT $DATE $TICKER qty=$QTY price_ccy=$PRICE in $DB"
 
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""Move closed periods of history into an archive DB (hot/cold tiering).
+
+Rows dated before the cutoff in snapshots, asset_prices, fx_rates and their derived
+tables (valuation_rc, the *_rc aggregates, valuation_jpy, fx_rates_derived) move to
+the archive file, by default money_diary.archive.db next to the DB. The GUI attaches
+the archive only when a requested date range reaches before the cutoff (see
+app/tiering.py). The cutoff only moves forward; archived dates are read-only.
+"""
+import argparse
+import datetime as dt
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "app"))
+
+from db import connect, ensure_schema  # noqa: E402
+from tiering import archive_before, archive_info, default_archive_path  # noqa: E402
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", dest="db_path", default="money_diary.db", help="SQLite DB path")
+    parser.add_argument("--archive", default=None, help="Archive DB path (default: <db>.archive.db)")
+    cutoff = parser.add_mutually_exclusive_group()
+    cutoff.add_argument("--before", default=None, help="Archive dates before YYYY-MM-DD")
+    cutoff.add_argument(
+        "--keep-months",
+        type=int,
+        default=None,
+        help="Archive whole months older than the last N months (e.g. 12)",
+    )
+    parser.add_argument("--vacuum", action="store_true", help="VACUUM the hot DB afterwards to shrink the file")
+    return parser.parse_args()
+
+
+def month_cutoff(today: dt.date, keep_months: int) -> dt.date:
+    """First day of the month keep_months before today's month."""
+    months = today.year * 12 + today.month - 1 - keep_months
+    return dt.date(months // 12, months % 12 + 1, 1)
+
+
+def size(path: Path) -> str:
+    return f"{path.stat().st_size / 1e6:,.1f} MB" if path.exists() else "-"
+
+
+def main():
+    args = parse_args()
+    today = dt.date.today()
+    if args.before:
+        cutoff = dt.date.fromisoformat(args.before)
+    elif args.keep_months is not None:
+        cutoff = month_cutoff(today, args.keep_months)
+    else:
+        cutoff = None
+    if cutoff is not None and cutoff > today:
+        raise SystemExit("The cutoff must not be in the future")
+
+    db_path = Path(args.db_path)
+    conn = connect(db_path)
+    try:
+        ensure_schema(conn)
+        info = archive_info(conn)
+        archive_path = Path(args.archive or (info["path"] if info else default_archive_path(db_path)))
+        if cutoff is not None:
+            try:
+                moved = archive_before(conn, cutoff.isoformat(), archive_path)
+            except ValueError as exc:
+                raise SystemExit(str(exc)) from None
+            if not moved:
+                print(f"Nothing to archive before {cutoff} (cutoff is {info['cutoff']})")
+            for table, rows in moved.items():
+                print(f"{table:<22} {rows:>10} rows archived")
+            info = archive_info(conn)
+        if args.vacuum:
+            conn.execute("VACUUM")
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    finally:
+        conn.close()
+
+    if info is None:
+        print("No archive yet (use --before YYYY-MM-DD or --keep-months N)")
+        return
+    print(f"Cutoff {info['cutoff']} (archived from {info['first_date'] or '-'})")
+    print(f"hot  {db_path}: {size(db_path)}")
+    print(f"cold {info['path']}: {size(Path(info['path']))}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""Compare the SQLite and DuckDB analytics engines: result parity and query time.
+
+Runs the history queries from app/analytics.py (attribution history, portfolio /
+currency history, v_valuation_enriched) on both engines, fails if results differ,
+and prints the best-of-N timings. Without --db a synthetic DB is generated.
+Exits with status 1 on a parity mismatch.
+"""
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "app"))
+
+from analytics import HISTORY_QUERIES, available_engines, compare_frames, open_engine  # noqa: E402
+from synth_db import build_synthetic_db  # noqa: E402
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", dest="db_path", default=None, help="Existing DB (default: synthetic)")
+    parser.add_argument("--tickers", type=int, default=100, help="Synthetic tickers (default: 100)")
+    parser.add_argument("--days", type=int, default=1000, help="Synthetic calendar days (default: 1000)")
+    parser.add_argument("--accounts", type=int, default=1, help="Synthetic accounts (default: 1)")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per query; best is reported (default: 3)")
+    parser.add_argument("--check-only", action="store_true", help="Only run the parity check")
+    return parser.parse_args()
+
+
+def run(db_path: Path, repeat: int, check_only: bool) -> int:
+    engines = available_engines()
+    if "duckdb" not in engines:
+        print("duckdb is not installed (pip install duckdb); running SQLite timings only")
+    opened = {name: open_engine(name, db_path) for name in engines}
+    failures = 0
+    try:
+        header = f"{'query':<22} {'rows':>9}" + "".join(f" {name + ' s':>10}" for name in engines)
+        print(header)
+        for label, fn in HISTORY_QUERIES.items():
+            results = {}
+            timings = {}
+            for name, engine in opened.items():
+                best = None
+                for _ in range(1 if check_only else repeat):
+                    began = time.perf_counter()
+                    results[name] = fn(engine)
+                    elapsed = time.perf_counter() - began
+                    best = elapsed if best is None else min(best, elapsed)
+                timings[name] = best
+            if "duckdb" in results:
+                diff = compare_frames(results["duckdb"], results["sqlite"])
+                if diff:
+                    failures += 1
+                    print(f"PARITY FAIL {label}: {diff}")
+            rows = len(results["sqlite"])
+            print(f"{label:<22} {rows:>9}" + "".join(f" {timings[name]:>10.3f}" for name in engines))
+    finally:
+        for engine in opened.values():
+            engine.close()
+    return failures
+
+
+def main():
+    args = parse_args()
+    if args.db_path:
+        failures = run(Path(args.db_path), args.repeat, args.check_only)
+    else:
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = Path(tmp) / "bench.db"
+            began = time.perf_counter()
+            counts = build_synthetic_db(db_path, args.tickers, args.days, args.accounts)
+            print(
+                f"Synthetic DB: {counts['snapshots']} snapshots, {counts['dates']} dates "
+                f"({time.perf_counter() - began:.1f}s to build)"
+            )
+            failures = run(db_path, args.repeat, args.check_only)
+    if failures:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
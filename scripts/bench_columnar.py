@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""Benchmark the columnar fetch path against the list-of-dicts path (q_all + DataFrame).
+
+Loads N synthetic asset_prices rows into a temporary DB, then reads them back
+both ways and reports wall time and peak Python memory (tracemalloc).
+"""
+import argparse
+import datetime as dt
+import gc
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "app"))
+
+from columnar import DATE_INDEX, fetch_frame  # noqa: E402
+
+SQL = "SELECT date, ticker, close FROM asset_prices ORDER BY date, ticker"
+
+
+def build(db_path: Path, rows: int) -> None:
+    tickers = [f"T{i:03d}" for i in range(200)]
+    start = dt.date(1990, 1, 1)
+
+    def gen():
+        for n in range(rows):
+            day, i = divmod(n, len(tickers))
+            yield ((start + dt.timedelta(days=day)).isoformat(), tickers[i], 100.0 + (n % 997) * 0.01)
+
+    conn = sqlite3.connect(db_path)
+    with conn:
+        conn.execute(
+            "CREATE TABLE asset_prices (date TEXT NOT NULL, ticker TEXT NOT NULL, close REAL NOT NULL,"
+            " PRIMARY KEY (date, ticker))"
+        )
+        conn.executemany("INSERT INTO asset_prices VALUES (?, ?, ?)", gen())
+    conn.close()
+
+
+def via_dicts(conn: sqlite3.Connection) -> pd.DataFrame:
+    cur = conn.cursor()
+    cur.execute(SQL)
+    rows = [dict(r) for r in cur.fetchall()]
+    df = pd.DataFrame(rows)
+    df["date"] = pd.to_datetime(df["date"])
+    return df
+
+
+def via_columns(conn: sqlite3.Connection) -> pd.DataFrame:
+    return fetch_frame(conn, SQL, dtypes=DATE_INDEX)
+
+
+def measure(fn, conn: sqlite3.Connection) -> tuple[float, float, int]:
+    """Time one run, then trace a second run for peak memory (tracing skews timing)."""
+    gc.collect()
+    began = time.perf_counter()
+    df = fn(conn)
+    elapsed = time.perf_counter() - began
+    rows = len(df)
+    del df
+    gc.collect()
+    tracemalloc.start()
+    fn(conn)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak / 2**20, rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1_000_000, help="Rows to load (default: 1,000,000)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = Path(tmp) / "columnar.db"
+        build(db_path, args.rows)
+        conn = sqlite3.connect(db_path)
+        conn.row_factory = sqlite3.Row
+        try:
+            print(f"{'path':<24} {'rows':>9} {'seconds':>8} {'peak MiB':>9}")
+            for label, fn in (("q_all + DataFrame", via_dicts), ("fetch_frame (columnar)", via_columns)):
+                elapsed, peak, rows = measure(fn, conn)
+                print(f"{label:<24} {rows:>9} {elapsed:>8.2f} {peak:>9.1f}")
+        finally:
+            conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""Benchmark the compact storage format (scripts/compact_db.py) against a schema.sql DB.
+
+Reports the on-disk size of the base tables and their indexes (dbstat) and of
+both files, then times the same read queries on both through the compatibility
+views, and on the compact DB also natively on the integer keys. Builds the
+compact copy in a temporary directory unless --compact is given.
+"""
+import argparse
+import sqlite3
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "app"))
+
+from compact_db import build  # noqa: E402
+from db import connect  # noqa: E402
+
+# Base tables of schema.sql and their compact counterparts
+TABLES = {
+    "snapshots": "c_snapshots",
+    "asset_prices": "c_asset_prices",
+    "fx_rates": "c_fx_rates",
+    "fx_rates_derived": "c_fx_rates_derived",
+}
+
+# label -> (query on both DBs, native query on the compact tables or None); :ticker, :date bound
+QUERIES = {
+    "attribution (all dates)": (
+        "SELECT COUNT(*), SUM(delta_total) FROM v_attribution",
+        "SELECT COUNT(*), SUM(delta_total) FROM"
+        " (SELECT SUM(delta_total) AS delta_total FROM c_v_account_attribution GROUP BY day, asset_id)",
+    ),
+    "valuation join (all)": (
+        "SELECT COUNT(*), SUM(value_jpy) FROM v_account_valuation",
+        "SELECT COUNT(*), SUM(value_jpy) FROM c_v_account_valuation",
+    ),
+    "one ticker, last year": (
+        "SELECT COUNT(*), SUM(close) FROM asset_prices WHERE ticker = :ticker AND date >= date(:date, '-1 year')",
+        "SELECT COUNT(*), SUM(close) FROM c_asset_prices WHERE asset_id = (SELECT id FROM c_assets WHERE ticker = :ticker)"
+        " AND day >= CAST(julianday(:date, '-1 year') - 2440587.5 AS INTEGER)",
+    ),
+    "prices on one date": (
+        "SELECT COUNT(*), SUM(close) FROM asset_prices WHERE date = :date",
+        "SELECT COUNT(*), SUM(close) FROM c_asset_prices WHERE day = CAST(julianday(:date) - 2440587.5 AS INTEGER)",
+    ),
+    "holdings on one date": (
+        "SELECT COUNT(*), SUM(qty * price_ccy) FROM snapshots WHERE date = :date",
+        "SELECT COUNT(*), SUM(qty * price_ccy) FROM c_snapshots WHERE day = CAST(julianday(:date) - 2440587.5 AS INTEGER)",
+    ),
+}
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--db", dest="db_path", default="money_diary.db", help="Source SQLite DB path")
+    parser.add_argument("--compact", default=None, help="Existing compact DB (default: build one in a temp dir)")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per query; the best is reported (default: 3)")
+    return parser.parse_args()
+
+
+def table_bytes(conn: sqlite3.Connection, tables) -> dict[str, tuple[int, int]]:
+    """{table: (table bytes, index bytes)} from dbstat."""
+    sizes = {table: [0, 0] for table in tables}
+    for table, kind, nbytes in conn.execute(
+        """
+        SELECT m.tbl_name, m.type, SUM(d.pgsize)
+        FROM dbstat d
+        JOIN sqlite_master m ON m.name = d.name
+        GROUP BY m.tbl_name, m.type
+        """
+    ):
+        if table in sizes:
+            sizes[table][kind == "index"] += nbytes
+    return {table: (data, index) for table, (data, index) in sizes.items()}
+
+
+def best(conn: sqlite3.Connection, sql: str, params: dict, repeat: int) -> tuple[float, tuple]:
+    elapsed = []
+    for _ in range(repeat):
+        began = time.perf_counter()
+        result = conn.execute(sql, params).fetchone()
+        elapsed.append(time.perf_counter() - began)
+    return min(elapsed) * 1000, result
+
+
+def report(src: sqlite3.Connection, compact: sqlite3.Connection, src_path: Path, compact_path: Path, repeat: int) -> None:
+    mb = 1e6
+    src_sizes = table_bytes(src, TABLES)
+    compact_sizes = table_bytes(compact, TABLES.values())
+    print(f"{'table':<18} {'rows':>9} {'data MB':>8} {'index MB':>9} {'compact':>8} {'c_index':>8}")
+    for table, c_table in TABLES.items():
+        rows = src.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+        data, index = src_sizes[table]
+        c_data, c_index = compact_sizes[c_table]
+        print(f"{table:<18} {rows:>9} {data / mb:>8.1f} {index / mb:>9.1f} {c_data / mb:>8.1f} {c_index / mb:>8.1f}")
+    print(f"file: {src_path.stat().st_size / mb:,.1f} MB -> {compact_path.stat().st_size / mb:,.1f} MB")
+
+    ticker, date = src.execute("SELECT ticker, MAX(date) FROM snapshots GROUP BY ticker ORDER BY ticker LIMIT 1").fetchone() or (None, None)
+    params = {"ticker": ticker, "date": date}
+    print(f"\n{'query':<24} {'source ms':>10} {'compact ms':>11} {'native ms':>10}")
+    for label, (sql, native) in QUERIES.items():
+        src_ms, expected = best(src, sql, params, repeat)
+        compact_ms, result = best(compact, sql, params, repeat)
+        if result[0] != expected[0]:
+            raise SystemExit(f"{label}: {result} != {expected}")
+        native_ms = f"{best(compact, native, params, repeat)[0]:>10.1f}" if native else f"{'-':>10}"
+        print(f"{label:<24} {src_ms:>10.1f} {compact_ms:>11.1f} {native_ms}")
+
+
+def main():
+    args = parse_args()
+    src_path = Path(args.db_path)
+    src = connect(src_path, read_only=True)
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            compact_path = Path(args.compact) if args.compact else Path(tmp) / "compact.db"
+            if not args.compact:
+                out = sqlite3.connect(compact_path)
+                with out:
+                    build(src, out)
+                out.execute("VACUUM")
+                out.close()
+            compact = connect(compact_path, read_only=True)
+            try:
+                report(src, compact, src_path, compact_path, args.repeat)
+            finally:
+                compact.close()
+    finally:
+        src.close()
+
+
+if __name__ == "__main__":
+    main()
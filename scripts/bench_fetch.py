@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""Benchmark fetcher throughput against the local Yahoo stub (no network access).
+
+Runs the price fetch path sequentially, concurrently and batched against
+scripts/yahoo_stub.py and reports symbols/sec, p50/p99 request latency and
+asset_prices rows written/sec.
+"""
+import argparse
+import datetime as dt
+import sqlite3
+import tempfile
+import time
+from pathlib import Path
+
+from fetch_prices import upsert
+from yahoo_client import FetchRecorder, fetch_histories, percentile
+from yahoo_stub import StubConfig, start_stub
+
+SCHEMA_PATH = Path(__file__).resolve().parent.parent / "schema.sql"
+
+
+def run_mode(
+    name: str,
+    base_url: str,
+    db_path: Path,
+    symbols: list[str],
+    start: dt.date,
+    end: dt.date,
+    workers: int,
+    batch_size: int,
+) -> dict:
+    recorder = FetchRecorder("bench_fetch", [name])
+    began = time.perf_counter()
+    histories, _ = fetch_histories(
+        symbols,
+        start,
+        end,
+        user_agent="MoneyDiaryBench/1.0",
+        recorder=recorder,
+        base_url=base_url,
+        batch_size=batch_size,
+        workers=workers,
+        retry_backoff=0.05,
+    )
+    fetch_s = time.perf_counter() - began
+
+    conn = sqlite3.connect(db_path)
+    try:
+        began = time.perf_counter()
+        rows = 0
+        with conn:
+            for symbol, history in histories.items():
+                for date, close in history.items():
+                    rows += upsert(conn, date, symbol, close)
+        write_s = time.perf_counter() - began
+    finally:
+        conn.close()
+
+    latencies = [r["latency_ms"] for r in recorder.requests if r.get("latency_ms") is not None]
+    return {
+        "mode": name,
+        "requests": len(recorder.requests),
+        "retries": sum(r.get("retries") or 0 for r in recorder.requests),
+        "symbols_per_s": len(histories) / fetch_s if fetch_s else 0.0,
+        "p50_ms": percentile(latencies, 50) or 0.0,
+        "p99_ms": percentile(latencies, 99) or 0.0,
+        "rows": rows,
+        "rows_per_s": rows / write_s if write_s else 0.0,
+    }
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--symbols", type=int, default=150, help="Number of synthetic symbols (default: 150)")
+    parser.add_argument("--days", type=int, default=30, help="Calendar days per symbol (default: 30)")
+    parser.add_argument("--workers", type=int, default=8, help="Workers for the concurrent mode (default: 8)")
+    parser.add_argument("--batch-size", type=int, default=20, help="Symbols per batched request (default: 20)")
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="Stub latency (default: 50)")
+    parser.add_argument("--jitter-ms", type=float, default=20.0, help="Stub jitter (default: 20)")
+    parser.add_argument("--rate-429", type=float, default=0.0, help="Stub 429 fraction")
+    parser.add_argument("--rate-503", type=float, default=0.0, help="Stub 503 fraction")
+    parser.add_argument("--pad-bytes", type=int, default=0, help="Stub extra payload bytes")
+    parser.add_argument("--seed", type=int, default=1, help="Stub random seed (default: 1)")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    config = StubConfig(args.latency_ms, args.jitter_ms, args.rate_429, args.rate_503, args.pad_bytes, args.seed)
+    server = start_stub(config)
+    base_url = f"http://127.0.0.1:{server.server_port}"
+    symbols = [f"SYM{i:04d}" for i in range(args.symbols)]
+    end = dt.date(2025, 9, 30)
+    start = end - dt.timedelta(days=args.days - 1)
+    modes = (
+        ("sequential", 1, 1),
+        (f"concurrent x{args.workers}", args.workers, 1),
+        (f"batched /{args.batch_size}", 1, args.batch_size),
+        (f"batched /{args.batch_size} x{args.workers}", args.workers, args.batch_size),
+    )
+
+    print(
+        f"{args.symbols} symbols x {args.days} days, stub latency {args.latency_ms}±{args.jitter_ms} ms, "
+        f"429/503 rate {args.rate_429}/{args.rate_503}"
+    )
+    print(f"{'mode':<22} {'req':>5} {'retry':>5} {'sym/s':>8} {'p50ms':>7} {'p99ms':>7} {'rows':>7} {'rows/s':>9}")
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            for name, workers, batch_size in modes:
+                db_path = Path(tmp) / f"bench_{workers}_{batch_size}.db"
+                conn = sqlite3.connect(db_path)
+                conn.executescript(SCHEMA_PATH.read_text(encoding="utf-8"))
+                conn.close()
+                r = run_mode(name, base_url, db_path, symbols, start, end, workers, batch_size)
+                print(
+                    f"{r['mode']:<22} {r['requests']:>5} {r['retries']:>5} {r['symbols_per_s']:>8.1f} "
+                    f"{r['p50_ms']:>7.1f} {r['p99_ms']:>7.1f} {r['rows']:>7} {r['rows_per_s']:>9.0f}"
+                )
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""Measure cold-start import time of the app and each CLI with `python -X importtime`.
+
+Each target is imported in a fresh interpreter (best of --repeat runs) and its
+cumulative import time is reported; interpreter startup (site, encodings) is
+excluded. The heaviest direct imports are listed so a regression can be traced
+to the dependency that caused it. Exits with status 1 if a target exceeds its
+budget or loads a dependency that is meant to be imported on first use.
+"""
+import argparse
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Dependencies that are imported on first use and must not appear at module load
+APP_DEFERRED = ("pandas", "numpy", "dotenv", "openai")
+CLI_DEFERRED = APP_DEFERRED + ("urllib.request", "concurrent.futures")
+
+# module -> (directory it is run from, budget in ms, deferred dependencies).
+# The app budget is dominated by streamlit itself (~350 ms).
+TARGETS = {
+    "streamlit_app": ("app", 550, APP_DEFERRED),
+    "fetch_fx": ("scripts", 40, CLI_DEFERRED),
+    "fetch_prices": ("scripts", 40, CLI_DEFERRED),
+    "fetch_report": ("scripts", 40, CLI_DEFERRED),
+    "replay_ledger": ("scripts", 30, CLI_DEFERRED),
+    "migrate_db": ("scripts", 30, CLI_DEFERRED),
+    "update_risk": ("scripts", 30, CLI_DEFERRED),
+    "run_scenarios": ("scripts", 30, CLI_DEFERRED),
+}
+
+
+def import_profile(module: str, cwd: Path) -> tuple[float, dict[str, float], set[str]]:
+    """Return (cumulative ms of module, {direct import: cumulative ms}, all imported module names)."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=cwd,
+        capture_output=True,
+        text=True,
+        check=False,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+    total = 0.0
+    direct: dict[str, float] = {}
+    names: set[str] = set()
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if not cumulative.strip().isdigit():
+            continue  # header line
+        ms = int(cumulative) / 1000
+        names.add(name.strip())
+        # nesting is shown by two extra spaces per level; children are logged before their parent
+        depth = (len(name) - len(name.lstrip(" ")) - 1) // 2
+        if depth == 1:
+            direct[name.strip()] = ms
+        elif depth == 0:
+            if name.strip() == module:
+                total = ms
+                break
+            direct.clear()  # site / encodings and their children: interpreter startup
+    return total, direct, names
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("targets", nargs="*", help=f"Modules to measure (default: all of {', '.join(TARGETS)})")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per target; best is reported (default: 5)")
+    parser.add_argument("--top", type=int, default=3, help="Heaviest direct imports to show (default: 3)")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    unknown = [t for t in args.targets if t not in TARGETS]
+    if unknown:
+        raise SystemExit(f"Unknown target(s): {', '.join(unknown)}")
+    failures = 0
+    print(f"{'target':<16} {'ms':>8} {'budget':>7}  heaviest imports")
+    for module in args.targets or TARGETS:
+        directory, budget, deferred = TARGETS[module]
+        best = None
+        for _ in range(max(args.repeat, 1)):
+            run = import_profile(module, ROOT / directory)
+            if best is None or run[0] < best[0]:
+                best = run
+        total, direct, names = best
+        heaviest = sorted(direct.items(), key=lambda kv: kv[1], reverse=True)[: args.top]
+        status = "ok" if total <= budget else "OVER"
+        print(
+            f"{module:<16} {total:>8.1f} {budget:>7}  "
+            + ", ".join(f"{name} {ms:.1f}" for name, ms in heaviest)
+            + ("" if status == "ok" else "  OVER BUDGET")
+        )
+        loaded = sorted(name for name in deferred if name in names)
+        if status != "ok" or loaded:
+            failures += 1
+        if loaded:
+            print(f"  {module} imports deferred dependencies at load: {', '.join(loaded)}")
+    if failures:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
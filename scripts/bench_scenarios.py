@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""Benchmark the scenario engine (app/scenarios.py) on a synthetic DB.
+
+Times a 100 x 100 grid of FX x equity shocks and --paths Monte Carlo paths
+(normal and bootstrap) over --tickers holdings, and checks the batched
+decomposition against a per-scenario revaluation (new value - base value).
+Exits with status 1 on a mismatch or if a run exceeds --budget seconds.
+"""
+import argparse
+import datetime as dt
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "app"))
+
+from db import connect  # noqa: E402
+from scenarios import decompose, load_history, load_positions, shock_returns, simulate  # noqa: E402
+from synth_db import build_synthetic_db  # noqa: E402
+
+
+def revalue(positions: dict, price_returns: np.ndarray, fx_returns: np.ndarray, ccys: list[str]) -> np.ndarray:
+    """Total JPY change per scenario by revaluing each holding one scenario at a time."""
+    totals = []
+    for price_row, fx_row in zip(price_returns, fx_returns):
+        fx_by_ccy = dict(zip(ccys, fx_row))
+        new = 0.0
+        for h, ccy in enumerate(positions["ccys"]):
+            price = positions["price"][h] * (1 + price_row[h])
+            rate = positions["fx_rate"][h] * (1 + fx_by_ccy.get(ccy, 0.0))
+            new += positions["qty"][h] * price * rate
+        totals.append(new - positions["value"].sum())
+    return np.array(totals)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tickers", type=int, default=200, help="Synthetic holdings (default: 200)")
+    parser.add_argument("--days", type=int, default=1000, help="Calendar days of history (default: 1000)")
+    parser.add_argument("--paths", type=int, default=10_000, help="Monte Carlo paths (default: 10000)")
+    parser.add_argument("--budget", type=float, default=1.0, help="Seconds allowed per run (default: 1.0)")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    failures = 0
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = Path(tmp) / "scenarios.db"
+        build_synthetic_db(db_path, args.tickers, args.days, end=dt.date(2025, 9, 30))
+        conn = connect(db_path, read_only=True)
+        try:
+            date = conn.execute("SELECT MAX(date) FROM v_valuation").fetchone()[0]
+            runs = {}
+
+            began = time.perf_counter()
+            positions = load_positions(conn, date)
+            grid = [
+                {"USDJPY": fx, "EURJPY": fx, "*": eq}
+                for fx in np.linspace(-0.2, 0.2, 100)
+                for eq in np.linspace(-0.4, 0.2, 100)
+            ]
+            price_returns, fx_returns = shock_returns(positions, grid)
+            shocked = decompose(positions, price_returns, fx_returns)
+            runs["shock grid"] = (len(grid), time.perf_counter() - began)
+
+            for method in ("normal", "bootstrap"):
+                began = time.perf_counter()
+                history = load_history(conn, positions, 250)
+                changes = simulate(history, args.paths, 20, method, seed=1)
+                holdings = len(positions["tickers"])
+                decompose(positions, changes[:, :holdings], changes[:, holdings:])
+                runs[f"monte carlo ({method})"] = (args.paths, time.perf_counter() - began)
+        finally:
+            conn.close()
+
+    ccys = sorted({c for c in positions["ccys"] if c != "JPY"})
+    sample = slice(0, len(grid), 997)
+    expected = revalue(positions, price_returns[sample], fx_returns[sample], ccys)
+    error = np.max(np.abs(shocked["total"][sample] - expected) / positions["value"].sum())
+    print(f"{len(positions['tickers'])} holdings on {date}; max relative mismatch vs revaluation {error:.2e}")
+    if error > 1e-9:
+        failures += 1
+    print(f"{'run':<26} {'scenarios':>10} {'seconds':>8}")
+    for name, (count, seconds) in runs.items():
+        over = seconds > args.budget
+        failures += over
+        print(f"{name:<26} {count:>10} {seconds:>8.3f}" + ("  OVER BUDGET" if over else ""))
+    if failures:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
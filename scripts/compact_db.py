@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""Write a compact read-only copy of a Money Diary DB (schema_compact.sql).
+
+Dates become integer day numbers and tickers / pairs / currencies / accounts
+small interned ids, stored in WITHOUT ROWID tables keyed by series. Views under
+the original table names (snapshots, asset_prices, fx_rates, ...) and the
+reporting views v_valuation, v_portfolio_total and v_attribution decode back to
+ISO dates and text keys, so read-only queries and exports run unchanged. The
+source DB is opened read-only; archived history (scripts/archive_db.py) is
+included. --verify compares every compatibility view with the source.
+"""
+import argparse
+import sqlite3
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "app"))
+
+import tiering  # noqa: E402
+from db import ROOT, connect  # noqa: E402
+
+COMPACT_SCHEMA_PATH = ROOT / "schema_compact.sql"
+
+DAY = "CAST(julianday(date) - 2440587.5 AS INTEGER)"
+
+# Compatibility view -> key columns; the other columns are compared with a relative
+# tolerance since consolidated sums may add up in another order
+PARITY = {
+    "accounts": ("account",),
+    "assets": ("ticker",),
+    "reporting_currencies": ("ccy",),
+    "fx_rates": ("date", "pair"),
+    "fx_rates_derived": ("date", "pair"),
+    "asset_prices": ("date", "ticker"),
+    "snapshots": ("account", "date", "ticker"),
+    "v_valuation": ("date", "ticker"),
+    "v_portfolio_total": ("date",),
+    "v_account_attribution": ("account", "date", "ticker"),
+    "v_attribution": ("date", "ticker"),
+}
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", dest="db_path", default="money_diary.db", help="Source SQLite DB path")
+    parser.add_argument("--out", default=None, help="Compact DB path (default: <db>.compact.db)")
+    parser.add_argument("--force", action="store_true", help="Overwrite --out if it exists")
+    parser.add_argument("--verify", action="store_true", help="Compare every compatibility view with the source")
+    return parser.parse_args()
+
+
+def default_compact_path(db_path: Path | str) -> Path:
+    """money_diary.db -> money_diary.compact.db next to it."""
+    db_path = Path(db_path)
+    return db_path.with_name(f"{db_path.stem}.compact.db")
+
+
+def _intern(out: sqlite3.Connection, table: str, column: str, values) -> dict[str, int]:
+    ids = {value: n for n, value in enumerate(sorted(set(values)), start=1)}
+    out.executemany(f"INSERT INTO {table} (id, {column}) VALUES (?, ?)", [(n, v) for v, n in ids.items()])
+    return ids
+
+
+def build(src: sqlite3.Connection, out: sqlite3.Connection) -> dict[str, int]:
+    """Copy src (schema.sql, cold tier attached) into an empty compact DB; returns rows per table."""
+    out.executescript(COMPACT_SCHEMA_PATH.read_text(encoding="utf-8"))
+
+    def col(sql: str) -> list:
+        return [row[0] for row in src.execute(sql)]
+
+    ccy_of = dict(src.execute("SELECT ticker, ccy FROM assets"))
+    ccys = _intern(
+        out,
+        "c_ccys",
+        "ccy",
+        [*ccy_of.values(), *col("SELECT ccy FROM reporting_currencies"), *col("SELECT via FROM fx_rates_derived WHERE via IS NOT NULL")],
+    )
+    pairs = _intern(
+        out,
+        "c_pairs",
+        "pair",
+        [
+            *col("SELECT DISTINCT pair FROM fx_rates"),
+            *col("SELECT DISTINCT pair FROM fx_rates_derived"),
+            *col("SELECT DISTINCT leg1 FROM fx_rates_derived"),
+            *col("SELECT DISTINCT leg2 FROM fx_rates_derived WHERE leg2 IS NOT NULL"),
+            *(f"{ccy}JPY" for ccy in ccys if ccy != "JPY"),
+        ],
+    )
+    out.executemany(
+        "UPDATE c_ccys SET jpy_pair_id = ? WHERE id = ?",
+        [(pairs[f"{ccy}JPY"], n) for ccy, n in ccys.items() if ccy != "JPY"],
+    )
+    accounts = _intern(out, "c_accounts", "account", col("SELECT account FROM accounts"))
+    out.executemany("UPDATE c_accounts SET name = ? WHERE account = ?", [(n, a) for a, n in src.execute("SELECT account, name FROM accounts")])
+    assets = {ticker: n for n, ticker in enumerate(sorted(ccy_of), start=1)}
+    out.executemany(
+        "INSERT INTO c_assets (id, ticker, ccy_id, name) VALUES (?, ?, ?, ?)",
+        [(assets[t], t, ccys[c], name) for t, c, name in src.execute("SELECT ticker, ccy, name FROM assets")],
+    )
+    out.executemany("INSERT INTO c_reporting_currencies (ccy_id) VALUES (?)", [(ccys[c],) for c in col("SELECT ccy FROM reporting_currencies")])
+
+    # rows arrive in key order of the compact tables, so the WITHOUT ROWID b-trees are appended to
+    copies = {
+        "c_fx_rates": (
+            f"SELECT pair, {DAY}, rate FROM fx_rates ORDER BY pair, date",
+            lambda p, d, r: (pairs[p], d, r),
+        ),
+        "c_fx_rates_derived": (
+            f"SELECT pair, {DAY}, rate, via, leg1, leg2, formula FROM fx_rates_derived ORDER BY pair, date",
+            lambda p, d, r, via, l1, l2, f: (pairs[p], d, r, ccys.get(via), pairs[l1], pairs.get(l2), f),
+        ),
+        "c_asset_prices": (
+            f"SELECT ticker, {DAY}, close FROM asset_prices ORDER BY ticker, date",
+            lambda t, d, c: (assets[t], d, c),
+        ),
+        "c_snapshots": (
+            f"SELECT account, ticker, {DAY}, qty, price_ccy FROM snapshots ORDER BY account, ticker, date",
+            lambda a, t, d, q, p: (accounts[a], assets[t], d, q, p),
+        ),
+    }
+    rows = {}
+    for table, (sql, convert) in copies.items():
+        cur = src.execute(sql)
+        width = len(cur.description)
+        insert = f"INSERT INTO {table} VALUES ({', '.join('?' * width)})"
+        rows[table] = 0
+        while chunk := cur.fetchmany(10_000):
+            out.executemany(insert, [convert(*row) for row in chunk])
+            rows[table] += len(chunk)
+    return rows
+
+
+def verify(src: sqlite3.Connection, out_path: Path) -> dict[str, int]:
+    """Rows that differ per compatibility view (missing on either side or values off)."""
+
+    def count(sql: str) -> int:
+        return src.execute(sql).fetchone()[0]
+
+    src.execute("ATTACH DATABASE ? AS compact", (f"file:{out_path}?mode=ro",))
+    try:
+        mismatches = {}
+        for view, keys in PARITY.items():
+            columns = [row[1] for row in src.execute(f"PRAGMA table_info({view})")]
+            values = [c for c in columns if c not in keys]
+            on = " AND ".join(f"s.{k} = c.{k}" for k in keys)
+            # decoded keys are not indexable: copy the compact side so the join gets an automatic index
+            src.execute("DROP TABLE IF EXISTS temp.compact_rows")
+            src.execute(f"CREATE TEMP TABLE compact_rows AS SELECT * FROM compact.{view}")
+            differ = " OR ".join(
+                f"(s.{v} IS NULL) <> (c.{v} IS NULL)"
+                f" OR (typeof(s.{v}) = 'real' AND abs(s.{v} - c.{v}) > 1e-9 * max(1.0, abs(s.{v})))"
+                f" OR (typeof(s.{v}) <> 'real' AND s.{v} IS NOT c.{v})"
+                for v in values
+            ) or "0"
+            matched, wrong = src.execute(
+                f"SELECT COUNT(*), COALESCE(SUM({differ}), 0) FROM {view} s JOIN temp.compact_rows c ON {on}"
+            ).fetchone()
+            total = count(f"SELECT COUNT(*) FROM {view}") + count("SELECT COUNT(*) FROM temp.compact_rows")
+            mismatches[view] = wrong + total - 2 * matched
+        return mismatches
+    finally:
+        src.execute("DROP TABLE IF EXISTS temp.compact_rows")
+        src.execute("DETACH DATABASE compact")
+
+
+def size(path: Path) -> str:
+    return f"{path.stat().st_size / 1e6:,.1f} MB"
+
+
+def main():
+    args = parse_args()
+    db_path = Path(args.db_path)
+    out_path = Path(args.out) if args.out else default_compact_path(db_path)
+    if not db_path.exists():
+        raise SystemExit(f"{db_path} not found")
+    if out_path.exists():
+        if not args.force:
+            raise SystemExit(f"{out_path} exists (use --force to overwrite)")
+        out_path.unlink()
+
+    began = time.perf_counter()
+    src = connect(db_path, read_only=True)
+    try:
+        tiering.ensure_range(src, None)
+        tmp_path = out_path.with_name(out_path.name + ".tmp")
+        tmp_path.unlink(missing_ok=True)
+        out = sqlite3.connect(tmp_path)
+        try:
+            out.execute("PRAGMA journal_mode = OFF")
+            out.execute("PRAGMA synchronous = OFF")
+            with out:
+                rows = build(src, out)
+            out.execute("VACUUM")
+        finally:
+            out.close()
+        tmp_path.replace(out_path)
+        for table, count in rows.items():
+            print(f"{table:<20} {count:>10} rows")
+        print(f"{db_path}: {size(db_path)} -> {out_path}: {size(out_path)} ({time.perf_counter() - began:.1f}s)")
+        if args.verify:
+            mismatches = verify(src, out_path)
+            for view, count in mismatches.items():
+                print(f"verify {view:<22} {'ok' if count == 0 else f'{count} rows differ'}")
+            if any(mismatches.values()):
+                raise SystemExit(1)
+    finally:
+        src.close()
+
+
+if __name__ == "__main__":
+    main()
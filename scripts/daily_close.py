@@ -0,0 +1,393 @@
+#!/usr/bin/env python3
+"""Run the end-of-day close as one pipeline: fetch, snapshots, derived tables, summaries.
+
+Stages form a small DAG and each starts as soon as the stages it depends on finish:
+
+  fx ───────┐
+            ├── snapshots ──┬── risk
+  prices ───┘               ├── gaps
+                            ├── tscache
+                            └── summaries
+
+fx and prices fetch in parallel (each on its own connection), so the run takes
+about as long as the slower fetch plus the incremental work after it. A stage
+whose inputs did not change is skipped: fetches skip keys whose stored data
+already reaches the close date, snapshots are written only for replayed ledger
+entries and newly changed closes, risk / gaps / tscache only run with rows in
+risk_dirty / gap_dirty / tscache_dirty (tscache only once the GUI has built the
+chart cache, app/tscache.py), and summaries only when a recent date has no
+summary for its current prompt (and OPENAI_API_KEY is set). Fetched rates and
+closes go through ingest screening (app/screening.py) as in fetch_fx.py /
+fetch_prices.py; held values wait in ingest_quarantine for
+scripts/review_quarantine.py. Per-stage timings are printed at the end.
+"""
+import argparse
+import datetime as dt
+import os
+import sqlite3
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from functools import partial
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "app"))
+
+import fetch_fx  # noqa: E402
+import fetch_prices  # noqa: E402
+from db import connect, ensure_schema  # noqa: E402
+from replay_ledger import CHECKPOINT_EVERY, replay_ticker, write_snapshots  # noqa: E402
+from yahoo_client import YAHOO_BASE_URL, FetchRecorder, backfill  # noqa: E402
+
+# name -> (dependencies, stage function); a stage returns (status, detail)
+STAGES = {}
+
+
+def stage(name: str, *deps: str):
+    def register(fn):
+        STAGES[name] = (deps, fn)
+        return fn
+
+    return register
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", dest="db_path", default="money_diary.db", help="SQLite DB path")
+    parser.add_argument("--date", default=None, help="Close date YYYY-MM-DD (default: today)")
+    parser.add_argument(
+        "--lookback",
+        type=int,
+        default=7,
+        help="Days to fetch for tickers / pairs with no stored data yet (default: 7)",
+    )
+    parser.add_argument("--force", action="store_true", help="Refetch keys whose data already reaches the close date")
+    parser.add_argument(
+        "--symbol",
+        action="append",
+        default=[],
+        metavar="TICKER=YAHOO_SYMBOL",
+        help="Yahoo symbol for a ticker whose symbol differs (repeatable)",
+    )
+    parser.add_argument("--workers", type=int, default=4, help="Concurrent requests per fetch stage (default: 4)")
+    parser.add_argument(
+        "--base-url",
+        default=YAHOO_BASE_URL,
+        help="Yahoo Finance base URL, e.g. a local stub (scripts/yahoo_stub.py)",
+    )
+    parser.add_argument(
+        "--summary-days",
+        type=int,
+        default=5,
+        help="Latest dates to keep summarized; 0 = skip the summaries stage (default: 5)",
+    )
+    parser.add_argument("--openai-base-url", default=None, help="OpenAI-compatible API base URL (default: OpenAI)")
+    return parser.parse_args()
+
+
+def fetch_plan(
+    conn, target: str, key_column: str, keys: list[str], end: dt.date, lookback: int, force: bool
+) -> tuple[list[str], dt.date | None]:
+    """Keys to fetch and the window start: from the earliest last stored date (refetched), or lookback days."""
+    pending = []
+    start = None
+    for key in keys:
+        last = conn.execute(f"SELECT MAX(date) FROM {target} WHERE {key_column} = ?", (key,)).fetchone()[0]
+        if last is not None and last >= end.isoformat() and not force:
+            continue
+        key_start = min(dt.date.fromisoformat(last), end) if last else end - dt.timedelta(days=lookback)
+        pending.append(key)
+        start = key_start if start is None else min(start, key_start)
+    return pending, start
+
+
+def run_fetch(ctx: dict, name: str, target: str, items: list[tuple[str, str]], start: dt.date, store, **options):
+    conn = connect(ctx["args"].db_path)
+    try:
+        recorder = FetchRecorder(f"daily_close:{name}", sys.argv[1:], conn)
+        try:
+            backfill(
+                items,
+                start,
+                ctx["end"],
+                target=target,
+                store=store,
+                on_chunk=lambda *_: None,
+                recorder=recorder,
+                conn=conn,
+                chunk_days=365,
+                resume=False,
+                workers=ctx["args"].workers,
+                base_url=ctx["args"].base_url,
+                **options,
+            )
+        except RuntimeError:
+            recorder.finish("error")
+            raise
+        recorder.finish("ok")
+        return sum(r.get("rows_changed") or 0 for r in recorder.requests), len(recorder.requests)
+    finally:
+        conn.close()
+
+
+@stage("fx")
+def stage_fx(ctx: dict) -> tuple[str, str]:
+    args = ctx["args"]
+    conn = connect(args.db_path)
+    try:
+        ccys = [
+            row[0]
+            for row in conn.execute(
+                """
+                SELECT ccy FROM assets WHERE ccy <> 'JPY'
+                UNION
+                SELECT ccy FROM reporting_currencies WHERE ccy <> 'JPY'
+                ORDER BY 1
+                """
+            )
+        ]
+        keys = [f"{ccy}JPY" for ccy in ccys]
+        pairs, start = fetch_plan(conn, "fx_rates", "pair", keys, ctx["end"], args.lookback, args.force)
+    finally:
+        conn.close()
+    if not pairs:
+        return "skipped", f"{len(ccys)} pairs up to date"
+    changed, requests = run_fetch(
+        ctx,
+        "fx",
+        "fx_rates",
+        [(pair, f"{pair}=X") for pair in pairs],
+        start,
+        partial(fetch_fx.store_history, source="daily_close"),
+        user_agent=fetch_fx.USER_AGENT,
+        timeout=15,
+    )
+    return "ran", f"{len(pairs)} pairs from {start}, {requests} requests, {changed} rows changed"
+
+
+@stage("prices")
+def stage_prices(ctx: dict) -> tuple[str, str]:
+    args = ctx["args"]
+    symbols = dict(spec.split("=", 1) for spec in args.symbol)
+    conn = connect(args.db_path)
+    try:
+        tickers = [row[0] for row in conn.execute("SELECT ticker FROM assets ORDER BY ticker")]
+        pending, start = fetch_plan(conn, "asset_prices", "ticker", tickers, ctx["end"], args.lookback, args.force)
+    finally:
+        conn.close()
+    if not pending:
+        return "skipped", f"{len(tickers)} tickers up to date"
+
+    changed_from = ctx["price_changes"]
+
+    def store(conn, ticker: str, history: dict[str, float]) -> int:
+        changed: list[str] = []
+        n = fetch_prices.store_history(conn, ticker, history, source="daily_close", changed_dates=changed)
+        if changed:
+            changed_from[ticker] = min(changed_from.get(ticker, changed[0]), changed[0])
+        return n
+
+    changed, requests = run_fetch(
+        ctx,
+        "prices",
+        "asset_prices",
+        [(ticker, symbols.get(ticker, ticker)) for ticker in pending],
+        start,
+        store,
+        user_agent=fetch_prices.USER_AGENT,
+    )
+    return "ran", f"{len(pending)} tickers from {start}, {requests} requests, {changed} rows changed"
+
+
+@stage("snapshots", "fx", "prices")
+def stage_snapshots(ctx: dict) -> tuple[str, str]:
+    """Replay dirty ledger entries and write ledger holdings for dates whose close changed."""
+    conn = connect(ctx["args"].db_path)
+    try:
+        dirty = conn.execute("SELECT account, ticker, from_date FROM ledger_dirty ORDER BY account, ticker").fetchall()
+        todo = {(account, ticker): from_date for account, ticker, from_date in dirty}
+        for ticker, from_date in ctx["price_changes"].items():
+            for (account,) in conn.execute(
+                "SELECT DISTINCT account FROM ledger_positions WHERE ticker = ?", (ticker,)
+            ).fetchall():
+                todo[(account, ticker)] = min(todo.get((account, ticker), from_date), from_date)
+        if not todo:
+            return "skipped", "no ledger changes or new closes"
+        replayed = written = 0
+        replay = {(account, ticker) for account, ticker, _ in dirty}
+        for (account, ticker), from_date in sorted(todo.items()):
+            with conn:
+                if (account, ticker) in replay:
+                    replayed += replay_ticker(conn, account, ticker, from_date, CHECKPOINT_EVERY)
+                written += write_snapshots(conn, account, ticker, from_date)
+    finally:
+        conn.close()
+    return "ran", f"{len(todo)} holdings, {replayed} transactions replayed, {written} snapshots written"
+
+
+@stage("risk", "snapshots")
+def stage_risk(ctx: dict) -> tuple[str, str]:
+    from risk import update_risk
+
+    conn = connect(ctx["args"].db_path)
+    try:
+        if conn.execute("SELECT 1 FROM risk_dirty LIMIT 1").fetchone() is None:
+            return "skipped", "risk_dirty is empty"
+        result = update_risk(conn)
+    finally:
+        conn.close()
+    return "ran", f"{result['series']} series, {result['rows']} rows"
+
+
+@stage("gaps", "snapshots")
+def stage_gaps(ctx: dict) -> tuple[str, str]:
+    from gaps import scan_gaps
+
+    conn = connect(ctx["args"].db_path)
+    try:
+        if conn.execute("SELECT 1 FROM gap_dirty LIMIT 1").fetchone() is None:
+            return "skipped", "gap_dirty is empty"
+        scanned = scan_gaps(conn)
+    finally:
+        conn.close()
+    return "ran", ", ".join(f"{kind} {n}" for kind, n in scanned.items()) + " gaps"
+
+
+@stage("tscache", "snapshots")
+def stage_tscache(ctx: dict) -> tuple[str, str]:
+    """Keep an existing chart cache warm so the first GUI render after the close is fast."""
+    from tscache import SeriesCache, default_cache_dir
+
+    db_path = ctx["args"].db_path
+    if not default_cache_dir(db_path).exists():
+        return "skipped", "no chart cache (built by the GUI on first use)"
+    written = SeriesCache(db_path).refresh()
+    if not written:
+        return "skipped", "tscache_dirty is empty"
+    return "ran", f"{len(written)} series, {sum(written.values())} rows"
+
+
+@stage("summaries", "snapshots")
+def stage_summaries(ctx: dict) -> tuple[str, str]:
+    from summaries import (
+        day_prompt,
+        ensure_summary_table,
+        load_summary,
+        precompute_daily,
+        recent_dates,
+    )
+
+    args = ctx["args"]
+    if args.summary_days <= 0:
+        return "skipped", "--summary-days 0"
+    conn = connect(args.db_path)
+    try:
+        ensure_summary_table(conn)
+        dates = recent_dates(conn, args.summary_days)
+        stale = []
+        for date in dates:
+            prompt = day_prompt(conn, date)
+            if prompt is not None and load_summary(conn, "day", date, prompt) is None:
+                stale.append(date)
+    finally:
+        conn.close()
+    if not stale:
+        return "skipped", f"{len(dates)} dates summarized"
+
+    from dotenv import load_dotenv
+
+    load_dotenv(ROOT / ".env")
+    api_key = os.getenv("OPENAI_API_KEY")
+    if not api_key:
+        return "skipped", f"{len(stale)} dates stale, OPENAI_API_KEY not set"
+
+    import asyncio
+
+    from openai import AsyncOpenAI
+
+    failures: dict[str, str] = {}
+
+    async def run() -> dict[str, int]:
+        client = AsyncOpenAI(api_key=api_key, base_url=args.openai_base_url)
+        try:
+            return await precompute_daily(args.db_path, client, stale, failures=failures)
+        finally:
+            await client.close()
+
+    counts = asyncio.run(run())
+    if failures:
+        raise RuntimeError(
+            f"{len(failures)} of {len(stale)} summaries failed: "
+            + ", ".join(f"{date} ({msg})" for date, msg in sorted(failures.items()))
+        )
+    return "ran", ", ".join(f"{status} {n}" for status, n in counts.items() if n)
+
+
+def run_stage(ctx: dict, name: str, fn) -> dict:
+    began = time.perf_counter()
+    try:
+        status, detail = fn(ctx)
+    # DB, network / file and stage-reported errors fail the stage; anything else is a bug and propagates
+    except (sqlite3.Error, OSError, RuntimeError, ValueError) as exc:
+        status, detail = "failed", f"{type(exc).__name__}: {exc}"
+    return {"status": status, "detail": detail, "start": began - ctx["began"], "seconds": time.perf_counter() - began}
+
+
+def run_pipeline(ctx: dict) -> dict[str, dict]:
+    """Run STAGES, each as soon as its dependencies finish; dependents of a failed stage are blocked."""
+    results: dict[str, dict] = {}
+    pending = dict(STAGES)
+    with ThreadPoolExecutor(max_workers=len(STAGES)) as pool:
+        running = {}
+        while pending or running:
+            for name, (deps, fn) in list(pending.items()):
+                if not all(dep in results for dep in deps):
+                    continue
+                del pending[name]
+                failed = [dep for dep in deps if results[dep]["status"] in ("failed", "blocked")]
+                if failed:
+                    detail = f"{', '.join(failed)} failed"
+                    results[name] = {"status": "blocked", "detail": detail, "start": None, "seconds": 0.0}
+                else:
+                    running[pool.submit(run_stage, ctx, name, fn)] = name
+            if not running:
+                continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                r = results[name] = future.result()
+                print(f"{name:<10} {r['status']:<8} {r['seconds']:>7.2f}s  {r['detail']}")
+    return results
+
+
+def main():
+    args = parse_args()
+    for spec in args.symbol:
+        if "=" not in spec:
+            raise SystemExit(f"Invalid --symbol {spec} (use TICKER=YAHOO_SYMBOL)")
+    end = dt.date.fromisoformat(args.date) if args.date else dt.date.today()
+    if not Path(args.db_path).exists():
+        raise SystemExit(f"DB not found: {args.db_path}")
+    conn = connect(args.db_path)
+    try:
+        ensure_schema(conn)
+    finally:
+        conn.close()
+
+    ctx = {"args": args, "end": end, "price_changes": {}, "began": time.perf_counter()}
+    results = run_pipeline(ctx)
+    total = time.perf_counter() - ctx["began"]
+
+    print(f"\nDaily close {end} in {total:.2f}s")
+    print(f"{'stage':<10} {'status':<8} {'start':>7} {'time':>7}")
+    for name in STAGES:
+        r = results[name]
+        start = f"{r['start']:.2f}s" if r["start"] is not None else "-"
+        print(f"{name:<10} {r['status']:<8} {start:>7} {r['seconds']:>6.2f}s")
+    if any(r["status"] in ("failed", "blocked") for r in results.values()):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -22,6 +22,6 @@ OUT=${1:-data/snapshots.csv}
 DB=${2:-money_diary.db}
 
 mkdir -p "$(dirname "$OUT")"
-sqlite3 -header -csv "$DB" "SELECT * FROM snapshots ORDER BY date, ticker" > "$OUT"
+sqlite3 -cmd ".timeout 5000" -header -csv "$DB" "SELECT * FROM snapshots ORDER BY date, account, ticker" > "$OUT"
 echo "Exported snapshots to $OUT"
 
@@ -2,61 +2,48 @@
 """Fetch FX rates via Yahoo Finance API and upsert into fx_rates."""
 import argparse
 import datetime as dt
-import json
 import sqlite3
 import sys
-import time
-import urllib.error
-import urllib.request
-from collections import defaultdict
-from typing import Dict
+from functools import partial
+from pathlib import Path
 
-BASE_URL = "https://query1.finance.yahoo.com/v8/finance/chart/{symbol}?interval=1d&period1={start}&period2={end}"
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "app"))
 
+from db import connect, deferred_refresh, ensure_schema  # noqa: E402
+from gaps import fetch_window  # noqa: E402
+from screening import screen_history  # noqa: E402
+from yahoo_client import YAHOO_BASE_URL, FetchRecorder, backfill, date_chunks  # noqa: E402
 
-def to_epoch(d: dt.date) -> int:
-    return int(time.mktime(dt.datetime(d.year, d.month, d.day, 0, 0).timetuple()))
+USER_AGENT = "MoneyDiaryFXFetcher/1.0"
 
 
-def fetch_history(symbol: str, start: dt.date, end: dt.date) -> Dict[str, float]:
-    url = BASE_URL.format(symbol=symbol, start=to_epoch(start), end=to_epoch(end + dt.timedelta(days=1)))
-    req = urllib.request.Request(url, headers={"User-Agent": "MoneyDiaryFXFetcher/1.0"})
-    try:
-        with urllib.request.urlopen(req, timeout=15) as resp:
-            data = json.load(resp)
-    except (urllib.error.URLError, TimeoutError) as exc:  # type: ignore[arg-type]
-        raise RuntimeError(f"Yahoo Finance request failed: {exc}") from exc
-
-    result = (data.get("chart") or {}).get("result") or []
-    if not result:
-        error = (data.get("chart") or {}).get("error")
-        raise RuntimeError(f"No data returned for {symbol}: {error}")
-
-    result = result[0]
-    timestamps = result.get("timestamp") or []
-    quotes = (result.get("indicators") or {}).get("quote") or []
-    if not timestamps or not quotes:
-        raise RuntimeError(f"Missing time series for {symbol}")
-
-    closes = quotes[0].get("close") or []
-    rates: Dict[str, float] = {}
-    for ts, close in zip(timestamps, closes):
-        if close is None:
-            continue
-        date = dt.datetime.utcfromtimestamp(ts).date().isoformat()
-        rates[date] = float(close)
-    return rates
-
-
-def upsert(conn: sqlite3.Connection, date: str, pair: str, rate: float) -> None:
-    conn.execute(
+def upsert(conn: sqlite3.Connection, date: str, pair: str, rate: float) -> int:
+    """Insert or update one rate; returns 1 if the stored row changed."""
+    cur = conn.execute(
         """
         INSERT INTO fx_rates (date, pair, rate)
         VALUES (?, ?, ?)
         ON CONFLICT(date, pair) DO UPDATE SET rate = excluded.rate
+         WHERE fx_rates.rate IS NOT excluded.rate
         """,
         (date, pair, rate),
     )
+    return cur.rowcount
+
+
+def store_history(
+    conn: sqlite3.Connection, pair: str, history: dict[str, float], screen: bool = True, source: str = "fetch_fx"
+) -> int:
+    """Upsert one pair's rates; suspicious ones are quarantined instead (app/screening.py).
+
+    The derived rates and valuations of the touched dates are rebuilt once at the end.
+    """
+    if screen:
+        history, held = screen_history(conn, "fx_rates", pair, history, source)
+        for date, rate, reason, detail in held:
+            print(f"QUARANTINED {date} {pair} = {rate} ({reason}: {detail})", file=sys.stderr)
+    with deferred_refresh(conn):
+        return sum(upsert(conn, date, pair, rate) for date, rate in history.items())
 
 
 def parse_args() -> argparse.Namespace:
@@ -67,6 +54,36 @@ def parse_args() -> argparse.Namespace:
     parser.add_argument("symbols", nargs="*", default=["JPY"], help="Target currencies (default: JPY)")
     parser.add_argument("--db", dest="db_path", default="money_diary.db", help="SQLite DB path")
     parser.add_argument("--dry-run", action="store_true", help="Do not write to DB, just print rates")
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=1,
+        help="Pairs per multi-symbol (spark) request; 1 = one chart request per pair (default: 1)",
+    )
+    parser.add_argument("--workers", type=int, default=1, help="Concurrent requests (default: 1)")
+    parser.add_argument(
+        "--base-url",
+        default=YAHOO_BASE_URL,
+        help="Yahoo Finance base URL, e.g. a local stub (scripts/yahoo_stub.py)",
+    )
+    parser.add_argument(
+        "--chunk-days",
+        type=int,
+        default=365,
+        help="Fetch and commit long ranges in chunks of this many days; 0 = single request (default: 365)",
+    )
+    parser.add_argument("--resume", action="store_true", help="Skip chunks completed by earlier runs (fetch_chunks)")
+    parser.add_argument(
+        "--gaps",
+        action="store_true",
+        help="Only fetch pairs and dates with fx_missing gaps in the range (rescans data_gaps first)",
+    )
+    parser.add_argument(
+        "--no-screen",
+        action="store_true",
+        help="Upsert every fetched value without anomaly screening (see scripts/review_quarantine.py)",
+    )
+    parser.add_argument("--log-jsonl", default=None, help="Append per-request metrics to this JSON-lines file")
     return parser.parse_args()
 
 
@@ -90,36 +107,63 @@ def main():
     base = args.base.upper()
     targets = [s.upper() for s in args.symbols]
 
-    all_rates: Dict[str, Dict[str, float]] = defaultdict(dict)
-    for target in targets:
-        symbol = f"{base}{target}=X"
+    items = [(f"{base}{target}", f"{base}{target}=X") for target in targets]
+
+    conn = None if args.dry_run else connect(args.db_path)
+    if conn is not None:
+        ensure_schema(conn)
+    if args.gaps:
+        window = fetch_window(conn, args.db_path, "fx_missing", [pair for pair, _ in items], start, end)
+        if window is None:
+            print(f"No missing FX rates between {start} and {end}")
+            if conn is not None:
+                conn.close()
+            return
+        pairs, start, end = window
+        items = [(pair, symbol) for pair, symbol in items if pair in pairs]
+        print(f"Filling missing FX rates for {len(items)} pairs between {start} and {end}")
+    recorder = FetchRecorder("fetch_fx", sys.argv[1:], conn, args.log_jsonl)
+    try:
+        multi_chunk = len(date_chunks(start, end, args.chunk_days)) > 1
+
+        def report(chunk_start: dt.date, chunk_end: dt.date, histories: dict[str, dict[str, float]]) -> None:
+            span = f" [{chunk_start} .. {chunk_end}]" if multi_chunk else ""
+            for pair, symbol in items:
+                if pair in histories:
+                    print(f"Fetched {len(histories[pair])} rates for {symbol}{span}")
+            rows = sorted((date, pair, rate) for pair, h in histories.items() for date, rate in h.items())
+            for date, pair, rate in rows:
+                print(f"{date} {pair} = {rate}")
+
         try:
-            history = fetch_history(symbol, start, end)
+            skipped = backfill(
+                items,
+                start,
+                end,
+                target="fx_rates",
+                store=partial(store_history, screen=not args.no_screen),
+                on_chunk=report,
+                recorder=recorder,
+                conn=conn,
+                chunk_days=args.chunk_days,
+                resume=args.resume,
+                user_agent=USER_AGENT,
+                batch_size=args.batch_size,
+                workers=args.workers,
+                base_url=args.base_url,
+                timeout=15,
+            )
         except RuntimeError as exc:
             print(f"ERROR: {exc}", file=sys.stderr)
+            recorder.finish("error")
             raise SystemExit(1)
-        for date, rate in history.items():
-            all_rates[date][target] = rate
-        print(f"Fetched {len(history)} rates for {symbol}")
-
-    dates_sorted = sorted(all_rates.keys())
-    for date in dates_sorted:
-        pairs = all_rates[date]
-        for target, rate in pairs.items():
-            print(f"{date} {base}{target} = {rate}")
-
-    if args.dry_run:
-        return
-
-    conn = sqlite3.connect(args.db_path)
-    try:
-        with conn:
-            for date in dates_sorted:
-                for target, rate in all_rates[date].items():
-                    pair = f"{base}{target}"
-                    upsert(conn, date, pair, rate)
+        if skipped:
+            print(f"Skipped {skipped} completed chunks (--resume)")
+        recorder.finish("ok")
+        print(recorder.summary())
     finally:
-        conn.close()
+        if conn is not None:
+            conn.close()
 
 
 if __name__ == "__main__":
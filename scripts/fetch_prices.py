@@ -2,89 +2,55 @@
 """Fetch daily close prices for assets and upsert into asset_prices."""
 import argparse
 import datetime as dt
-import json
 import sqlite3
 import sys
-import time
-import urllib.error
-import urllib.request
-from collections import defaultdict
-from typing import Dict, List, Tuple
+from functools import partial
+from pathlib import Path
 
-BASE_URL = "https://query1.finance.yahoo.com/v8/finance/chart/{symbol}?interval=1d&period1={start}&period2={end}"
-RETRY_STATUS = {429, 502, 503}
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "app"))
 
+from db import connect, ensure_schema  # noqa: E402
+from gaps import fetch_window  # noqa: E402
+from screening import screen_history  # noqa: E402
+from yahoo_client import YAHOO_BASE_URL, FetchRecorder, backfill, date_chunks  # noqa: E402
 
-def to_epoch(day: dt.date) -> int:
-    return int(time.mktime(dt.datetime(day.year, day.month, day.day, 0, 0).timetuple()))
+USER_AGENT = "MoneyDiaryPriceFetcher/1.0"
 
 
-def fetch_history(symbol: str, start: dt.date, end: dt.date) -> Dict[str, float]:
-    url = BASE_URL.format(symbol=symbol, start=to_epoch(start), end=to_epoch(end + dt.timedelta(days=1)))
-    req = urllib.request.Request(url, headers={"User-Agent": "MoneyDiaryPriceFetcher/1.0"})
-
-    backoff = 2.0
-    for attempt in range(4):
-        try:
-            with urllib.request.urlopen(req, timeout=20) as resp:
-                data = json.load(resp)
-            break
-        except urllib.error.HTTPError as exc:
-            if exc.code in RETRY_STATUS and attempt < 3:
-                time.sleep(backoff)
-                backoff *= 2
-                continue
-            raise RuntimeError(f"Yahoo Finance request failed ({symbol}): HTTP {exc.code}") from exc
-        except (urllib.error.URLError, TimeoutError) as exc:  # type: ignore[arg-type]
-            if attempt < 3:
-                time.sleep(backoff)
-                backoff *= 2
-                continue
-            raise RuntimeError(f"Yahoo Finance request failed ({symbol}): {exc}") from exc
-
-    result = (data.get("chart") or {}).get("result") or []
-    if not result:
-        error = (data.get("chart") or {}).get("error")
-        raise RuntimeError(f"No data returned for {symbol}: {error}")
-
-    node = result[0]
-    timestamps = node.get("timestamp") or []
-    quotes = (node.get("indicators") or {}).get("quote") or []
-    if not timestamps or not quotes:
-        raise RuntimeError(f"Missing time series for {symbol}")
-
-    closes = quotes[0].get("close") or []
-    history: Dict[str, float] = {}
-    for ts, close in zip(timestamps, closes):
-        if close is None:
-            continue
-        date = dt.datetime.utcfromtimestamp(ts).date().isoformat()
-        history[date] = float(close)
-    return history
-
-
-def ensure_table(conn: sqlite3.Connection) -> None:
-    conn.execute(
-        """
-        CREATE TABLE IF NOT EXISTS asset_prices (
-          date   TEXT NOT NULL CHECK (date LIKE '____-__-__'),
-          ticker TEXT NOT NULL,
-          close  REAL NOT NULL CHECK (close >= 0),
-          PRIMARY KEY (date, ticker)
-        )
-        """
-    )
-
-
-def upsert(conn: sqlite3.Connection, date: str, ticker: str, close: float) -> None:
-    conn.execute(
+def upsert(conn: sqlite3.Connection, date: str, ticker: str, close: float) -> int:
+    """Insert or update one close; returns 1 if the stored row changed."""
+    cur = conn.execute(
         """
         INSERT INTO asset_prices (date, ticker, close)
         VALUES (?, ?, ?)
         ON CONFLICT(date, ticker) DO UPDATE SET close = excluded.close
+         WHERE asset_prices.close IS NOT excluded.close
         """,
         (date, ticker, close),
     )
+    return cur.rowcount
+
+
+def store_history(
+    conn: sqlite3.Connection,
+    ticker: str,
+    history: dict[str, float],
+    screen: bool = True,
+    source: str = "fetch_prices",
+    changed_dates: list[str] | None = None,
+) -> int:
+    """Upsert one ticker's closes; suspicious ones are quarantined instead (app/screening.py).
+
+    Returns the number of changed rows; their dates are appended to changed_dates if given.
+    """
+    if screen:
+        history, held = screen_history(conn, "asset_prices", ticker, history, source)
+        for date, close, reason, detail in held:
+            print(f"QUARANTINED {date} {ticker} = {close} ({reason}: {detail})", file=sys.stderr)
+    changed = [date for date, close in sorted(history.items()) if upsert(conn, date, ticker, close)]
+    if changed_dates is not None:
+        changed_dates.extend(changed)
+    return len(changed)
 
 
 def parse_args() -> argparse.Namespace:
@@ -98,6 +64,36 @@ def parse_args() -> argparse.Namespace:
     )
     parser.add_argument("--db", dest="db_path", default="money_diary.db", help="SQLite DB path")
     parser.add_argument("--dry-run", action="store_true", help="Print rates only")
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=1,
+        help="Symbols per multi-symbol (spark) request; 1 = one chart request per symbol (default: 1)",
+    )
+    parser.add_argument("--workers", type=int, default=1, help="Concurrent requests (default: 1)")
+    parser.add_argument(
+        "--base-url",
+        default=YAHOO_BASE_URL,
+        help="Yahoo Finance base URL, e.g. a local stub (scripts/yahoo_stub.py)",
+    )
+    parser.add_argument(
+        "--chunk-days",
+        type=int,
+        default=365,
+        help="Fetch and commit long ranges in chunks of this many days; 0 = single request (default: 365)",
+    )
+    parser.add_argument("--resume", action="store_true", help="Skip chunks completed by earlier runs (fetch_chunks)")
+    parser.add_argument(
+        "--gaps",
+        action="store_true",
+        help="Only fetch tickers and dates with price_hole gaps in the range (rescans data_gaps first)",
+    )
+    parser.add_argument(
+        "--no-screen",
+        action="store_true",
+        help="Upsert every fetched value without anomaly screening (see scripts/review_quarantine.py)",
+    )
+    parser.add_argument("--log-jsonl", default=None, help="Append per-request metrics to this JSON-lines file")
     return parser.parse_args()
 
 
@@ -113,7 +109,7 @@ def main():
     if end < start:
         raise SystemExit("End date must be on or after start date")
 
-    pairs: List[Tuple[str, str]] = []  # (store_ticker, yahoo_symbol)
+    pairs: list[tuple[str, str]] = []  # (store_ticker, yahoo_symbol)
     for spec in args.tickers:
         if "=" in spec:
             store, symbol = spec.split("=", 1)
@@ -125,35 +121,61 @@ def main():
             raise SystemExit(f"Invalid ticker specification: {spec}")
         pairs.append((store, symbol))
 
-    all_prices = defaultdict(dict)  # date -> ticker -> close
+    conn = None if args.dry_run else connect(args.db_path)
+    if conn is not None:
+        ensure_schema(conn)
+    if args.gaps:
+        window = fetch_window(conn, args.db_path, "price_hole", [store for store, _ in pairs], start, end)
+        if window is None:
+            print(f"No price holes between {start} and {end}")
+            if conn is not None:
+                conn.close()
+            return
+        stores, start, end = window
+        pairs = [(store, symbol) for store, symbol in pairs if store in stores]
+        print(f"Filling price holes for {len(pairs)} tickers between {start} and {end}")
+    recorder = FetchRecorder("fetch_prices", sys.argv[1:], conn, args.log_jsonl)
+    try:
+        multi_chunk = len(date_chunks(start, end, args.chunk_days)) > 1
+
+        def report(chunk_start: dt.date, chunk_end: dt.date, histories: dict[str, dict[str, float]]) -> None:
+            span = f" [{chunk_start} .. {chunk_end}]" if multi_chunk else ""
+            for store_ticker, yahoo_symbol in pairs:
+                if store_ticker in histories:
+                    n = len(histories[store_ticker])
+                    print(f"Fetched {n} prices for {store_ticker} (symbol {yahoo_symbol}){span}")
+            rows = sorted((date, ticker, close) for ticker, h in histories.items() for date, close in h.items())
+            for date, ticker, close in rows:
+                print(f"{date} {ticker} = {close}")
 
-    for store_ticker, yahoo_symbol in pairs:
         try:
-            history = fetch_history(yahoo_symbol, start, end)
+            skipped = backfill(
+                pairs,
+                start,
+                end,
+                target="asset_prices",
+                store=partial(store_history, screen=not args.no_screen),
+                on_chunk=report,
+                recorder=recorder,
+                conn=conn,
+                chunk_days=args.chunk_days,
+                resume=args.resume,
+                user_agent=USER_AGENT,
+                batch_size=args.batch_size,
+                workers=args.workers,
+                base_url=args.base_url,
+            )
         except RuntimeError as exc:
             print(f"ERROR: {exc}", file=sys.stderr)
+            recorder.finish("error")
             raise SystemExit(1)
-        print(f"Fetched {len(history)} prices for {store_ticker} (symbol {yahoo_symbol})")
-        for date, close in history.items():
-            all_prices[date][store_ticker] = close
-
-    dates = sorted(all_prices.keys())
-    for date in dates:
-        for ticker, close in all_prices[date].items():
-            print(f"{date} {ticker} = {close}")
-
-    if args.dry_run:
-        return
-
-    conn = sqlite3.connect(args.db_path)
-    try:
-        with conn:
-            ensure_table(conn)
-            for date in dates:
-                for ticker, close in all_prices[date].items():
-                    upsert(conn, date, ticker, close)
+        if skipped:
+            print(f"Skipped {skipped} completed chunks (--resume)")
+        recorder.finish("ok")
+        print(recorder.summary())
     finally:
-        conn.close()
+        if conn is not None:
+            conn.close()
 
 
 if __name__ == "__main__":
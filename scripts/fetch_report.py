@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""Summarize recorded fetch runs (fetch_runs / fetch_requests)."""
+import argparse
+import sqlite3
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "app"))
+
+from db import connect, ensure_schema  # noqa: E402
+from yahoo_client import percentile  # noqa: E402
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--db", dest="db_path", default="money_diary.db", help="SQLite DB path")
+    parser.add_argument("--runs", type=int, default=10, help="Number of recent runs to show (default: 10)")
+    parser.add_argument("--run", type=int, default=None, help="Show per-request detail for this run id")
+    return parser.parse_args()
+
+
+def print_runs(conn: sqlite3.Connection, limit: int) -> None:
+    rows = conn.execute(
+        """
+        SELECT run_id, script, started_at, status, n_requests, n_errors, retries,
+               response_bytes, rows_parsed, rows_changed, total_elapsed_ms
+          FROM v_fetch_run_summary
+         ORDER BY run_id DESC
+         LIMIT ?
+        """,
+        (limit,),
+    ).fetchall()
+    if not rows:
+        print("No fetch runs recorded")
+        return
+    print("run  script        started_at                     status  req  err  retry  bytes     parsed  changed  p50ms  p99ms")
+    for run_id, script, started_at, status, n_req, n_err, retries, nbytes, parsed, changed, _ in rows:
+        latencies = [
+            r[0]
+            for r in conn.execute(
+                "SELECT latency_ms FROM fetch_requests WHERE run_id = ? AND latency_ms IS NOT NULL",
+                (run_id,),
+            )
+        ]
+        p50 = percentile(latencies, 50) or 0
+        p99 = percentile(latencies, 99) or 0
+        print(
+            f"{run_id:<4} {script:<13} {started_at:<30} {status:<7} {n_req:>3} {n_err:>4} {retries:>6} "
+            f"{nbytes:>9} {parsed:>7} {changed:>8} {p50:>6.0f} {p99:>6.0f}"
+        )
+
+
+def print_requests(conn: sqlite3.Connection, run_id: int) -> None:
+    rows = conn.execute(
+        """
+        SELECT symbol, http_status, retries, latency_ms, elapsed_ms, response_bytes,
+               rows_parsed, rows_changed, error
+          FROM fetch_requests
+         WHERE run_id = ?
+         ORDER BY id
+        """,
+        (run_id,),
+    ).fetchall()
+    if not rows:
+        print(f"No requests recorded for run {run_id}")
+        return
+    print("symbol          status  retry  latency_ms  elapsed_ms  bytes     parsed  changed  error")
+    for symbol, status, retries, latency, elapsed, nbytes, parsed, changed, error in rows:
+        print(
+            f"{symbol:<15} {status or '-':>6} {retries:>6} {latency or 0:>11.1f} {elapsed or 0:>11.1f} "
+            f"{nbytes or 0:>9} {parsed or 0:>7} {changed if changed is not None else '-':>8}  {error or ''}"
+        )
+
+
+def main():
+    args = parse_args()
+    conn = connect(args.db_path)
+    try:
+        ensure_schema(conn)
+        if args.run is not None:
+            print_requests(conn, args.run)
+        else:
+            print_runs(conn, args.runs)
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""Import prices or FX rates from CSV with ingest screening (app/screening.py).
+
+Columns are date,ticker,close for asset_prices and date,pair,rate for fx_rates;
+the first line is a header unless --no-header. Rows are screened per ticker /
+pair like fetched data: suspicious values go to ingest_quarantine (review them
+with scripts/review_quarantine.py), the rest are upserted. Use - to read stdin.
+"""
+import argparse
+import csv
+import datetime as dt
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "app"))
+
+import fetch_fx  # noqa: E402
+import fetch_prices  # noqa: E402
+from db import connect, ensure_schema  # noqa: E402
+from screening import utc_now  # noqa: E402
+
+STORE = {"asset_prices": fetch_prices.store_history, "fx_rates": fetch_fx.store_history}
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("target", choices=sorted(STORE), help="Table to import into")
+    parser.add_argument("csv_path", help="CSV file, or - for stdin")
+    parser.add_argument("--db", dest="db_path", default="money_diary.db", help="SQLite DB path")
+    parser.add_argument("--no-header", action="store_true", help="The first line is data")
+    parser.add_argument("--source", default="import", help="Source recorded on quarantined rows (default: import)")
+    parser.add_argument("--no-screen", action="store_true", help="Upsert every row without anomaly screening")
+    return parser.parse_args()
+
+
+def read_rows(f, header: bool) -> dict[str, dict[str, float]]:
+    """{key: {date: value}}; raises SystemExit on a malformed line."""
+    histories: dict[str, dict[str, float]] = {}
+    reader = csv.reader(f)
+    if header:
+        next(reader, None)
+    for row in reader:
+        if not row or not "".join(row).strip():
+            continue
+        line = reader.line_num
+        if len(row) != 3:
+            raise SystemExit(f"line {line}: expected 3 columns, got {len(row)}")
+        date, key, value = (cell.strip() for cell in row)
+        try:
+            dt.date.fromisoformat(date)
+            number = float(value)
+        except ValueError:
+            raise SystemExit(f"line {line}: expected YYYY-MM-DD,KEY,NUMBER, got {','.join(row)}") from None
+        histories.setdefault(key, {})[date] = number
+    return histories
+
+
+def main():
+    args = parse_args()
+    if args.csv_path == "-":
+        histories = read_rows(sys.stdin, not args.no_header)
+    else:
+        with open(args.csv_path, newline="", encoding="utf-8") as f:
+            histories = read_rows(f, not args.no_header)
+
+    store = STORE[args.target]
+    conn = connect(args.db_path)
+    rows = changed = 0
+    began = utc_now()
+    try:
+        ensure_schema(conn)
+        for key, history in sorted(histories.items()):
+            with conn:
+                changed += store(conn, key, history, screen=not args.no_screen, source=args.source)
+            rows += len(history)
+        held = 0
+        if not args.no_screen:
+            held = conn.execute(
+                "SELECT COUNT(*) FROM ingest_quarantine WHERE source = ? AND status = 'pending' AND created_at >= ?",
+                (args.source, began),
+            ).fetchone()[0]
+    finally:
+        conn.close()
+    print(f"Read {rows} rows for {len(histories)} keys into {args.target}: {changed} changed")
+    if held:
+        print(f"Quarantined {held} rows; review them with ./scripts/review_quarantine.py --db {args.db_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -7,6 +7,8 @@ usage() {
 
 説明:
   fx_rates テーブルへ CSV をインポートします（ヘッダー1行を自動スキップ）。
+  急変・据え置きなど疑わしいレートは ingest_quarantine に保留されます
+  （確認: scripts/review_quarantine.py）。
 
 引数:
   csv_path : 入力CSV（列: date,pair,rate）
@@ -24,15 +26,5 @@ if [[ -z "${CSV}" || ! -f "${CSV}" ]]; then
   usage; echo "ERROR: CSV ファイルを指定してください: $CSV" 1>&2; exit 1
 fi
 
-TMP=$(mktemp)
-# ヘッダーを除去
-tail -n +2 "$CSV" > "$TMP"
-
-sqlite3 "$DB" <<SQL
-.mode csv
-.import "$TMP" fx_rates
-SQL
-
-rm -f "$TMP"
-echo "Imported fx_rates from $CSV into $DB"
-
+# ヘッダー行を読み飛ばし、異常値チェック（scripts/import_csv.py）を通して取り込みます
+python3 "$(dirname "$0")/import_csv.py" fx_rates "$CSV" --db "$DB"
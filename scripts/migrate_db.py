@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+"""Create or migrate a Money Diary SQLite DB to the current schema.sql."""
+import argparse
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "app"))
+
+from db import connect, ensure_schema  # noqa: E402
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--db", dest="db_path", default="money_diary.db", help="SQLite DB path")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    conn = connect(args.db_path)
+    try:
+        applied = ensure_schema(conn)
+    finally:
+        conn.close()
+    if applied:
+        print(f"Applied migrations: {', '.join(applied)} ({args.db_path})")
+    else:
+        print(f"Schema is up to date ({args.db_path})")
+
+
+if __name__ == "__main__":
+    main()
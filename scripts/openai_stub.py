@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""Local stand-in for the OpenAI Responses API (POST /v1/responses), plain and streamed.
+
+The reply is a deterministic Japanese bullet list derived from the prompt, sent
+word by word as server-sent events when "stream": true. Point the GUI at it with
+OPENAI_BASE_URL=http://127.0.0.1:PORT/v1 (and any OPENAI_API_KEY), and the
+precompute script with --base-url. GET /stats returns request counters,
+including the peak number of requests in flight.
+"""
+import argparse
+import hashlib
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StubConfig:
+    def __init__(
+        self, latency_ms: float = 0.0, token_ms: float = 0.0, words: int = 40, error_status: int | None = None
+    ):
+        self.latency_ms = latency_ms
+        self.token_ms = token_ms
+        self.words = words
+        # answer every /responses request with this HTTP status (error handling tests)
+        self.error_status = error_status
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.streamed = 0
+        self.inflight = 0
+        self.max_inflight = 0
+
+
+def reply_text(prompt: str, words: int) -> str:
+    """Deterministic summary-like text that names the date in the prompt, if any."""
+    found = re.search(r'"date": "(\d{4}-\d{2}-\d{2})"', prompt)
+    subject = found.group(1) if found else "全期間"
+    digest = hashlib.sha256(prompt.encode()).hexdigest()
+    body = " ".join(f"要因{digest[i % 60:i % 60 + 4]}" for i in range(max(words - 4, 1)))
+    return f"- {subject} の変動要約（スタブ）\n- {body}\n- 結論: 特記事項なし"
+
+
+def response_object(response_id: str, model: str, text: str, status: str) -> dict:
+    content = [{"type": "output_text", "text": text, "annotations": []}] if text else []
+    return {
+        "id": response_id,
+        "object": "response",
+        "created_at": int(time.time()),
+        "model": model,
+        "status": status,
+        "output": [
+            {
+                "type": "message",
+                "id": f"msg_{response_id}",
+                "role": "assistant",
+                "status": status,
+                "content": content,
+            }
+        ],
+        "parallel_tool_calls": False,
+        "tool_choice": "auto",
+        "tools": [],
+    }
+
+
+def make_handler(config: StubConfig):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):  # noqa: N802
+            if self.path.rstrip("/").endswith("/stats"):
+                with config.lock:
+                    stats = {
+                        "requests": config.requests,
+                        "streamed": config.streamed,
+                        "max_inflight": config.max_inflight,
+                    }
+                self._send(200, json.dumps(stats).encode())
+            else:
+                self._send(404, b'{"error": {"message": "not found"}}')
+
+        def do_POST(self):  # noqa: N802
+            length = int(self.headers.get("Content-Length") or 0)
+            try:
+                payload = json.loads(self.rfile.read(length) or b"{}")
+            except ValueError:
+                self._send(400, b'{"error": {"message": "invalid JSON"}}')
+                return
+            if not self.path.rstrip("/").endswith("/responses"):
+                self._send(404, b'{"error": {"message": "not found"}}')
+                return
+            prompt = payload.get("input")
+            if not isinstance(prompt, str):
+                prompt = json.dumps(prompt, ensure_ascii=False)
+            model = payload.get("model") or "stub"
+            if config.error_status is not None:
+                self._send(config.error_status, b'{"error": {"message": "stub error", "type": "server_error"}}')
+                return
+            with config.lock:
+                config.requests += 1
+                config.inflight += 1
+                config.max_inflight = max(config.max_inflight, config.inflight)
+                response_id = f"resp_stub{config.requests:06d}"
+            try:
+                time.sleep(config.latency_ms / 1000)
+                text = reply_text(prompt, config.words)
+                if payload.get("stream"):
+                    with config.lock:
+                        config.streamed += 1
+                    self._stream(response_id, model, text)
+                else:
+                    time.sleep(config.token_ms * len(text.split(" ")) / 1000)
+                    body = json.dumps(response_object(response_id, model, text, "completed"), ensure_ascii=False)
+                    self._send(200, body.encode())
+            finally:
+                with config.lock:
+                    config.inflight -= 1
+
+        def _stream(self, response_id: str, model: str, text: str) -> None:
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Cache-Control", "no-cache")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            sequence = 0
+
+            def event(kind: str, data: dict) -> None:
+                nonlocal sequence
+                data = {"type": kind, "sequence_number": sequence, **data}
+                sequence += 1
+                self.wfile.write(f"event: {kind}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n".encode())
+                self.wfile.flush()
+
+            event("response.created", {"response": response_object(response_id, model, "", "in_progress")})
+            pieces = text.split(" ")
+            for i, piece in enumerate(pieces):
+                time.sleep(config.token_ms / 1000)
+                delta = piece if i == len(pieces) - 1 else piece + " "
+                event(
+                    "response.output_text.delta",
+                    {"item_id": f"msg_{response_id}", "output_index": 0, "content_index": 0, "delta": delta,
+                     "logprobs": []},
+                )
+            event("response.completed", {"response": response_object(response_id, model, text, "completed")})
+            self.close_connection = True
+
+        def _send(self, status: int, body: bytes) -> None:
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):  # noqa: A002
+            pass
+
+    return Handler
+
+
+def start_stub(config: StubConfig, host: str = "127.0.0.1", port: int = 0) -> ThreadingHTTPServer:
+    """Start the stub in a daemon thread; server.server_port holds the bound port."""
+    server = ThreadingHTTPServer((host, port), make_handler(config))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--latency-ms", type=float, default=300.0, help="Delay before the first token (default: 300)")
+    parser.add_argument("--token-ms", type=float, default=30.0, help="Delay per streamed word (default: 30)")
+    parser.add_argument("--words", type=int, default=40, help="Words per reply (default: 40)")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    config = StubConfig(args.latency_ms, args.token_ms, args.words)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(config))
+    server.daemon_threads = True
+    print(f"Serving OpenAI stub on http://{args.host}:{server.server_port}/v1 (Ctrl-C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f"Served {config.requests} requests ({config.streamed} streamed, peak {config.max_inflight} in flight)")
+
+
+if __name__ == "__main__":
+    main()
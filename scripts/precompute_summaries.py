@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""Pre-generate AI summaries for recent dates so the GUI can show them without waiting.
+
+Requests run concurrently (at most --concurrency in flight) through the async
+OpenAI client; each summary is stored in ai_summaries as soon as it arrives.
+Dates whose stored summary was generated from the current data are skipped.
+OPENAI_API_KEY is read from the environment or .env; --base-url points the
+client at an OpenAI-compatible server such as scripts/openai_stub.py.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "app"))
+
+from db import connect, ensure_schema  # noqa: E402
+from summaries import MODEL, precompute_daily, recent_dates  # noqa: E402
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", dest="db_path", default="money_diary.db", help="SQLite DB path")
+    parser.add_argument("--days", type=int, default=30, help="Latest dates with attribution to cover (default: 30)")
+    parser.add_argument("--concurrency", type=int, default=4, help="Requests in flight (default: 4)")
+    parser.add_argument("--model", default=MODEL, help=f"Model name (default: {MODEL})")
+    parser.add_argument("--base-url", default=None, help="OpenAI-compatible API base URL (default: OpenAI)")
+    parser.add_argument("--force", action="store_true", help="Regenerate summaries that are already cached")
+    return parser.parse_args()
+
+
+async def run(args: argparse.Namespace, api_key: str, dates: list[str], failures: dict[str, str]) -> dict[str, int]:
+    from openai import AsyncOpenAI
+
+    client = AsyncOpenAI(api_key=api_key, base_url=args.base_url)
+
+    def progress(date: str, status: str) -> None:
+        print(f"{date} {status}: {failures[date]}" if status == "failed" else f"{date} {status}")
+
+    try:
+        return await precompute_daily(
+            args.db_path,
+            client,
+            dates,
+            concurrency=args.concurrency,
+            model=args.model,
+            force=args.force,
+            progress=progress,
+            failures=failures,
+        )
+    finally:
+        await client.close()
+
+
+def main():
+    args = parse_args()
+    from dotenv import load_dotenv
+
+    load_dotenv(ROOT / ".env")
+    api_key = os.getenv("OPENAI_API_KEY")
+    if not api_key:
+        raise SystemExit("OPENAI_API_KEY が設定されていません")
+    conn = connect(args.db_path)
+    try:
+        ensure_schema(conn)
+        dates = recent_dates(conn, args.days)
+    finally:
+        conn.close()
+    if not dates:
+        print("No attribution dates to summarize")
+        return
+    began = time.perf_counter()
+    failures: dict[str, str] = {}
+    counts = asyncio.run(run(args, api_key, dates, failures))
+    print(
+        f"{len(dates)} dates in {time.perf_counter() - began:.1f}s: "
+        + ", ".join(f"{status} {n}" for status, n in counts.items())
+    )
+    if failures:
+        raise SystemExit("Failed dates: " + ", ".join(sorted(failures)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""Replay the cashflows ledger into per-account holdings (ledger_positions).
+
+Replay is incremental: cashflows triggers record the earliest changed date per
+account and ticker in ledger_dirty, and only the part of the ledger after the
+nearest checkpoint before that date is replayed.
+"""
+import argparse
+import sqlite3
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "app"))
+
+from db import connect, deferred_refresh, ensure_schema  # noqa: E402
+
+# Sign applied to cashflows.qty per type; other types with a qty are applied as-is
+QTY_SIGN = {"BUY": 1.0, "SELL": -1.0}
+CHECKPOINT_EVERY = 50
+
+
+def mark_all_dirty(conn: sqlite3.Connection) -> None:
+    conn.execute("DELETE FROM ledger_dirty")
+    conn.execute(
+        """
+        INSERT INTO ledger_dirty (account, ticker, from_date)
+        SELECT account, ticker, MIN(date)
+          FROM (
+            SELECT account, ticker, date FROM cashflows
+            UNION ALL
+            SELECT account, ticker, date FROM ledger_positions
+          )
+         GROUP BY account, ticker
+        """
+    )
+
+
+def replay_ticker(
+    conn: sqlite3.Connection,
+    account: str,
+    ticker: str,
+    from_date: str,
+    checkpoint_every: int,
+) -> int:
+    """Replay one account/ticker from the last checkpoint before from_date; returns replayed txn count."""
+    cp = conn.execute(
+        """
+        SELECT date, qty, n_txn
+          FROM ledger_checkpoints
+         WHERE account = ? AND ticker = ? AND date < ?
+         ORDER BY date DESC
+         LIMIT 1
+        """,
+        (account, ticker, from_date),
+    ).fetchone()
+    cp_date, qty, n_txn = cp if cp else ("", 0.0, 0)
+
+    key = (account, ticker, cp_date)
+    conn.execute("DELETE FROM ledger_checkpoints WHERE account = ? AND ticker = ? AND date > ?", key)
+    conn.execute("DELETE FROM ledger_positions WHERE account = ? AND ticker = ? AND date > ?", key)
+
+    cur = conn.execute(
+        """
+        SELECT date, type, qty
+          FROM cashflows
+         WHERE account = ? AND ticker = ? AND date > ? AND qty IS NOT NULL
+         ORDER BY date, id
+        """,
+        key,
+    )
+    replayed = 0
+    last_cp_n = n_txn
+    day = None
+    for d, kind, delta in cur.fetchall():
+        if day is not None and d != day:
+            conn.execute(
+                "INSERT INTO ledger_positions (account, date, ticker, qty) VALUES (?, ?, ?, ?)",
+                (account, day, ticker, qty),
+            )
+            if n_txn - last_cp_n >= checkpoint_every:
+                conn.execute(
+                    """
+                    INSERT INTO ledger_checkpoints (account, ticker, date, qty, n_txn)
+                    VALUES (?, ?, ?, ?, ?)
+                    """,
+                    (account, ticker, day, qty, n_txn),
+                )
+                last_cp_n = n_txn
+        day = d
+        kind = kind.upper()
+        qty += QTY_SIGN[kind] * abs(delta) if kind in QTY_SIGN else delta
+        n_txn += 1
+        replayed += 1
+    if day is not None:
+        conn.execute(
+            "INSERT INTO ledger_positions (account, date, ticker, qty) VALUES (?, ?, ?, ?)",
+            (account, day, ticker, qty),
+        )
+        if qty < 0:
+            print(f"WARNING: {account}/{ticker} holds negative qty {qty} on {day}", file=sys.stderr)
+    conn.execute("DELETE FROM ledger_dirty WHERE account = ? AND ticker = ?", (account, ticker))
+    return replayed
+
+
+def write_snapshots(conn: sqlite3.Connection, account: str, ticker: str, from_date: str) -> int:
+    with deferred_refresh(conn):
+        cur = conn.execute(
+            """
+            INSERT INTO snapshots (account, date, ticker, qty, price_ccy)
+            SELECT account, date, ticker, qty, price_ccy
+              FROM v_ledger_snapshots
+             WHERE account = ? AND ticker = ? AND date >= ? AND qty >= 0
+            ON CONFLICT(account, date, ticker) DO UPDATE SET
+              qty = excluded.qty,
+              price_ccy = excluded.price_ccy
+            """,
+            (account, ticker, from_date),
+        )
+    return cur.rowcount
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--db", dest="db_path", default="money_diary.db", help="SQLite DB path")
+    parser.add_argument("--full", action="store_true", help="Discard checkpoints and replay every ticker")
+    parser.add_argument(
+        "--checkpoint-every",
+        type=int,
+        default=CHECKPOINT_EVERY,
+        help=f"Store a checkpoint after this many replayed transactions (default: {CHECKPOINT_EVERY})",
+    )
+    parser.add_argument(
+        "--write-snapshots",
+        action="store_true",
+        help="Upsert replayed holdings priced from asset_prices into snapshots",
+    )
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if args.checkpoint_every < 1:
+        raise SystemExit("--checkpoint-every must be positive")
+
+    conn = connect(args.db_path)
+    try:
+        ensure_schema(conn)
+        with conn:
+            if args.full:
+                conn.execute("DELETE FROM ledger_checkpoints")
+                mark_all_dirty(conn)
+            dirty = conn.execute(
+                "SELECT account, ticker, from_date FROM ledger_dirty ORDER BY account, ticker"
+            ).fetchall()
+        if not dirty:
+            print("Ledger is up to date")
+            return
+        for account, ticker, from_date in dirty:
+            with conn:
+                replayed = replay_ticker(conn, account, ticker, from_date, args.checkpoint_every)
+                msg = f"Replayed {replayed} transactions for {account}/{ticker} (from {from_date})"
+                if args.write_snapshots:
+                    written = write_snapshots(conn, account, ticker, from_date)
+                    msg += f", wrote {written} snapshots"
+            print(msg)
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
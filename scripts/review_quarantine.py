@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""List, accept or reject prices / FX rates held by ingest screening (ingest_quarantine).
+
+Without --accept / --reject the matching rows are listed (pending ones unless
+--status). --accept upserts the matching pending values into asset_prices /
+fx_rates; --reject keeps them out, also when a later fetch returns the same value.
+For an unadjusted split, re-fetching the ticker's whole history is usually the
+better fix: values that agree with each other pass screening.
+"""
+import argparse
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "app"))
+
+from db import connect, ensure_schema  # noqa: E402
+from screening import REASONS, TARGETS, review  # noqa: E402
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", dest="db_path", default="money_diary.db", help="SQLite DB path")
+    parser.add_argument("--target", choices=sorted(TARGETS), default=None, help="Only asset_prices or fx_rates")
+    parser.add_argument("--key", default=None, help="Only this ticker / pair")
+    parser.add_argument("--start", default=None, help="Only dates on or after YYYY-MM-DD")
+    parser.add_argument("--end", default=None, help="Only dates on or before YYYY-MM-DD")
+    parser.add_argument("--reason", choices=REASONS, default=None, help="Only this reason")
+    parser.add_argument(
+        "--status", choices=("pending", "accepted", "rejected", "all"), default="pending", help="Rows to list"
+    )
+    action = parser.add_mutually_exclusive_group()
+    action.add_argument("--accept", action="store_true", help="Upsert the matching pending values")
+    action.add_argument("--reject", action="store_true", help="Reject the matching pending values")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    filters = {"target": args.target, "key": args.key, "start": args.start, "end": args.end, "reason": args.reason}
+    conn = connect(args.db_path)
+    try:
+        ensure_schema(conn)
+        if args.accept or args.reject:
+            action = "accept" if args.accept else "reject"
+            try:
+                n = review(conn, action, **filters)
+            except ValueError as exc:
+                raise SystemExit(str(exc)) from None
+            print(f"{action}ed {n} rows" if n else "No matching pending rows")
+            return
+        where, params = [], []
+        if args.status != "all":
+            where.append("status = ?")
+            params.append(args.status)
+        for column in ("target", "key", "reason"):
+            if filters[column] is not None:
+                where.append(f"{column} = ?")
+                params.append(filters[column])
+        if args.start:
+            where.append("date >= ?")
+            params.append(args.start)
+        if args.end:
+            where.append("date <= ?")
+            params.append(args.end)
+        rows = conn.execute(
+            f"""
+            SELECT target, key, date, value, ref_value, reason, detail, source, status
+            FROM ingest_quarantine
+            {'WHERE ' + ' AND '.join(where) if where else ''}
+            ORDER BY target, key, date
+            """,
+            params,
+        ).fetchall()
+    finally:
+        conn.close()
+    if not rows:
+        print("No quarantined rows")
+        return
+    print(f"{'target':<13} {'key':<10} {'date':<10} {'value':>12} {'ref':>12} {'reason':<7} {'source':<13} detail")
+    for target, key, date, value, ref, reason, detail, source, status in rows:
+        value = "-" if value is None else f"{value:.6g}"
+        ref = "-" if ref is None else f"{ref:.6g}"
+        flag = "" if status == "pending" else f" [{status}]"
+        print(f"{target:<13} {key:<10} {date:<10} {value:>12} {ref:>12} {reason:<7} {source:<13} {detail or ''}{flag}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""What-if shocks and Monte Carlo scenarios over the holdings of one date.
+
+Each --shock is one scenario, e.g. --shock "USDJPY=-10%,*=-20%" (XXXJPY: a
+currency, TICKER: one holding, @USD: holdings priced in USD, *: all holdings).
+--paths N adds N Monte Carlo paths over --horizon days, drawn from the last
+--lookback days of asset_prices / FX history. Changes are in JPY and split into
+price / fx / cross like v_attribution.
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "app"))
+
+from db import connect  # noqa: E402
+from scenarios import (  # noqa: E402
+    COMPONENTS,
+    decompose,
+    load_positions,
+    monte_carlo,
+    parse_shocks,
+    shock_returns,
+    summarize,
+)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", dest="db_path", default="money_diary.db", help="SQLite DB path")
+    parser.add_argument("--date", default=None, help="Base date (default: latest valuation date)")
+    parser.add_argument("--account", default=None, help="Only this account's holdings (default: all accounts)")
+    parser.add_argument("--shock", action="append", default=[], help="Shock scenario KEY=CHANGE[,KEY=CHANGE...]")
+    parser.add_argument("--by-holding", action="store_true", help="Also print per-holding rows for each shock")
+    parser.add_argument("--paths", type=int, default=0, help="Monte Carlo paths (default: 0, none)")
+    parser.add_argument("--horizon", type=int, default=20, help="Monte Carlo horizon in days (default: 20)")
+    parser.add_argument("--lookback", type=int, default=250, help="History days to estimate from (default: 250)")
+    parser.add_argument("--method", choices=("normal", "bootstrap"), default="normal")
+    parser.add_argument("--seed", type=int, default=None, help="Random seed for reproducible paths")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if not args.shock and args.paths <= 0:
+        raise SystemExit("Specify at least one --shock or --paths N")
+    try:
+        shocks = [parse_shocks(text) for text in args.shock]
+    except ValueError as exc:
+        raise SystemExit(str(exc)) from None
+
+    conn = connect(args.db_path, read_only=True)
+    try:
+        date = args.date or conn.execute("SELECT MAX(date) FROM v_valuation WHERE value_jpy IS NOT NULL").fetchone()[0]
+        if date is None:
+            raise SystemExit("No valued holdings in the DB")
+        positions = load_positions(conn, date, args.account)
+        if not positions["tickers"]:
+            raise SystemExit(f"No valued holdings on {date}")
+        base = positions["value"].sum()
+        print(f"Base {date}: {len(positions['tickers'])} holdings, {base:,.0f} JPY")
+
+        if shocks:
+            result = decompose(positions, *shock_returns(positions, shocks))
+            print(f"\n{'scenario':<32} " + " ".join(f"{name:>16}" for name in COMPONENTS) + f" {'total %':>8}")
+            for i, text in enumerate(args.shock):
+                print(
+                    f"{text:<32} "
+                    + " ".join(f"{result[name][i]:>16,.0f}" for name in COMPONENTS)
+                    + f" {result['total'][i] / base:>8.2%}"
+                )
+                if args.by_holding:
+                    rows = decompose(positions, *shock_returns(positions, [shocks[i]]), by_holding=True)
+                    for h, ticker in enumerate(positions["tickers"]):
+                        print(f"  {ticker:<30} " + " ".join(f"{rows[name][0, h]:>16,.0f}" for name in COMPONENTS))
+
+        if args.paths > 0:
+            began = time.perf_counter()
+            try:
+                result = monte_carlo(
+                    conn, positions, args.paths, args.horizon, args.lookback, args.method, args.seed
+                )
+            except ValueError as exc:
+                raise SystemExit(str(exc)) from None
+            elapsed = time.perf_counter() - began
+            print(
+                f"\nMonte Carlo: {args.paths} paths, {args.horizon}-day horizon, {args.method}, "
+                f"lookback {args.lookback} ({elapsed:.2f}s)"
+            )
+            stats = summarize(result)
+            columns = list(stats["total"])
+            print(f"{'component':<10} " + " ".join(f"{c:>14}" for c in columns))
+            for name in COMPONENTS:
+                print(f"{name:<10} " + " ".join(f"{stats[name][c]:>14,.0f}" for c in columns))
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
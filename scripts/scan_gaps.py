@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""Scan the whole history for data gaps and store them in data_gaps.
+
+Kinds: fx_missing (snapshots without an XXXJPY rate), price_hole (dates inside a
+ticker's price range where its market traded but no close is stored) and
+attribution (dropped rows / account totals that the attribution does not explain).
+Scans are incremental: triggers record the earliest changed date per kind in
+gap_dirty, and only dates from there on are rescanned (see app/gaps.py).
+"""
+import argparse
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "app"))
+
+from db import connect, ensure_schema  # noqa: E402
+from gaps import gap_counts, scan_gaps  # noqa: E402
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", dest="db_path", default="money_diary.db", help="SQLite DB path")
+    parser.add_argument("--full", action="store_true", help="Rescan every kind over the whole history")
+    parser.add_argument("--list", type=int, default=10, help="Latest gaps to print per kind (default: 10)")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    conn = connect(args.db_path)
+    try:
+        ensure_schema(conn)
+        scanned = scan_gaps(conn, full=args.full)
+        if not scanned:
+            print("Gap scan is up to date")
+        print(f"{'kind':<12} {'gaps':>7} {'keys':>6} {'first':>10} {'last':>10}")
+        for kind, (n, keys, first, last) in gap_counts(conn).items():
+            print(f"{kind:<12} {n:>7} {keys:>6} {first or '-':>10} {last or '-':>10}")
+            rows = conn.execute(
+                "SELECT date, key, detail FROM data_gaps WHERE kind = ? ORDER BY date DESC, key LIMIT ?",
+                (kind, args.list),
+            ).fetchall()
+            for date, key, detail in rows:
+                print(f"  {date} {key:<24} {detail}")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""Serve the portfolio views as a local read-only HTTP API (JSON or Arrow).
+
+Endpoints: /api/meta, /api/valuation, /api/history, /api/exposure, /api/attribution
+(see app/api.py). Responses carry an ETag derived from PRAGMA data_version; send it
+back in If-None-Match to get 304 until the DB changes. Range endpoints are paged by
+valuation date (?days=, next page in "next" / the Link header).
+"""
+import argparse
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "app"))
+
+from api import serve  # noqa: E402
+from db import connect, ensure_schema  # noqa: E402
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", dest="db_path", default="money_diary.db", help="SQLite DB path")
+    parser.add_argument("--host", default="127.0.0.1", help="Bind address (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8767, help="Port (default: 8767)")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if not Path(args.db_path).exists():
+        raise SystemExit(f"DB not found: {args.db_path}")
+    # the server only reads; bring the schema up to date once before serving
+    conn = connect(args.db_path)
+    try:
+        ensure_schema(conn)
+    finally:
+        conn.close()
+    print(f"Serving {args.db_path} on http://{args.host}:{args.port}/api/meta (Ctrl+C to stop)")
+    try:
+        serve(args.db_path, args.host, args.port)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""Stress test: a fetch backfill and a simulated dashboard reading the same DB at once.
+
+Builds a synthetic DB, starts the local Yahoo stub and runs an FX + price
+backfill (backfill() from yahoo_client, as fetch_fx.py / fetch_prices.py do)
+while reader processes replay the dashboard's queries over read-only
+connections. Read latency percentiles are reported separately for the idle
+phase (before the backfill starts) and while the backfill is writing.
+`--journal delete` runs the same load on the rollback journal for comparison.
+Exits with status 1 if any read fails (e.g. "database is locked").
+"""
+import argparse
+import datetime as dt
+import multiprocessing as mp
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "app"))
+
+import fetch_fx  # noqa: E402
+import fetch_prices  # noqa: E402
+from db import BUSY_TIMEOUT_MS, connect  # noqa: E402
+from synth_db import build_synthetic_db  # noqa: E402
+from yahoo_client import FetchRecorder, backfill, percentile  # noqa: E402
+from yahoo_stub import StubConfig, start_stub  # noqa: E402
+
+# name -> SQL run by the dashboard on every rerun; parameters are a random (start, end) date
+# window, truncated to the number of placeholders
+DASHBOARD_QUERIES = {
+    "portfolio_history": (
+        "SELECT date, total_value FROM portfolio_total_rc WHERE rc = 'JPY' AND date BETWEEN ? AND ? ORDER BY date"
+    ),
+    "currency_history": (
+        "SELECT date, ccy, value FROM exposure_rc WHERE rc = 'JPY' AND date BETWEEN ? AND ? ORDER BY date, ccy"
+    ),
+    "valuation_for_date": (
+        "SELECT account, ticker, ccy, qty, price_ccy, fx_rate, value FROM valuation_rc WHERE rc = 'JPY' AND date = ?"
+    ),
+    "asset_prices": (
+        "SELECT date, ticker, close FROM asset_prices"
+        " WHERE ticker IN ('T0000', 'T0001', 'T0002') AND date BETWEEN ? AND ? ORDER BY date, ticker"
+    ),
+}
+
+
+def dashboard_reader(db_path: str, dates: list[str], stop, results, seed: int) -> None:
+    """Run dashboard queries over a read-only connection until stop is set."""
+    rng = random.Random(seed)
+    conn = connect(db_path, read_only=True)
+    samples = []
+    try:
+        while not stop.is_set():
+            name = rng.choice(list(DASHBOARD_QUERIES))
+            i = rng.randrange(len(dates))
+            j = min(len(dates) - 1, i + 250)
+            sql = DASHBOARD_QUERIES[name]
+            params = (dates[i], dates[j])[: sql.count("?")]
+            began = time.perf_counter()
+            error = None
+            try:
+                conn.execute(sql, params).fetchall()
+            except sqlite3.OperationalError as exc:
+                error = str(exc)
+            samples.append((time.time(), name, (time.perf_counter() - began) * 1000, error))
+            time.sleep(rng.uniform(0, 0.01))
+    finally:
+        conn.close()
+        results.put(samples)
+
+
+def open_writer(db_path: Path, journal: str) -> sqlite3.Connection:
+    if journal == "wal":
+        return connect(db_path)
+    conn = sqlite3.connect(db_path, timeout=BUSY_TIMEOUT_MS / 1000)
+    conn.execute("PRAGMA journal_mode = DELETE")
+    return conn
+
+
+def run_backfill(conn: sqlite3.Connection, base_url: str, tickers: list[str], start: dt.date, end: dt.date,
+                 chunk_days: int) -> int:
+    recorder = FetchRecorder("stress_concurrency", [], conn)
+    options = {"user_agent": "MoneyDiaryStress/1.0", "base_url": base_url, "retry_backoff": 0.05}
+    backfill(
+        [(f"{ccy}JPY", f"{ccy}JPY=X") for ccy in ("USD", "EUR")],
+        start,
+        end,
+        target="fx_rates",
+        store=fetch_fx.store_history,
+        on_chunk=lambda *_: None,
+        recorder=recorder,
+        conn=conn,
+        chunk_days=chunk_days,
+        resume=False,
+        **options,
+    )
+    backfill(
+        [(ticker, ticker) for ticker in tickers],
+        start,
+        end,
+        target="asset_prices",
+        store=fetch_prices.store_history,
+        on_chunk=lambda *_: None,
+        recorder=recorder,
+        conn=conn,
+        chunk_days=chunk_days,
+        resume=False,
+        **options,
+    )
+    recorder.finish("ok")
+    return sum(r.get("rows_changed") or 0 for r in recorder.requests)
+
+
+def report(label: str, samples: list[tuple]) -> None:
+    print(f"{label}:")
+    print(f"  {'query':<20} {'reads':>6} {'errors':>6} {'p50ms':>8} {'p95ms':>8} {'p99ms':>8} {'maxms':>8}")
+    for name in [*DASHBOARD_QUERIES, None]:
+        rows = [s for s in samples if name is None or s[1] == name]
+        ok = [s[2] for s in rows if s[3] is None]
+        errors = len(rows) - len(ok)
+        if not ok:
+            print(f"  {name or 'all':<20} {len(rows):>6} {errors:>6}")
+            continue
+        print(
+            f"  {name or 'all':<20} {len(rows):>6} {errors:>6} {percentile(ok, 50):>8.1f} "
+            f"{percentile(ok, 95):>8.1f} {percentile(ok, 99):>8.1f} {max(ok):>8.1f}"
+        )
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--journal", choices=("wal", "delete"), default="wal", help="Journal mode (default: wal)")
+    parser.add_argument("--tickers", type=int, default=100, help="Synthetic tickers to backfill (default: 100)")
+    parser.add_argument("--days", type=int, default=1500, help="Calendar days of history (default: 1500)")
+    parser.add_argument("--chunk-days", type=int, default=365, help="Backfill chunk size (default: 365)")
+    parser.add_argument("--readers", type=int, default=4, help="Dashboard reader processes (default: 4)")
+    parser.add_argument("--idle-seconds", type=float, default=2.0, help="Reads before the backfill (default: 2)")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    server = start_stub(StubConfig())
+    base_url = f"http://127.0.0.1:{server.server_port}"
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = Path(tmp) / "stress.db"
+            end = dt.date(2025, 9, 30)
+            start = end - dt.timedelta(days=args.days - 1)
+            counts = build_synthetic_db(db_path, args.tickers, args.days, end=end)
+            conn = open_writer(db_path, args.journal)
+            dates = [row[0] for row in conn.execute("SELECT DISTINCT date FROM snapshots ORDER BY date")]
+            tickers = [row[0] for row in conn.execute("SELECT ticker FROM assets ORDER BY ticker")]
+            print(
+                f"journal={args.journal}: {counts['snapshots']} snapshots, {len(tickers)} tickers, "
+                f"{args.readers} readers, chunk {args.chunk_days} days"
+            )
+
+            stop = mp.Event()
+            results = mp.Queue()
+            readers = [
+                mp.Process(target=dashboard_reader, args=(str(db_path), dates, stop, results, seed))
+                for seed in range(args.readers)
+            ]
+            for proc in readers:
+                proc.start()
+            time.sleep(args.idle_seconds)
+            write_began = time.time()
+            try:
+                changed = run_backfill(conn, base_url, tickers, start, end, args.chunk_days)
+            finally:
+                write_ended = time.time()
+                stop.set()
+                samples = [s for _ in readers for s in results.get()]
+                for proc in readers:
+                    proc.join()
+                conn.close()
+    finally:
+        server.shutdown()
+
+    print(f"Backfill wrote {changed} changed rows in {write_ended - write_began:.1f}s")
+    report("idle", [s for s in samples if s[0] < write_began])
+    report("during backfill", [s for s in samples if write_began <= s[0] <= write_ended])
+    errors = sorted({s[3] for s in samples if s[3]})
+    if errors:
+        print(f"Read errors: {', '.join(errors)}")
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""Build a synthetic money_diary DB at scale for benchmarks (deterministic)."""
+import argparse
+import datetime as dt
+import math
+import random
+import sqlite3
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "app"))
+
+from db import apply_schema  # noqa: E402
+
+CCYS = ("JPY", "USD", "EUR")
+
+
+def weekdays(end: dt.date, days: int) -> list[str]:
+    start = end - dt.timedelta(days=days - 1)
+    return [
+        (start + dt.timedelta(days=i)).isoformat()
+        for i in range(days)
+        if (start + dt.timedelta(days=i)).weekday() < 5
+    ]
+
+
+def build_synthetic_db(
+    db_path: Path | str,
+    tickers: int = 100,
+    days: int = 1000,
+    accounts: int = 1,
+    end: dt.date = dt.date(2025, 9, 30),
+    seed: int = 1,
+) -> dict[str, int]:
+    """Create db_path with assets, fx_rates, asset_prices and snapshots; returns row counts.
+
+    Rows are bulk-loaded with the schema's triggers dropped, then schema.sql is
+    re-applied, which recreates the triggers and backfills the derived tables.
+    """
+    rng = random.Random(seed)
+    dates = weekdays(end, days)
+    conn = sqlite3.connect(db_path)
+    try:
+        apply_schema(conn)
+        for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'").fetchall():
+            conn.execute(f'DROP TRIGGER "{name}"')
+        with conn:
+            conn.executemany(
+                "INSERT OR IGNORE INTO accounts (account, name) VALUES (?, ?)",
+                [("main" if a == 0 else f"acct{a}", f"Account {a}") for a in range(accounts)],
+            )
+            assets = [(f"T{i:04d}", CCYS[i % len(CCYS)], f"Ticker {i}") for i in range(tickers)]
+            conn.executemany("INSERT OR REPLACE INTO assets (ticker, ccy, name) VALUES (?, ?, ?)", assets)
+            fx_rows = []
+            for n, d in enumerate(dates):
+                fx_rows.append((d, "USDJPY", 140 + 10 * math.sin(n / 60) + rng.uniform(-0.5, 0.5)))
+                fx_rows.append((d, "EURJPY", 155 + 8 * math.sin(n / 45) + rng.uniform(-0.5, 0.5)))
+            conn.executemany("INSERT OR REPLACE INTO fx_rates (date, pair, rate) VALUES (?, ?, ?)", fx_rows)
+
+            price_rows = []
+            snap_rows = []
+            for ticker, _, _ in assets:
+                price = rng.uniform(20, 500)
+                qty = {a: rng.uniform(1, 100) for a in range(accounts)}
+                for d in dates:
+                    price *= math.exp(rng.gauss(0.0002, 0.015))
+                    price_rows.append((d, ticker, price))
+                    for a in range(accounts):
+                        if rng.random() < 0.02:
+                            qty[a] += rng.uniform(-5, 10)
+                            qty[a] = max(qty[a], 0.0)
+                        account = "main" if a == 0 else f"acct{a}"
+                        snap_rows.append((account, d, ticker, qty[a], price))
+            conn.executemany(
+                "INSERT OR REPLACE INTO asset_prices (date, ticker, close) VALUES (?, ?, ?)", price_rows
+            )
+            conn.executemany(
+                "INSERT OR REPLACE INTO snapshots (account, date, ticker, qty, price_ccy) VALUES (?, ?, ?, ?, ?)",
+                snap_rows,
+            )
+        apply_schema(conn)
+        return {"dates": len(dates), "asset_prices": len(price_rows), "snapshots": len(snap_rows)}
+    finally:
+        conn.close()
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("db_path", help="Output SQLite path (must not exist)")
+    parser.add_argument("--tickers", type=int, default=100)
+    parser.add_argument("--days", type=int, default=1000, help="Calendar days (weekdays are used)")
+    parser.add_argument("--accounts", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=1)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if Path(args.db_path).exists():
+        raise SystemExit(f"{args.db_path} already exists")
+    counts = build_synthetic_db(args.db_path, args.tickers, args.days, args.accounts, seed=args.seed)
+    print(", ".join(f"{k}: {v}" for k, v in counts.items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -44,4 +44,10 @@ done
 
 echo "-----"
 echo "Total: $total, Failed: $fail"
+
+# Python behaviour tests (tests/test_*.py, stdlib unittest)
+if ! python3 -m unittest discover -s "$TEST_DIR" -t "$TEST_DIR"; then
+  red "FAIL: python tests"
+  fail=$((fail+1))
+fi
 exit $fail
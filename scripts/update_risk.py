@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""Update the rolling risk statistics (risk_series / risk_vol / risk_corr).
+
+Updates are incremental: asset_prices and portfolio_total_rc triggers record the
+earliest changed date per series in risk_dirty, and only observations from that
+date on are recomputed (see app/risk.py).
+"""
+import argparse
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "app"))
+
+from db import connect, ensure_schema  # noqa: E402
+from risk import update_risk  # noqa: E402
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--db", dest="db_path", default="money_diary.db", help="SQLite DB path")
+    parser.add_argument("--full", action="store_true", help="Discard stored statistics and recompute every series")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    conn = connect(args.db_path)
+    try:
+        ensure_schema(conn)
+        result = update_risk(conn, full=args.full)
+    finally:
+        conn.close()
+    if not result["series"] and all(mode == "unchanged" for mode in result["correlation"].values()):
+        print("Risk statistics are up to date")
+        return
+    windows = ", ".join(f"{window}d {mode}" for window, mode in result["correlation"].items())
+    print(f"Updated {result['series']} series ({result['rows']} rows); correlation: {windows}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,515 @@
+"""Yahoo Finance chart client and fetch instrumentation shared by the fetch scripts."""
+import datetime as dt
+import json
+import sqlite3
+import time
+import urllib.parse
+
+YAHOO_BASE_URL = "https://query1.finance.yahoo.com"
+CHART_PATH = "/v8/finance/chart/{symbol}?interval=1d&period1={start}&period2={end}"
+SPARK_PATH = "/v7/finance/spark?symbols={symbols}&interval=1d&period1={start}&period2={end}"
+RETRY_STATUS = {429, 502, 503}
+
+# Spark batches are split so that neither limit is exceeded
+MAX_BATCH_SYMBOLS = 20
+MAX_URL_LENGTH = 2000
+
+REQUEST_FIELDS = (
+    "symbol",
+    "started_at",
+    "latency_ms",
+    "elapsed_ms",
+    "http_status",
+    "retries",
+    "response_bytes",
+    "rows_parsed",
+    "rows_changed",
+    "error",
+)
+
+
+def utc_now() -> str:
+    return dt.datetime.now(dt.timezone.utc).isoformat(timespec="milliseconds")
+
+
+def to_epoch(day: dt.date) -> int:
+    return int(time.mktime(dt.datetime(day.year, day.month, day.day, 0, 0).timetuple()))
+
+
+def _series_to_history(timestamps: list, closes: list) -> dict[str, float]:
+    history: dict[str, float] = {}
+    for ts, close in zip(timestamps, closes):
+        if close is None:
+            continue
+        date = dt.datetime.fromtimestamp(ts, dt.timezone.utc).date().isoformat()
+        history[date] = float(close)
+    return history
+
+
+def parse_chart(data: dict, symbol: str) -> dict[str, float]:
+    result = (data.get("chart") or {}).get("result") or []
+    if not result:
+        error = (data.get("chart") or {}).get("error")
+        raise RuntimeError(f"No data returned for {symbol}: {error}")
+
+    node = result[0]
+    timestamps = node.get("timestamp") or []
+    if not timestamps:
+        # a valid symbol without bars in the range (before listing, holidays only)
+        return {}
+    quotes = (node.get("indicators") or {}).get("quote") or []
+    if not quotes:
+        raise RuntimeError(f"Missing time series for {symbol}")
+
+    return _series_to_history(timestamps, quotes[0].get("close") or [])
+
+
+def parse_spark(data: dict) -> dict[str, dict[str, float]]:
+    """Parse a spark response into {symbol: {date: close}}; symbols without data are omitted.
+
+    Accepts both the v7 shape ({"spark": {"result": [{"symbol", "response": [chart]}]}})
+    and the flat v8 shape ({symbol: {"timestamp": [...], "close": [...]}}).
+    """
+    histories: dict[str, dict[str, float]] = {}
+    if "spark" in data:
+        for item in (data.get("spark") or {}).get("result") or []:
+            symbol = item.get("symbol")
+            response = item.get("response") or []
+            if not symbol or not response:
+                continue
+            node = response[0]
+            timestamps = node.get("timestamp") or []
+            quotes = (node.get("indicators") or {}).get("quote") or []
+            if timestamps and quotes:
+                histories[symbol] = _series_to_history(timestamps, quotes[0].get("close") or [])
+        return histories
+    for symbol, node in data.items():
+        if isinstance(node, dict) and node.get("timestamp"):
+            histories[symbol] = _series_to_history(node["timestamp"], node.get("close") or [])
+    return histories
+
+
+def _get(
+    url: str,
+    label: str,
+    *,
+    user_agent: str,
+    timeout: float,
+    max_attempts: int,
+    retry_backoff: float,
+    stats: dict,
+) -> bytes:
+    """GET with retry/backoff on 429/5xx and network errors; fills latency/status/retry stats."""
+    # urllib.request drags in http.client / email / ssl; import it only when a request is made
+    import urllib.error
+    import urllib.request
+
+    req = urllib.request.Request(url, headers={"User-Agent": user_agent})
+    backoff = retry_backoff
+    for attempt in range(max_attempts):
+        attempt_began = time.perf_counter()
+        last = attempt == max_attempts - 1
+        try:
+            with urllib.request.urlopen(req, timeout=timeout) as resp:
+                body = resp.read()
+                stats["http_status"] = resp.status
+            stats["latency_ms"] = (time.perf_counter() - attempt_began) * 1000
+            stats["response_bytes"] = len(body)
+            return body
+        except urllib.error.HTTPError as exc:
+            stats["http_status"] = exc.code
+            stats["latency_ms"] = (time.perf_counter() - attempt_began) * 1000
+            if exc.code in RETRY_STATUS and not last:
+                stats["retries"] += 1
+                time.sleep(backoff)
+                backoff *= 2
+                continue
+            raise RuntimeError(f"Yahoo Finance request failed ({label}): HTTP {exc.code}") from exc
+        except (urllib.error.URLError, TimeoutError) as exc:  # type: ignore[arg-type]
+            stats["latency_ms"] = (time.perf_counter() - attempt_began) * 1000
+            if not last:
+                stats["retries"] += 1
+                time.sleep(backoff)
+                backoff *= 2
+                continue
+            raise RuntimeError(f"Yahoo Finance request failed ({label}): {exc}") from exc
+    raise RuntimeError(f"Yahoo Finance request failed ({label}): no attempts made")
+
+
+def _init_stats(stats: dict | None, label: str) -> dict:
+    if stats is None:
+        stats = {}
+    stats.update(
+        symbol=label,
+        started_at=utc_now(),
+        http_status=None,
+        retries=0,
+        response_bytes=None,
+        rows_parsed=0,
+        rows_changed=None,
+        error=None,
+    )
+    return stats
+
+
+def fetch_history(
+    symbol: str,
+    start: dt.date,
+    end: dt.date,
+    *,
+    user_agent: str,
+    base_url: str = YAHOO_BASE_URL,
+    timeout: float = 20.0,
+    max_attempts: int = 4,
+    retry_backoff: float = 2.0,
+    stats: dict | None = None,
+) -> dict[str, float]:
+    """Fetch daily closes for one symbol; per-request metrics are written into stats."""
+    url = base_url.rstrip("/") + CHART_PATH.format(
+        symbol=urllib.parse.quote(symbol, safe=""),
+        start=to_epoch(start),
+        end=to_epoch(end + dt.timedelta(days=1)),
+    )
+    stats = _init_stats(stats, symbol)
+    began = time.perf_counter()
+    try:
+        body = _get(
+            url,
+            symbol,
+            user_agent=user_agent,
+            timeout=timeout,
+            max_attempts=max_attempts,
+            retry_backoff=retry_backoff,
+            stats=stats,
+        )
+        history = parse_chart(json.loads(body), symbol)
+        stats["rows_parsed"] = len(history)
+        return history
+    except RuntimeError as exc:
+        stats["error"] = str(exc)
+        raise
+    finally:
+        stats["elapsed_ms"] = (time.perf_counter() - began) * 1000
+
+
+def split_batches(
+    symbols: list[str],
+    base_url: str = YAHOO_BASE_URL,
+    max_symbols: int = MAX_BATCH_SYMBOLS,
+    max_url_length: int = MAX_URL_LENGTH,
+) -> list[list[str]]:
+    """Group symbols into spark batches bounded by symbol count and URL length."""
+    fixed = len(base_url.rstrip("/") + SPARK_PATH.format(symbols="", start="0" * 10, end="0" * 10))
+    batches: list[list[str]] = []
+    batch: list[str] = []
+    length = fixed
+    for symbol in symbols:
+        # quoted symbol plus the encoded comma separator
+        cost = len(urllib.parse.quote(symbol, safe="")) + (3 if batch else 0)
+        if batch and (len(batch) >= max_symbols or length + cost > max_url_length):
+            batches.append(batch)
+            batch, length = [], fixed
+            cost = len(urllib.parse.quote(symbol, safe=""))
+        batch.append(symbol)
+        length += cost
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+def fetch_batch(
+    symbols: list[str],
+    start: dt.date,
+    end: dt.date,
+    *,
+    user_agent: str,
+    base_url: str = YAHOO_BASE_URL,
+    timeout: float = 20.0,
+    max_attempts: int = 4,
+    retry_backoff: float = 2.0,
+    stats: dict | None = None,
+) -> dict[str, dict[str, float]]:
+    """Fetch daily closes for several symbols in one spark request.
+
+    Returns {symbol: {date: close}} for the symbols present in the response; callers
+    should treat absent symbols as failed.
+    """
+    label = ",".join(symbols)
+    url = base_url.rstrip("/") + SPARK_PATH.format(
+        symbols=urllib.parse.quote(label, safe=""),
+        start=to_epoch(start),
+        end=to_epoch(end + dt.timedelta(days=1)),
+    )
+    stats = _init_stats(stats, label)
+    began = time.perf_counter()
+    try:
+        body = _get(
+            url,
+            label,
+            user_agent=user_agent,
+            timeout=timeout,
+            max_attempts=max_attempts,
+            retry_backoff=retry_backoff,
+            stats=stats,
+        )
+        histories = {s: h for s, h in parse_spark(json.loads(body)).items() if s in symbols and h}
+        stats["rows_parsed"] = sum(len(h) for h in histories.values())
+        missing = [s for s in symbols if s not in histories]
+        if missing:
+            stats["error"] = f"Missing from batch response: {','.join(missing)}"
+        return histories
+    except (RuntimeError, ValueError) as exc:
+        stats["error"] = str(exc)
+        raise RuntimeError(f"Yahoo Finance batch request failed ({label}): {exc}") from exc
+    finally:
+        stats["elapsed_ms"] = (time.perf_counter() - began) * 1000
+
+
+def fetch_histories(
+    symbols: list[str],
+    start: dt.date,
+    end: dt.date,
+    *,
+    user_agent: str,
+    recorder: "FetchRecorder",
+    base_url: str = YAHOO_BASE_URL,
+    batch_size: int = 1,
+    workers: int = 1,
+    timeout: float = 20.0,
+    retry_backoff: float = 2.0,
+) -> tuple[dict[str, dict[str, float]], dict[str, dict]]:
+    """Fetch several symbols, batched via spark when batch_size > 1.
+
+    Up to `workers` requests run concurrently. Symbols missing from a batch response,
+    or in a failed batch, are retried one by one through the chart endpoint. Returns
+    ({symbol: history}, {symbol: stats}); the stats dict is shared by all symbols
+    served by the same request. Raises RuntimeError if a symbol cannot be fetched.
+    """
+    options = {"user_agent": user_agent, "base_url": base_url, "timeout": timeout, "retry_backoff": retry_backoff}
+    histories: dict[str, dict[str, float]] = {}
+    stats_by_symbol: dict[str, dict] = {}
+    pending = list(dict.fromkeys(symbols))
+
+    def run(fn, jobs):
+        if workers <= 1 or len(jobs) <= 1:
+            return [fn(job) for job in jobs]
+        # pulls in logging; only needed with --workers
+        from concurrent.futures import ThreadPoolExecutor
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            return list(pool.map(fn, jobs))
+
+    if batch_size > 1 and len(pending) > 1:
+
+        def one_batch(batch: list[str]) -> tuple[list[str], dict, dict]:
+            stats = recorder.new_request()
+            try:
+                return batch, fetch_batch(batch, start, end, stats=stats, **options), stats
+            except RuntimeError:
+                return batch, {}, stats
+
+        fallback: list[str] = []
+        for batch, found, stats in run(one_batch, split_batches(pending, base_url, max_symbols=batch_size)):
+            for symbol in batch:
+                if symbol in found:
+                    histories[symbol] = found[symbol]
+                    stats_by_symbol[symbol] = stats
+                else:
+                    fallback.append(symbol)
+        pending = fallback
+
+    def one_symbol(symbol: str) -> tuple[str, dict, dict]:
+        stats = recorder.new_request()
+        return symbol, fetch_history(symbol, start, end, stats=stats, **options), stats
+
+    for symbol, history, stats in run(one_symbol, pending):
+        histories[symbol] = history
+        stats_by_symbol[symbol] = stats
+    return histories, stats_by_symbol
+
+
+def date_chunks(start: dt.date, end: dt.date, days: int) -> list[tuple[dt.date, dt.date]]:
+    """Split [start, end] into chunks on a fixed grid of `days`-day cells (0 = one chunk).
+
+    The grid does not depend on start, so re-running with a different start date
+    still lines up with chunks recorded by an earlier run.
+    """
+    if days <= 0:
+        return [(start, end)]
+    chunks = []
+    cur = start
+    while cur <= end:
+        next_cell = dt.date.fromordinal((cur.toordinal() // days + 1) * days)
+        chunk_end = min(end, next_cell - dt.timedelta(days=1))
+        chunks.append((cur, chunk_end))
+        cur = chunk_end + dt.timedelta(days=1)
+    return chunks
+
+
+def backfill(
+    items: list[tuple[str, str]],
+    start: dt.date,
+    end: dt.date,
+    *,
+    target: str,
+    store,
+    on_chunk,
+    recorder: "FetchRecorder",
+    conn: sqlite3.Connection | None,
+    chunk_days: int,
+    resume: bool,
+    **fetch_options,
+) -> int:
+    """Fetch (key, symbol) items chunk by chunk, committing each key's chunk as it arrives.
+
+    store(conn, key, history) upserts one history and returns the changed row count;
+    on_chunk(chunk_start, chunk_end, {key: history}) is called before writing (for
+    printing). Completed chunks that end before today are recorded in fetch_chunks;
+    with resume=True those are skipped. Returns the number of chunks skipped.
+    """
+    today = dt.date.today()
+    done: set[tuple[str, str, str]] = set()
+    if conn is not None and resume:
+        done = {
+            tuple(row)
+            for row in conn.execute(
+                "SELECT key, chunk_start, chunk_end FROM fetch_chunks WHERE target = ?",
+                (target,),
+            )
+        }
+    skipped = 0
+    for chunk_start, chunk_end in date_chunks(start, end, chunk_days):
+        span = (chunk_start.isoformat(), chunk_end.isoformat())
+        pending = [(key, symbol) for key, symbol in items if (key, *span) not in done]
+        skipped += len(items) - len(pending)
+        if not pending:
+            continue
+        histories, stats_by_symbol = fetch_histories(
+            [symbol for _, symbol in pending], chunk_start, chunk_end, recorder=recorder, **fetch_options
+        )
+        by_key = {key: histories[symbol] for key, symbol in pending}
+        on_chunk(chunk_start, chunk_end, by_key)
+        if conn is None:
+            continue
+        for _, symbol in pending:
+            stats_by_symbol[symbol]["rows_changed"] = 0
+        # One short transaction per (key, chunk): at most chunk_days rows hold the write lock
+        for key, symbol in pending:
+            with conn:
+                stats_by_symbol[symbol]["rows_changed"] += store(conn, key, by_key[key])
+                if chunk_end < today:
+                    conn.execute(
+                        """
+                        INSERT INTO fetch_chunks
+                          (target, key, symbol, chunk_start, chunk_end, rows, run_id, fetched_at)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                        ON CONFLICT(target, key, chunk_start, chunk_end) DO UPDATE SET
+                          symbol = excluded.symbol,
+                          rows = excluded.rows,
+                          run_id = excluded.run_id,
+                          fetched_at = excluded.fetched_at
+                        """,
+                        (target, key, symbol, *span, len(by_key[key]), recorder.run_id, utc_now()),
+                    )
+    return skipped
+
+
+def percentile(values: list[float], pct: float) -> float | None:
+    """Nearest-rank percentile (pct in 0-100)."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, min(len(ordered), round(pct / 100 * len(ordered) + 0.5)))
+    return ordered[rank - 1]
+
+
+class FetchRecorder:
+    """Collects per-request metrics for one fetch run.
+
+    Metrics are persisted to fetch_runs / fetch_requests (schema.sql; callers run
+    db.ensure_schema first) when a connection is given and appended to a JSON-lines
+    file when jsonl_path is given.
+    """
+
+    def __init__(
+        self,
+        script: str,
+        args: list[str],
+        conn: sqlite3.Connection | None = None,
+        jsonl_path: str | None = None,
+    ):
+        self.script = script
+        self.args = " ".join(args)
+        self.conn = conn
+        self.jsonl_path = jsonl_path
+        self.started_at = utc_now()
+        self.requests: list[dict] = []
+        self.run_id: int | None = None
+        if conn is not None:
+            with conn:
+                cur = conn.execute(
+                    "INSERT INTO fetch_runs (script, args, started_at) VALUES (?, ?, ?)",
+                    (script, self.args, self.started_at),
+                )
+                self.run_id = cur.lastrowid
+
+    def new_request(self) -> dict:
+        stats: dict = {}
+        self.requests.append(stats)
+        return stats
+
+    def finish(self, status: str = "ok") -> None:
+        finished_at = utc_now()
+        rows_changed = sum(r.get("rows_changed") or 0 for r in self.requests)
+        if self.conn is not None and self.run_id is not None:
+            with self.conn:
+                self.conn.executemany(
+                    f"""
+                    INSERT INTO fetch_requests (run_id, {", ".join(REQUEST_FIELDS)})
+                    VALUES (?, {", ".join("?" for _ in REQUEST_FIELDS)})
+                    """,
+                    [(self.run_id, *(r.get(f) for f in REQUEST_FIELDS)) for r in self.requests if r],
+                )
+                self.conn.execute(
+                    """
+                    UPDATE fetch_runs
+                       SET finished_at = ?, status = ?, n_requests = ?, rows_changed = ?
+                     WHERE id = ?
+                    """,
+                    (finished_at, status, len(self.requests), rows_changed, self.run_id),
+                )
+        if self.jsonl_path:
+            with open(self.jsonl_path, "a", encoding="utf-8") as f:
+                for r in self.requests:
+                    if r:
+                        f.write(json.dumps({"type": "request", "script": self.script, **r}) + "\n")
+                f.write(
+                    json.dumps(
+                        {
+                            "type": "run",
+                            "script": self.script,
+                            "args": self.args,
+                            "started_at": self.started_at,
+                            "finished_at": finished_at,
+                            "status": status,
+                            "n_requests": len(self.requests),
+                            "rows_changed": rows_changed,
+                        }
+                    )
+                    + "\n"
+                )
+
+    def summary(self) -> str:
+        done = [r for r in self.requests if r]
+        latencies = [r["latency_ms"] for r in done if r.get("latency_ms") is not None]
+        p50 = percentile(latencies, 50)
+        p99 = percentile(latencies, 99)
+        return (
+            f"Requests: {len(done)}, errors: {sum(1 for r in done if r.get('error'))}, "
+            f"retries: {sum(r.get('retries') or 0 for r in done)}, "
+            f"bytes: {sum(r.get('response_bytes') or 0 for r in done)}, "
+            f"rows parsed/changed: {sum(r.get('rows_parsed') or 0 for r in done)}"
+            f"/{sum(r.get('rows_changed') or 0 for r in done)}, "
+            f"latency p50/p99: {p50 or 0:.0f}/{p99 or 0:.0f} ms"
+        )
+
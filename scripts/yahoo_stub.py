@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""Local stand-in for the Yahoo Finance chart / spark endpoints serving synthetic closes.
+
+Point the fetchers at it with --base-url http://127.0.0.1:PORT.
+"""
+import argparse
+import datetime as dt
+import hashlib
+import json
+import math
+import random
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StubConfig:
+    def __init__(
+        self,
+        latency_ms: float = 0.0,
+        jitter_ms: float = 0.0,
+        rate_429: float = 0.0,
+        rate_503: float = 0.0,
+        pad_bytes: int = 0,
+        seed: int | None = None,
+        listed: dict[str, dt.date] | None = None,
+        spark_status: int | None = None,
+    ):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.rate_429 = rate_429
+        self.rate_503 = rate_503
+        self.pad_bytes = pad_bytes
+        self.rng = random.Random(seed)
+        # symbol -> first trading day; earlier ranges come back without bars
+        self.listed = listed or {}
+        # answer every spark request with this HTTP status (the chart endpoint keeps working)
+        self.spark_status = spark_status
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.injected = 0
+        self.by_endpoint = {"chart": 0, "spark": 0}
+        self.in_flight = 0
+        self.peak_in_flight = 0
+
+
+def synthetic_series(symbol: str, period1: int, period2: int, listed: dt.date | None = None) -> dict:
+    """Deterministic weekday closes for symbol in [period1, period2) as a chart result node.
+
+    Like Yahoo, a range without bars (weekends, before listed) has no timestamp / indicators.
+    """
+    base = 50 + int(hashlib.sha1(symbol.encode()).hexdigest()[:6], 16) % 450
+    timestamps: list[int] = []
+    closes: list[float] = []
+    day = dt.datetime.fromtimestamp(period1, dt.timezone.utc).date()
+    last = dt.datetime.fromtimestamp(max(period1, period2 - 1), dt.timezone.utc).date()
+    while day <= last:
+        if day.weekday() < 5 and (listed is None or day >= listed):
+            n = day.toordinal()
+            timestamps.append(int(dt.datetime(day.year, day.month, day.day, tzinfo=dt.timezone.utc).timestamp()))
+            closes.append(round(base * (1 + 0.1 * math.sin(n / 30)) + (n % 7) * 0.01, 4))
+        day += dt.timedelta(days=1)
+    if not timestamps:
+        return {"meta": {"symbol": symbol, "currency": "USD"}}
+    return {
+        "meta": {"symbol": symbol, "currency": "USD"},
+        "timestamp": timestamps,
+        "indicators": {"quote": [{"close": closes}]},
+    }
+
+
+def make_handler(config: StubConfig):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):  # noqa: N802
+            url = urllib.parse.urlparse(self.path)
+            endpoint = "spark" if url.path == "/v7/finance/spark" else "chart"
+            with config.lock:
+                config.requests += 1
+                config.by_endpoint[endpoint] += 1
+                config.in_flight += 1
+                config.peak_in_flight = max(config.peak_in_flight, config.in_flight)
+                delay = max(0.0, config.latency_ms + config.rng.uniform(-config.jitter_ms, config.jitter_ms))
+                roll = config.rng.random()
+            try:
+                time.sleep(delay / 1000)
+                self._respond(url, endpoint, roll)
+            finally:
+                with config.lock:
+                    config.in_flight -= 1
+
+        def _respond(self, url: urllib.parse.ParseResult, endpoint: str, roll: float) -> None:
+            status = None
+            if roll < config.rate_429:
+                status = 429
+            elif roll < config.rate_429 + config.rate_503:
+                status = 503
+            if status is not None:
+                with config.lock:
+                    config.injected += 1
+                self._send(status, b"{}")
+                return
+            if endpoint == "spark" and config.spark_status is not None:
+                self._send(config.spark_status, b'{"error": "spark unavailable"}')
+                return
+
+            query = urllib.parse.parse_qs(url.query)
+            try:
+                period1 = int(query["period1"][0])
+                period2 = int(query["period2"][0])
+            except (KeyError, ValueError):
+                self._send(400, b'{"error": "period1/period2 required"}')
+                return
+
+            if url.path.startswith("/v8/finance/chart/"):
+                symbol = urllib.parse.unquote(url.path.rsplit("/", 1)[-1])
+                node = synthetic_series(symbol, period1, period2, config.listed.get(symbol))
+                data = {"chart": {"result": [node], "error": None}}
+            elif url.path == "/v7/finance/spark":
+                symbols = [s for s in query.get("symbols", [""])[0].split(",") if s]
+                data = {
+                    "spark": {
+                        "result": [
+                            {"symbol": s, "response": [synthetic_series(s, period1, period2, config.listed.get(s))]}
+                            for s in symbols
+                        ],
+                        "error": None,
+                    }
+                }
+            else:
+                self._send(404, b'{"error": "not found"}')
+                return
+            if config.pad_bytes:
+                data["padding"] = "x" * config.pad_bytes
+            self._send(200, json.dumps(data).encode())
+
+        def _send(self, status: int, body: bytes) -> None:
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):  # noqa: A002
+            pass
+
+    return Handler
+
+
+def start_stub(config: StubConfig, host: str = "127.0.0.1", port: int = 0) -> ThreadingHTTPServer:
+    """Start the stub in a daemon thread; server.server_port holds the bound port."""
+    server = ThreadingHTTPServer((host, port), make_handler(config))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="Mean response latency (default: 50)")
+    parser.add_argument("--jitter-ms", type=float, default=20.0, help="Uniform +/- latency jitter (default: 20)")
+    parser.add_argument("--rate-429", type=float, default=0.0, help="Fraction of requests answered with 429")
+    parser.add_argument("--rate-503", type=float, default=0.0, help="Fraction of requests answered with 503")
+    parser.add_argument("--pad-bytes", type=int, default=0, help="Extra payload bytes per response")
+    parser.add_argument("--seed", type=int, default=None, help="Random seed for jitter/error injection")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    config = StubConfig(args.latency_ms, args.jitter_ms, args.rate_429, args.rate_503, args.pad_bytes, args.seed)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(config))
+    server.daemon_threads = True
+    print(f"Serving Yahoo stub on http://{args.host}:{server.server_port} (Ctrl-C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f"Served {config.requests} requests ({config.injected} injected errors)")
+
+
+if __name__ == "__main__":
+    main()
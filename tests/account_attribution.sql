@@ -0,0 +1,26 @@
+-- per-account attribution rows and the consolidated view summed from them
+INSERT INTO assets (ticker, ccy) VALUES ('VTI','USD');
+INSERT INTO accounts (account, name) VALUES ('nisa','NISA');
+INSERT INTO fx_rates (date, pair, rate) VALUES ('2025-09-14','USDJPY',140.0);
+INSERT INTO fx_rates (date, pair, rate) VALUES ('2025-09-15','USDJPY',145.0);
+INSERT INTO snapshots (account, date, ticker, qty, price_ccy) VALUES ('main','2025-09-14','VTI',100,200);
+INSERT INTO snapshots (account, date, ticker, qty, price_ccy) VALUES ('main','2025-09-15','VTI',100,210);
+INSERT INTO snapshots (account, date, ticker, qty, price_ccy) VALUES ('nisa','2025-09-14','VTI',10,200);
+INSERT INTO snapshots (account, date, ticker, qty, price_ccy) VALUES ('nisa','2025-09-15','VTI',20,210);
+
+SELECT 'account' AS scope,
+       account,
+       date,
+       ticker,
+       round(delta_total, 3) AS total,
+       round(delta_price, 3) AS price,
+       round(delta_fx, 3)    AS fx,
+       round(delta_cross, 3) AS cross,
+       round(flow, 3)        AS flow
+FROM v_account_attribution
+UNION ALL
+SELECT 'consolidated', NULL, date, ticker,
+       round(delta_total, 3), round(delta_price, 3), round(delta_fx, 3),
+       round(delta_cross, 3), round(flow, 3)
+FROM v_attribution
+ORDER BY scope, account, ticker;
@@ -0,0 +1,21 @@
+-- per-account totals per reporting currency and the consolidated totals built from them
+INSERT INTO assets (ticker, ccy) VALUES ('VTI','USD');
+INSERT INTO assets (ticker, ccy) VALUES ('TOPIX','JPY');
+INSERT INTO accounts (account, name) VALUES ('nisa','NISA');
+INSERT INTO fx_rates (date, pair, rate) VALUES ('2025-09-15','USDJPY',150.0);
+INSERT INTO snapshots (account, date, ticker, qty, price_ccy) VALUES ('main','2025-09-15','VTI',10,200);
+INSERT INTO snapshots (account, date, ticker, qty, price_ccy) VALUES ('main','2025-09-15','TOPIX',100,3000);
+INSERT INTO snapshots (account, date, ticker, qty, price_ccy) VALUES ('nisa','2025-09-15','VTI',5,200);
+DELETE FROM snapshots WHERE account = 'main' AND ticker = 'TOPIX';
+
+SELECT rc, account, date, round(total_value, 3) AS total_value
+FROM account_total_rc
+WHERE rc IN ('JPY','USD')
+UNION ALL
+SELECT rc, 'ALL', date, round(total_value, 3)
+FROM portfolio_total_rc
+WHERE rc IN ('JPY','USD')
+UNION ALL
+SELECT 'JPY', 'v_portfolio_total', date, round(total_value_jpy, 3)
+FROM v_portfolio_total
+ORDER BY 1, 2;
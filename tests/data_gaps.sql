@@ -0,0 +1,43 @@
+-- Set-based gap views: snapshots without an FX rate, price holes inside a ticker's range,
+-- and attribution rows dropped for a missing rate or breaking the account total identity
+INSERT INTO assets (ticker, ccy) VALUES ('VTI','USD');
+INSERT INTO assets (ticker, ccy) VALUES ('SPY','USD');
+INSERT INTO assets (ticker, ccy) VALUES ('SXR8','EUR');
+INSERT INTO assets (ticker, ccy) VALUES ('TOPIX','JPY');
+INSERT INTO fx_rates (date, pair, rate) VALUES ('2025-09-10','USDJPY',150);
+INSERT INTO fx_rates (date, pair, rate) VALUES ('2025-09-12','USDJPY',152);
+INSERT INTO fx_rates (date, pair, rate) VALUES ('2025-09-10','EURJPY',160);
+
+INSERT INTO asset_prices (date, ticker, close) VALUES ('2025-09-10','VTI',200);
+INSERT INTO asset_prices (date, ticker, close) VALUES ('2025-09-11','VTI',201);
+INSERT INTO asset_prices (date, ticker, close) VALUES ('2025-09-12','VTI',202);
+INSERT INTO asset_prices (date, ticker, close) VALUES ('2025-09-10','SPY',500);
+INSERT INTO asset_prices (date, ticker, close) VALUES ('2025-09-12','SPY',505);
+INSERT INTO asset_prices (date, ticker, close) VALUES ('2025-09-11','TOPIX',2500);
+
+INSERT INTO snapshots (date, ticker, qty, price_ccy) VALUES ('2025-09-10','VTI',10,200);
+INSERT INTO snapshots (date, ticker, qty, price_ccy) VALUES ('2025-09-11','VTI',10,201);
+INSERT INTO snapshots (date, ticker, qty, price_ccy) VALUES ('2025-09-12','VTI',10,202);
+INSERT INTO snapshots (date, ticker, qty, price_ccy) VALUES ('2025-09-10','SXR8',5,100);
+INSERT INTO snapshots (date, ticker, qty, price_ccy) VALUES ('2025-09-12','SXR8',5,101);
+INSERT INTO snapshots (date, ticker, qty, price_ccy) VALUES ('2025-09-12','TOPIX',1,2500);
+INSERT INTO snapshots (account, date, ticker, qty, price_ccy) VALUES ('sub','2025-09-10','VTI',1,200);
+INSERT INTO snapshots (account, date, ticker, qty, price_ccy) VALUES ('sub','2025-09-12','VTI',1,202);
+INSERT INTO snapshots (account, date, ticker, qty, price_ccy) VALUES ('sub','2025-09-12','TOPIX',1,2500);
+DELETE FROM gap_dirty;
+
+-- Filling USDJPY on 09-11 marks the FX-dependent kinds dirty from that date
+INSERT INTO fx_rates (date, pair, rate) VALUES ('2025-09-11','USDJPY',151);
+
+SELECT 'fx_missing' AS kind, pair AS key, date, snapshots || ' snapshots: ' || tickers AS detail
+FROM v_gap_fx_missing
+UNION ALL
+SELECT 'price_hole', ticker, date, ccy
+FROM v_gap_price_holes
+UNION ALL
+SELECT 'attribution', account || ':' || ticker, date, issue || ': ' || detail
+FROM v_gap_attribution
+UNION ALL
+SELECT 'dirty', kind, from_date, NULL
+FROM gap_dirty
+ORDER BY 1, 2, 3;
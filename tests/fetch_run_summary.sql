@@ -0,0 +1,14 @@
+-- per-run totals over fetch_requests; runs without requests still appear
+INSERT INTO fetch_runs (id, script, args, started_at, finished_at, status) VALUES (1,'fetch_prices','2025-09-15 VTI','2025-09-15T00:00:00','2025-09-15T00:00:03','ok');
+INSERT INTO fetch_runs (id, script, args, started_at, status) VALUES (2,'fetch_fx','2025-09-16','2025-09-16T00:00:00','error');
+INSERT INTO fetch_requests (run_id, symbol, started_at, latency_ms, elapsed_ms, http_status, retries, response_bytes, rows_parsed, rows_changed)
+VALUES (1,'VTI','2025-09-15T00:00:00',120.0,2120.0,200,1,1500,5,3);
+INSERT INTO fetch_requests (run_id, symbol, started_at, latency_ms, elapsed_ms, http_status, retries, response_bytes, rows_parsed, rows_changed)
+VALUES (1,'TOPIX','2025-09-15T00:00:02',80.0,80.0,200,0,900,5,0);
+INSERT INTO fetch_requests (run_id, symbol, started_at, latency_ms, elapsed_ms, http_status, retries, error)
+VALUES (2,'USDJPY=X','2025-09-16T00:00:00',40.0,40.0,404,0,'HTTP 404');
+
+SELECT run_id, script, status, n_requests, n_errors, retries, response_bytes,
+       rows_parsed, rows_changed, avg_latency_ms, max_latency_ms, total_elapsed_ms
+FROM v_fetch_run_summary
+ORDER BY run_id;
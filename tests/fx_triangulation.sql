@@ -0,0 +1,21 @@
+-- missing XXXJPY rates are triangulated per date and follow leg updates
+INSERT INTO fx_rates (date, pair, rate) VALUES ('2025-09-15','USDJPY',145.0);
+INSERT INTO fx_rates (date, pair, rate) VALUES ('2025-09-15','USDEUR',0.8);
+INSERT INTO fx_rates (date, pair, rate) VALUES ('2025-09-15','GBPUSD',1.25);
+INSERT INTO fx_rates (date, pair, rate) VALUES ('2025-09-15','JPYKRW',9.5);
+INSERT INTO fx_rates (date, pair, rate) VALUES ('2025-09-15','CHFJPY',180.0);
+INSERT INTO fx_rates (date, pair, rate) VALUES ('2025-09-15','EURCHF',0.9);
+INSERT INTO fx_rates (date, pair, rate) VALUES ('2025-09-16','USDJPY',140.0);
+INSERT INTO fx_rates (date, pair, rate) VALUES ('2025-09-16','USDEUR',0.8);
+INSERT INTO fx_rates (date, pair, rate) VALUES ('2025-09-16','EURJPY',170.0);
+UPDATE fx_rates SET rate = 150.0 WHERE date = '2025-09-15' AND pair = 'USDJPY';
+
+SELECT date,
+       pair,
+       round(rate, 6) AS rate,
+       via,
+       leg1,
+       leg2,
+       formula
+FROM fx_rates_derived
+ORDER BY date, pair;
@@ -0,0 +1,17 @@
+-- cashflows writes record the earliest stale date per account and ticker
+INSERT INTO assets (ticker, ccy) VALUES ('VTI','USD');
+INSERT INTO assets (ticker, ccy) VALUES ('TOPIX','JPY');
+
+INSERT INTO cashflows (date, ticker, type, amount_ccy, ccy, qty) VALUES ('2025-09-10','VTI','BUY',2000,'USD',10);
+INSERT INTO cashflows (date, ticker, type, amount_ccy, ccy, qty) VALUES ('2025-09-12','VTI','SELL',400,'USD',2);
+INSERT INTO cashflows (date, ticker, type, amount_ccy, ccy, qty) VALUES ('2025-09-15','TOPIX','BUY',1000,'JPY',10);
+DELETE FROM ledger_dirty;
+
+INSERT INTO cashflows (date, ticker, type, amount_ccy, ccy, qty) VALUES ('2025-09-14','VTI','DIVIDEND',5,'USD',NULL);
+UPDATE cashflows SET date = '2025-09-11' WHERE ticker = 'VTI' AND type = 'SELL';
+INSERT INTO cashflows (date, ticker, type, amount_ccy, ccy, qty, account) VALUES ('2025-09-16','TOPIX','BUY',1010,'JPY',10,'nisa');
+DELETE FROM cashflows WHERE ticker = 'TOPIX' AND date = '2025-09-15';
+
+SELECT account, ticker, from_date
+FROM ledger_dirty
+ORDER BY account, ticker;
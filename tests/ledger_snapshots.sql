@@ -0,0 +1,16 @@
+-- replayed holdings are carried forward onto asset_prices dates
+INSERT INTO assets (ticker, ccy) VALUES ('VTI','USD');
+
+INSERT INTO ledger_positions (account, date, ticker, qty) VALUES ('main','2025-09-10','VTI',10);
+INSERT INTO ledger_positions (account, date, ticker, qty) VALUES ('main','2025-09-12','VTI',8);
+INSERT INTO ledger_positions (account, date, ticker, qty) VALUES ('nisa','2025-09-11','VTI',3);
+
+INSERT INTO asset_prices (date, ticker, close) VALUES ('2025-09-09','VTI',199);
+INSERT INTO asset_prices (date, ticker, close) VALUES ('2025-09-10','VTI',200);
+INSERT INTO asset_prices (date, ticker, close) VALUES ('2025-09-11','VTI',201);
+INSERT INTO asset_prices (date, ticker, close) VALUES ('2025-09-12','VTI',202);
+INSERT INTO asset_prices (date, ticker, close) VALUES ('2025-09-15','VTI',205);
+
+SELECT account, date, ticker, qty, price_ccy
+FROM v_ledger_snapshots
+ORDER BY account, date, ticker;
@@ -0,0 +1,21 @@
+-- totals precomputed per reporting currency, kept in sync with snapshots and FX writes
+INSERT INTO assets (ticker, ccy) VALUES ('VTI','USD');
+INSERT INTO assets (ticker, ccy) VALUES ('TOPIX','JPY');
+INSERT INTO assets (ticker, ccy) VALUES ('SX5E','EUR');
+
+INSERT INTO snapshots (date, ticker, qty, price_ccy) VALUES ('2025-09-15','VTI',10,200);
+INSERT INTO snapshots (date, ticker, qty, price_ccy) VALUES ('2025-09-15','TOPIX',100,3000);
+INSERT INTO snapshots (date, ticker, qty, price_ccy) VALUES ('2025-09-15','SX5E',4,50);
+
+INSERT INTO fx_rates (date, pair, rate) VALUES ('2025-09-15','USDJPY',140.0);
+INSERT INTO fx_rates (date, pair, rate) VALUES ('2025-09-15','EURUSD',1.25);
+UPDATE fx_rates SET rate = 150.0 WHERE date = '2025-09-15' AND pair = 'USDJPY';
+UPDATE snapshots SET qty = 20 WHERE date = '2025-09-15' AND ticker = 'VTI';
+
+SELECT t.rc,
+       t.date,
+       round(t.total_value, 3) AS total_value,
+       round(e.value, 3) AS usd_exposure
+FROM portfolio_total_rc t
+JOIN exposure_rc e ON e.rc = t.rc AND e.date = t.date AND e.ccy = 'USD'
+ORDER BY t.rc, t.date;
@@ -0,0 +1,22 @@
+-- asset_prices and JPY portfolio totals record the earliest stale date per risk series
+INSERT INTO assets (ticker, ccy) VALUES ('VTI','USD');
+INSERT INTO assets (ticker, ccy) VALUES ('TOPIX','JPY');
+INSERT INTO fx_rates (date, pair, rate) VALUES ('2025-09-10','USDJPY',150);
+INSERT INTO fx_rates (date, pair, rate) VALUES ('2025-09-11','USDJPY',151);
+
+INSERT INTO asset_prices (date, ticker, close) VALUES ('2025-09-10','VTI',200);
+INSERT INTO asset_prices (date, ticker, close) VALUES ('2025-09-11','VTI',202);
+INSERT INTO asset_prices (date, ticker, close) VALUES ('2025-09-10','TOPIX',2500);
+INSERT INTO asset_prices (date, ticker, close) VALUES ('2025-09-11','TOPIX',2510);
+INSERT INTO snapshots (date, ticker, qty, price_ccy) VALUES ('2025-09-10','VTI',10,200);
+INSERT INTO snapshots (date, ticker, qty, price_ccy) VALUES ('2025-09-11','VTI',10,202);
+DELETE FROM risk_dirty;
+
+INSERT INTO asset_prices (date, ticker, close) VALUES ('2025-09-12','VTI',205);
+UPDATE asset_prices SET close = 201 WHERE ticker = 'VTI' AND date = '2025-09-11';
+DELETE FROM asset_prices WHERE ticker = 'TOPIX' AND date = '2025-09-11';
+UPDATE fx_rates SET rate = 152 WHERE pair = 'USDJPY' AND date = '2025-09-11';
+
+SELECT series, from_date
+FROM risk_dirty
+ORDER BY series;
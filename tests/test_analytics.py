@@ -0,0 +1,48 @@
+"""SQLite / DuckDB analytics engine parity (app/analytics.py); skipped without duckdb."""
+import importlib.util
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path[:0] = [str(ROOT / "app"), str(ROOT / "scripts")]
+
+from analytics import HISTORY_QUERIES, compare_frames, open_engine  # noqa: E402
+from synth_db import build_synthetic_db  # noqa: E402
+
+
+@unittest.skipUnless(importlib.util.find_spec("duckdb"), "duckdb is not installed")
+class EngineParityTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.TemporaryDirectory()
+        # a quote in the path must survive the DuckDB ATTACH
+        cls.db_path = Path(cls.tmp.name) / "it's.db"
+        build_synthetic_db(cls.db_path, 6, 120, 2)
+        cls.sqlite = open_engine("sqlite", cls.db_path)
+        import duckdb
+
+        try:
+            cls.duckdb = open_engine("duckdb", cls.db_path)
+        except duckdb.Error as exc:  # the sqlite extension is downloaded on first use
+            cls.sqlite.close()
+            cls.tmp.cleanup()
+            raise unittest.SkipTest(f"DuckDB sqlite extension unavailable: {exc}") from None
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.duckdb.close()
+        cls.sqlite.close()
+        cls.tmp.cleanup()
+
+    def test_history_queries_match(self):
+        for label, fn in HISTORY_QUERIES.items():
+            with self.subTest(label):
+                expected = fn(self.sqlite)
+                self.assertGreater(len(expected), 0)
+                self.assertIsNone(compare_frames(fn(self.duckdb), expected))
+
+
+if __name__ == "__main__":
+    unittest.main()
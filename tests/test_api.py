@@ -0,0 +1,175 @@
+"""Local HTTP API: ETag / 304, invalidation after a write and paging (app/api.py)."""
+import importlib.util
+import json
+import sqlite3
+import sys
+import tempfile
+import threading
+import unittest
+import urllib.error
+import urllib.request
+from http import HTTPStatus
+from http.server import HTTPServer
+from pathlib import Path
+from unittest import mock
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path[:0] = [str(ROOT / "app"), str(ROOT / "scripts")]
+
+import queries  # noqa: E402
+from api import PortfolioAPI, make_handler  # noqa: E402
+from db import connect  # noqa: E402
+from synth_db import build_synthetic_db  # noqa: E402
+
+
+class PortfolioAPITest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.TemporaryDirectory()
+        cls.db_path = Path(cls.tmp.name) / "api.db"
+        build_synthetic_db(cls.db_path, 6, 120, 2)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp.cleanup()
+
+    def setUp(self):
+        self.api = PortfolioAPI(self.db_path)
+
+    def tearDown(self):
+        self.api.close()
+
+    def get(self, target: str, **kwargs) -> tuple[int, dict, bytes]:
+        return self.api.handle(target, **kwargs)
+
+    def test_if_none_match_gets_304_until_another_connection_writes(self):
+        status, headers, body = self.get("/api/valuation")
+        self.assertEqual(status, HTTPStatus.OK)
+        etag = headers["ETag"]
+        date = json.loads(body)["date"]
+        status, headers, empty = self.get("/api/valuation", if_none_match=f'"other", {etag}')
+        self.assertEqual((status, headers["ETag"], empty), (HTTPStatus.NOT_MODIFIED, etag, b""))
+        # the ETag names the format too
+        self.assertNotEqual(self.get("/api/valuation?format=arrow")[1]["ETag"], etag)
+
+        writer = connect(self.db_path)
+        try:
+            with writer:
+                writer.execute("UPDATE snapshots SET price_ccy = price_ccy * 2 WHERE date = ?", (date,))
+        finally:
+            writer.close()
+        status, headers, changed = self.get("/api/valuation", if_none_match=etag)
+        self.assertEqual(status, HTTPStatus.OK)
+        self.assertNotEqual(headers["ETag"], etag)
+        before = {(r["account"], r["ticker"]): r["value"] for r in json.loads(body)["rows"]}
+        after = {(r["account"], r["ticker"]): r["value"] for r in json.loads(changed)["rows"]}
+        self.assertEqual(before.keys(), after.keys())
+        for key, value in before.items():
+            self.assertAlmostEqual(after[key], value * 2, delta=abs(value) * 1e-9)
+        self.assertEqual(self.get("/api/valuation", if_none_match=headers["ETag"])[0], HTTPStatus.NOT_MODIFIED)
+
+    def test_a_write_invalidates_the_cached_body(self):
+        status, headers, body = self.get("/api/history?days=10000")
+        self.assertEqual(status, HTTPStatus.OK)
+        rows = json.loads(body)["rows"]
+        self.assertIs(self.get("/api/history?days=10000")[2], body)
+
+        writer = connect(self.db_path)
+        try:
+            last = writer.execute("SELECT MAX(date) FROM snapshots").fetchone()[0]
+            with writer:
+                held = writer.execute(
+                    "SELECT account, date, ticker, qty, price_ccy FROM snapshots WHERE date = ?", (last,)
+                ).fetchall()
+                writer.execute("DELETE FROM snapshots WHERE date = ?", (last,))
+            self.assertEqual(len(json.loads(self.get("/api/history?days=10000")[2])["rows"]), len(rows) - 1)
+            with writer:
+                writer.executemany(
+                    "INSERT INTO snapshots (account, date, ticker, qty, price_ccy) VALUES (?, ?, ?, ?, ?)", held
+                )
+        finally:
+            writer.close()
+        self.assertEqual(json.loads(self.get("/api/history?days=10000")[2])["rows"], rows)
+
+    def test_range_pages_cover_every_date_once(self):
+        everything = json.loads(self.get("/api/history?days=10000")[2])["rows"]
+        target, paged = "/api/history?days=7", []
+        while target:
+            status, headers, body = self.get(target)
+            self.assertEqual(status, HTTPStatus.OK)
+            payload = json.loads(body)
+            self.assertLessEqual(len(payload["rows"]), 7)
+            paged += payload["rows"]
+            target = payload["next"]
+            if target:
+                self.assertEqual(headers["Link"], f'<{target}>; rel="next"')
+        self.assertEqual(paged, everything)
+
+    def test_bad_requests(self):
+        for target, status in (
+            ("/api/history?start=2025-13-01", HTTPStatus.BAD_REQUEST),
+            ("/api/history?days=0", HTTPStatus.BAD_REQUEST),
+            ("/api/history?rc=XXX", HTTPStatus.BAD_REQUEST),
+            ("/api/valuation?format=csv", HTTPStatus.BAD_REQUEST),
+            ("/api/nothing", HTTPStatus.NOT_FOUND),
+        ):
+            with self.subTest(target):
+                got, headers, body = self.get(target)
+                self.assertEqual(got, status)
+                self.assertEqual(headers["Cache-Control"], "no-store")
+                self.assertIn("error", json.loads(body))
+
+    def test_database_errors_are_json_500s(self):
+        error = sqlite3.OperationalError("database is locked")
+        with mock.patch.object(queries, "page_dates", side_effect=error):
+            status, headers, body = self.get("/api/history?days=5")
+        self.assertEqual(status, HTTPStatus.INTERNAL_SERVER_ERROR)
+        self.assertEqual(headers["Cache-Control"], "no-store")
+        self.assertEqual(json.loads(body), {"error": "database error: database is locked"})
+        # the failure is not cached
+        self.assertEqual(self.get("/api/history?days=5")[0], HTTPStatus.OK)
+
+    @unittest.skipUnless(importlib.util.find_spec("pyarrow"), "pyarrow is not installed")
+    def test_arrow_matches_json(self):
+        import pyarrow as pa
+
+        rows = json.loads(self.get("/api/attribution?days=20")[2])["rows"]
+        status, headers, body = self.get("/api/attribution?days=20", accept="application/vnd.apache.arrow.stream")
+        self.assertEqual(headers["Content-Type"], "application/vnd.apache.arrow.stream")
+        table = pa.ipc.open_stream(body).read_all()
+        self.assertEqual(table.num_rows, len(rows))
+        self.assertEqual(table.column("ticker").to_pylist(), [r["ticker"] for r in rows])
+
+    def test_http_round_trip(self):
+        # the API connection belongs to this thread, so the server runs here and the client in a thread
+        server = HTTPServer(("127.0.0.1", 0), make_handler(self.api))
+        server.timeout = 10
+        url = f"http://127.0.0.1:{server.server_address[1]}/api/meta"
+        responses = []
+
+        def client():
+            with urllib.request.urlopen(url, timeout=10) as response:
+                responses.append((response.status, response.headers["ETag"], json.load(response)))
+            request = urllib.request.Request(url, headers={"If-None-Match": responses[0][1]})
+            try:
+                urllib.request.urlopen(request, timeout=10)
+            except urllib.error.HTTPError as exc:
+                responses.append((exc.code, exc.headers["ETag"], exc.read()))
+                exc.close()
+
+        thread = threading.Thread(target=client, daemon=True)
+        thread.start()
+        try:
+            server.handle_request()
+            server.handle_request()
+        finally:
+            thread.join(10)
+            server.server_close()
+        (status, etag, meta), not_modified = responses
+        self.assertEqual(status, HTTPStatus.OK)
+        self.assertIn("/api/history", meta["endpoints"])
+        self.assertEqual(not_modified, (HTTPStatus.NOT_MODIFIED, etag, b""))
+
+
+if __name__ == "__main__":
+    unittest.main()
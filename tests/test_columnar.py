@@ -0,0 +1,60 @@
+"""Columnar fetches keep every value of loosely typed SQLite columns (app/columnar.py)."""
+import importlib.util
+import sqlite3
+import sys
+import unittest
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path[:0] = [str(ROOT / "app"), str(ROOT / "scripts")]
+
+from columnar import DATE_INDEX, fetch_columns  # noqa: E402
+
+
+@unittest.skipUnless(importlib.util.find_spec("numpy"), "numpy is not installed")
+class FetchColumnsTest(unittest.TestCase):
+    def setUp(self):
+        self.conn = sqlite3.connect(":memory:")
+        self.conn.execute("CREATE TABLE t (id INTEGER PRIMARY KEY, date TEXT, n NUMERIC, label TEXT)")
+
+    def tearDown(self):
+        self.conn.close()
+
+    def fetch(self, values: list, chunk_size: int = 2, **options) -> "object":
+        self.conn.executemany(
+            "INSERT INTO t (date, n) VALUES (?, ?)", [(f"2025-01-{i + 1:02d}", v) for i, v in enumerate(values)]
+        )
+        return fetch_columns(self.conn, "SELECT id, date, n FROM t ORDER BY id", chunk_size=chunk_size, **options)
+
+    def test_reals_after_integers_are_kept(self):
+        for chunk_size in (1, 2, 4096):
+            with self.subTest(chunk_size=chunk_size):
+                self.conn.execute("DELETE FROM t")
+                columns = self.fetch([1, 2, 3, 2.5, 7], chunk_size)
+                self.assertEqual(columns["n"].dtype.name, "float64")
+                self.assertEqual(columns["n"].tolist(), [1.0, 2.0, 3.0, 2.5, 7.0])
+                self.assertEqual(columns["id"].dtype.name, "int64")
+
+    def test_null_after_integers_becomes_nan(self):
+        n = self.fetch([1, 2, None, 4])["n"]
+        self.assertEqual(n.dtype.name, "float64")
+        self.assertEqual(n[[0, 1, 3]].tolist(), [1.0, 2.0, 4.0])
+        self.assertNotEqual(n[2], n[2])
+
+    def test_text_after_integers_becomes_object(self):
+        n = self.fetch([1, 2, "n/a"])["n"]
+        self.assertEqual(n.dtype, object)
+        self.assertEqual(n.tolist(), [1, 2, "n/a"])
+
+    def test_integers_stay_int64(self):
+        self.assertEqual(self.fetch([1, 2, 3, 4, 5])["n"].dtype.name, "int64")
+
+    def test_given_dtypes_are_used_as_is(self):
+        columns = self.fetch([1, 2, 3.5], dtypes={"n": "float32", **DATE_INDEX})
+        self.assertEqual(columns["n"].dtype.name, "float32")
+        self.assertEqual(columns["date"].dtype.name, "datetime64[D]")
+        self.assertEqual(str(columns["date"][2]), "2025-01-03")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,118 @@
+"""Compact copy: the compatibility views read back the source DB (scripts/compact_db.py)."""
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path[:0] = [str(ROOT / "app"), str(ROOT / "scripts")]
+
+import compact_db  # noqa: E402
+import tiering  # noqa: E402
+from db import connect  # noqa: E402
+from synth_db import build_synthetic_db  # noqa: E402
+
+
+class CompactDBTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.db_path = Path(self.tmp.name) / "src.db"
+        build_synthetic_db(self.db_path, 5, 60, 2)
+        conn = connect(self.db_path)
+        try:
+            dates = [row[0] for row in conn.execute("SELECT DISTINCT date FROM fx_rates ORDER BY date")]
+            with conn:
+                # a GBP asset valued through a triangulated GBPJPY rate
+                conn.execute("UPDATE assets SET ccy = 'GBP' WHERE ticker = 'T0004'")
+                conn.executemany(
+                    "INSERT INTO fx_rates (date, pair, rate) VALUES (?, 'GBPUSD', 1.27)", [(d,) for d in dates]
+                )
+        finally:
+            conn.close()
+        self.out_path = compact_db.default_compact_path(self.db_path)
+
+    def build(self) -> dict[str, int]:
+        src = connect(self.db_path, read_only=True)
+        try:
+            tiering.ensure_range(src, None)
+            out = sqlite3.connect(self.out_path)
+            try:
+                with out:
+                    rows = compact_db.build(src, out)
+            finally:
+                out.close()
+            self.assertEqual(compact_db.verify(src, self.out_path), dict.fromkeys(compact_db.PARITY, 0))
+            return rows
+        finally:
+            src.close()
+
+    def read(self, db_path: Path, sql: str) -> list[tuple]:
+        conn = connect(db_path, read_only=True)
+        try:
+            if db_path == self.db_path:
+                tiering.ensure_range(conn, None)
+            return conn.execute(sql).fetchall()
+        finally:
+            conn.close()
+
+    def test_round_trip(self):
+        rows = self.build()
+        self.assertEqual(self.out_path.name, "src.compact.db")
+        self.assertEqual(rows["c_snapshots"], self.read(self.db_path, "SELECT COUNT(*) FROM snapshots")[0][0])
+        self.assertGreater(rows["c_fx_rates_derived"], 0)
+        # keys decode back to ISO dates and text, so queries written for the source run unchanged
+        for sql in (
+            "SELECT * FROM snapshots WHERE date = (SELECT MAX(date) FROM snapshots) ORDER BY account, ticker",
+            "SELECT date, pair, rate, via, leg1, leg2, formula FROM fx_rates_derived"
+            " WHERE pair = 'GBPJPY' ORDER BY date",
+            "SELECT date, ticker, value_jpy FROM v_valuation WHERE ticker = 'T0004' ORDER BY date",
+        ):
+            with self.subTest(sql):
+                expected = self.read(self.db_path, sql)
+                self.assertGreater(len(expected), 0)
+                self.assertEqual(self.read(self.out_path, sql), expected)
+
+    def test_verify_reports_changed_rows(self):
+        self.build()
+        out = sqlite3.connect(self.out_path)
+        try:
+            (first,) = out.execute("SELECT MIN(day) FROM c_asset_prices").fetchone()
+            with out:
+                # one value off and the last date missing for each of the 5 tickers
+                out.execute("UPDATE c_asset_prices SET close = close * 1.01 WHERE asset_id = 1 AND day = ?", (first,))
+                out.execute("DELETE FROM c_asset_prices WHERE day = (SELECT MAX(day) FROM c_asset_prices)")
+        finally:
+            out.close()
+        src = connect(self.db_path, read_only=True)
+        try:
+            mismatches = compact_db.verify(src, self.out_path)
+        finally:
+            src.close()
+        self.assertEqual(mismatches["asset_prices"], 6)
+        self.assertEqual({view for view, n in mismatches.items() if n}, {"asset_prices"})
+
+    def test_archived_history_is_included(self):
+        dates = [row[0] for row in self.read(self.db_path, "SELECT DISTINCT date FROM snapshots ORDER BY date")]
+        conn = connect(self.db_path)
+        try:
+            tiering.archive_before(conn, dates[len(dates) // 2], tiering.default_archive_path(self.db_path))
+        finally:
+            conn.close()
+        self.build()
+        self.assertEqual(self.read(self.out_path, "SELECT MIN(date) FROM snapshots"), [(dates[0],)])
+
+    def test_cli_verify(self):
+        command = [sys.executable, str(ROOT / "scripts" / "compact_db.py"), "--db", str(self.db_path), "--verify"]
+        out = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+        self.assertIn("verify v_attribution          ok", out)
+        self.assertTrue(self.out_path.exists())
+        again = subprocess.run(command, check=False, capture_output=True, text=True)
+        self.assertNotEqual(again.returncode, 0)
+        self.assertIn("exists (use --force to overwrite)", again.stderr)
+
+
+if __name__ == "__main__":
+    unittest.main()
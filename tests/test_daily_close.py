@@ -0,0 +1,210 @@
+"""Daily close pipeline: DAG order, blocked dependents and skipping unchanged inputs (scripts/daily_close.py)."""
+import argparse
+import datetime as dt
+import io
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from contextlib import redirect_stdout
+from pathlib import Path
+from unittest import mock
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path[:0] = [str(ROOT / "app"), str(ROOT / "scripts")]
+
+import daily_close  # noqa: E402
+from db import connect, ensure_schema  # noqa: E402
+from synth_db import build_synthetic_db  # noqa: E402
+from yahoo_client import parse_chart, to_epoch  # noqa: E402
+from yahoo_stub import StubConfig, start_stub, synthetic_series  # noqa: E402
+
+LAST = dt.date(2024, 6, 28)  # a Friday: the last synthetic date
+CLOSE = dt.date(2024, 7, 3)
+
+
+def run(ctx: dict) -> dict[str, dict]:
+    with redirect_stdout(io.StringIO()):
+        return daily_close.run_pipeline(ctx)
+
+
+class PipelineOrderTest(unittest.TestCase):
+    """STAGES replaced by stubs that record when they run."""
+
+    def setUp(self):
+        self.events: list[tuple[str, str]] = []
+        self.lock = threading.Lock()
+        self.fail: set[str] = set()
+
+    def stub(self, name: str, seconds: float):
+        def fn(ctx):
+            with self.lock:
+                self.events.append(("start", name))
+            time.sleep(seconds)
+            with self.lock:
+                self.events.append(("end", name))
+            if name in self.fail:
+                raise RuntimeError(f"{name} broke")
+            return "ran", name
+
+        return fn
+
+    def pipeline(self) -> dict[str, dict]:
+        stages = {
+            name: (deps, self.stub(name, 0.15 if name == "fx" else 0.05))
+            for name, (deps, _) in daily_close.STAGES.items()
+        }
+        with mock.patch.dict(daily_close.STAGES, stages, clear=True):
+            return run({"began": time.perf_counter()})
+
+    def index(self, kind: str, name: str) -> int:
+        return self.events.index((kind, name))
+
+    def test_stages_start_once_their_dependencies_finish(self):
+        results = self.pipeline()
+        self.assertEqual({r["status"] for r in results.values()}, {"ran"})
+        # fx and prices overlap; snapshots waits for the slower one
+        self.assertLess(self.index("start", "prices"), self.index("end", "fx"))
+        self.assertGreater(self.index("start", "snapshots"), self.index("end", "fx"))
+        for name in ("risk", "gaps", "tscache", "summaries"):
+            self.assertGreater(self.index("start", name), self.index("end", "snapshots"))
+        # the leaves run side by side
+        leaves = [self.index("start", name) for name in ("risk", "gaps", "tscache", "summaries")]
+        self.assertLess(max(leaves), min(self.index("end", name) for name in ("risk", "gaps", "tscache", "summaries")))
+
+    def test_dependents_of_a_failed_stage_are_blocked(self):
+        self.fail = {"fx"}
+        results = self.pipeline()
+        self.assertEqual(results["fx"]["status"], "failed")
+        self.assertEqual(results["fx"]["detail"], "RuntimeError: fx broke")
+        self.assertEqual(results["prices"]["status"], "ran")
+        self.assertEqual(
+            results["snapshots"], {"status": "blocked", "detail": "fx failed", "start": None, "seconds": 0.0}
+        )
+        for name in ("risk", "gaps", "tscache", "summaries"):
+            self.assertEqual((results[name]["status"], results[name]["detail"]), ("blocked", "snapshots failed"))
+        started = {name for kind, name in self.events if kind == "start"}
+        self.assertEqual(started, {"fx", "prices"})
+
+    def test_a_failed_leaf_blocks_nothing_else(self):
+        self.fail = {"risk"}
+        results = self.pipeline()
+        self.assertEqual(results["risk"]["status"], "failed")
+        self.assertEqual({results[name]["status"] for name in results if name != "risk"}, {"ran"})
+
+
+class DailyCloseTest(unittest.TestCase):
+    """The real stages against a synthetic DB and the Yahoo stub."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.db_path = Path(self.tmp.name) / "close.db"
+        build_synthetic_db(self.db_path, 3, 30, 1, end=LAST)
+        conn = connect(self.db_path)
+        try:
+            ensure_schema(conn)
+            # the stored history continues into what the stub serves, so screening holds nothing back
+            first = dt.date.fromisoformat(conn.execute("SELECT MIN(date) FROM asset_prices").fetchone()[0])
+            span = (to_epoch(first), to_epoch(LAST + dt.timedelta(days=1)))
+            with conn:
+                for table, key_column, value_column, suffix in (
+                    ("asset_prices", "ticker", "close", ""),
+                    ("fx_rates", "pair", "rate", "=X"),
+                ):
+                    for (key,) in conn.execute(f"SELECT DISTINCT {key_column} FROM {table}").fetchall():
+                        symbol = key + suffix
+                        history = parse_chart({"chart": {"result": [synthetic_series(symbol, *span)]}}, symbol)
+                        conn.executemany(
+                            f"UPDATE {table} SET {value_column} = ? WHERE {key_column} = ? AND date = ?",
+                            [(value, key, date) for date, value in history.items()],
+                        )
+        finally:
+            conn.close()
+        self.config = StubConfig()
+        server = start_stub(self.config)
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        self.base_url = f"http://127.0.0.1:{server.server_port}"
+
+    def close(self, **options) -> dict[str, dict]:
+        args = argparse.Namespace(
+            db_path=str(self.db_path),
+            lookback=7,
+            force=False,
+            symbol=[],
+            workers=2,
+            base_url=self.base_url,
+            summary_days=0,
+            openai_base_url=None,
+        )
+        for name, value in options.items():
+            setattr(args, name, value)
+        ctx = {"args": args, "end": CLOSE, "price_changes": {}, "began": time.perf_counter()}
+        return run(ctx)
+
+    def test_fetch_plan(self):
+        conn = connect(self.db_path)
+        try:
+            keys = ["T0000", "T0001", "NEW"]
+            plan = daily_close.fetch_plan(conn, "asset_prices", "ticker", keys, CLOSE, 7, False)
+            self.assertEqual(plan, (keys, CLOSE - dt.timedelta(days=7)))
+            plan = daily_close.fetch_plan(conn, "asset_prices", "ticker", keys[:2], CLOSE, 7, False)
+            self.assertEqual(plan, (keys[:2], LAST))
+            # data reaching the close date is skipped unless forced, and refetched from the close date
+            plan = daily_close.fetch_plan(conn, "asset_prices", "ticker", keys[:2], LAST, 7, False)
+            self.assertEqual(plan, ([], None))
+            plan = daily_close.fetch_plan(conn, "asset_prices", "ticker", keys[:2], LAST, 7, True)
+            self.assertEqual(plan, (keys[:2], LAST))
+        finally:
+            conn.close()
+
+    def test_second_close_skips_everything(self):
+        conn = connect(self.db_path)
+        try:
+            with conn:
+                conn.execute(
+                    "INSERT INTO cashflows (date, ticker, type, amount_ccy, ccy, qty) "
+                    "VALUES ('2024-07-01', 'T0000', 'BUY', 100, 'JPY', 5)"
+                )
+        finally:
+            conn.close()
+        results = self.close()
+        self.assertEqual(
+            {name: r["status"] for name, r in results.items()},
+            {"fx": "ran", "prices": "ran", "snapshots": "ran", "risk": "ran", "gaps": "ran",
+             "tscache": "skipped", "summaries": "skipped"},
+        )
+        self.assertEqual(results["snapshots"]["detail"], "1 holdings, 1 transactions replayed, 3 snapshots written")
+        conn = connect(self.db_path)
+        try:
+            self.assertEqual(conn.execute("SELECT MAX(date) FROM asset_prices").fetchone()[0], CLOSE.isoformat())
+            self.assertEqual(conn.execute("SELECT MAX(date) FROM fx_rates").fetchone()[0], CLOSE.isoformat())
+        finally:
+            conn.close()
+
+        requests = self.config.requests
+        results = self.close()
+        self.assertEqual({r["status"] for r in results.values()}, {"skipped"})
+        self.assertEqual(results["fx"]["detail"], "2 pairs up to date")
+        self.assertEqual(results["prices"]["detail"], "3 tickers up to date")
+        self.assertEqual(self.config.requests, requests)
+
+        # --force refetches, but unchanged closes write nothing downstream
+        results = self.close(force=True)
+        self.assertEqual((results["fx"]["status"], results["prices"]["status"]), ("ran", "ran"))
+        self.assertIn("0 rows changed", results["prices"]["detail"])
+        self.assertEqual(results["snapshots"]["status"], "skipped")
+        self.assertGreater(self.config.requests, requests)
+
+    def test_a_failing_fetch_blocks_the_snapshots(self):
+        # an unknown path: the stub answers 404, which is not retried
+        results = self.close(base_url=self.base_url + "/missing")
+        self.assertEqual(results["fx"]["status"], "failed")
+        self.assertEqual(results["snapshots"]["status"], "blocked")
+        self.assertEqual(results["risk"]["detail"], "snapshots failed")
+
+
+if __name__ == "__main__":
+    unittest.main()
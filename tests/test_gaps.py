@@ -0,0 +1,113 @@
+"""Incremental data-gap scans match a full rescan (app/gaps.py, scan_gaps.py)."""
+import datetime as dt
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path[:0] = [str(ROOT / "app"), str(ROOT / "scripts")]
+
+from db import connect, ensure_schema  # noqa: E402
+from gaps import fetch_window, gap_counts, gap_spans, scan_gaps  # noqa: E402
+from synth_db import build_synthetic_db  # noqa: E402
+
+
+def stored(conn) -> list[tuple]:
+    return conn.execute("SELECT kind, key, date, detail FROM data_gaps ORDER BY kind, key, date").fetchall()
+
+
+class GapScanTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = Path(self.tmp.name) / "gaps.db"
+        self.conn = connect(self.db_path)
+        ensure_schema(self.conn)
+        # the fixture of the SQL golden test; its trailing SELECT is discarded
+        self.conn.executescript((ROOT / "tests" / "data_gaps.sql").read_text(encoding="utf-8"))
+
+    def tearDown(self):
+        self.conn.close()
+        self.tmp.cleanup()
+
+    def assertMatchesFull(self):
+        incremental = stored(self.conn)
+        scan_gaps(self.conn, full=True)
+        self.assertEqual(incremental, stored(self.conn))
+
+    def test_scan_finds_each_kind(self):
+        counts = scan_gaps(self.conn, full=True)
+        self.assertEqual(counts, {"attribution": 4, "fx_missing": 1, "price_hole": 1})
+        self.assertEqual(
+            [row[:3] for row in stored(self.conn) if row[0] != "attribution"],
+            [("fx_missing", "EURJPY", "2025-09-12"), ("price_hole", "SPY", "2025-09-11")],
+        )
+        self.assertEqual(self.conn.execute("SELECT COUNT(*) FROM gap_dirty").fetchone()[0], 0)
+        self.assertEqual(gap_counts(self.conn)["fx_missing"], (1, 1, "2025-09-12", "2025-09-12"))
+
+    def test_filling_gaps_rescans_only_the_dirty_kinds(self):
+        scan_gaps(self.conn, full=True)
+        with self.conn:
+            self.conn.execute("INSERT INTO fx_rates (date, pair, rate) VALUES ('2025-09-12', 'EURJPY', 161)")
+        dirty = dict(self.conn.execute("SELECT kind, from_date FROM gap_dirty").fetchall())
+        self.assertEqual(dirty, {"fx_missing": "2025-09-12", "attribution": "2025-09-12"})
+        self.assertEqual(set(scan_gaps(self.conn)), {"fx_missing", "attribution"})
+        self.assertNotIn("EURJPY", {row[1] for row in stored(self.conn)})
+        self.assertMatchesFull()
+
+        with self.conn:
+            self.conn.execute("INSERT INTO asset_prices (date, ticker, close) VALUES ('2025-09-11', 'SPY', 502)")
+        self.assertIn("price_hole", scan_gaps(self.conn))
+        self.assertEqual(gap_counts(self.conn)["price_hole"], (0, 0, None, None))
+        self.assertMatchesFull()
+        self.assertEqual(scan_gaps(self.conn), {})
+
+    def test_fetch_window_narrows_to_the_gaps(self):
+        start, end = dt.date(2025, 9, 1), dt.date(2025, 9, 30)
+        self.assertEqual(
+            fetch_window(self.conn, str(self.db_path), "fx_missing", ["USDJPY", "EURJPY"], start, end),
+            (["EURJPY"], dt.date(2025, 9, 12), dt.date(2025, 9, 12)),
+        )
+        self.assertEqual(gap_spans(self.conn, "price_hole", ["VTI", "SPY"], "2025-09-01", "2025-09-10"), {})
+        # a dry run reads the stored scan without rescanning
+        self.assertIsNone(fetch_window(None, str(self.db_path), "price_hole", ["VTI"], start, end))
+
+
+class SyntheticGapParityTest(unittest.TestCase):
+    def test_incremental_scan_after_deletes_and_backfill(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = Path(tmp) / "synthetic.db"
+            build_synthetic_db(db_path, 8, 200, 2)
+            conn = connect(db_path)
+            try:
+                scan_gaps(conn, full=True)
+                dates = [r[0] for r in conn.execute("SELECT DISTINCT date FROM fx_rates ORDER BY date")]
+                mid, late = dates[len(dates) // 2], dates[-5]
+                held = conn.execute("SELECT date, pair, rate FROM fx_rates WHERE date IN (?, ?)", (mid, late)).fetchall()
+                ticker = conn.execute("SELECT MIN(ticker) FROM asset_prices").fetchone()[0]
+                with conn:
+                    conn.execute("DELETE FROM fx_rates WHERE date IN (?, ?)", (mid, late))
+                    conn.execute(
+                        "DELETE FROM asset_prices WHERE ticker = ? AND date IN (?, ?)", (ticker, dates[10], late)
+                    )
+                scan_gaps(conn)
+                found = {(row[0], row[2]) for row in stored(conn)}
+                self.assertIn(("fx_missing", mid), found)
+                self.assertIn(("price_hole", late), found)
+                incremental = stored(conn)
+                scan_gaps(conn, full=True)
+                self.assertEqual(incremental, stored(conn))
+
+                with conn:
+                    conn.executemany("INSERT INTO fx_rates (date, pair, rate) VALUES (?, ?, ?)", held)
+                scan_gaps(conn)
+                self.assertNotIn("fx_missing", {row[0] for row in stored(conn)})
+                incremental = stored(conn)
+                scan_gaps(conn, full=True)
+                self.assertEqual(incremental, stored(conn))
+            finally:
+                conn.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
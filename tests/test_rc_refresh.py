@@ -0,0 +1,121 @@
+"""Batched writes rebuild cross rates and reporting-currency tables like per-row writes (schema.sql rc_batch)."""
+import math
+import shutil
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path[:0] = [str(ROOT / "app"), str(ROOT / "scripts")]
+
+from db import connect, deferred_refresh  # noqa: E402
+from synth_db import build_synthetic_db  # noqa: E402
+
+DERIVED = {
+    "fx_rates_derived": "SELECT date, pair, rate, via FROM fx_rates_derived ORDER BY date, pair",
+    "valuation_rc": "SELECT * FROM valuation_rc ORDER BY rc, account, date, ticker",
+    "account_exposure_rc": "SELECT * FROM account_exposure_rc ORDER BY rc, account, date, ccy",
+    "account_total_rc": "SELECT * FROM account_total_rc ORDER BY rc, account, date",
+    "exposure_rc": "SELECT * FROM exposure_rc ORDER BY rc, date, ccy",
+    "portfolio_total_rc": "SELECT * FROM portfolio_total_rc ORDER BY rc, date",
+    "valuation_jpy": "SELECT * FROM valuation_jpy ORDER BY date, ticker",
+}
+
+
+def same(a, b) -> bool:
+    if isinstance(a, float) and isinstance(b, float):
+        return math.isclose(a, b, rel_tol=1e-12, abs_tol=1e-9)
+    return a == b
+
+
+def write(conn, dates: list[str]) -> None:
+    """Snapshot inserts, updates and deletes plus rate and currency changes over several dates."""
+    conn.execute("UPDATE snapshots SET qty = qty * 1.5 WHERE account = 'acct1' AND date IN (?, ?)", dates[1:3])
+    conn.execute("DELETE FROM snapshots WHERE account = 'main' AND ticker = 'T0001' AND date IN (?, ?, ?)", dates[2:5])
+    conn.executemany(
+        "INSERT INTO snapshots (account, date, ticker, qty, price_ccy) VALUES ('main', ?, 'T0001', 3, 99)",
+        [(d,) for d in dates[3:5]],
+    )
+    conn.execute("UPDATE snapshots SET price_ccy = price_ccy * 0.9 WHERE ticker = 'T0002' AND date >= ?", (dates[4],))
+    conn.executemany(
+        "UPDATE fx_rates SET rate = rate * 1.01 WHERE pair = 'USDJPY' AND date = ?", [(d,) for d in dates[::2]]
+    )
+    # GBP and (on one date) EUR assets are valued through USD cross rates
+    conn.executemany("INSERT INTO fx_rates (date, pair, rate) VALUES (?, 'GBPUSD', 1.25)", [(d,) for d in dates[1:6]])
+    conn.execute("INSERT INTO fx_rates (date, pair, rate) VALUES (?, 'EURUSD', 1.1)", (dates[5],))
+    conn.execute("DELETE FROM fx_rates WHERE pair = 'EURJPY' AND date = ?", (dates[5],))
+    conn.execute("UPDATE assets SET ccy = 'GBP' WHERE ticker = 'T0004'")
+    conn.execute("INSERT INTO reporting_currencies (ccy) VALUES ('EUR') ON CONFLICT DO NOTHING")
+
+
+class DeferredRefreshTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        tmp = Path(self.tmp.name)
+        self.row_path, self.batch_path = tmp / "row.db", tmp / "batch.db"
+        build_synthetic_db(self.row_path, 6, 30, 2)
+        shutil.copyfile(self.row_path, self.batch_path)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def read(self, db_path: Path) -> dict[str, list[tuple]]:
+        conn = connect(db_path, read_only=True)
+        try:
+            return {name: conn.execute(sql).fetchall() for name, sql in DERIVED.items()}
+        finally:
+            conn.close()
+
+    def test_batched_writes_match_per_row_writes(self):
+        conn = connect(self.row_path)
+        try:
+            dates = [row[0] for row in conn.execute("SELECT DISTINCT date FROM snapshots ORDER BY date")][-8:]
+            with conn:
+                write(conn, dates)
+        finally:
+            conn.close()
+        conn = connect(self.batch_path)
+        try:
+            with conn, deferred_refresh(conn):
+                write(conn, dates)
+                # nested blocks join the outer batch; nothing is rebuilt until it ends
+                with deferred_refresh(conn):
+                    conn.execute("UPDATE snapshots SET qty = qty + 1 WHERE account = 'main' AND date = ?", (dates[0],))
+                for queue in ("rc_refresh", "fx_derive_dirty"):
+                    self.assertGreater(conn.execute(f"SELECT COUNT(*) FROM {queue}").fetchone()[0], 0)
+            for table in ("rc_batch", "rc_refresh", "fx_derive_dirty"):
+                self.assertEqual(conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0], 0)
+        finally:
+            conn.close()
+        conn = connect(self.row_path)
+        try:
+            with conn:
+                conn.execute("UPDATE snapshots SET qty = qty + 1 WHERE account = 'main' AND date = ?", (dates[0],))
+        finally:
+            conn.close()
+
+        expected, actual = self.read(self.row_path), self.read(self.batch_path)
+        for name in DERIVED:
+            with self.subTest(name):
+                self.assertGreater(len(expected[name]), 0)
+                self.assertEqual(len(actual[name]), len(expected[name]))
+                for got, want in zip(actual[name], expected[name]):
+                    self.assertTrue(all(map(same, got, want)), (got, want))
+
+    def test_a_failed_batch_leaves_no_flag(self):
+        conn = connect(self.batch_path)
+        try:
+            with self.assertRaises(RuntimeError), conn, deferred_refresh(conn):
+                conn.execute("UPDATE snapshots SET qty = qty * 2")
+                conn.execute("UPDATE fx_rates SET rate = rate * 2")
+                raise RuntimeError("interrupted")
+            for table in ("rc_batch", "rc_refresh", "fx_derive_dirty"):
+                self.assertEqual(conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0], 0)
+        finally:
+            conn.close()
+        self.assertEqual(self.read(self.batch_path), self.read(self.row_path))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,116 @@
+"""Incremental ledger replay from checkpoints matches a full replay (scripts/replay_ledger.py)."""
+import datetime as dt
+import random
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path[:0] = [str(ROOT / "app"), str(ROOT / "scripts")]
+
+from db import connect, ensure_schema  # noqa: E402
+from replay_ledger import mark_all_dirty, replay_ticker  # noqa: E402
+
+CHECKPOINT_EVERY = 5
+START = dt.date(2024, 1, 1)
+
+
+def replay_dirty(conn) -> int:
+    replayed = 0
+    with conn:
+        dirty = conn.execute("SELECT account, ticker, from_date FROM ledger_dirty ORDER BY account, ticker").fetchall()
+        for account, ticker, from_date in dirty:
+            replayed += replay_ticker(conn, account, ticker, from_date, CHECKPOINT_EVERY)
+    return replayed
+
+
+def add_flow(conn, date: str, ticker: str, kind: str, qty: float) -> None:
+    conn.execute(
+        "INSERT INTO cashflows (date, ticker, type, amount_ccy, ccy, qty) VALUES (?, ?, ?, 10, ?, ?)",
+        (date, ticker, kind, "USD" if ticker == "VTI" else "JPY", qty),
+    )
+
+
+def ledger(conn) -> list[tuple]:
+    return conn.execute(
+        "SELECT account, ticker, date, qty FROM ledger_positions ORDER BY account, ticker, date"
+    ).fetchall()
+
+
+def scalar(conn, sql: str, *params):
+    return conn.execute(sql, params).fetchone()[0]
+
+
+class ReplayTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.conn = connect(Path(self.tmp.name) / "ledger.db")
+        ensure_schema(self.conn)
+        rng = random.Random(7)
+        with self.conn:
+            self.conn.execute("INSERT INTO assets (ticker, ccy) VALUES ('VTI', 'USD'), ('TOPIX', 'JPY')")
+            flows = []
+            for n in range(120):
+                date = (START + dt.timedelta(days=n * 2)).isoformat()
+                for ticker in ("VTI", "TOPIX"):
+                    kind = rng.choice(("BUY", "BUY", "SELL", "DIVIDEND"))
+                    qty = None if kind == "DIVIDEND" else rng.randint(1, 5)
+                    flows.append((date, ticker, kind, 100.0, "USD" if ticker == "VTI" else "JPY", qty))
+            self.conn.executemany(
+                "INSERT INTO cashflows (date, ticker, type, amount_ccy, ccy, qty) VALUES (?, ?, ?, ?, ?, ?)", flows
+            )
+        self.total = replay_dirty(self.conn)
+
+    def tearDown(self):
+        self.conn.close()
+        self.tmp.cleanup()
+
+    def assertMatchesFullReplay(self):
+        incremental = ledger(self.conn)
+        checkpoints = scalar(self.conn, "SELECT COUNT(*) FROM ledger_checkpoints")
+        with self.conn:
+            self.conn.execute("DELETE FROM ledger_checkpoints")
+            mark_all_dirty(self.conn)
+        replay_dirty(self.conn)
+        self.assertEqual(incremental, ledger(self.conn))
+        self.assertEqual(checkpoints, scalar(self.conn, "SELECT COUNT(*) FROM ledger_checkpoints"))
+
+    def test_first_replay_writes_checkpoints(self):
+        self.assertEqual(self.total, scalar(self.conn, "SELECT COUNT(*) FROM cashflows WHERE qty IS NOT NULL"))
+        self.assertGreater(scalar(self.conn, "SELECT COUNT(*) FROM ledger_checkpoints"), 10)
+        self.assertEqual(scalar(self.conn, "SELECT COUNT(*) FROM ledger_dirty"), 0)
+
+    def test_back_dated_flow_resumes_from_the_checkpoint_before_it(self):
+        checkpoints = [
+            row[0]
+            for row in self.conn.execute("SELECT date FROM ledger_checkpoints WHERE ticker = 'VTI' ORDER BY date")
+        ]
+        late = dt.date.fromisoformat(checkpoints[-3]) + dt.timedelta(days=1)
+        with self.conn:
+            add_flow(self.conn, late.isoformat(), "VTI", "SELL", 2)
+        replayed = replay_dirty(self.conn)
+        after = scalar(
+            self.conn,
+            "SELECT COUNT(*) FROM cashflows WHERE ticker = 'VTI' AND qty IS NOT NULL AND date > ?",
+            checkpoints[-3],
+        )
+        self.assertEqual(replayed, after)
+        self.assertLess(replayed, self.total // 4)
+        self.assertMatchesFullReplay()
+
+    def test_edits_on_and_before_checkpoint_dates(self):
+        first_cp = scalar(self.conn, "SELECT MIN(date) FROM ledger_checkpoints WHERE ticker = 'TOPIX'")
+        with self.conn:
+            # a flow on a checkpoint date, one before every flow, an update and a delete
+            add_flow(self.conn, first_cp, "TOPIX", "BUY", 7)
+            add_flow(self.conn, "2023-12-01", "VTI", "BUY", 3)
+            self.conn.execute("UPDATE cashflows SET qty = qty + 1 WHERE ticker = 'VTI' AND date = '2024-03-01'")
+            self.conn.execute("DELETE FROM cashflows WHERE ticker = 'TOPIX' AND date = '2024-06-01'")
+        replay_dirty(self.conn)
+        self.assertEqual(scalar(self.conn, "SELECT MIN(date) FROM ledger_positions WHERE ticker = 'VTI'"), "2023-12-01")
+        self.assertMatchesFullReplay()
+
+
+if __name__ == "__main__":
+    unittest.main()
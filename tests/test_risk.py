@@ -0,0 +1,100 @@
+"""Incremental risk statistics match a full recompute (app/risk.py, update_risk.py --full)."""
+import math
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path[:0] = [str(ROOT / "app"), str(ROOT / "scripts")]
+
+from db import connect  # noqa: E402
+from risk import update_risk  # noqa: E402
+from synth_db import build_synthetic_db  # noqa: E402
+
+# table -> key columns; the other columns are compared with a relative tolerance
+TABLES = {
+    "risk_series": ("series", "date"),
+    "risk_vol": ("series", "window_days", "date"),
+    "risk_corr": ("window_days", "series_a", "series_b"),
+}
+
+
+def dump(conn, table: str) -> dict[tuple, tuple]:
+    keys = TABLES[table]
+    cur = conn.execute(f"SELECT * FROM {table}")
+    names = [d[0] for d in cur.description]
+    key_at = [names.index(k) for k in keys]
+    return {
+        tuple(row[i] for i in key_at): tuple(v for i, v in enumerate(row) if i not in key_at)
+        for row in cur.fetchall()
+    }
+
+
+def close(a, b) -> bool:
+    if isinstance(a, float) and isinstance(b, float):
+        return math.isclose(a, b, rel_tol=1e-7, abs_tol=1e-9)
+    return a == b
+
+
+class IncrementalRiskTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        db_path = Path(self.tmp.name) / "risk.db"
+        build_synthetic_db(db_path, 5, 200, 2)
+        self.conn = connect(db_path)
+
+    def tearDown(self):
+        self.conn.close()
+        self.tmp.cleanup()
+
+    def assertMatchesFull(self):
+        incremental = {table: dump(self.conn, table) for table in TABLES}
+        update_risk(self.conn, full=True)
+        for table in TABLES:
+            full = dump(self.conn, table)
+            self.assertGreater(len(full), 0, table)
+            self.assertEqual(incremental[table].keys(), full.keys(), table)
+            for key, row in full.items():
+                self.assertTrue(all(map(close, incremental[table][key], row)), (table, key, incremental[table][key], row))
+
+    def test_new_days_and_a_back_edit(self):
+        conn = self.conn
+        last = conn.execute("SELECT DISTINCT date FROM asset_prices ORDER BY date DESC LIMIT 10").fetchall()
+        cutoff = last[-1][0]
+        held = {
+            "asset_prices": conn.execute("SELECT date, ticker, close FROM asset_prices WHERE date >= ?", (cutoff,)).fetchall(),
+            "snapshots": conn.execute(
+                "SELECT account, date, ticker, qty, price_ccy FROM snapshots WHERE date >= ?", (cutoff,)
+            ).fetchall(),
+        }
+        with conn:
+            conn.execute("DELETE FROM snapshots WHERE date >= ?", (cutoff,))
+            conn.execute("DELETE FROM asset_prices WHERE date >= ?", (cutoff,))
+        update_risk(conn, full=True)
+
+        # the close arrives for ten more days, and one price inside the window is corrected
+        with conn:
+            conn.executemany("INSERT INTO asset_prices (date, ticker, close) VALUES (?, ?, ?)", held["asset_prices"])
+            conn.executemany(
+                "INSERT INTO snapshots (account, date, ticker, qty, price_ccy) VALUES (?, ?, ?, ?, ?)", held["snapshots"]
+            )
+            date, ticker = conn.execute(
+                "SELECT date, ticker FROM asset_prices WHERE date < ? ORDER BY date DESC LIMIT 1 OFFSET 40", (cutoff,)
+            ).fetchone()
+            conn.execute("UPDATE asset_prices SET close = close * 1.03 WHERE date = ? AND ticker = ?", (date, ticker))
+        self.assertGreater(conn.execute("SELECT COUNT(*) FROM risk_dirty").fetchone()[0], 0)
+        result = update_risk(conn)
+        self.assertGreater(result["rows"], 0)
+        self.assertEqual(conn.execute("SELECT COUNT(*) FROM risk_dirty").fetchone()[0], 0)
+        self.assertMatchesFull()
+
+    def test_nothing_dirty_is_a_no_op(self):
+        update_risk(self.conn, full=True)
+        result = update_risk(self.conn)
+        self.assertEqual(result["series"], 0)
+        self.assertEqual(set(result["correlation"].values()), {"unchanged"})
+
+
+if __name__ == "__main__":
+    unittest.main()
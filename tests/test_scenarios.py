@@ -0,0 +1,130 @@
+"""Scenario engine parity with a per-holding revaluation (app/scenarios.py)."""
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path[:0] = [str(ROOT / "app"), str(ROOT / "scripts")]
+
+from db import connect  # noqa: E402
+from scenarios import (  # noqa: E402
+    COMPONENTS,
+    decompose,
+    foreign_ccys,
+    load_history,
+    load_positions,
+    monte_carlo,
+    parse_shocks,
+    shock_returns,
+    simulate,
+)
+from synth_db import build_synthetic_db  # noqa: E402
+
+
+def revalue(positions: dict, price_returns: np.ndarray, fx_returns: np.ndarray) -> np.ndarray:
+    """Total JPY change per scenario: new value of every holding minus the base value."""
+    ccys = foreign_ccys(positions)
+    totals = []
+    for price_row, fx_row in zip(price_returns, fx_returns):
+        fx_by_ccy = dict(zip(ccys, fx_row))
+        new = sum(
+            positions["qty"][h] * positions["price"][h] * (1 + price_row[h])
+            * positions["fx_rate"][h] * (1 + fx_by_ccy.get(ccy, 0.0))
+            for h, ccy in enumerate(positions["ccys"])
+        )
+        totals.append(new - positions["value"].sum())
+    return np.array(totals)
+
+
+class ScenarioTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.TemporaryDirectory()
+        db_path = Path(cls.tmp.name) / "scenarios.db"
+        build_synthetic_db(db_path, 12, 400, 2)
+        cls.conn = connect(db_path, read_only=True)
+        cls.date = cls.conn.execute("SELECT MAX(date) FROM v_valuation").fetchone()[0]
+        cls.positions = load_positions(cls.conn, cls.date)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.conn.close()
+        cls.tmp.cleanup()
+
+    def test_positions_match_the_valuation_view(self):
+        positions = self.positions
+        self.assertGreater(len(positions["tickers"]), 0)
+        self.assertTrue(foreign_ccys(positions))
+        total = self.conn.execute(
+            "SELECT SUM(value_jpy) FROM v_valuation WHERE date = ? AND qty <> 0", (self.date,)
+        ).fetchone()[0]
+        self.assertAlmostEqual(positions["value"].sum(), total, delta=abs(total) * 1e-12)
+        account = self.conn.execute("SELECT MIN(account) FROM snapshots").fetchone()[0]
+        self.assertLessEqual(load_positions(self.conn, self.date, account)["value"].sum(), total)
+
+    def test_shock_grid_matches_revaluation(self):
+        grid = [
+            {"USDJPY": fx, "EURJPY": fx / 2, "*": eq}
+            for fx in np.linspace(-0.2, 0.2, 9)
+            for eq in np.linspace(-0.4, 0.2, 9)
+        ]
+        price_returns, fx_returns = shock_returns(self.positions, grid)
+        result = decompose(self.positions, price_returns, fx_returns)
+        expected = revalue(self.positions, price_returns, fx_returns)
+        scale = self.positions["value"].sum()
+        np.testing.assert_allclose(result["total"] / scale, expected / scale, rtol=0, atol=1e-12)
+        np.testing.assert_allclose(result["total"], result["price"] + result["fx"] + result["cross"])
+
+    def test_by_holding_sums_to_the_aggregate(self):
+        rng = np.random.default_rng(0)
+        holdings, ccys = len(self.positions["tickers"]), len(foreign_ccys(self.positions))
+        price_returns = rng.normal(0, 0.1, (50, holdings))
+        fx_returns = rng.normal(0, 0.05, (50, ccys))
+        total = decompose(self.positions, price_returns, fx_returns)
+        detail = decompose(self.positions, price_returns, fx_returns, by_holding=True)
+        for name in COMPONENTS:
+            self.assertEqual(detail[name].shape, (50, holdings))
+            np.testing.assert_allclose(detail[name].sum(axis=1), total[name], rtol=1e-10, atol=1e-6)
+        np.testing.assert_allclose(total["total"], revalue(self.positions, price_returns, fx_returns), rtol=1e-10)
+
+    def test_most_specific_shock_wins(self):
+        positions = self.positions
+        ticker, ccy = positions["tickers"][0], positions["ccys"][0]
+        shocks = parse_shocks(f"*=-20%, @{ccy}=-0.1, {ticker.lower()}=5%, USDJPY=-10%")
+        price, fx = shock_returns(positions, [shocks])
+        self.assertAlmostEqual(price[0, 0], 0.05)
+        for h, c in enumerate(positions["ccys"][1:], start=1):
+            self.assertAlmostEqual(price[0, h], -0.1 if c == ccy else -0.2)
+        ccys = foreign_ccys(positions)
+        self.assertEqual(list(fx[0]), [-0.1 if c == "USD" else 0.0 for c in ccys])
+
+    def test_parse_shocks_rejects_bad_specs(self):
+        self.assertEqual(parse_shocks("USDJPY=-10%, *=0.25,"), {"USDJPY": -0.1, "*": 0.25})
+        for text in ("USDJPY", "VTI=abc", "VTI=-100%"):
+            with self.subTest(text), self.assertRaises(ValueError):
+                parse_shocks(text)
+
+    def test_monte_carlo_is_seeded_and_matches_revaluation(self):
+        history = load_history(self.conn, self.positions, 250)
+        holdings = len(self.positions["tickers"])
+        self.assertEqual(history.shape[1], holdings + len(foreign_ccys(self.positions)))
+        self.assertGreater(history.shape[0], 100)
+        self.assertFalse(np.isnan(history).any())
+        for method in ("normal", "bootstrap"):
+            with self.subTest(method):
+                first = monte_carlo(self.conn, self.positions, 500, method=method, seed=7)
+                again = monte_carlo(self.conn, self.positions, 500, method=method, seed=7)
+                np.testing.assert_array_equal(first["total"], again["total"])
+                changes = simulate(history, 500, 20, method, seed=7)
+                np.testing.assert_allclose(
+                    first["total"], revalue(self.positions, changes[:, :holdings], changes[:, holdings:]), rtol=1e-10
+                )
+        with self.assertRaises(ValueError):
+            simulate(history, 10, method="garch")
+
+
+if __name__ == "__main__":
+    unittest.main()
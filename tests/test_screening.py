@@ -0,0 +1,173 @@
+"""Ingest screening rules and quarantine routing (app/screening.py, fetch_prices / fetch_fx store_history)."""
+import datetime as dt
+import io
+import sys
+import tempfile
+import unittest
+from contextlib import redirect_stderr
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path[:0] = [str(ROOT / "app"), str(ROOT / "scripts")]
+
+import fetch_fx  # noqa: E402
+import fetch_prices  # noqa: E402
+from db import connect, ensure_schema  # noqa: E402
+from screening import STALE_RUN, review, screen_history  # noqa: E402
+
+START = dt.date(2024, 1, 1)
+
+
+def walk(n: int, level: float, sigma: float, seed: int = 0) -> list[float]:
+    rng = np.random.default_rng(seed)
+    return list(level * np.exp(np.cumsum(rng.normal(0, sigma, n))))
+
+
+def history(values, offset: int = 0) -> dict[str, float]:
+    return {(START + dt.timedelta(days=offset + i)).isoformat(): v for i, v in enumerate(values)}
+
+
+def day(i: int) -> str:
+    return (START + dt.timedelta(days=i)).isoformat()
+
+
+class ScreeningTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.conn = connect(Path(self.tmp.name) / "screen.db")
+        ensure_schema(self.conn)
+
+    def tearDown(self):
+        self.conn.close()
+        self.tmp.cleanup()
+
+    def store_fx(self, values, offset: int = 0) -> int:
+        with self.conn, redirect_stderr(io.StringIO()):  # QUARANTINED lines
+            return fetch_fx.store_history(self.conn, "USDJPY", history(values, offset), source="test")
+
+    def store_prices(self, values, offset: int = 0, changed: list | None = None) -> int:
+        with self.conn, redirect_stderr(io.StringIO()):
+            return fetch_prices.store_history(
+                self.conn, "VTI", history(values, offset), source="test", changed_dates=changed
+            )
+
+    def quarantined(self, status: str = "pending") -> list[tuple]:
+        return self.conn.execute(
+            "SELECT key, date, reason FROM ingest_quarantine WHERE status = ? ORDER BY key, date", (status,)
+        ).fetchall()
+
+    def stored(self, table: str = "fx_rates") -> int:
+        return self.conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+    def test_clean_series_passes(self):
+        self.assertEqual(self.store_fx(walk(300, 140, 0.005)), 300)
+        self.assertEqual(self.store_prices(walk(300, 200, 0.012, seed=1)), 300)
+        self.assertEqual(self.quarantined(), [])
+
+    def test_bad_tick_is_held_and_the_rest_upserted(self):
+        values = walk(120, 140, 0.005)
+        values[60] *= 1.6
+        self.assertEqual(self.store_fx(values), 119)
+        self.assertEqual(self.quarantined(), [("USDJPY", day(60), "zscore")])
+        source, ref = self.conn.execute("SELECT source, ref_value FROM ingest_quarantine").fetchone()
+        self.assertEqual(source, "test")
+        self.assertAlmostEqual(ref, values[59], delta=values[59] * 0.02)
+
+    def test_invalid_values(self):
+        values = walk(40, 140, 0.005)
+        values[10], values[20] = float("nan"), -1.0
+        self.store_fx(values)
+        self.assertEqual(self.quarantined(), [("USDJPY", day(10), "invalid"), ("USDJPY", day(20), "invalid")])
+
+    def test_stale_run(self):
+        values = walk(80, 140, 0.005)
+        values[40:48] = [values[40]] * 8
+        self.store_fx(values)
+        self.assertEqual([r[1] for r in self.quarantined()], [day(i) for i in range(40 + STALE_RUN, 48)])
+        self.assertEqual({r[2] for r in self.quarantined()}, {"stale"})
+
+    def test_confirmed_moderate_jump_is_released(self):
+        self.store_fx(walk(100, 140, 0.005))
+        last = self.conn.execute("SELECT rate FROM fx_rates ORDER BY date DESC LIMIT 1").fetchone()[0]
+        # an unconfirmed last value is held, then released once the next day stays at the new level
+        self.store_fx([last * 1.08], offset=100)
+        self.assertEqual(self.quarantined(), [("USDJPY", day(100), "zscore")])
+        self.store_fx([last * 1.081], offset=101)
+        self.assertEqual(self.quarantined(), [])
+        self.assertEqual(self.stored(), 102)
+
+    def test_level_shift_past_the_cap_is_held_even_when_confirmed(self):
+        self.store_fx(walk(100, 130, 0.005))
+        shifted = walk(20, 537, 0.005, seed=2)
+        self.assertEqual(self.store_fx(shifted, offset=100), 0)
+        rows = self.quarantined()
+        self.assertEqual(len(rows), 20)
+        self.assertEqual(rows[0], ("USDJPY", day(100), "shift"))
+        self.assertEqual({r[2] for r in rows}, {"shift"})
+        # the next daily batch looks normal against the shifted days but stays held
+        self.assertEqual(self.store_fx([shifted[-1] * 1.001], offset=120), 0)
+        self.assertEqual(len(self.quarantined()), 21)
+        self.assertEqual(self.stored(), 100)
+
+    def test_daily_batches_turn_a_confirmed_big_jump_into_a_shift(self):
+        self.store_fx(walk(100, 130, 0.005))
+        self.store_fx([537.0], offset=100)
+        self.assertEqual(self.quarantined(), [("USDJPY", day(100), "zscore")])
+        self.store_fx([538.0], offset=101)
+        self.store_fx([539.0], offset=102)
+        self.assertEqual(
+            self.quarantined(),
+            [("USDJPY", day(100), "shift"), ("USDJPY", day(101), "shift"), ("USDJPY", day(102), "shift")],
+        )
+        self.assertEqual(self.stored(), 100)
+
+    def test_split_holds_later_batches_until_adjusted_history_arrives(self):
+        raw = walk(200, 100, 0.01, seed=3)
+        values = raw[:150] + [v / 2 for v in raw[150:]]
+        self.store_prices(values[:180])
+        rows = self.quarantined()
+        self.assertEqual(rows[0], ("VTI", day(150), "split"))
+        self.assertEqual(len(rows), 30)
+        self.store_prices(values[180:], offset=180)
+        self.assertEqual(len(self.quarantined()), 50)
+        # re-fetching the split-adjusted history releases everything
+        self.store_prices([v / 2 for v in raw[:150]] + values[150:])
+        self.assertEqual(self.quarantined(), [])
+        self.assertEqual(self.stored("asset_prices"), 200)
+
+    def test_changed_dates_are_reported(self):
+        changed: list[str] = []
+        values = walk(30, 100, 0.01)
+        values[10] *= 3.3
+        self.store_prices(values, changed=changed)
+        self.assertEqual(len(changed), 29)
+        self.assertNotIn(day(10), changed)
+        changed.clear()
+        self.store_prices(values, changed=changed)
+        self.assertEqual(changed, [])
+
+    def test_review_accept_and_reject(self):
+        values = walk(60, 140, 0.005)
+        values[30] *= 1.5
+        values[40] *= 0.6
+        self.store_fx(values)
+        self.assertEqual(review(self.conn, "reject", end=day(35)), 1)
+        self.assertEqual(review(self.conn, "accept"), 1)
+        self.assertAlmostEqual(
+            self.conn.execute("SELECT rate FROM fx_rates WHERE date = ?", (day(40),)).fetchone()[0], values[40]
+        )
+        # a rejected value stays out when it is fetched again; a corrected one goes in
+        self.assertEqual(self.store_fx([values[30]], offset=30), 0)
+        self.assertEqual(self.quarantined("rejected"), [("USDJPY", day(30), "zscore")])
+        self.assertEqual(self.store_fx([values[29] * 1.001], offset=30), 1)
+
+    def test_screen_history_without_stored_data(self):
+        rows, held = screen_history(self.conn, "fx_rates", "EURJPY", history([150.0, float("inf")]), "test")
+        self.assertEqual(list(rows), [day(0)])
+        self.assertEqual([(d, r) for d, _, r, _ in held], [(day(1), "invalid")])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,150 @@
+"""AI summaries against the local Responses API stub: streaming, cache and precompute (app/summaries.py)."""
+import asyncio
+import importlib.util
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path[:0] = [str(ROOT / "app"), str(ROOT / "scripts")]
+
+import summaries  # noqa: E402
+from db import connect  # noqa: E402
+from openai_stub import StubConfig, reply_text, start_stub  # noqa: E402
+from synth_db import build_synthetic_db  # noqa: E402
+
+WORDS = 12
+
+
+@unittest.skipUnless(importlib.util.find_spec("openai"), "openai is not installed")
+class SummariesTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.TemporaryDirectory()
+        cls.db_path = Path(cls.tmp.name) / "summaries.db"
+        build_synthetic_db(cls.db_path, 4, 40, 1)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp.cleanup()
+
+    def setUp(self):
+        self.config = StubConfig(latency_ms=20, words=WORDS)
+        self.server = start_stub(self.config)
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.base_url = f"http://127.0.0.1:{self.server.server_port}/v1"
+        conn = connect(self.db_path)
+        try:
+            summaries.ensure_summary_table(conn)
+            with conn:
+                conn.execute("DELETE FROM ai_summaries")
+            self.dates = summaries.recent_dates(conn, 6)
+        finally:
+            conn.close()
+
+    def precompute(self, dates: list[str], **options) -> dict[str, int]:
+        from openai import AsyncOpenAI
+
+        async def main():
+            client = AsyncOpenAI(api_key="test", base_url=self.base_url)
+            try:
+                return await summaries.precompute_daily(self.db_path, client, dates, **options)
+            finally:
+                await client.close()
+
+        return asyncio.run(main())
+
+    def cached(self, date: str) -> str | None:
+        conn = connect(self.db_path, read_only=True)
+        try:
+            return summaries.load_summary(conn, "day", date, summaries.day_prompt(conn, date))
+        finally:
+            conn.close()
+
+    def test_stream_yields_the_reply_in_pieces(self):
+        from openai import OpenAI
+
+        conn = connect(self.db_path, read_only=True)
+        try:
+            prompt = summaries.day_prompt(conn, self.dates[0])
+        finally:
+            conn.close()
+        client = OpenAI(api_key="test", base_url=self.base_url)
+        try:
+            pieces = list(summaries.stream_summary(client, prompt))
+        finally:
+            client.close()
+        self.assertGreater(len(pieces), 1)
+        self.assertEqual("".join(pieces), reply_text(prompt, WORDS))
+        self.assertEqual(self.config.streamed, 1)
+
+    def test_stream_errors_become_runtime_errors(self):
+        from openai import OpenAI
+
+        self.config.error_status = 500
+        client = OpenAI(api_key="test", base_url=self.base_url, max_retries=0)
+        try:
+            with self.assertRaisesRegex(RuntimeError, "OpenAI API"):
+                list(summaries.stream_summary(client, "prompt"))
+        finally:
+            client.close()
+
+    def test_precompute_caches_until_the_prompt_changes(self):
+        progress = []
+        counts = self.precompute(self.dates, concurrency=2, progress=lambda d, s: progress.append((d, s)))
+        self.assertEqual(counts, {"cached": 0, "generated": len(self.dates), "empty": 0, "failed": 0})
+        self.assertEqual(sorted(progress), sorted((d, "generated") for d in self.dates))
+        self.assertEqual(self.config.max_inflight, 2)
+        self.assertIn(self.dates[0], self.cached(self.dates[0]))
+
+        requests = self.config.requests
+        counts = self.precompute([*self.dates, "1999-01-01"])
+        self.assertEqual(counts, {"cached": len(self.dates), "generated": 0, "empty": 1, "failed": 0})
+        self.assertEqual(self.config.requests, requests)
+
+        # a changed holding changes that date's prompt, so only it is generated again
+        conn = connect(self.db_path)
+        try:
+            with conn:
+                conn.execute("UPDATE snapshots SET qty = qty + 1 WHERE date = ?", (self.dates[1],))
+        finally:
+            conn.close()
+        self.assertIsNone(self.cached(self.dates[1]))
+        counts = self.precompute(self.dates)
+        self.assertEqual(counts["generated"], 2)  # the next date's attribution compares against it
+        self.assertEqual(self.precompute(self.dates[:1], force=True)["generated"], 1)
+
+    def test_failed_requests_are_counted_not_raised(self):
+        from openai import AsyncOpenAI
+
+        self.config.error_status = 500
+        failures: dict[str, str] = {}
+
+        async def main():
+            client = AsyncOpenAI(api_key="test", base_url=self.base_url, max_retries=0)
+            try:
+                return await summaries.precompute_daily(self.db_path, client, self.dates[:2], failures=failures)
+            finally:
+                await client.close()
+
+        self.assertEqual(asyncio.run(main())["failed"], 2)
+        self.assertEqual(set(failures), set(self.dates[:2]))
+
+    def test_background_job_fills_the_cache(self):
+        with mock.patch.dict(os.environ, {"OPENAI_BASE_URL": self.base_url}):
+            job = summaries.PrecomputeJob(self.db_path, "test", days=4, concurrency=3)
+            job.thread.join(30)
+        self.assertFalse(job.running)
+        self.assertIsNone(job.error)
+        self.assertEqual(job.total, 4)
+        self.assertEqual(job.counts["generated"], 4)
+        self.assertEqual(job.finished, {date: "generated" for date in self.dates[:4]})
+        self.assertTrue(all(self.cached(date) for date in self.dates[:4]))
+
+
+if __name__ == "__main__":
+    unittest.main()
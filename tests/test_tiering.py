@@ -0,0 +1,177 @@
+"""Hot/cold tiering: archived history reads back unchanged through the union views (app/tiering.py)."""
+import math
+import shutil
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path[:0] = [str(ROOT / "app"), str(ROOT / "scripts")]
+
+import tiering  # noqa: E402
+from db import connect  # noqa: E402
+from synth_db import build_synthetic_db  # noqa: E402
+
+# read the same way before and after archiving; base tables, derived tables and views
+QUERIES = {
+    "asset_prices": "SELECT date, ticker, close FROM asset_prices ORDER BY date, ticker",
+    "snapshots": "SELECT account, date, ticker, qty, price_ccy FROM snapshots ORDER BY account, date, ticker",
+    "portfolio_total_rc": "SELECT * FROM portfolio_total_rc ORDER BY rc, date",
+    "v_portfolio_total": "SELECT * FROM v_portfolio_total ORDER BY date",
+    "v_valuation": "SELECT date, ticker, value_jpy FROM v_valuation ORDER BY date, ticker",
+    "v_attribution": "SELECT * FROM v_attribution ORDER BY date, ticker",
+    "v_fx_rates": "SELECT * FROM v_fx_rates ORDER BY date, pair",
+}
+
+
+def same(a, b) -> bool:
+    if isinstance(a, float) and isinstance(b, float):
+        return math.isclose(a, b, rel_tol=1e-12, abs_tol=1e-9)
+    return a == b
+
+
+class TierArchiveTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        tmp = Path(self.tmp.name)
+        self.db_path = tmp / "hot.db"
+        build_synthetic_db(self.db_path, 6, 300, 2)
+        self.reference = tmp / "reference.db"
+        shutil.copyfile(self.db_path, self.reference)
+        self.archive_path = tiering.default_archive_path(self.db_path)
+        dates = self.read("SELECT DISTINCT date FROM snapshots ORDER BY date")
+        self.cutoff = dates[len(dates) // 2][0]
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def read(self, sql: str, db_path: Path | None = None, start: str | None = "9999-12-31") -> list[tuple]:
+        conn = connect(db_path or self.db_path, read_only=True)
+        try:
+            tiering.ensure_range(conn, start)
+            return conn.execute(sql).fetchall()
+        finally:
+            conn.close()
+
+    def archive(self, cutoff: str) -> dict[str, int]:
+        conn = connect(self.db_path)
+        try:
+            return tiering.archive_before(conn, cutoff, self.archive_path)
+        finally:
+            conn.close()
+
+    def assertUnionMatches(self):
+        for name, sql in QUERIES.items():
+            with self.subTest(name):
+                expected = self.read(sql, self.reference)
+                actual = self.read(sql, start=None)
+                self.assertGreater(len(expected), 0)
+                self.assertEqual(len(actual), len(expected))
+                for got, want in zip(actual, expected):
+                    self.assertTrue(all(map(same, got, want)), (got, want))
+
+    def test_archive_moves_rows_and_the_union_reads_them_back(self):
+        self.assertEqual(self.archive_path.name, "hot.archive.db")
+        before = self.read(f"SELECT COUNT(*) FROM asset_prices WHERE date < '{self.cutoff}'")[0][0]
+        moved = self.archive(self.cutoff)
+        self.assertEqual(list(moved), list(tiering.TIERED_TABLES))
+        self.assertEqual(moved["asset_prices"], before)
+        self.assertTrue(self.archive_path.exists())
+        # the hot DB keeps only the open period, and a recent read does not attach the archive
+        hot = self.read(f"SELECT COUNT(*) FROM asset_prices WHERE date < '{self.cutoff}'")
+        self.assertEqual(hot, [(0,)])
+        self.assertUnionMatches()
+
+    def test_cutoff_only_moves_forward(self):
+        dates = [row[0] for row in self.read("SELECT DISTINCT date FROM snapshots ORDER BY date")]
+        self.archive(dates[len(dates) // 4])
+        self.assertEqual(self.archive(dates[10]), {})
+        self.assertGreater(self.archive(self.cutoff)["snapshots"], 0)
+        conn = connect(self.db_path)
+        try:
+            info = tiering.archive_info(conn)
+            self.assertEqual(info["cutoff"], self.cutoff)
+            self.assertEqual(info["first_date"], dates[0])
+            with self.assertRaises(ValueError):
+                tiering.archive_before(conn, dates[-5], Path(self.tmp.name) / "other.archive.db")
+        finally:
+            conn.close()
+        self.assertUnionMatches()
+
+    def test_ensure_range_attaches_only_for_archived_dates(self):
+        self.archive(self.cutoff)
+        conn = connect(self.db_path, read_only=True)
+        try:
+            later = conn.execute("SELECT MIN(date) FROM snapshots WHERE date > ?", (self.cutoff,)).fetchone()[0]
+            self.assertFalse(tiering.ensure_range(conn, later))
+            self.assertTrue(tiering.ensure_range(conn, "2000-01-01"))
+            self.assertTrue(tiering.ensure_range(conn, later))
+            tiering.detach_cold(conn)
+            hot = conn.execute(f"SELECT COUNT(*) FROM asset_prices WHERE date < '{self.cutoff}'").fetchone()
+            self.assertEqual(hot, (0,))
+        finally:
+            conn.close()
+
+    def test_first_hot_date_reads_its_previous_date_from_the_archive(self):
+        self.archive(self.cutoff)
+        sql = f"SELECT * FROM v_attribution WHERE date = '{self.cutoff}' ORDER BY ticker"
+        expected = self.read(sql, self.reference)
+        self.assertGreater(len(expected), 0)
+        self.assertEqual(self.read(sql, start=self.cutoff), expected)
+        # a cutoff on a day without data: the first hot date after it still looks back
+        conn = connect(self.db_path)
+        try:
+            with conn:
+                conn.execute("UPDATE tier_archive SET cutoff = date(cutoff, '-1 day')")
+        finally:
+            conn.close()
+        self.assertEqual(self.read(sql, start=self.cutoff), expected)
+
+    def test_every_view_runs_on_the_tiered_connection(self):
+        self.archive(self.cutoff)
+        hot_gaps = "SELECT * FROM v_gap_attribution ORDER BY date, account, ticker"
+        conn = connect(self.db_path)
+        try:
+            expected = conn.execute(hot_gaps).fetchall()
+        finally:
+            conn.close()
+        conn = connect(self.db_path, read_only=True)
+        try:
+            self.assertTrue(tiering.ensure_range(conn, None))
+            views = [row[0] for row in conn.execute("SELECT name FROM main.sqlite_master WHERE type = 'view'")]
+            self.assertIn("v_gap_attribution_rows", views)
+            for view in views:
+                with self.subTest(view):
+                    conn.execute(f"SELECT * FROM {view} LIMIT 1").fetchall()
+            # the gap views stay on the hot tables
+            self.assertEqual(conn.execute(hot_gaps).fetchall(), expected)
+        finally:
+            conn.close()
+
+    def test_rows_left_behind_by_an_interrupted_run_are_read_once(self):
+        self.archive(self.cutoff)
+        # a copy that committed before its delete: the same rows sit in both tiers
+        # (tier_archive is cleared meanwhile, the insert triggers reject archived dates)
+        conn = connect(self.db_path)
+        try:
+            conn.execute("ATTACH DATABASE ? AS cold", (str(self.archive_path),))
+            with conn:
+                conn.execute("DELETE FROM main.tier_archive")
+                for table in ("asset_prices", "fx_rates", "snapshots"):
+                    conn.execute(f"INSERT INTO main.{table} SELECT * FROM cold.{table}")
+            conn.execute("DETACH DATABASE cold")
+            conn.execute(
+                "INSERT INTO tier_archive (id, path, cutoff, first_date, moving) VALUES (1, ?, ?, NULL, 0)",
+                (str(self.archive_path), self.cutoff),
+            )
+            conn.commit()
+        finally:
+            conn.close()
+        for name in ("asset_prices", "snapshots", "v_fx_rates"):
+            with self.subTest(name):
+                self.assertEqual(self.read(QUERIES[name], start=None), self.read(QUERIES[name], self.reference))
+
+
+if __name__ == "__main__":
+    unittest.main()
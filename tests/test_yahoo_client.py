@@ -0,0 +1,236 @@
+"""Yahoo client against the local stub (scripts/yahoo_client.py, scripts/yahoo_stub.py)."""
+import datetime as dt
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+from functools import partial
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path[:0] = [str(ROOT / "app"), str(ROOT / "scripts")]
+
+import fetch_prices  # noqa: E402
+from db import connect, ensure_schema  # noqa: E402
+from yahoo_client import (  # noqa: E402
+    FetchRecorder,
+    backfill,
+    date_chunks,
+    fetch_histories,
+    fetch_history,
+)
+from yahoo_stub import StubConfig, start_stub  # noqa: E402
+
+# START is a Saturday: the first 30-day chunk is that weekend only
+START, END = dt.date(2024, 1, 13), dt.date(2024, 6, 30)
+LISTED = dt.date(2024, 3, 15)
+
+
+def weekdays(start: dt.date, end: dt.date) -> int:
+    return sum((start + dt.timedelta(days=i)).weekday() < 5 for i in range((end - start).days + 1))
+
+
+class DateChunksTest(unittest.TestCase):
+    def test_chunks_follow_a_fixed_grid(self):
+        for days in (1, 7, 30, 365):
+            with self.subTest(days=days):
+                chunks = date_chunks(START, END, days)
+                self.assertEqual((chunks[0][0], chunks[-1][1]), (START, END))
+                for (_, prev_end), (cur_start, _) in zip(chunks, chunks[1:]):
+                    self.assertEqual(cur_start - prev_end, dt.timedelta(days=1))
+                for first, last in chunks:
+                    self.assertLessEqual(first, last)
+                    self.assertEqual(first.toordinal() // days, last.toordinal() // days)
+                # a later start lines up with the cells of the earlier run
+                later = date_chunks(START + dt.timedelta(days=40), END, days)
+                self.assertTrue(set(later[1:]) <= set(chunks))
+
+    def test_zero_days_is_one_chunk(self):
+        self.assertEqual(date_chunks(START, END, 0), [(START, END)])
+
+
+class BackfillTest(unittest.TestCase):
+    def setUp(self):
+        self.config = StubConfig(listed={"NEW": LISTED})
+        self.server = start_stub(self.config)
+        self.base_url = f"http://127.0.0.1:{self.server.server_port}"
+        self.tmp = tempfile.TemporaryDirectory()
+        self.conn = connect(Path(self.tmp.name) / "backfill.db")
+        ensure_schema(self.conn)
+
+    def tearDown(self):
+        self.conn.close()
+        self.tmp.cleanup()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def run_backfill(self, resume: bool = False, store=None, batch_size: int = 1) -> int:
+        recorder = FetchRecorder("test", [], self.conn)
+        return backfill(
+            [("OLD", "OLD"), ("NEW", "NEW")],
+            START,
+            END,
+            target="asset_prices",
+            store=store or partial(fetch_prices.store_history, source="test"),
+            on_chunk=lambda *args: None,
+            recorder=recorder,
+            conn=self.conn,
+            chunk_days=30,
+            resume=resume,
+            user_agent="test",
+            base_url=self.base_url,
+            batch_size=batch_size,
+            retry_backoff=0.01,
+        )
+
+    def stored(self, ticker: str) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM asset_prices WHERE ticker = ?", (ticker,)).fetchone()[0]
+
+    def chunks(self, key: str) -> list[tuple]:
+        return self.conn.execute(
+            "SELECT chunk_start, chunk_end, rows FROM fetch_chunks WHERE key = ? ORDER BY chunk_start", (key,)
+        ).fetchall()
+
+    def test_chunks_without_bars_count_as_zero_rows(self):
+        for batch_size in (1, 2):
+            with self.subTest(batch_size=batch_size):
+                self.conn.execute("DELETE FROM fetch_chunks")
+                self.assertEqual(self.run_backfill(batch_size=batch_size), 0)
+                self.assertEqual(self.stored("OLD"), weekdays(START, END))
+                self.assertEqual(self.stored("NEW"), weekdays(LISTED, END))
+                expected = [(a.isoformat(), b.isoformat()) for a, b in date_chunks(START, END, 30)]
+                for key in ("OLD", "NEW"):
+                    self.assertEqual([row[:2] for row in self.chunks(key)], expected)
+                # NEW has no bars before listing, and neither ticker has any on the first weekend
+                before = [rows for _, chunk_end, rows in self.chunks("NEW") if chunk_end < LISTED.isoformat()]
+                self.assertTrue(before)
+                self.assertEqual(set(before), {0})
+                self.assertEqual(self.chunks("OLD")[0], (START.isoformat(), "2024-01-14", 0))
+                self.assertEqual(sum(rows for *_, rows in self.chunks("OLD")), weekdays(START, END))
+
+    def test_resume_skips_completed_chunks_after_an_interruption(self):
+        calls = []
+
+        def failing_store(conn, key, history):
+            calls.append(key)
+            if len(calls) == 5:
+                raise RuntimeError("interrupted")
+            return fetch_prices.store_history(conn, key, history, source="test")
+
+        with self.assertRaises(RuntimeError):
+            self.run_backfill(store=failing_store)
+        done = len(self.chunks("OLD")) + len(self.chunks("NEW"))
+        self.assertEqual(done, 4)
+        requests = self.config.requests
+
+        chunk_count = len(date_chunks(START, END, 30))
+        self.assertEqual(self.run_backfill(resume=True), 4)
+        self.assertEqual(self.config.requests - requests, 2 * chunk_count - 4)
+        self.assertEqual(self.stored("OLD"), weekdays(START, END))
+        self.assertEqual(self.stored("NEW"), weekdays(LISTED, END))
+
+        # nothing left: no requests at all
+        requests = self.config.requests
+        self.assertEqual(self.run_backfill(resume=True), 2 * chunk_count)
+        self.assertEqual(self.config.requests, requests)
+
+    def test_chunks_reaching_today_are_not_recorded(self):
+        today = dt.date.today()
+        recorder = FetchRecorder("test", [], self.conn)
+        options = dict(
+            target="asset_prices",
+            store=partial(fetch_prices.store_history, source="test"),
+            on_chunk=lambda *args: None,
+            recorder=recorder,
+            conn=self.conn,
+            chunk_days=30,
+            user_agent="test",
+            base_url=self.base_url,
+            retry_backoff=0.01,
+        )
+        start = today - dt.timedelta(days=45)
+        backfill([("OLD", "OLD")], start, today, resume=False, **options)
+        recorded = self.chunks("OLD")
+        self.assertEqual(len(recorded), len(date_chunks(start, today, 30)) - 1)
+        self.assertTrue(all(chunk_end < today.isoformat() for _, chunk_end, _ in recorded))
+        requests = self.config.requests
+        self.assertEqual(backfill([("OLD", "OLD")], start, today, resume=True, **options), len(recorded))
+        self.assertEqual(self.config.requests - requests, 1)
+
+    def test_fetch_prices_resume_flag(self):
+        db_path = Path(self.tmp.name) / "cli.db"
+        command = [
+            sys.executable, str(ROOT / "scripts" / "fetch_prices.py"), START.isoformat(), END.isoformat(),
+            "OLD", "NEW", "--db", str(db_path), "--base-url", self.base_url, "--chunk-days", "30",
+        ]
+        subprocess.run(command, check=True, capture_output=True, text=True)
+        requests = self.config.requests
+        out = subprocess.run([*command, "--resume"], check=True, capture_output=True, text=True).stdout
+        self.assertIn(f"Skipped {2 * len(date_chunks(START, END, 30))} completed chunks (--resume)", out)
+        self.assertEqual(self.config.requests, requests)
+
+
+class FetchHistoriesTest(unittest.TestCase):
+    SYMBOLS = [f"S{i}" for i in range(7)]
+
+    def start(self, **config) -> str:
+        self.config = StubConfig(listed={"LATE": END + dt.timedelta(days=1)}, **config)
+        self.server = start_stub(self.config)
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        return f"http://127.0.0.1:{self.server.server_port}"
+
+    def fetch(self, symbols: list[str], base_url: str, **options) -> tuple[dict, dict]:
+        recorder = FetchRecorder("test", [])
+        return fetch_histories(
+            symbols, START, END, user_agent="test", recorder=recorder, base_url=base_url, retry_backoff=0.01, **options
+        )
+
+    def test_spark_batches_match_single_charts(self):
+        base_url = self.start()
+        expected = {s: fetch_history(s, START, END, user_agent="test", base_url=base_url) for s in self.SYMBOLS}
+        self.config.by_endpoint.update(chart=0, spark=0)
+        histories, stats = self.fetch(self.SYMBOLS, base_url, batch_size=3)
+        self.assertEqual(histories, expected)
+        self.assertEqual(self.config.by_endpoint, {"chart": 0, "spark": 3})
+        # symbols of one request share its stats
+        self.assertIs(stats["S0"], stats["S2"])
+        self.assertIsNot(stats["S0"], stats["S3"])
+        self.assertEqual(stats["S0"]["rows_parsed"], 3 * weekdays(START, END))
+
+    def test_missing_symbols_fall_back_to_the_chart_endpoint(self):
+        base_url = self.start()
+        # LATE has no bars in the range, so the spark response omits it
+        histories, stats = self.fetch(["S0", "LATE", "S1"], base_url, batch_size=5)
+        self.assertEqual(self.config.by_endpoint, {"chart": 1, "spark": 1})
+        self.assertEqual(len(histories["S0"]), weekdays(START, END))
+        self.assertEqual(histories["LATE"], {})
+        self.assertEqual(stats["S0"]["error"], "Missing from batch response: LATE")
+        self.assertIsNone(stats["LATE"]["error"])
+
+    def test_failed_batches_fall_back_symbol_by_symbol(self):
+        base_url = self.start(spark_status=500)
+        histories, stats = self.fetch(self.SYMBOLS, base_url, batch_size=4, workers=2)
+        self.assertEqual(set(histories), set(self.SYMBOLS))
+        self.assertEqual(self.config.by_endpoint, {"chart": len(self.SYMBOLS), "spark": 2})
+        self.assertTrue(all(len(history) == weekdays(START, END) for history in histories.values()))
+
+    def test_workers_bound_the_requests_in_flight(self):
+        base_url = self.start(latency_ms=100)
+        began = time.perf_counter()
+        histories, _ = self.fetch(self.SYMBOLS * 2, base_url, workers=3)
+        elapsed = time.perf_counter() - began
+        self.assertEqual(set(histories), set(self.SYMBOLS))
+        # duplicates are fetched once: 7 requests in ceil(7 / 3) rounds of 100 ms
+        self.assertEqual(self.config.requests, len(self.SYMBOLS))
+        self.assertEqual(self.config.peak_in_flight, 3)
+        self.assertLess(elapsed, 0.1 * len(self.SYMBOLS) * 0.8)
+
+        self.config.peak_in_flight = 0
+        self.fetch(self.SYMBOLS, base_url, workers=1)
+        self.assertEqual(self.config.peak_in_flight, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,36 @@
+-- Archiving (app/tiering.py) deletes hot rows before the cutoff while tier_archive.moving = 1:
+-- the delete triggers leave the remaining derived rows and dirty markers alone, and later
+-- prices / rates for archived dates are skipped
+INSERT INTO assets (ticker, ccy) VALUES ('VTI','USD');
+INSERT INTO fx_rates (date, pair, rate) VALUES ('2023-12-29','USDJPY',140.0);
+INSERT INTO fx_rates (date, pair, rate) VALUES ('2024-01-04','USDJPY',142.0);
+INSERT INTO asset_prices (date, ticker, close) VALUES ('2023-12-29','VTI',200);
+INSERT INTO asset_prices (date, ticker, close) VALUES ('2024-01-04','VTI',205);
+INSERT INTO snapshots (date, ticker, qty, price_ccy) VALUES ('2023-12-29','VTI',10,200);
+INSERT INTO snapshots (date, ticker, qty, price_ccy) VALUES ('2024-01-04','VTI',10,205);
+DELETE FROM risk_dirty;
+DELETE FROM gap_dirty;
+
+INSERT INTO tier_archive (id, path, cutoff, moving) VALUES (1, 'money_diary.archive.db', '2024-01-01', 1);
+DELETE FROM snapshots WHERE date < '2024-01-01';
+DELETE FROM asset_prices WHERE date < '2024-01-01';
+DELETE FROM fx_rates WHERE date < '2024-01-01';
+DELETE FROM portfolio_total_rc WHERE date < '2024-01-01';
+UPDATE tier_archive SET moving = 0;
+
+INSERT INTO asset_prices (date, ticker, close) VALUES ('2023-12-28','VTI',199);
+INSERT INTO fx_rates (date, pair, rate) VALUES ('2023-12-28','USDJPY',139.0);
+
+SELECT 'portfolio_total_rc' AS source, date, round(total_value, 3) AS value
+FROM portfolio_total_rc WHERE rc = 'JPY'
+UNION ALL
+SELECT 'valuation_rc', date, round(value, 3) FROM valuation_rc WHERE rc = 'JPY'
+UNION ALL
+SELECT 'asset_prices', date, close FROM asset_prices
+UNION ALL
+SELECT 'fx_rates', date, rate FROM fx_rates
+UNION ALL
+SELECT 'risk_dirty', from_date, NULL FROM risk_dirty
+UNION ALL
+SELECT 'gap_dirty', from_date, NULL FROM gap_dirty
+ORDER BY 1, 2;
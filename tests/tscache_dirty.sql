@@ -0,0 +1,20 @@
+-- tscache_dirty keeps the earliest changed date per chart series (prices, FX, totals)
+INSERT INTO accounts (account, name) VALUES ('sub', 'Sub');
+INSERT INTO assets (ticker, ccy) VALUES ('VTI','USD');
+
+INSERT INTO fx_rates (date, pair, rate) VALUES ('2024-01-04','USDJPY',144.0);
+INSERT INTO fx_rates (date, pair, rate) VALUES ('2024-01-05','USDJPY',145.0);
+INSERT INTO asset_prices (date, ticker, close) VALUES ('2024-01-04','VTI',230.0);
+INSERT INTO asset_prices (date, ticker, close) VALUES ('2024-01-05','VTI',232.0);
+INSERT INTO snapshots (date, ticker, qty, price_ccy) VALUES ('2024-01-04','VTI',10,230);
+INSERT INTO snapshots (account, date, ticker, qty, price_ccy) VALUES ('sub','2024-01-05','VTI',1,232);
+
+-- the cache has caught up
+DELETE FROM tscache_dirty;
+
+-- appended close, edited close, and an edited rate that rewrites the 2024-01-05 totals
+INSERT INTO asset_prices (date, ticker, close) VALUES ('2024-01-08','VTI',233.0);
+UPDATE asset_prices SET close = 231.0 WHERE date = '2024-01-04' AND ticker = 'VTI';
+UPDATE fx_rates SET rate = 146.0 WHERE date = '2024-01-05' AND pair = 'USDJPY';
+
+SELECT series, from_date FROM tscache_dirty ORDER BY series;
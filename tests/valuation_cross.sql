@@ -0,0 +1,17 @@
+-- EUR asset valued through a triangulated EURJPY rate
+INSERT INTO assets (ticker, ccy) VALUES ('SX5E','EUR');
+INSERT INTO fx_rates (date, pair, rate) VALUES ('2025-09-14','USDJPY',140.0);
+INSERT INTO fx_rates (date, pair, rate) VALUES ('2025-09-14','EURUSD',1.1);
+INSERT INTO fx_rates (date, pair, rate) VALUES ('2025-09-15','USDJPY',145.0);
+INSERT INTO fx_rates (date, pair, rate) VALUES ('2025-09-15','EURUSD',1.1);
+INSERT INTO snapshots (date, ticker, qty, price_ccy) VALUES ('2025-09-14','SX5E',10,50);
+INSERT INTO snapshots (date, ticker, qty, price_ccy) VALUES ('2025-09-15','SX5E',10,50);
+
+SELECT v.date,
+       v.ticker,
+       round(v.fx_rate, 3) AS fx_rate,
+       round(v.value_jpy, 3) AS value_jpy,
+       round(a.delta_fx, 3) AS delta_fx
+FROM v_valuation v
+LEFT JOIN v_attribution a ON a.date = v.date AND a.ticker = v.ticker
+ORDER BY v.date, v.ticker;
@@ -0,0 +1,29 @@
+-- valuation_jpy / portfolio_total_rc follow snapshot and FX edits for the touched dates only
+INSERT INTO accounts (account, name) VALUES ('sub', 'Sub');
+INSERT INTO assets (ticker, ccy) VALUES ('VTI','USD');
+INSERT INTO assets (ticker, ccy) VALUES ('TOPIX','JPY');
+
+INSERT INTO fx_rates (date, pair, rate) VALUES ('2023-12-29','USDJPY',140.0);
+INSERT INTO fx_rates (date, pair, rate) VALUES ('2023-12-30','USDJPY',142.0);
+
+INSERT INTO snapshots (date, ticker, qty, price_ccy) VALUES ('2023-12-29','VTI',10,200);
+INSERT INTO snapshots (date, ticker, qty, price_ccy) VALUES ('2023-12-29','TOPIX',5,100);
+INSERT INTO snapshots (account, date, ticker, qty, price_ccy) VALUES ('sub','2023-12-29','VTI',5,210);
+INSERT INTO snapshots (date, ticker, qty, price_ccy) VALUES ('2023-12-30','VTI',11,205);
+INSERT INTO snapshots (date, ticker, qty, price_ccy) VALUES ('2023-12-30','TOPIX',5,101);
+
+UPDATE fx_rates SET rate = 145.0 WHERE date = '2023-12-30' AND pair = 'USDJPY';
+DELETE FROM snapshots WHERE date = '2023-12-29' AND ticker = 'TOPIX';
+UPDATE snapshots SET qty = 12 WHERE date = '2023-12-30' AND ticker = 'VTI';
+
+SELECT
+  date,
+  ticker,
+  qty,
+  round(price_ccy, 3) AS price_ccy,
+  fx_rate,
+  round(value_jpy, 3) AS value_jpy,
+  round(portfolio_value_jpy, 3) AS portfolio_value_jpy,
+  round(weight, 6) AS weight
+FROM v_valuation_enriched
+ORDER BY date, ticker;